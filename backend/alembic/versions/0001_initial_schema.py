@@ -0,0 +1,84 @@
+"""Initial schema: users, strategies and backtests
+
+Databases created by Base.metadata.create_all before migrations existed
+have exactly these tables; upgrade_database stamps them with this revision.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'users',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('email', sa.String(), nullable=False),
+        sa.Column('username', sa.String(), nullable=False),
+        sa.Column('hashed_password', sa.String(), nullable=False),
+        sa.Column('is_active', sa.Boolean(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True)
+    )
+    op.create_index('ix_users_id', 'users', ['id'])
+    op.create_index('ix_users_email', 'users', ['email'], unique=True)
+    op.create_index('ix_users_username', 'users', ['username'], unique=True)
+
+    op.create_table(
+        'strategies',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('name', sa.String(), nullable=False),
+        sa.Column('description', sa.Text(), nullable=True),
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id'), nullable=True),
+        sa.Column('symbol', sa.String(), nullable=False),
+        sa.Column('strategy_type', sa.String(), nullable=False),
+        sa.Column('parameters', sa.JSON(), nullable=True),
+        sa.Column('buy_conditions', sa.JSON(), nullable=True),
+        sa.Column('sell_conditions', sa.JSON(), nullable=True),
+        sa.Column('initial_capital', sa.Float(), nullable=True),
+        sa.Column('position_size', sa.Float(), nullable=True),
+        sa.Column('stop_loss', sa.Float(), nullable=True),
+        sa.Column('take_profit', sa.Float(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True)
+    )
+    op.create_index('ix_strategies_id', 'strategies', ['id'])
+    op.create_index('ix_strategies_name', 'strategies', ['name'])
+
+    op.create_table(
+        'backtests',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('strategy_id', sa.Integer(), sa.ForeignKey('strategies.id'), nullable=True),
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id'), nullable=True),
+        sa.Column('start_date', sa.DateTime(), nullable=False),
+        sa.Column('end_date', sa.DateTime(), nullable=False),
+        sa.Column('status', sa.String(), nullable=True),
+        sa.Column('total_return', sa.Float(), nullable=True),
+        sa.Column('total_return_pct', sa.Float(), nullable=True),
+        sa.Column('sharpe_ratio', sa.Float(), nullable=True),
+        sa.Column('max_drawdown', sa.Float(), nullable=True),
+        sa.Column('win_rate', sa.Float(), nullable=True),
+        sa.Column('total_trades', sa.Integer(), nullable=True),
+        sa.Column('winning_trades', sa.Integer(), nullable=True),
+        sa.Column('losing_trades', sa.Integer(), nullable=True),
+        sa.Column('trades', sa.JSON(), nullable=True),
+        sa.Column('equity_curve', sa.JSON(), nullable=True),
+        sa.Column('metrics', sa.JSON(), nullable=True),
+        sa.Column('error_message', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.Column('completed_at', sa.DateTime(timezone=True), nullable=True)
+    )
+    op.create_index('ix_backtests_id', 'backtests', ['id'])
+
+
+def downgrade():
+    op.drop_table('backtests')
+    op.drop_table('strategies')
+    op.drop_table('users')
@@ -0,0 +1,113 @@
+"""Job queue, result artifacts, batches and run options
+
+Adds the backtest_jobs, backtest_artifacts and backtest_batches tables, the
+execution settings of strategies, and the interval, universe, out-of-core,
+profiling and engine state columns of backtests. Existing backtests are
+daily single-symbol in-memory runs without a profile.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'backtest_batches',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id'), nullable=True),
+        sa.Column('total', sa.Integer(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True)
+    )
+    op.create_index('ix_backtest_batches_id', 'backtest_batches', ['id'])
+    op.create_index('ix_backtest_batches_user_id', 'backtest_batches', ['user_id'])
+
+    with op.batch_alter_table('strategies') as batch:
+        batch.add_column(sa.Column('execution', sa.JSON(), nullable=True))
+        batch.create_index('ix_strategies_user_created', ['user_id', 'created_at', 'id'])
+
+    with op.batch_alter_table('backtests') as batch:
+        batch.add_column(sa.Column('batch_id', sa.Integer(), nullable=True))
+        batch.add_column(sa.Column('symbols', sa.JSON(), nullable=True))
+        batch.add_column(sa.Column('interval', sa.String(), nullable=True))
+        batch.add_column(sa.Column('out_of_core', sa.Boolean(), nullable=True))
+        batch.add_column(sa.Column('profile', sa.JSON(), nullable=True))
+        batch.add_column(sa.Column('capture_profile', sa.Boolean(), nullable=True))
+        batch.add_column(sa.Column('engine_state', sa.JSON(), nullable=True))
+        batch.create_foreign_key('fk_backtests_batch_id', 'backtest_batches', ['batch_id'], ['id'])
+        batch.create_index('ix_backtests_batch_id', ['batch_id'])
+        batch.create_index('ix_backtests_user_created', ['user_id', 'created_at', 'id'])
+
+    backtests = sa.table(
+        'backtests',
+        sa.column('interval', sa.String()),
+        sa.column('out_of_core', sa.Boolean()),
+        sa.column('capture_profile', sa.Boolean())
+    )
+    op.execute(backtests.update().values(interval='1d', out_of_core=False, capture_profile=False))
+
+    op.create_table(
+        'backtest_artifacts',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('backtest_id', sa.Integer(), sa.ForeignKey('backtests.id'), nullable=False),
+        sa.Column('kind', sa.String(), nullable=False),
+        sa.Column('format', sa.String(), nullable=False),
+        sa.Column('rows', sa.Integer(), nullable=True),
+        sa.Column('size_bytes', sa.Integer(), nullable=True),
+        sa.Column('data', sa.LargeBinary(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.UniqueConstraint('backtest_id', 'kind')
+    )
+    op.create_index('ix_backtest_artifacts_id', 'backtest_artifacts', ['id'])
+    op.create_index('ix_backtest_artifacts_backtest_id', 'backtest_artifacts', ['backtest_id'])
+
+    op.create_table(
+        'backtest_jobs',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('backtest_id', sa.Integer(), sa.ForeignKey('backtests.id'), nullable=True),
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id'), nullable=True),
+        sa.Column('kind', sa.String(), nullable=True),
+        sa.Column('group_key', sa.String(), nullable=True),
+        sa.Column('priority', sa.Integer(), nullable=True),
+        sa.Column('status', sa.String(), nullable=True),
+        sa.Column('attempts', sa.Integer(), nullable=True),
+        sa.Column('max_attempts', sa.Integer(), nullable=True),
+        sa.Column('available_at', sa.DateTime(), nullable=True),
+        sa.Column('worker_id', sa.String(), nullable=True),
+        sa.Column('cancel_requested', sa.Boolean(), nullable=True),
+        sa.Column('error_message', sa.Text(), nullable=True),
+        sa.Column('enqueued_at', sa.DateTime(), nullable=False),
+        sa.Column('started_at', sa.DateTime(), nullable=True),
+        sa.Column('finished_at', sa.DateTime(), nullable=True)
+    )
+    op.create_index('ix_backtest_jobs_id', 'backtest_jobs', ['id'])
+    op.create_index('ix_backtest_jobs_backtest_id', 'backtest_jobs', ['backtest_id'])
+    op.create_index('ix_backtest_jobs_user_id', 'backtest_jobs', ['user_id'])
+    op.create_index('ix_backtest_jobs_group_key', 'backtest_jobs', ['group_key'])
+    op.create_index('ix_backtest_jobs_status', 'backtest_jobs', ['status'])
+
+
+def downgrade():
+    op.drop_table('backtest_jobs')
+    op.drop_table('backtest_artifacts')
+
+    with op.batch_alter_table('backtests') as batch:
+        batch.drop_index('ix_backtests_user_created')
+        batch.drop_index('ix_backtests_batch_id')
+        batch.drop_constraint('fk_backtests_batch_id', type_='foreignkey')
+        for column in ('engine_state', 'capture_profile', 'profile', 'out_of_core', 'interval', 'symbols', 'batch_id'):
+            batch.drop_column(column)
+
+    with op.batch_alter_table('strategies') as batch:
+        batch.drop_index('ix_strategies_user_created')
+        batch.drop_column('execution')
+
+    op.drop_table('backtest_batches')
@@ -0,0 +1,51 @@
+"""Analysis runs executed by the job queue
+
+Adds the analysis_runs table holding the requests, progress and results
+of optimization, walk-forward and robustness analyses, and the job column
+linking a queued job to the analysis it runs.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'analysis_runs',
+        sa.Column('id', sa.String(), primary_key=True),
+        sa.Column('kind', sa.String(), nullable=False),
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id'), nullable=True),
+        sa.Column('strategy_id', sa.Integer(), nullable=True),
+        sa.Column('backtest_id', sa.Integer(), nullable=True),
+        sa.Column('status', sa.String(), nullable=True),
+        sa.Column('request', sa.JSON(), nullable=False),
+        sa.Column('progress', sa.JSON(), nullable=True),
+        sa.Column('results', sa.JSON(), nullable=True),
+        sa.Column('error_message', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.Column('completed_at', sa.DateTime(timezone=True), nullable=True)
+    )
+    op.create_index('ix_analysis_runs_user_id', 'analysis_runs', ['user_id'])
+
+    with op.batch_alter_table('backtest_jobs') as batch:
+        batch.add_column(sa.Column('analysis_id', sa.String(), nullable=True))
+        batch.create_foreign_key('fk_backtest_jobs_analysis_id', 'analysis_runs', ['analysis_id'], ['id'])
+        batch.create_index('ix_backtest_jobs_analysis_id', ['analysis_id'])
+
+
+def downgrade():
+    with op.batch_alter_table('backtest_jobs') as batch:
+        batch.drop_index('ix_backtest_jobs_analysis_id')
+        batch.drop_constraint('fk_backtest_jobs_analysis_id', type_='foreignkey')
+        batch.drop_column('analysis_id')
+
+    op.drop_table('analysis_runs')
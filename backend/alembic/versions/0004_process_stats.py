@@ -0,0 +1,31 @@
+"""Counters published by worker processes
+
+Adds the process_stats table, where each backtest worker saves the
+counters of its in-memory caches so the API can report them for all
+workers.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'process_stats',
+        sa.Column('process_id', sa.String(), primary_key=True),
+        sa.Column('stats', sa.JSON(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False)
+    )
+
+
+def downgrade():
+    op.drop_table('process_stats')
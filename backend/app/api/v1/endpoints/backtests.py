@@ -1,19 +1,47 @@
-from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks
-from sqlalchemy.orm import Session
-from typing import List
+import json
+import numpy as np
+import pandas as pd
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import Response, StreamingResponse
+from sqlalchemy import func, insert
+from sqlalchemy.orm import Session, load_only
+from typing import Dict, List, Any, Optional
 from datetime import datetime
+from app.core.config import settings
 from app.core.database import get_db
-from app.models.models import User as UserModel, Backtest as BacktestModel, Strategy as StrategyModel
-from app.schemas.schemas import BacktestCreate, BacktestResult
+from app.core.pagination import paginate
+from app.models.models import (
+    User as UserModel, AnalysisRun as AnalysisRunModel, Backtest as BacktestModel, BacktestArtifact as BacktestArtifactModel, BacktestBatch as BacktestBatchModel,
+    BacktestJob as BacktestJobModel, Strategy as StrategyModel
+)
+from app.schemas.schemas import (
+    BacktestCreate, BacktestBatchCreate, BacktestBatchStatus, BacktestExtend, BacktestResult, BacktestSummary, BacktestPage, BacktestProfile, EquityCurve, PerformanceReport, OptimizationRequest, OptimizationStatus,
+    IndicatorCacheStats, QueueStats, RobustnessRequest, RobustnessStatus, WalkForwardRequest, WalkForwardStatus
+)
 from app.api.v1.endpoints.auth import get_current_user
-from app.services.backtesting_engine import run_backtest
+from app.services.job_queue import job_queue, market_data_key
+from app.services.analysis_runs import submit_analysis
+from app.services.optimizer import strategy_snapshot
+from app.services.indicator_cache import combine_stats
+from app.services.process_stats import collect_stats
+from app.services.result_store import ARTIFACT_KINDS, load_results, load_columns
+from app.services.downsampling import downsample
+from app.services.performance import local_times, period_returns, rolling_metrics
+from app.services.profiling import format_profiler_data
+from app.services.timeframes import higher_timeframes, periods_per_year
 
 router = APIRouter()
 
+def _check_timeframes(parameters: Optional[Dict[str, Any]], interval: str):
+    """Reject higher timeframes that are not coarser than the backtest's bars"""
+    try:
+        higher_timeframes(parameters or {}, interval)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 @router.post("/", response_model=BacktestResult, status_code=status.HTTP_201_CREATED)
 def create_backtest(
     backtest: BacktestCreate,
-    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
     current_user: UserModel = Depends(get_current_user)
 ):
@@ -24,6 +52,9 @@ def create_backtest(
     ).first()
     if not strategy:
         raise HTTPException(status_code=404, detail="Strategy not found")
+    _check_timeframes(strategy.parameters, backtest.interval)
+    if backtest.out_of_core and backtest.symbols:
+        raise HTTPException(status_code=400, detail="Out-of-core runs support a single symbol only")
     
     # Create backtest record
     db_backtest = BacktestModel(
@@ -31,28 +62,354 @@ def create_backtest(
         user_id=current_user.id,
         start_date=backtest.start_date,
         end_date=backtest.end_date,
+        interval=backtest.interval,
+        symbols=backtest.symbols,
+        capture_profile=backtest.capture_profile,
+        out_of_core=backtest.out_of_core,
         status="pending"
     )
     db.add(db_backtest)
     db.commit()
     db.refresh(db_backtest)
     
-    # Run backtest in background
-    background_tasks.add_task(run_backtest, db_backtest.id)
+    # Queue the backtest for the worker pool; out-of-core runs stream their own bars instead of a preloaded frame
+    group_key = None if backtest.symbols or backtest.out_of_core else market_data_key(
+        strategy.symbol, backtest.start_date, backtest.end_date, backtest.interval
+    )
+    job_queue.enqueue(db, db_backtest, priority=backtest.priority, group_key=group_key)
+    db.refresh(db_backtest)
     
     return db_backtest
 
-@router.get("/", response_model=List[BacktestResult])
-def list_backtests(
-    skip: int = 0,
-    limit: int = 100,
+def _batch_status(db: Session, batch: BacktestBatchModel) -> BacktestBatchStatus:
+    counts = dict(
+        db.query(BacktestModel.status, func.count(BacktestModel.id))
+        .filter(BacktestModel.batch_id == batch.id)
+        .group_by(BacktestModel.status)
+        .all()
+    )
+    finished = sum(counts.get(name, 0) for name in ("completed", "failed", "cancelled"))
+    return BacktestBatchStatus(
+        id=batch.id,
+        status="completed" if finished >= batch.total else "running",
+        total=batch.total,
+        finished=finished,
+        progress=finished / batch.total if batch.total else 1.0,
+        counts=counts,
+        created_at=batch.created_at
+    )
+
+@router.post("/batch", response_model=BacktestBatchStatus, status_code=status.HTTP_202_ACCEPTED)
+def create_backtest_batch(
+    request: BacktestBatchCreate,
+    db: Session = Depends(get_db),
+    current_user: UserModel = Depends(get_current_user)
+):
+    if len(request.backtests) > settings.BATCH_MAX_BACKTESTS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Batch has {len(request.backtests)} backtests, the limit is {settings.BATCH_MAX_BACKTESTS}"
+        )
+    
+    # Verify every strategy exists and belongs to the user in one query
+    strategy_ids = {item.strategy_id for item in request.backtests}
+    rows = db.query(StrategyModel.id, StrategyModel.symbol, StrategyModel.parameters).filter(
+        StrategyModel.id.in_(strategy_ids),
+        StrategyModel.user_id == current_user.id
+    ).all()
+    symbols = {strategy_id: symbol for strategy_id, symbol, _ in rows}
+    parameters = {strategy_id: params for strategy_id, _, params in rows}
+    missing = sorted(strategy_ids - symbols.keys())
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Strategies not found: {', '.join(map(str, missing))}")
+    for item in request.backtests:
+        _check_timeframes(parameters[item.strategy_id], item.interval)
+    
+    batch = BacktestBatchModel(user_id=current_user.id, total=len(request.backtests))
+    db.add(batch)
+    db.flush()
+    
+    # Backtests over the same market data are queued next to each other so a worker runs them on one fetch
+    items = [
+        (market_data_key(symbols[item.strategy_id], item.start_date, item.end_date, item.interval), item)
+        for item in request.backtests
+    ]
+    items.sort(key=lambda pair: pair[0])
+    backtest_ids = db.execute(
+        insert(BacktestModel).returning(BacktestModel.id, sort_by_parameter_order=True),
+        [
+            {
+                "strategy_id": item.strategy_id,
+                "user_id": current_user.id,
+                "batch_id": batch.id,
+                "start_date": item.start_date,
+                "end_date": item.end_date,
+                "interval": item.interval,
+                "status": "pending"
+            }
+            for _, item in items
+        ]
+    ).scalars().all()
+    
+    job_queue.enqueue_many(
+        db, current_user.id, zip(backtest_ids, (group_key for group_key, _ in items)), priority=request.priority
+    )
+    db.refresh(batch)
+    return _batch_status(db, batch)
+
+@router.get("/batch/{batch_id}", response_model=BacktestBatchStatus)
+def get_backtest_batch(
+    batch_id: int,
+    db: Session = Depends(get_db),
+    current_user: UserModel = Depends(get_current_user)
+):
+    batch = db.query(BacktestBatchModel).filter(
+        BacktestBatchModel.id == batch_id,
+        BacktestBatchModel.user_id == current_user.id
+    ).first()
+    if not batch:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    return _batch_status(db, batch)
+
+def _get_analysis(db: Session, kind: str, analysis_id: str, current_user: UserModel, detail: str) -> AnalysisRunModel:
+    run = db.query(AnalysisRunModel).filter(
+        AnalysisRunModel.id == analysis_id,
+        AnalysisRunModel.kind == kind,
+        AnalysisRunModel.user_id == current_user.id
+    ).first()
+    if not run:
+        raise HTTPException(status_code=404, detail=detail)
+    return run
+
+def _optimization_status(run: AnalysisRunModel, top_n: int = 20) -> OptimizationStatus:
+    progress = run.progress or {}
+    return OptimizationStatus(
+        id=run.id,
+        strategy_id=run.strategy_id,
+        status=run.status,
+        metric=run.request["metric"],
+        total_combinations=progress.get("total_combinations", 0),
+        completed=progress.get("completed", 0),
+        failed=progress.get("failed", 0),
+        results=(run.results or [])[:top_n],
+        error_message=run.error_message,
+        created_at=run.created_at,
+        completed_at=run.completed_at
+    )
+
+@router.post("/optimize", response_model=OptimizationStatus, status_code=status.HTTP_202_ACCEPTED)
+def create_optimization(
+    request: OptimizationRequest,
+    db: Session = Depends(get_db),
+    current_user: UserModel = Depends(get_current_user)
+):
+    """Queue a grid search of a strategy's parameters, run by the backtest worker pool"""
+    strategy = db.query(StrategyModel).filter(
+        StrategyModel.id == request.strategy_id,
+        StrategyModel.user_id == current_user.id
+    ).first()
+    if not strategy:
+        raise HTTPException(status_code=404, detail="Strategy not found")
+    
+    try:
+        run = submit_analysis(db, "optimization", {
+            "snapshot": strategy_snapshot(strategy),
+            **request.model_dump(mode="json", exclude={"strategy_id"})
+        }, current_user.id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return _optimization_status(run)
+
+@router.get("/optimize/{optimization_id}", response_model=OptimizationStatus)
+def get_optimization(
+    optimization_id: str,
+    top_n: int = 20,
+    db: Session = Depends(get_db),
+    current_user: UserModel = Depends(get_current_user)
+):
+    run = _get_analysis(db, "optimization", optimization_id, current_user, "Optimization not found")
+    return _optimization_status(run, top_n)
+
+@router.delete("/optimize/{optimization_id}", response_model=OptimizationStatus)
+def cancel_optimization(
+    optimization_id: str,
+    db: Session = Depends(get_db),
+    current_user: UserModel = Depends(get_current_user)
+):
+    """Cancel an optimization; a queued one stops at once, a running one when the worker pool stops its worker"""
+    run = _get_analysis(db, "optimization", optimization_id, current_user, "Optimization not found")
+    job_queue.cancel_analysis(db, run.id)
+    return _optimization_status(run)
+
+def _walk_forward_status(run: AnalysisRunModel, include_results: bool = False) -> WalkForwardStatus:
+    progress = run.progress or {}
+    results = (run.results or {}) if include_results else {}
+    return WalkForwardStatus(
+        id=run.id,
+        strategy_id=run.strategy_id,
+        status=run.status,
+        phase=progress.get("phase"),
+        metric=run.request["metric"],
+        total_combinations=progress.get("total_combinations", 0),
+        completed=progress.get("completed", 0),
+        failed=progress.get("failed", 0),
+        tested=progress.get("tested", 0),
+        windows=progress.get("windows", []),
+        metrics=progress.get("metrics"),
+        trades=results.get("trades"),
+        equity_curve=results.get("equity_curve"),
+        error_message=run.error_message,
+        created_at=run.created_at,
+        completed_at=run.completed_at
+    )
+
+@router.post("/walk-forward", response_model=WalkForwardStatus, status_code=status.HTTP_202_ACCEPTED)
+def create_walk_forward(
+    request: WalkForwardRequest,
+    db: Session = Depends(get_db),
+    current_user: UserModel = Depends(get_current_user)
+):
+    """Queue a walk-forward optimization of a strategy, run by the backtest worker pool"""
+    strategy = db.query(StrategyModel).filter(
+        StrategyModel.id == request.strategy_id,
+        StrategyModel.user_id == current_user.id
+    ).first()
+    if not strategy:
+        raise HTTPException(status_code=404, detail="Strategy not found")
+    
+    try:
+        run = submit_analysis(db, "walk_forward", {
+            "snapshot": strategy_snapshot(strategy),
+            **request.model_dump(mode="json", exclude={"strategy_id"})
+        }, current_user.id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return _walk_forward_status(run)
+
+@router.get("/walk-forward/{analysis_id}", response_model=WalkForwardStatus)
+def get_walk_forward(
+    analysis_id: str,
+    include_results: bool = False,
+    db: Session = Depends(get_db),
+    current_user: UserModel = Depends(get_current_user)
+):
+    """Progress and per-window results; include_results adds the stitched trades and equity curve"""
+    run = _get_analysis(db, "walk_forward", analysis_id, current_user, "Walk-forward analysis not found")
+    return _walk_forward_status(run, include_results)
+
+@router.delete("/walk-forward/{analysis_id}", response_model=WalkForwardStatus)
+def cancel_walk_forward(
+    analysis_id: str,
+    db: Session = Depends(get_db),
+    current_user: UserModel = Depends(get_current_user)
+):
+    run = _get_analysis(db, "walk_forward", analysis_id, current_user, "Walk-forward analysis not found")
+    job_queue.cancel_analysis(db, run.id)
+    return _walk_forward_status(run)
+
+def _robustness_status(run: AnalysisRunModel) -> RobustnessStatus:
+    progress = run.progress or {}
+    return RobustnessStatus(
+        id=run.id,
+        backtest_id=run.backtest_id,
+        status=run.status,
+        seed=run.request["seed"],
+        confidence=run.request["confidence"],
+        total_simulations=progress.get("total_simulations", 0),
+        completed=progress.get("completed", 0),
+        results=run.results or {},
+        error_message=run.error_message,
+        created_at=run.created_at,
+        completed_at=run.completed_at
+    )
+
+@router.post("/{backtest_id}/robustness", response_model=RobustnessStatus, status_code=status.HTTP_202_ACCEPTED)
+def create_robustness_analysis(
+    backtest_id: int,
+    request: RobustnessRequest,
     db: Session = Depends(get_db),
     current_user: UserModel = Depends(get_current_user)
 ):
-    backtests = db.query(BacktestModel).filter(
+    """Queue a Monte Carlo analysis resampling the trades and returns of a completed backtest"""
+    backtest = db.query(BacktestModel).filter(
+        BacktestModel.id == backtest_id,
         BacktestModel.user_id == current_user.id
-    ).order_by(BacktestModel.created_at.desc()).offset(skip).limit(limit).all()
-    return backtests
+    ).first()
+    if not backtest:
+        raise HTTPException(status_code=404, detail="Backtest not found")
+    if backtest.status != "completed":
+        raise HTTPException(status_code=409, detail="Only completed backtests can be analyzed")
+    
+    try:
+        run = submit_analysis(db, "robustness", {
+            "backtest_id": backtest.id,
+            **request.model_dump(mode="json")
+        }, current_user.id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return _robustness_status(run)
+
+@router.get("/robustness/{analysis_id}", response_model=RobustnessStatus)
+def get_robustness_analysis(
+    analysis_id: str,
+    db: Session = Depends(get_db),
+    current_user: UserModel = Depends(get_current_user)
+):
+    run = _get_analysis(db, "robustness", analysis_id, current_user, "Robustness analysis not found")
+    return _robustness_status(run)
+
+@router.delete("/robustness/{analysis_id}", response_model=RobustnessStatus)
+def cancel_robustness_analysis(
+    analysis_id: str,
+    db: Session = Depends(get_db),
+    current_user: UserModel = Depends(get_current_user)
+):
+    run = _get_analysis(db, "robustness", analysis_id, current_user, "Robustness analysis not found")
+    job_queue.cancel_analysis(db, run.id)
+    return _robustness_status(run)
+
+@router.get("/queue/stats", response_model=QueueStats)
+def get_queue_stats(
+    db: Session = Depends(get_db),
+    current_user: UserModel = Depends(get_current_user)
+):
+    return job_queue.stats(db)
+
+@router.get("/indicator-cache/stats", response_model=IndicatorCacheStats)
+def get_indicator_cache_stats(
+    db: Session = Depends(get_db),
+    current_user: UserModel = Depends(get_current_user)
+):
+    """
+    Indicator cache counters summed over the backtest workers and this API process
+
+    Each process has its own cache; workers publish their counters when
+    they start and after every job.
+    """
+    return combine_stats(collect_stats(db, "indicator_cache"))
+
+@router.get("/", response_model=BacktestPage)
+def list_backtests(
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=100),
+    batch_id: Optional[int] = None,
+    db: Session = Depends(get_db),
+    current_user: UserModel = Depends(get_current_user)
+):
+    # Only the summary columns are read; results stay on disk
+    query = db.query(BacktestModel).options(
+        load_only(*(getattr(BacktestModel, field) for field in BacktestSummary.model_fields))
+    ).filter(BacktestModel.user_id == current_user.id)
+    if batch_id is not None:
+        query = query.filter(BacktestModel.batch_id == batch_id)
+    try:
+        backtests, next_cursor = paginate(query, BacktestModel, cursor, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return BacktestPage(items=backtests, next_cursor=next_cursor)
 
 @router.get("/{backtest_id}", response_model=BacktestResult)
 def get_backtest(
@@ -66,6 +423,208 @@ def get_backtest(
     ).first()
     if not backtest:
         raise HTTPException(status_code=404, detail="Backtest not found")
+    
+    # Trades and equity curve are only loaded for the detail view
+    result = BacktestResult.model_validate(backtest)
+    for kind in ARTIFACT_KINDS:
+        setattr(result, kind, load_results(db, backtest, kind))
+    return result
+
+def _as_utc(value: datetime) -> pd.Timestamp:
+    timestamp = pd.Timestamp(value)
+    return timestamp.tz_localize("UTC") if timestamp.tzinfo is None else timestamp.tz_convert("UTC")
+
+def _curve_points(columns: Dict[str, np.ndarray], index: np.ndarray) -> List[Dict[str, Any]]:
+    names = list(columns)
+    return [dict(zip(names, row)) for row in zip(*(columns[name][index].tolist() for name in names))]
+
+def _stream_curve(columns: Dict[str, np.ndarray], index: np.ndarray, chunk_size: int = 5000):
+    # Serialize a chunk at a time so the full response is never held in memory
+    for offset in range(0, len(index), chunk_size):
+        points = _curve_points(columns, index[offset:offset + chunk_size])
+        yield "".join(json.dumps(point) + "\n" for point in points)
+
+@router.get("/{backtest_id}/equity-curve", response_model=EquityCurve)
+def get_equity_curve(
+    backtest_id: int,
+    points: int = Query(2000, ge=10, le=100000),
+    method: str = Query("lttb", pattern="^(lttb|minmax|none)$"),
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    format: str = Query("json", pattern="^(json|ndjson)$"),
+    db: Session = Depends(get_db),
+    current_user: UserModel = Depends(get_current_user)
+):
+    backtest = db.query(BacktestModel).filter(
+        BacktestModel.id == backtest_id,
+        BacktestModel.user_id == current_user.id
+    ).first()
+    if not backtest:
+        raise HTTPException(status_code=404, detail="Backtest not found")
+    
+    columns = load_columns(db, backtest, "equity_curve")
+    if not columns:
+        raise HTTPException(status_code=404, detail="Equity curve not available")
+    
+    # Restrict to the requested window; naive bounds are taken as UTC
+    times = pd.to_datetime(pd.Series(columns['timestamp']), utc=True, format='ISO8601')
+    window = np.ones(len(times), dtype=bool)
+    if start is not None:
+        window &= (times >= _as_utc(start)).to_numpy()
+    if end is not None:
+        window &= (times <= _as_utc(end)).to_numpy()
+    if not window.all():
+        columns = {name: values[window] for name, values in columns.items()}
+        times = times[window]
+    
+    x = times.dt.tz_convert(None).to_numpy().astype('datetime64[s]').astype(np.float64)
+    index = downsample(x, columns['value'].astype(np.float64), points, method)
+    
+    if format == "ndjson":
+        return StreamingResponse(_stream_curve(columns, index), media_type="application/x-ndjson")
+    return EquityCurve(
+        backtest_id=backtest.id,
+        method=method,
+        total_points=len(x),
+        returned_points=len(index),
+        points=_curve_points(columns, index)
+    )
+
+@router.get("/{backtest_id}/performance", response_model=PerformanceReport)
+def get_performance(
+    backtest_id: int,
+    window: int = Query(63, ge=2, le=10000),
+    points: int = Query(2000, ge=10, le=100000),
+    db: Session = Depends(get_db),
+    current_user: UserModel = Depends(get_current_user)
+):
+    """Monthly and yearly returns and trailing-window metrics of a backtest's equity curve"""
+    backtest = db.query(BacktestModel).filter(
+        BacktestModel.id == backtest_id,
+        BacktestModel.user_id == current_user.id
+    ).first()
+    if not backtest:
+        raise HTTPException(status_code=404, detail="Backtest not found")
+    
+    columns = load_columns(db, backtest, "equity_curve")
+    if not columns:
+        raise HTTPException(status_code=404, detail="Equity curve not available")
+    
+    values = columns['value'].astype(np.float64)
+    times = local_times(columns['timestamp'])
+    rolling = rolling_metrics(values, window, periods_per_year(backtest.interval or "1d"))
+    
+    # Rolling values are evenly subsampled to at most `points` bars
+    full = np.arange(window, len(values))
+    index = full[np.unique(np.linspace(0, len(full) - 1, min(points, len(full))).round().astype(np.int64))] if len(full) else full
+    names = list(rolling)
+    series = [rolling[name][index].tolist() for name in names]
+    return PerformanceReport(
+        backtest_id=backtest.id,
+        window=window,
+        monthly_returns=period_returns(values, times, "monthly"),
+        yearly_returns=period_returns(values, times, "yearly"),
+        total_points=len(full),
+        rolling=[
+            {"timestamp": timestamp, **dict(zip(names, row))}
+            for timestamp, row in zip(columns['timestamp'][index].tolist(), zip(*series))
+        ]
+    )
+
+@router.post("/{backtest_id}/extend", response_model=BacktestResult)
+def extend_backtest(
+    backtest_id: int,
+    request: BacktestExtend,
+    db: Session = Depends(get_db),
+    current_user: UserModel = Depends(get_current_user)
+):
+    """
+    Continue a completed backtest up to a later end date
+
+    Single-symbol runs of an unchanged strategy without higher-timeframe
+    indicators simulate only the bars after the previous end, from the
+    saved portfolio and indicator state; trades, equity curve and metrics
+    are identical to a full rerun. Other backtests are rerun in full.
+    """
+    backtest = db.query(BacktestModel).filter(
+        BacktestModel.id == backtest_id,
+        BacktestModel.user_id == current_user.id
+    ).first()
+    if not backtest:
+        raise HTTPException(status_code=404, detail="Backtest not found")
+    if backtest.status in ("pending", "running"):
+        raise HTTPException(status_code=409, detail=f"Backtest is already {backtest.status}")
+    if _as_utc(request.end_date) <= _as_utc(backtest.end_date):
+        raise HTTPException(status_code=400, detail="end_date must be after the current end_date")
+    
+    # Only the new bars are simulated when the saved engine state allows it
+    backtest.end_date = request.end_date
+    job_queue.enqueue(db, backtest, priority=request.priority, kind="extend")
+    db.refresh(backtest)
+    return backtest
+
+@router.get("/{backtest_id}/profile", response_model=BacktestProfile)
+def get_backtest_profile(
+    backtest_id: int,
+    sort: str = Query("cumulative", pattern="^(cumulative|tottime|calls)$"),
+    limit: int = Query(50, ge=1, le=500),
+    format: str = Query("json", pattern="^(json|pstats)$"),
+    db: Session = Depends(get_db),
+    current_user: UserModel = Depends(get_current_user)
+):
+    backtest = db.query(BacktestModel).filter(
+        BacktestModel.id == backtest_id,
+        BacktestModel.user_id == current_user.id
+    ).first()
+    if not backtest:
+        raise HTTPException(status_code=404, detail="Backtest not found")
+    if not backtest.profile:
+        raise HTTPException(status_code=404, detail="Profile not available")
+    
+    artifact = db.query(BacktestArtifactModel).filter(
+        BacktestArtifactModel.backtest_id == backtest.id,
+        BacktestArtifactModel.kind == "cprofile"
+    ).first()
+    
+    # Raw stats load with `python -m pstats` or snakeviz
+    if format == "pstats":
+        if artifact is None:
+            raise HTTPException(status_code=404, detail="No cProfile was captured for this backtest")
+        return Response(
+            content=artifact.data,
+            media_type="application/octet-stream",
+            headers={"Content-Disposition": f'attachment; filename="backtest-{backtest.id}.pstats"'}
+        )
+    
+    job = db.query(BacktestJobModel).filter(
+        BacktestJobModel.backtest_id == backtest.id,
+        BacktestJobModel.started_at.isnot(None)
+    ).order_by(BacktestJobModel.id.desc()).first()
+    
+    return BacktestProfile(
+        backtest_id=backtest.id,
+        queue_wait_seconds=(job.started_at - job.enqueued_at).total_seconds() if job else None,
+        cprofile=format_profiler_data(artifact.data, sort, limit) if artifact is not None else None,
+        **backtest.profile
+    )
+
+@router.post("/{backtest_id}/cancel", response_model=BacktestResult)
+def cancel_backtest(
+    backtest_id: int,
+    db: Session = Depends(get_db),
+    current_user: UserModel = Depends(get_current_user)
+):
+    backtest = db.query(BacktestModel).filter(
+        BacktestModel.id == backtest_id,
+        BacktestModel.user_id == current_user.id
+    ).first()
+    if not backtest:
+        raise HTTPException(status_code=404, detail="Backtest not found")
+    if backtest.status not in ("pending", "running"):
+        raise HTTPException(status_code=409, detail=f"Backtest is already {backtest.status}")
+    
+    job_queue.cancel(db, backtest.id)
+    db.refresh(backtest)
     return backtest
 
 @router.delete("/{backtest_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -1,6 +1,10 @@
 from fastapi import APIRouter, Depends, HTTPException
-from app.schemas.schemas import MarketDataRequest, OHLCVData
-from app.services.market_data_service import MarketDataService
+from sqlalchemy.orm import Session
+from app.core.database import get_db
+from app.schemas.schemas import MarketDataRequest, MarketDataBatchRequest, MarketDataBatch, OHLCVData, MarketDataCacheStats
+from app.services.market_data_service import async_market_data_service
+from app.services.market_data_cache import combine_stats, market_data_cache
+from app.services.process_stats import collect_stats
 from typing import List
 
 router = APIRouter()
@@ -8,8 +12,7 @@ router = APIRouter()
 @router.post("/", response_model=List[OHLCVData])
 async def get_market_data(request: MarketDataRequest):
     try:
-        service = MarketDataService()
-        data = service.fetch_data(
+        data = await async_market_data_service.fetch_data(
             symbol=request.symbol,
             start_date=request.start_date,
             end_date=request.end_date,
@@ -18,3 +21,24 @@ async def get_market_data(request: MarketDataRequest):
         return data
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
+
+@router.post("/batch", response_model=MarketDataBatch)
+async def get_market_data_batch(request: MarketDataBatchRequest):
+    # Uncached symbols are downloaded together; symbols without data are reported, not fatal
+    data, errors = await async_market_data_service.fetch_data_batch(
+        symbols=request.symbols,
+        start_date=request.start_date,
+        end_date=request.end_date,
+        interval=request.interval
+    )
+    return MarketDataBatch(data=data, errors=errors)
+
+@router.get("/cache/stats", response_model=MarketDataCacheStats)
+def get_cache_stats(db: Session = Depends(get_db)):
+    """
+    Market data cache usage and counters
+
+    Entries and bytes describe the cache directory all processes share; hits,
+    misses and evictions are summed over this process and the backtest workers.
+    """
+    return combine_stats(market_data_cache.stats(), collect_stats(db, "market_data_cache"))
@@ -1,36 +1,51 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.orm import Session, load_only
+from typing import Optional
 from app.core.database import get_db
+from app.core.pagination import paginate
 from app.models.models import User as UserModel, Strategy as StrategyModel
-from app.schemas.schemas import Strategy, StrategyCreate, StrategyUpdate
+from app.schemas.schemas import Strategy, StrategyCreate, StrategyUpdate, StrategySummary, StrategyPage
 from app.api.v1.endpoints.auth import get_current_user
+from app.services.backtesting_engine import compile_strategy_conditions
 
 router = APIRouter()
 
+def validate_conditions(parameters, buy_conditions, sell_conditions):
+    """Reject conditions the engine cannot compile against the strategy's indicators and timeframes"""
+    try:
+        compile_strategy_conditions(parameters, buy_conditions, sell_conditions)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 @router.post("/", response_model=Strategy, status_code=status.HTTP_201_CREATED)
 def create_strategy(
     strategy: StrategyCreate,
     db: Session = Depends(get_db),
     current_user: UserModel = Depends(get_current_user)
 ):
+    validate_conditions(strategy.parameters, strategy.buy_conditions, strategy.sell_conditions)
     db_strategy = StrategyModel(**strategy.dict(), user_id=current_user.id)
     db.add(db_strategy)
     db.commit()
     db.refresh(db_strategy)
     return db_strategy
 
-@router.get("/", response_model=List[Strategy])
+@router.get("/", response_model=StrategyPage)
 def list_strategies(
-    skip: int = 0,
-    limit: int = 100,
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=100),
     db: Session = Depends(get_db),
     current_user: UserModel = Depends(get_current_user)
 ):
-    strategies = db.query(StrategyModel).filter(
-        StrategyModel.user_id == current_user.id
-    ).offset(skip).limit(limit).all()
-    return strategies
+    # Parameters and conditions are only returned by the detail endpoint
+    query = db.query(StrategyModel).options(
+        load_only(*(getattr(StrategyModel, field) for field in StrategySummary.model_fields))
+    ).filter(StrategyModel.user_id == current_user.id)
+    try:
+        strategies, next_cursor = paginate(query, StrategyModel, cursor, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return StrategyPage(items=strategies, next_cursor=next_cursor)
 
 @router.get("/{strategy_id}", response_model=Strategy)
 def get_strategy(
@@ -61,6 +76,10 @@ def update_strategy(
         raise HTTPException(status_code=404, detail="Strategy not found")
     
     update_data = strategy_update.dict(exclude_unset=True)
+    validate_conditions(*(
+        update_data[field] if field in update_data else getattr(db_strategy, field)
+        for field in ("parameters", "buy_conditions", "sell_conditions")
+    ))
     for field, value in update_data.items():
         setattr(db_strategy, field, value)
     
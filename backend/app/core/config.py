@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings
-from typing import List
+from typing import List, Optional
 import os
 
 class Settings(BaseSettings):
@@ -15,6 +15,39 @@ class Settings(BaseSettings):
     ALPHA_VANTAGE_API_KEY: str = ""
     POLYGON_API_KEY: str = ""
     
+    # Market data providers: yfinance, alpha_vantage, polygon or local
+    MARKET_DATA_PROVIDER: str = "yfinance"
+    MARKET_DATA_LOCAL_DIR: str = "./market_data"  # Bulk vendor dumps read by the local provider
+    MARKET_DATA_LOCAL_TIMEZONE: str = ""  # Timezone of naive timestamps in dumps; empty keeps them naive
+    
+    # Market data cache
+    MARKET_DATA_CACHE_ENABLED: bool = True
+    MARKET_DATA_CACHE_DIR: str = "./market_data_cache"
+    MARKET_DATA_CACHE_MAX_BYTES: int = 2 * 1024 ** 3
+    MARKET_DATA_OFFLINE: bool = False  # Serve only from the cache, never touch the network
+    MARKET_DATA_MAX_CONCURRENCY: int = 8  # Concurrent provider requests and pooled connections
+    
+    # Backtesting
+    VECTORIZED_BACKTESTING: bool = True
+    JIT_SIMULATION: bool = True  # Walk vectorized backtests in the Numba kernel when Numba is installed
+    SIMULATION_CHUNK_BYTES: int = 64 * 1024 ** 2  # Working memory of one chunk of bars walked by a vectorized backtest
+    RESULT_SPOOL_DIR: Optional[str] = None  # Temporary files of out-of-core backtest results; the system default when unset
+    OPTIMIZER_MAX_WORKERS: int = 0  # 0 uses every CPU core
+    OPTIMIZER_MAX_COMBINATIONS: int = 5000
+    WALK_FORWARD_MAX_WINDOWS: int = 100
+    ROBUSTNESS_MAX_SIMULATIONS: int = 100000
+    ROBUSTNESS_CHUNK_BYTES: int = 64 * 1024 ** 2  # Memory bound of one chunk of simulated paths
+    INDICATOR_CACHE_MAX_BYTES: int = 256 * 1024 ** 2
+    BATCH_MAX_BACKTESTS: int = 1000  # Backtests accepted per batch submission
+    
+    # Backtest job queue and worker pool
+    EMBEDDED_WORKER_POOL: bool = True  # Run workers inside the API process tree
+    BACKTEST_WORKERS: int = 2
+    WORKER_POLL_INTERVAL: float = 1.0
+    MAX_CONCURRENT_BACKTESTS_PER_USER: int = 2
+    BACKTEST_MAX_ATTEMPTS: int = 2
+    BACKTEST_RETRY_DELAY_SECONDS: float = 30.0
+    
     # Application
     DEBUG: bool = True
     CORS_ORIGINS: List[str] = ["http://localhost:3000"]
@@ -0,0 +1,40 @@
+import os
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import inspect
+from sqlalchemy.engine import Engine
+from app.core.database import engine
+
+SCRIPT_LOCATION = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "alembic")
+
+# Revision of the schema Base.metadata.create_all built before migrations existed
+INITIAL_REVISION = "0001"
+
+# Later revisions create_all could already have built, newest first, with the tables each adds
+UNVERSIONED_REVISIONS = (("0002", ("backtest_batches", "backtest_artifacts", "backtest_jobs")),)
+
+
+def _unversioned_revision(tables) -> str:
+    """Revision matching the tables of a database built by create_all"""
+    for revision, added in UNVERSIONED_REVISIONS:
+        if all(table in tables for table in added):
+            return revision
+    return INITIAL_REVISION
+
+
+def upgrade_database(bind: Engine = engine, revision: str = "head"):
+    """
+    Create or upgrade the database schema to a migration, the latest by default
+
+    Databases created before migrations existed have tables but no
+    alembic_version table; they are stamped with the revision their tables
+    match and upgraded from there, so their existing rows are kept.
+    """
+    config = Config()
+    config.set_main_option("script_location", SCRIPT_LOCATION)
+    with bind.begin() as connection:
+        config.attributes["connection"] = connection
+        tables = inspect(connection).get_table_names()
+        if "alembic_version" not in tables and "users" in tables:
+            command.stamp(config, _unversioned_revision(tables))
+        command.upgrade(config, revision)
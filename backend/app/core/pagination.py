@@ -0,0 +1,50 @@
+import base64
+from datetime import datetime
+from typing import Any, List, Optional, Tuple
+from sqlalchemy import and_, func, or_, select
+from sqlalchemy.orm import Query
+
+
+def encode_cursor(created_at: datetime, id: int) -> str:
+    """Opaque cursor pointing just after the given row"""
+    raw = f"{created_at.isoformat()}|{id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Parse a cursor produced by encode_cursor, raising ValueError if it is malformed"""
+    try:
+        created_at, id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(created_at), int(id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+def paginate(query: Query, model: Any, cursor: Optional[str], limit: int) -> Tuple[List[Any], Optional[str]]:
+    """
+    Keyset pagination over (created_at, id), newest first
+
+    Each page is an index range scan on (user_id, created_at, id) rather than
+    an OFFSET that skips every earlier row.
+
+    Returns:
+        Rows of the page and the cursor of the next page (None on the last page)
+    """
+    if cursor:
+        created_at, id = decode_cursor(cursor)
+        # Compare against the stored value of the boundary row so the database's own
+        # timestamp representation is used; the cursor's copy covers deleted rows
+        boundary = func.coalesce(
+            select(model.created_at).where(model.id == id).scalar_subquery(),
+            created_at
+        )
+        query = query.filter(or_(
+            model.created_at < boundary,
+            and_(model.created_at == boundary, model.id < id)
+        ))
+
+    rows = query.order_by(model.created_at.desc(), model.id.desc()).limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(rows[-1].created_at, rows[-1].id)
@@ -0,0 +1,37 @@
+import argparse
+import logging
+from datetime import datetime
+from app.services.market_data_ingest import DEFAULT_FLUSH_BYTES, ingest_dump
+
+logging.basicConfig(level=logging.INFO)
+
+
+def main():
+    """Import bulk vendor dumps (CSV/Parquet directories) into the market data store"""
+    parser = argparse.ArgumentParser(prog="python -m app.ingest", description=main.__doc__)
+    parser.add_argument("source", help="Directory of dump files, one per symbol or partitioned by date")
+    parser.add_argument("--interval", default="1d", help="Bar interval of the dump (default: 1d)")
+    parser.add_argument("--symbols", nargs="+", help="Only import these symbols")
+    parser.add_argument("--start", type=datetime.fromisoformat, help="Start of the range the dump covers")
+    parser.add_argument("--end", type=datetime.fromisoformat, help="End (exclusive) of the range the dump covers")
+    parser.add_argument("--timezone", help="Timezone of naive timestamps in the dump")
+    parser.add_argument(
+        "--flush-mb", type=int, default=DEFAULT_FLUSH_BYTES // 1024 ** 2,
+        help="Buffered bars (MiB) before merging into the store"
+    )
+    args = parser.parse_args()
+
+    stored = ingest_dump(
+        args.source,
+        interval=args.interval,
+        symbols=args.symbols,
+        start_date=args.start,
+        end_date=args.end,
+        tz=args.timezone,
+        flush_bytes=args.flush_mb * 1024 ** 2
+    )
+    print(f"Imported {len(stored)} symbols, {sum(stored.values())} bars")
+
+
+if __name__ == "__main__":
+    main()
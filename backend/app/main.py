@@ -1,11 +1,16 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Depends
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
+from sqlalchemy.orm import Session
 from app.core.config import settings
 from app.api.v1.api import api_router
-from app.core.database import engine, Base
+from app.core.database import get_db
+from app.core.migrations import upgrade_database
+from app.services.metrics import render_metrics
+from app.services.worker_pool import BacktestWorkerPool
 
-# Create database tables
-Base.metadata.create_all(bind=engine)
+# Create or upgrade the database tables
+upgrade_database()
 
 app = FastAPI(
     title="Backtesting Platform API",
@@ -25,6 +30,19 @@ app.add_middleware(
 # Include API router
 app.include_router(api_router, prefix="/api/v1")
 
+# Backtest worker pool running alongside the API (disable to run `python -m app.worker` separately)
+worker_pool = BacktestWorkerPool() if settings.EMBEDDED_WORKER_POOL else None
+
+@app.on_event("startup")
+def start_worker_pool():
+    if worker_pool is not None:
+        worker_pool.start()
+
+@app.on_event("shutdown")
+def stop_worker_pool():
+    if worker_pool is not None:
+        worker_pool.stop()
+
 @app.get("/")
 async def root():
     return {
@@ -36,3 +54,7 @@ async def root():
 @app.get("/health")
 async def health_check():
     return {"status": "healthy"}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics(db: Session = Depends(get_db)):
+    return PlainTextResponse(render_metrics(db), media_type="text/plain; version=0.0.4")
@@ -1,5 +1,5 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Text, Boolean, JSON
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Text, Boolean, JSON, LargeBinary, UniqueConstraint, Index
+from sqlalchemy.orm import relationship, deferred
 from sqlalchemy.sql import func
 from app.core.database import Base
 
@@ -19,6 +19,7 @@ class User(Base):
 
 class Strategy(Base):
     __tablename__ = "strategies"
+    __table_args__ = (Index("ix_strategies_user_created", "user_id", "created_at", "id"),)
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, index=True, nullable=False)
@@ -39,6 +40,7 @@ class Strategy(Base):
     position_size = Column(Float, default=1.0)  # Percentage of capital per trade
     stop_loss = Column(Float, nullable=True)  # Stop loss percentage
     take_profit = Column(Float, nullable=True)  # Take profit percentage
+    execution = Column(JSON, nullable=True)  # Commissions, slippage and fills, see app.services.execution
     
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
@@ -49,15 +51,20 @@ class Strategy(Base):
 
 class Backtest(Base):
     __tablename__ = "backtests"
+    __table_args__ = (Index("ix_backtests_user_created", "user_id", "created_at", "id"),)
 
     id = Column(Integer, primary_key=True, index=True)
     strategy_id = Column(Integer, ForeignKey("strategies.id"))
     user_id = Column(Integer, ForeignKey("users.id"))
+    batch_id = Column(Integer, ForeignKey("backtest_batches.id"), index=True, nullable=True)  # Set when submitted in a batch
     
     # Backtest parameters
     start_date = Column(DateTime, nullable=False)
     end_date = Column(DateTime, nullable=False)
-    status = Column(String, default="pending")  # pending, running, completed, failed
+    symbols = Column(JSON, nullable=True)  # Portfolio universe; None runs the strategy's own symbol
+    interval = Column(String, default="1d")  # Bar interval: 1m, 5m, 15m, 30m, 1h/60m, 1d, 1wk or 1mo
+    out_of_core = Column(Boolean, default=False)  # Stream bars and results in chunks instead of holding them in memory
+    status = Column(String, default="pending")  # pending, running, completed, failed, cancelled
     
     # Results
     total_return = Column(Float, nullable=True)
@@ -69,14 +76,115 @@ class Backtest(Base):
     winning_trades = Column(Integer, nullable=True)
     losing_trades = Column(Integer, nullable=True)
     
-    # Detailed results stored as JSON
-    trades = Column(JSON)  # List of all trades executed
-    equity_curve = Column(JSON)  # Portfolio value over time
+    # Detailed results; trades and the equity curve are stored as BacktestArtifact rows
     metrics = Column(JSON)  # Additional metrics
     
+    # JSON results of backtests run before artifacts existed, only loaded on access
+    trades_json = deferred(Column("trades", JSON), group="legacy_results")
+    equity_curve_json = deferred(Column("equity_curve", JSON), group="legacy_results")
+    
+    # Instrumentation: per-stage timings of the last run, and whether to capture a cProfile artifact
+    profile = Column(JSON, nullable=True)
+    capture_profile = Column(Boolean, default=False)
+    
+    # Terminal engine state of the last run, used to extend end_date without a full rerun
+    engine_state = deferred(Column(JSON, nullable=True))
+    
     error_message = Column(Text, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     completed_at = Column(DateTime(timezone=True), nullable=True)
     
     owner = relationship("User", back_populates="backtests")
     strategy = relationship("Strategy", back_populates="backtests")
+    batch = relationship("BacktestBatch", back_populates="backtests")
+    jobs = relationship("BacktestJob", back_populates="backtest", cascade="all, delete-orphan")
+    artifacts = relationship("BacktestArtifact", back_populates="backtest", cascade="all, delete-orphan")
+
+
+class BacktestBatch(Base):
+    __tablename__ = "backtest_batches"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), index=True)
+    total = Column(Integer, default=0)  # Backtests submitted in the batch
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    backtests = relationship("Backtest", back_populates="batch")
+
+
+class BacktestArtifact(Base):
+    __tablename__ = "backtest_artifacts"
+    __table_args__ = (UniqueConstraint("backtest_id", "kind"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    backtest_id = Column(Integer, ForeignKey("backtests.id"), index=True, nullable=False)
+    kind = Column(String, nullable=False)  # trades, equity_curve, cprofile
+    format = Column(String, nullable=False)  # Encoding of data, see app.services.result_store
+    rows = Column(Integer, default=0)
+    size_bytes = Column(Integer, default=0)
+    data = deferred(Column(LargeBinary, nullable=False))  # Compressed columnar arrays
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    backtest = relationship("Backtest", back_populates="artifacts")
+
+
+class AnalysisRun(Base):
+    __tablename__ = "analysis_runs"
+
+    id = Column(String, primary_key=True)  # Hex UUID used in API paths
+    kind = Column(String, nullable=False)  # optimization, walk_forward, robustness
+    user_id = Column(Integer, ForeignKey("users.id"), index=True)
+    strategy_id = Column(Integer, nullable=True)  # Strategy optimized; the request keeps a snapshot of it
+    backtest_id = Column(Integer, nullable=True)  # Backtest resampled, read when the analysis starts
+    status = Column(String, default="pending")  # pending, running, completed, failed, cancelled
+    
+    # Arguments the worker rebuilds the analysis from, see app.services.analysis_runs
+    request = Column(JSON, nullable=False)
+    
+    # Counters and partial results, saved by the worker while the analysis runs
+    progress = Column(JSON, nullable=True)
+    results = deferred(Column(JSON, nullable=True))
+    
+    error_message = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    completed_at = Column(DateTime(timezone=True), nullable=True)
+    
+    jobs = relationship("BacktestJob", back_populates="analysis", cascade="all, delete-orphan")
+
+
+class BacktestJob(Base):
+    __tablename__ = "backtest_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    backtest_id = Column(Integer, ForeignKey("backtests.id"), index=True)  # Set on backtest runs
+    analysis_id = Column(String, ForeignKey("analysis_runs.id"), index=True, nullable=True)  # Set on analysis runs
+    user_id = Column(Integer, ForeignKey("users.id"), index=True)
+    
+    # Scheduling
+    kind = Column(String, default="run")  # Job handler to execute
+    group_key = Column(String, index=True, nullable=True)  # Jobs sharing market data, claimed together
+    priority = Column(Integer, default=0)  # Higher priority jobs are claimed first
+    status = Column(String, default="queued", index=True)  # queued, running, completed, failed, cancelled
+    attempts = Column(Integer, default=0)
+    max_attempts = Column(Integer, default=1)
+    available_at = Column(DateTime, nullable=True)  # Not claimable before this time (retry backoff)
+    
+    # Execution
+    worker_id = Column(String, nullable=True)  # host:pid of the worker process holding the job
+    cancel_requested = Column(Boolean, default=False)
+    error_message = Column(Text, nullable=True)
+    
+    enqueued_at = Column(DateTime, nullable=False)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+    
+    backtest = relationship("Backtest", back_populates="jobs")
+    analysis = relationship("AnalysisRun", back_populates="jobs")
+
+
+class ProcessStats(Base):
+    __tablename__ = "process_stats"
+
+    process_id = Column(String, primary_key=True)  # host:pid of a worker process, as in BacktestJob.worker_id
+    stats = Column(JSON, nullable=False)  # In-memory counters of the process by component, see app.services.process_stats
+    updated_at = Column(DateTime, nullable=False)
@@ -31,6 +31,16 @@ class TokenData(BaseModel):
 
 
 # Strategy Schemas
+class ExecutionSettings(BaseModel):
+    commission_fixed: float = Field(0.0, ge=0)  # Charge per order
+    commission_pct: float = Field(0.0, ge=0)  # Charge in percent of traded value
+    spread_pct: float = Field(0.0, ge=0)  # Bid/ask spread; each fill pays half
+    slippage_model: str = Field("fixed", pattern="^(fixed|volume)$")
+    slippage_pct: float = Field(0.0, ge=0)  # Fixed: per fill; volume: at 100% of bar volume, scaled by sqrt(participation)
+    fill_price: str = Field("close", pattern="^(close|next_open)$")  # Signal bar's close or next bar's open
+    max_volume_pct: Optional[float] = Field(None, gt=0, le=100)  # Entry size cap in percent of bar volume
+    fractional_shares: bool = False
+
 class StrategyBase(BaseModel):
     name: str
     description: Optional[str] = None
@@ -43,6 +53,7 @@ class StrategyBase(BaseModel):
     position_size: float = 1.0
     stop_loss: Optional[float] = None
     take_profit: Optional[float] = None
+    execution: Optional[ExecutionSettings] = None  # Frictionless whole-share fills at the close when unset
 
 class StrategyCreate(StrategyBase):
     pass
@@ -57,6 +68,7 @@ class StrategyUpdate(BaseModel):
     position_size: Optional[float] = None
     stop_loss: Optional[float] = None
     take_profit: Optional[float] = None
+    execution: Optional[ExecutionSettings] = None
 
 class Strategy(StrategyBase):
     id: int
@@ -67,22 +79,63 @@ class Strategy(StrategyBase):
     class Config:
         from_attributes = True
 
+class StrategySummary(BaseModel):
+    id: int
+    name: str
+    description: Optional[str] = None
+    symbol: str
+    strategy_type: str
+    created_at: datetime
+    updated_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+class StrategyPage(BaseModel):
+    items: List[StrategySummary]
+    next_cursor: Optional[str] = None  # Pass as `cursor` to fetch the next page
+
 
 # Backtest Schemas
 class BacktestBase(BaseModel):
     strategy_id: int
     start_date: datetime
     end_date: datetime
+    interval: str = Field("1d", pattern="^(1m|5m|15m|30m|1h|60m|1d|1wk|1mo)$")  # Bar interval the strategy runs on
 
 class BacktestCreate(BacktestBase):
-    pass
+    priority: int = 0  # Higher priority backtests are picked up first
+    symbols: Optional[List[str]] = Field(default=None, min_length=1, max_length=1000)  # Run as a portfolio over these symbols
+    capture_profile: bool = False  # Record a cProfile of the run, see GET /backtests/{id}/profile
+    out_of_core: bool = False  # Stream very long histories in chunks with bounded memory; single-symbol only
+
+class BacktestBatchCreate(BaseModel):
+    backtests: List[BacktestBase] = Field(min_length=1)  # Strategy and date range of each backtest
+    priority: int = 0
+
+class BacktestBatchStatus(BaseModel):
+    id: int
+    status: str  # running until every backtest has finished, then completed
+    total: int
+    finished: int  # Completed, failed or cancelled
+    progress: float  # Fraction of backtests finished
+    counts: Dict[str, int]  # Backtests by status
+    created_at: datetime
+
+class BacktestExtend(BaseModel):
+    end_date: datetime  # New end of the backtest, after the current one
+    priority: int = 0
 
 class BacktestResult(BaseModel):
     id: int
     strategy_id: int
     user_id: int
+    batch_id: Optional[int] = None
     start_date: datetime
     end_date: datetime
+    interval: str = "1d"
+    symbols: Optional[List[str]] = None
+    out_of_core: Optional[bool] = False
     status: str
     total_return: Optional[float] = None
     total_return_pct: Optional[float] = None
@@ -95,6 +148,29 @@ class BacktestResult(BaseModel):
     trades: Optional[List[Dict[str, Any]]] = None
     equity_curve: Optional[List[Dict[str, Any]]] = None
     metrics: Optional[Dict[str, Any]] = None
+    profile: Optional[Dict[str, Any]] = None  # Per-stage timings of the run
+    error_message: Optional[str] = None
+    created_at: datetime
+    completed_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+class BacktestSummary(BaseModel):
+    id: int
+    strategy_id: int
+    batch_id: Optional[int] = None
+    start_date: datetime
+    end_date: datetime
+    interval: str = "1d"
+    symbols: Optional[List[str]] = None
+    status: str
+    total_return: Optional[float] = None
+    total_return_pct: Optional[float] = None
+    sharpe_ratio: Optional[float] = None
+    max_drawdown: Optional[float] = None
+    win_rate: Optional[float] = None
+    total_trades: Optional[int] = None
     error_message: Optional[str] = None
     created_at: datetime
     completed_at: Optional[datetime] = None
@@ -102,6 +178,170 @@ class BacktestResult(BaseModel):
     class Config:
         from_attributes = True
 
+class BacktestPage(BaseModel):
+    items: List[BacktestSummary]
+    next_cursor: Optional[str] = None  # Pass as `cursor` to fetch the next page
+
+
+class EquityCurve(BaseModel):
+    backtest_id: int
+    method: str  # Downsampling method: lttb, minmax or none
+    total_points: int  # Points in the requested window before downsampling
+    returned_points: int
+    points: List[Dict[str, Any]]
+
+
+class PeriodReturn(BaseModel):
+    period: str  # YYYY-MM or YYYY
+    return_pct: float
+
+class PerformanceReport(BaseModel):
+    backtest_id: int
+    window: int  # Bars in each rolling window
+    monthly_returns: List[PeriodReturn]
+    yearly_returns: List[PeriodReturn]
+    total_points: int  # Bars with a full rolling window
+    rolling: List[Dict[str, Any]]  # timestamp, return_pct, volatility, sharpe_ratio, max_drawdown
+
+
+class StageTiming(BaseModel):
+    name: str
+    seconds: float
+    rows: Optional[int] = None  # Bars processed by the stage
+    peak_rss_bytes: Optional[int] = None  # Process memory high-water mark after the stage
+    peak_rss_growth_bytes: Optional[int] = None
+    failed: bool = False
+
+class BacktestProfile(BaseModel):
+    backtest_id: int
+    stages: List[StageTiming]
+    total_seconds: Optional[float] = None
+    peak_rss_bytes: Optional[int] = None
+    queue_wait_seconds: Optional[float] = None
+    cprofile: Optional[str] = None  # pstats report, only for backtests created with capture_profile
+
+
+class RobustnessRequest(BaseModel):
+    simulations: int = Field(1000, ge=1)
+    block_size: Optional[int] = Field(None, ge=1)  # Bars per bootstrap block, cube root of the curve length by default
+    trade_sampling: str = Field("bootstrap", pattern="^(bootstrap|shuffle)$")  # Trades drawn with replacement or reordered
+    confidence: float = Field(0.95, gt=0, lt=1)
+    seed: Optional[int] = Field(None, ge=0)
+    max_workers: Optional[int] = Field(None, ge=1, le=256)  # Processes to simulate on, 1 runs in the job's worker process; at most the CPU count
+
+class RobustnessStatus(BaseModel):
+    id: str
+    backtest_id: int
+    status: str
+    seed: int
+    confidence: float
+    total_simulations: int
+    completed: int
+    results: Dict[str, Any] = {}  # Per resampling method (trades, returns): metric distributions and intervals
+    error_message: Optional[str] = None
+    created_at: datetime
+    completed_at: Optional[datetime] = None
+
+
+class LatencySummary(BaseModel):
+    count: int
+    avg: float
+    p50: float
+    p95: float
+    max: float
+
+class QueueStats(BaseModel):
+    queued: int
+    running: int
+    queued_by_priority: Dict[int, int]
+    recent_outcomes: Dict[str, int]
+    wait_seconds: LatencySummary
+    run_seconds: LatencySummary
+
+class IndicatorCacheStats(BaseModel):
+    hits: int
+    misses: int
+    hit_rate: float
+    evictions: int
+    entries: int
+    bytes: int
+    max_bytes: int
+    processes: int = 1  # Caches summed: one per live backtest worker, plus the API process answering
+
+
+# Optimization Schemas
+class OptimizationRequest(BaseModel):
+    strategy_id: int
+    start_date: datetime
+    end_date: datetime
+    interval: str = Field("1d", pattern="^(1m|5m|15m|30m|1h|60m|1d|1wk|1mo)$")
+    parameter_ranges: Dict[str, Any]  # name -> list of values or {"start", "stop", "step"}
+    metric: str = "sharpe_ratio"
+    maximize: bool = True
+    max_workers: Optional[int] = Field(None, ge=1, le=256)  # Worker processes, at most the CPU count
+
+class OptimizationResultRow(BaseModel):
+    rank: int
+    parameters: Dict[str, Any]
+    metrics: Dict[str, Any]
+
+class OptimizationStatus(BaseModel):
+    id: str
+    strategy_id: int
+    status: str
+    metric: str
+    total_combinations: int
+    completed: int
+    failed: int
+    results: List[OptimizationResultRow] = []
+    error_message: Optional[str] = None
+    created_at: datetime
+    completed_at: Optional[datetime] = None
+
+
+# Walk-Forward Schemas
+class WalkForwardRequest(BaseModel):
+    strategy_id: int
+    start_date: datetime
+    end_date: datetime
+    interval: str = Field("1d", pattern="^(1m|5m|15m|30m|1h|60m|1d|1wk|1mo)$")
+    parameter_ranges: Dict[str, Any]  # name -> list of values or {"start", "stop", "step"}
+    train_days: int = Field(gt=0)
+    test_days: int = Field(gt=0)
+    anchored: bool = False  # Train windows all start at start_date instead of rolling
+    metric: str = "sharpe_ratio"
+    maximize: bool = True
+    max_workers: Optional[int] = Field(None, ge=1, le=256)  # Worker processes, at most the CPU count
+
+class WalkForwardWindow(BaseModel):
+    train_start: datetime
+    train_end: datetime
+    test_start: datetime
+    test_end: datetime
+    train_bars: int
+    test_bars: int
+    parameters: Optional[Dict[str, Any]] = None
+    train_metrics: Optional[Dict[str, Any]] = None
+    test_metrics: Optional[Dict[str, Any]] = None
+
+class WalkForwardStatus(BaseModel):
+    id: str
+    strategy_id: int
+    status: str
+    phase: Optional[str] = None
+    metric: str
+    total_combinations: int
+    completed: int
+    failed: int
+    tested: int
+    windows: List[WalkForwardWindow] = []
+    metrics: Optional[Dict[str, Any]] = None
+    trades: Optional[List[Dict[str, Any]]] = None
+    equity_curve: Optional[List[Dict[str, Any]]] = None
+    error_message: Optional[str] = None
+    created_at: datetime
+    completed_at: Optional[datetime] = None
+
 
 # Market Data Schemas
 class MarketDataRequest(BaseModel):
@@ -110,6 +350,12 @@ class MarketDataRequest(BaseModel):
     end_date: datetime
     interval: str = "1d"  # 1d, 1h, 5m, etc.
 
+class MarketDataBatchRequest(BaseModel):
+    symbols: List[str] = Field(min_length=1, max_length=1000)
+    start_date: datetime
+    end_date: datetime
+    interval: str = "1d"
+
 class OHLCVData(BaseModel):
     timestamp: datetime
     open: float
@@ -117,3 +363,19 @@ class OHLCVData(BaseModel):
     low: float
     close: float
     volume: float
+
+class MarketDataBatch(BaseModel):
+    data: Dict[str, List[OHLCVData]]  # Bars of each symbol with data
+    errors: Dict[str, str]  # Why each remaining symbol has no data
+
+class MarketDataCacheStats(BaseModel):
+    hits: int
+    partial_hits: int
+    misses: int
+    evictions: int
+    entries: int
+    bytes: int
+    pinned_entries: int  # Imported entries, never evicted and not counted against max_bytes
+    max_bytes: int
+    offline: bool
+    processes: int = 1  # Counters summed: one per live backtest worker, plus the API process answering
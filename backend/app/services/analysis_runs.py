@@ -0,0 +1,174 @@
+import time
+from datetime import datetime
+from typing import Dict, Any, Union
+from sqlalchemy.orm import Session
+from app.core.database import SessionLocal
+from app.models.models import AnalysisRun, Backtest
+from app.services.job_queue import JobQueue, job_queue
+from app.services.optimizer import ParameterOptimizer, build_strategy
+from app.services.result_store import load_columns
+from app.services.robustness import RobustnessAnalysis
+from app.services.timeframes import periods_per_year
+from app.services.walk_forward import WalkForwardAnalysis
+
+Analysis = Union[ParameterOptimizer, WalkForwardAnalysis, RobustnessAnalysis]
+
+# Analysis kinds, each also the kind of the jobs running it
+ANALYSIS_KINDS = ("optimization", "walk_forward", "robustness")
+
+# Minimum seconds between saves of a running analysis's progress
+PROGRESS_INTERVAL = 2.0
+
+
+def build_analysis(
+    db: Session,
+    kind: str,
+    request: Dict[str, Any],
+    user_id: int
+) -> Analysis:
+    """
+    Build the analysis a saved request describes
+
+    Optimization and walk-forward requests carry a snapshot of the strategy;
+    robustness requests name the backtest whose trades and equity curve
+    they resample.
+
+    Raises:
+        ValueError: the request is invalid or its backtest is gone
+    """
+    if kind == "robustness":
+        backtest = db.query(Backtest).filter(Backtest.id == request['backtest_id']).first()
+        if not backtest or backtest.status != "completed":
+            raise ValueError("The backtest is no longer available to analyze")
+        return RobustnessAnalysis(
+            backtest.id,
+            backtest.strategy.initial_capital,
+            load_columns(db, backtest, "trades") or {},
+            load_columns(db, backtest, "equity_curve") or {},
+            observed={
+                "final_value": (backtest.metrics or {}).get("final_value"),
+                "max_drawdown": backtest.max_drawdown,
+                "sharpe_ratio": backtest.sharpe_ratio
+            },
+            simulations=request['simulations'],
+            block_size=request['block_size'],
+            trade_sampling=request['trade_sampling'],
+            confidence=request['confidence'],
+            seed=request['seed'],
+            periods_per_year=periods_per_year(backtest.interval or "1d"),
+            max_workers=request['max_workers'],
+            user_id=user_id
+        )
+
+    strategy = build_strategy(request['snapshot'], {})
+    start_date = datetime.fromisoformat(request['start_date'])
+    end_date = datetime.fromisoformat(request['end_date'])
+    options = {
+        "metric": request['metric'],
+        "maximize": request['maximize'],
+        "max_workers": request['max_workers'],
+        "interval": request['interval'],
+        "user_id": user_id
+    }
+    if kind == "optimization":
+        return ParameterOptimizer(strategy, start_date, end_date, request['parameter_ranges'], **options)
+    if kind == "walk_forward":
+        return WalkForwardAnalysis(
+            strategy,
+            start_date,
+            end_date,
+            request['parameter_ranges'],
+            train_days=request['train_days'],
+            test_days=request['test_days'],
+            anchored=request['anchored'],
+            **options
+        )
+    raise ValueError(f"Unknown analysis kind: {kind}")
+
+
+def submit_analysis(
+    db: Session,
+    kind: str,
+    request: Dict[str, Any],
+    user_id: int,
+    priority: int = 0,
+    queue: JobQueue = job_queue
+) -> AnalysisRun:
+    """
+    Validate an analysis request, save it as a run and queue the job executing it
+
+    The run is executed by the backtest worker pool under the same per-user
+    concurrency limit as backtests.
+
+    Raises:
+        ValueError: the request is invalid; nothing is saved
+    """
+    analysis = build_analysis(db, kind, request, user_id)
+    if kind == "robustness":
+        # Draw the seed once, so a retried attempt simulates the same paths
+        request = {**request, "seed": analysis.seed}
+
+    run = AnalysisRun(
+        id=analysis.id,
+        kind=kind,
+        user_id=user_id,
+        strategy_id=getattr(analysis, 'strategy_id', None),
+        backtest_id=getattr(analysis, 'backtest_id', None),
+        request=request,
+        progress=analysis.progress()
+    )
+    db.add(run)
+    queue.enqueue_analysis(db, run, priority)
+    return run
+
+
+def _save(db: Session, run: AnalysisRun, analysis: Analysis):
+    run.progress = analysis.progress()
+    run.results = analysis.result()
+    db.commit()
+
+
+def run_analysis(analysis_id: str):
+    """
+    Execute a queued analysis run in the calling worker process
+
+    Progress and partial results are saved at most every PROGRESS_INTERVAL
+    seconds while it runs, so any API process can report on it.
+    """
+    db = SessionLocal()
+    try:
+        run = db.query(AnalysisRun).filter(AnalysisRun.id == analysis_id).first()
+        if not run:
+            raise ValueError(f"Analysis run {analysis_id} not found")
+
+        try:
+            analysis = build_analysis(db, run.kind, run.request, run.user_id)
+        except Exception as e:
+            run.status = "failed"
+            run.error_message = str(e)
+            run.completed_at = datetime.utcnow()
+            db.commit()
+            return
+
+        run.status = "running"
+        run.error_message = None
+        run.completed_at = None
+        _save(db, run, analysis)
+
+        last_save = time.monotonic()
+
+        def report():
+            nonlocal last_save
+            if time.monotonic() - last_save >= PROGRESS_INTERVAL:
+                _save(db, run, analysis)
+                last_save = time.monotonic()
+
+        analysis.on_progress = report
+        analysis.run()
+
+        run.status = analysis.status
+        run.error_message = analysis.error_message
+        run.completed_at = analysis.completed_at
+        _save(db, run, analysis)
+    finally:
+        db.close()
@@ -1,218 +1,255 @@
+import cProfile
+import math
 import pandas as pd
 import numpy as np
 from datetime import datetime
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional, Tuple
 from sqlalchemy.orm import Session
+from app.core.config import settings
 from app.core.database import SessionLocal
-from app.models.models import Backtest, Strategy
+from app.models.models import Backtest, BacktestArtifact, Strategy
 from app.services.market_data_service import MarketDataService
+from app.services.indicator_cache import IndicatorCalculator, indicator_cache, data_version
+from app.services.result_store import save_results, load_results
+from app.services.profiling import CPROFILE_FORMAT, RunProfile, profiler_data
+from app.services.incremental import can_extend, capture_state, extension_frame, streaming_indicators
+from app.services.execution import ExecutionModel
+from app.services.conditions import ConditionProgram, compile_conditions
+from app.services import simulation_kernel
+from app.services.performance import calendar_years, column, compute_metrics
+from app.services.timeframes import as_of, completed_bars, higher_timeframes, periods_per_year, timeframe_column, validate_interval
+
+# Price columns of every market data frame, available to conditions alongside indicators
+PRICE_COLUMNS = ('open', 'high', 'low', 'close', 'volume')
+
+# Working memory per bar of a vectorized simulation chunk: the bar's inputs and
+# outputs as Python floats, its equity record and its formatted timestamp
+_BYTES_PER_SIMULATED_BAR = 512
+
+
+def simulation_chunk_bars() -> int:
+    """Bars walked per chunk of a vectorized simulation, from SIMULATION_CHUNK_BYTES"""
+    return max(1, settings.SIMULATION_CHUNK_BYTES // _BYTES_PER_SIMULATED_BAR)
+
+
+def compute_indicator_columns(indicators: IndicatorCalculator, params: Dict[str, Any]) -> Dict[str, np.ndarray]:
+    """Compute the indicator columns requested by strategy parameters"""
+    columns = {}
+    
+    # Simple Moving Averages
+    if 'sma_short' in params:
+        columns['SMA_SHORT'] = indicators.sma(params['sma_short'])
+    if 'sma_long' in params:
+        columns['SMA_LONG'] = indicators.sma(params['sma_long'])
+    
+    # Exponential Moving Averages
+    if 'ema_short' in params:
+        columns['EMA_SHORT'] = indicators.ema(params['ema_short'])
+    if 'ema_long' in params:
+        columns['EMA_LONG'] = indicators.ema(params['ema_long'])
+    
+    # RSI (Relative Strength Index)
+    if 'rsi_period' in params:
+        columns['RSI'] = indicators.rsi(params['rsi_period'])
+    
+    # MACD
+    if 'macd_fast' in params and 'macd_slow' in params:
+        fast = params['macd_fast']
+        slow = params['macd_slow']
+        signal = params.get('macd_signal', 9)
+        
+        columns['MACD'] = indicators.macd(fast, slow)
+        columns['MACD_SIGNAL'] = indicators.macd_signal(fast, slow, signal)
+        columns['MACD_HIST'] = columns['MACD'] - columns['MACD_SIGNAL']
+    
+    # Bollinger Bands
+    if 'bb_period' in params:
+        period = params['bb_period']
+        std_dev = params.get('bb_std', 2)
+        columns['BB_MIDDLE'] = indicators.sma(period)
+        columns['BB_STD'] = indicators.rolling_std(period)
+        columns['BB_UPPER'] = columns['BB_MIDDLE'] + (columns['BB_STD'] * std_dev)
+        columns['BB_LOWER'] = columns['BB_MIDDLE'] - (columns['BB_STD'] * std_dev)
+    
+    return columns
+
+
+def compute_timeframe_columns(
+    df: pd.DataFrame,
+    params: Dict[str, Any],
+    interval: str,
+    symbol: str
+) -> Dict[str, np.ndarray]:
+    """
+    Compute indicators of the higher timeframes in strategy parameters, aligned to the bars of `df`
+    
+    Every higher timeframe is resampled from the bars themselves, so its bars
+    complete exactly on one of them and are joined as of that bar.
+    """
+    columns = {}
+    closes = df['close'].to_numpy(dtype=np.float64)
+    for timeframe, timeframe_params in higher_timeframes(params, interval).items():
+        ends = completed_bars(df.index, timeframe)
+        frame = pd.DataFrame({'close': closes[ends]}, index=df.index[ends])
+        indicators = IndicatorCalculator.for_frame(frame, symbol, timeframe, cache=indicator_cache)
+        for name, values in compute_indicator_columns(indicators, timeframe_params).items():
+            columns[timeframe_column(name, timeframe)] = as_of(values, ends, len(df))
+    return columns
+
+
+def indicator_column_names(params: Dict[str, Any]) -> List[str]:
+    """Names of the indicator columns compute_indicator_columns and compute_timeframe_columns add for strategy parameters"""
+    names = []
+    for required, columns in (
+        (('sma_short',), ['SMA_SHORT']),
+        (('sma_long',), ['SMA_LONG']),
+        (('ema_short',), ['EMA_SHORT']),
+        (('ema_long',), ['EMA_LONG']),
+        (('rsi_period',), ['RSI']),
+        (('macd_fast', 'macd_slow'), ['MACD', 'MACD_SIGNAL', 'MACD_HIST']),
+        (('bb_period',), ['BB_MIDDLE', 'BB_STD', 'BB_UPPER', 'BB_LOWER']),
+    ):
+        if all(name in params for name in required):
+            names.extend(columns)
+    for timeframe, timeframe_params in higher_timeframes(params).items():
+        names.extend(timeframe_column(name, timeframe) for name in indicator_column_names(timeframe_params))
+    return names
+
+
+def compile_strategy_conditions(
+    parameters: Optional[Dict[str, Any]],
+    buy_conditions: Optional[List[Dict[str, Any]]],
+    sell_conditions: Optional[List[Dict[str, Any]]]
+) -> Tuple[ConditionProgram, ConditionProgram]:
+    """
+    Compile buy conditions (all must hold) and sell conditions (any suffices)
+    against the price columns and the indicators the parameters request
+    
+    Raises:
+        ConditionError: A condition cannot be compiled
+        ValueError: The parameters' higher timeframes are invalid
+    """
+    available = PRICE_COLUMNS + tuple(indicator_column_names(parameters or {}))
+    return (
+        compile_conditions(buy_conditions, True, available, "buy_conditions"),
+        compile_conditions(sell_conditions, False, available, "sell_conditions"),
+    )
+
 
 class BacktestingEngine:
     """Core backtesting engine to simulate trading strategies"""
     
-    def __init__(self, strategy: Strategy, start_date: datetime, end_date: datetime):
+    def __init__(
+        self,
+        strategy: Strategy,
+        start_date: datetime,
+        end_date: datetime,
+        vectorized: bool = False,
+        market_data: Optional[pd.DataFrame] = None,
+        interval: str = "1d"
+    ):
         self.strategy = strategy
         self.start_date = start_date
         self.end_date = end_date
+        self.vectorized = vectorized
+        self.jit = settings.JIT_SIMULATION and simulation_kernel.available()  # Vectorized runs use the compiled kernel
+        self.market_data = market_data  # Preloaded OHLCV frame, skips fetching when set
+        self.interval = validate_interval(interval)
+        self.periods_per_year = periods_per_year(interval)  # Annualizes Sharpe ratio and volatility
         self.market_data_service = MarketDataService()
         
         # Portfolio state
         self.initial_capital = strategy.initial_capital
         self.cash = strategy.initial_capital
         self.position = 0  # Number of shares held
+        self.entry_price = None  # Fill price of the open position
         self.portfolio_value = strategy.initial_capital
+        self.entry_cost = 0.0  # Cost of the open position including commission
+        self.pending_order = None  # "BUY" or "SELL" signalled for the next bar's open
+        
+        # Order fills: commissions, spread, slippage and sizing
+        self.execution = ExecutionModel.from_strategy(strategy)
+        
+        # Conditions are compiled once, so invalid ones fail the run up front
+        self.buy_program, self.sell_program = compile_strategy_conditions(
+            strategy.parameters, strategy.buy_conditions, strategy.sell_conditions
+        )
+        higher_timeframes(strategy.parameters or {}, interval)  # Higher timeframes must be coarser than the bars
         
         # Results tracking
         self.trades = []
         self.equity_curve = []
         self.daily_returns = []
+        
+        # Per-stage timings of the last run
+        self.profile = RunProfile()
+        
+        # Incremental extension: whether run() saves its terminal state, and the saved state
+        self.capture_state = False
+        self.state: Optional[Dict[str, Any]] = None
+        self.indicators: Optional[IndicatorCalculator] = None
+        self._portfolio_state: Optional[Dict[str, Any]] = None
     
     def fetch_market_data(self) -> pd.DataFrame:
         """Fetch historical market data for the strategy symbol"""
-        data = self.market_data_service.fetch_data(
+        if self.market_data is not None:
+            # Fingerprint once on the shared frame so copies reuse cached indicators
+            data_version(self.market_data)
+            # Shallow copy so indicator columns never leak into the shared frame
+            return self.market_data.copy(deep=False)
+        
+        return self.market_data_service.fetch_frame(
             symbol=self.strategy.symbol,
             start_date=self.start_date,
             end_date=self.end_date,
-            interval="1d"
+            interval=self.interval
         )
-        
-        df = pd.DataFrame(data)
-        df.set_index('timestamp', inplace=True)
-        return df
     
-    def calculate_indicators(self, df: pd.DataFrame) -> pd.DataFrame:
+    def calculate_indicators(self, df: pd.DataFrame, indicators: Optional[IndicatorCalculator] = None) -> pd.DataFrame:
         """Calculate technical indicators based on strategy parameters"""
         params = self.strategy.parameters or {}
+        if indicators is None:
+            indicators = IndicatorCalculator.for_frame(df, self.strategy.symbol, self.interval, cache=indicator_cache)
+        self.indicators = indicators
         
-        # Simple Moving Averages
-        if 'sma_short' in params:
-            df['SMA_SHORT'] = df['close'].rolling(window=params['sma_short']).mean()
-        if 'sma_long' in params:
-            df['SMA_LONG'] = df['close'].rolling(window=params['sma_long']).mean()
-        
-        # Exponential Moving Averages
-        if 'ema_short' in params:
-            df['EMA_SHORT'] = df['close'].ewm(span=params['ema_short']).mean()
-        if 'ema_long' in params:
-            df['EMA_LONG'] = df['close'].ewm(span=params['ema_long']).mean()
-        
-        # RSI (Relative Strength Index)
-        if 'rsi_period' in params:
-            period = params['rsi_period']
-            delta = df['close'].diff()
-            gain = (delta.where(delta > 0, 0)).rolling(window=period).mean()
-            loss = (-delta.where(delta < 0, 0)).rolling(window=period).mean()
-            rs = gain / loss
-            df['RSI'] = 100 - (100 / (1 + rs))
-        
-        # MACD
-        if 'macd_fast' in params and 'macd_slow' in params:
-            fast = params['macd_fast']
-            slow = params['macd_slow']
-            signal = params.get('macd_signal', 9)
-            
-            df['MACD'] = df['close'].ewm(span=fast).mean() - df['close'].ewm(span=slow).mean()
-            df['MACD_SIGNAL'] = df['MACD'].ewm(span=signal).mean()
-            df['MACD_HIST'] = df['MACD'] - df['MACD_SIGNAL']
-        
-        # Bollinger Bands
-        if 'bb_period' in params:
-            period = params['bb_period']
-            std_dev = params.get('bb_std', 2)
-            df['BB_MIDDLE'] = df['close'].rolling(window=period).mean()
-            df['BB_STD'] = df['close'].rolling(window=period).std()
-            df['BB_UPPER'] = df['BB_MIDDLE'] + (df['BB_STD'] * std_dev)
-            df['BB_LOWER'] = df['BB_MIDDLE'] - (df['BB_STD'] * std_dev)
+        for name, values in compute_indicator_columns(indicators, params).items():
+            df[name] = values
+        for name, values in compute_timeframe_columns(df, params, self.interval, self.strategy.symbol).items():
+            df[name] = values
         
         return df
     
-    def check_buy_conditions(self, row: pd.Series, df: pd.DataFrame, idx: int) -> bool:
-        """Check if buy conditions are met"""
-        if not self.strategy.buy_conditions:
-            return False
-        
-        for condition in self.strategy.buy_conditions:
-            indicator = condition.get('indicator')
-            operator = condition.get('operator')
-            value = condition.get('value')
-            compare_to = condition.get('compare_to')
-            
-            if indicator not in row.index:
-                continue
-            
-            indicator_value = row[indicator]
-            
-            # Handle comparison
-            if compare_to:
-                # Compare to another indicator
-                if compare_to not in row.index:
-                    continue
-                compare_value = row[compare_to]
-            else:
-                # Compare to fixed value
-                compare_value = value
-            
-            # Evaluate condition
-            if operator == '>':
-                if not (indicator_value > compare_value):
-                    return False
-            elif operator == '<':
-                if not (indicator_value < compare_value):
-                    return False
-            elif operator == '>=':
-                if not (indicator_value >= compare_value):
-                    return False
-            elif operator == '<=':
-                if not (indicator_value <= compare_value):
-                    return False
-            elif operator == '==':
-                if not (indicator_value == compare_value):
-                    return False
-            elif operator == 'crosses_above':
-                if idx > 0:
-                    prev_row = df.iloc[idx - 1]
-                    if not (prev_row[indicator] <= prev_row[compare_to] and 
-                           indicator_value > compare_value):
-                        return False
-                else:
-                    return False
-            elif operator == 'crosses_below':
-                if idx > 0:
-                    prev_row = df.iloc[idx - 1]
-                    if not (prev_row[indicator] >= prev_row[compare_to] and 
-                           indicator_value < compare_value):
-                        return False
-                else:
-                    return False
+    def execute_trade(
+        self,
+        timestamp: datetime,
+        price: float,
+        action: str,
+        reason: str = "",
+        volume: float = math.nan
+    ):
+        """
+        Execute a buy or sell trade
         
-        return True
-    
-    def check_sell_conditions(self, row: pd.Series, df: pd.DataFrame, idx: int, entry_price: float) -> bool:
-        """Check if sell conditions are met"""
-        if not self.strategy.sell_conditions:
-            return False
-        
-        # Check stop loss
-        if self.strategy.stop_loss:
-            if row['close'] <= entry_price * (1 - self.strategy.stop_loss / 100):
-                return True
-        
-        # Check take profit
-        if self.strategy.take_profit:
-            if row['close'] >= entry_price * (1 + self.strategy.take_profit / 100):
-                return True
-        
-        # Check custom sell conditions
-        for condition in self.strategy.sell_conditions:
-            indicator = condition.get('indicator')
-            operator = condition.get('operator')
-            value = condition.get('value')
-            compare_to = condition.get('compare_to')
-            
-            if indicator not in row.index:
-                continue
-            
-            indicator_value = row[indicator]
-            
-            if compare_to:
-                if compare_to not in row.index:
-                    continue
-                compare_value = row[compare_to]
-            else:
-                compare_value = value
-            
-            if operator == '>':
-                if indicator_value > compare_value:
-                    return True
-            elif operator == '<':
-                if indicator_value < compare_value:
-                    return True
-            elif operator == 'crosses_above':
-                if idx > 0:
-                    prev_row = df.iloc[idx - 1]
-                    if (prev_row[indicator] <= prev_row[compare_to] and 
-                        indicator_value > compare_value):
-                        return True
-            elif operator == 'crosses_below':
-                if idx > 0:
-                    prev_row = df.iloc[idx - 1]
-                    if (prev_row[indicator] >= prev_row[compare_to] and 
-                        indicator_value < compare_value):
-                        return True
-        
-        return False
-    
-    def execute_trade(self, timestamp: datetime, price: float, action: str, reason: str = ""):
-        """Execute a buy or sell trade"""
+        `price` is the fill price after spread and fixed slippage (see
+        ExecutionModel.fill_prices); volume slippage and commissions are
+        applied here. The open position's cost is kept on the engine, so
+        exits never search earlier trades.
+        """
+        execution = self.execution
         if action == "BUY" and self.position == 0:
             # Calculate position size
-            position_value = self.cash * (self.strategy.position_size / 100)
-            shares = int(position_value / price)
+            budget = self.cash * (self.strategy.position_size / 100)
+            shares, price = execution.entry(budget, price, volume)
+            shares = float(shares) if execution.fractional else int(shares)
             
             if shares > 0:
-                cost = shares * price
+                price = float(price)
+                commission = float(execution.commission(shares * price))
+                cost = shares * price + commission
                 self.cash -= cost
                 self.position = shares
+                self.entry_price = price
+                self.entry_cost = cost
                 
                 self.trades.append({
                     "timestamp": timestamp.isoformat(),
@@ -220,17 +257,19 @@ class BacktestingEngine:
                     "price": price,
                     "shares": shares,
                     "cost": cost,
+                    "commission": commission,
                     "reason": reason
                 })
         
         elif action == "SELL" and self.position > 0:
-            proceeds = self.position * price
+            price = float(execution.exit_price(self.position, price, volume))
+            commission = float(execution.commission(self.position * price))
+            proceeds = self.position * price - commission
             self.cash += proceeds
             
             # Calculate profit/loss
-            entry_trade = [t for t in self.trades if t['action'] == 'BUY'][-1]
-            profit = proceeds - entry_trade['cost']
-            profit_pct = (profit / entry_trade['cost']) * 100
+            profit = proceeds - self.entry_cost
+            profit_pct = (profit / self.entry_cost) * 100
             
             self.trades.append({
                 "timestamp": timestamp.isoformat(),
@@ -238,58 +277,315 @@ class BacktestingEngine:
                 "price": price,
                 "shares": self.position,
                 "proceeds": proceeds,
+                "commission": commission,
                 "profit": profit,
                 "profit_pct": profit_pct,
                 "reason": reason
             })
             
             self.position = 0
+            self.entry_price = None
+            self.entry_cost = 0.0
+            # Flat again, so the portfolio is worth its cash after the exit's costs
+            self.portfolio_value = self.cash
     
-    def run(self) -> Dict[str, Any]:
-        """Run the backtest simulation"""
-        try:
-            # Fetch and prepare data
-            df = self.fetch_market_data()
-            df = self.calculate_indicators(df)
+    def simulate_loop(self, df: pd.DataFrame, start: int = 0):
+        """
+        Simulate the strategy bar by bar over a frame with indicators
+        
+        Bars before `start` are only history for crossover conditions.
+        """
+        execution = self.execution
+        buy_at = self.buy_program.bind(df)
+        sell_at = self.sell_program.bind(df)
+        check_sells = not self.sell_program.empty
+        stop_loss = self.strategy.stop_loss
+        take_profit = self.strategy.take_profit
+        
+        # Iterate through each day
+        for idx, (timestamp, row) in enumerate(df.iterrows()):
+            if idx < start:
+                continue
+            
+            # Orders signalled on the previous bar fill at this bar's open
+            if self.pending_order is not None:
+                buy_price, sell_price = execution.fill_prices(row['open'])
+                if self.pending_order == "SELL":
+                    self.execute_trade(timestamp, sell_price, "SELL", "Sell conditions met", row['volume'])
+                else:
+                    self.execute_trade(timestamp, buy_price, "BUY", "Buy conditions met", row['volume'])
+                self.pending_order = None
+            
+            # Calculate current portfolio value
+            if self.position > 0:
+                self.portfolio_value = self.cash + (self.position * row['close'])
+            else:
+                self.portfolio_value = self.cash
+            
+            # Record equity curve
+            self.equity_curve.append({
+                "timestamp": timestamp.isoformat(),
+                "value": self.portfolio_value,
+                "cash": self.cash,
+                "position_value": self.position * row['close'] if self.position > 0 else 0
+            })
+            
+            buy_price, sell_price = execution.fill_prices(row['close'])
+            
+            # Check for sell signal (if we have a position); stop loss and take profit need sell conditions
+            if self.position > 0 and self.entry_price:
+                if check_sells and (
+                    (stop_loss and row['close'] <= self.entry_price * (1 - stop_loss / 100))
+                    or (take_profit and row['close'] >= self.entry_price * (1 + take_profit / 100))
+                    or sell_at(idx)
+                ):
+                    if execution.next_open:
+                        self.pending_order = "SELL"
+                    else:
+                        self.execute_trade(timestamp, sell_price, "SELL", "Sell conditions met", row['volume'])
+            
+            # Check for buy signal (if we don't have a position)
+            elif self.position == 0:
+                if buy_at(idx):
+                    if execution.next_open:
+                        self.pending_order = "BUY"
+                    else:
+                        self.execute_trade(timestamp, buy_price, "BUY", "Buy conditions met", row['volume'])
+        
+        self._save_portfolio_state()
+        
+        # Close any open positions at the end
+        if self.position > 0:
+            last = df.iloc[-1]
+            self.execute_trade(df.index[-1], execution.fill_prices(last['close'])[1], "SELL", "End of backtest period", last['volume'])
+    
+    def simulate_vectorized(self, df: pd.DataFrame, start: int = 0, final: bool = True):
+        """
+        Simulate the strategy using precomputed signal arrays
+        
+        Buy/sell conditions and the fill prices of every bar are evaluated
+        over the whole series up front; only the position state machine
+        (entry price, stop loss, take profit, sizing) walks the bars, in the
+        compiled kernel when Numba is installed and reading plain floats in
+        Python otherwise. Bars before `start` are only history for crossover
+        conditions; a position still open on the last bar is closed there
+        unless more bars follow (`final` unset).
+        
+        The walk goes through the bars in chunks sized to
+        SIMULATION_CHUNK_BYTES, carrying the engine state from one chunk to
+        the next, so long intraday runs never hold the per-bar floats and
+        records of the whole range at once.
+        """
+        n = len(df)
+        execution = self.execution
+        closes = df['close'].to_numpy(dtype=np.float64)
+        buy_signals = self.buy_program.evaluate(df, (n,))
+        sell_signals = self.sell_program.evaluate(df, (n,))
+        
+        # Orders fill at the signal bar's close or at the next bar's open
+        reference = df['open'].to_numpy(dtype=np.float64) if execution.next_open else closes
+        buy_prices, sell_prices = execution.fill_prices(reference)
+        volumes = df['volume'].to_numpy(dtype=np.float64) if execution.uses_volume else np.full(n, np.nan)
+        
+        walk = self._walk_compiled if self.jit else self._walk
+        chunk_size = simulation_chunk_bars()
+        for chunk_start in range(start, n, chunk_size):
+            bars = slice(chunk_start, min(chunk_start + chunk_size, n))
+            values, cash_values, position_values = walk(
+                df.index[bars], closes[bars], buy_signals[bars], sell_signals[bars],
+                buy_prices[bars], sell_prices[bars], volumes[bars]
+            )
+            timestamps = [timestamp.isoformat() for timestamp in df.index[bars]]
+            self.equity_curve.extend(
+                {"timestamp": timestamp, "value": value, "cash": cash, "position_value": position_value}
+                for timestamp, value, cash, position_value in zip(timestamps, values, cash_values, position_values)
+            )
+        self._save_portfolio_state()
+        
+        if final:
+            self.close_position(df.index[-1], float(closes[-1]), float(volumes[-1]))
+    
+    def close_position(self, timestamp: datetime, close: float, volume: float = math.nan):
+        """Close any open position at the end of the backtest period"""
+        if self.position > 0:
+            last_price = self.execution.fill_prices(close)[1]
+            self.execute_trade(timestamp, last_price, "SELL", "End of backtest period", volume)
+    
+    def _walk(
+        self,
+        index: pd.DatetimeIndex,
+        closes: np.ndarray,
+        buy_signals: np.ndarray,
+        sell_signals: np.ndarray,
+        buy_prices: np.ndarray,
+        sell_prices: np.ndarray,
+        volumes: np.ndarray
+    ) -> Tuple[List[float], List[float], List[float]]:
+        """Walk the position state machine over a chunk of bars in Python"""
+        n = len(closes)
+        closes, buy_signals, sell_signals, buy_prices, sell_prices, volumes = (
+            values.tolist() for values in (closes, buy_signals, sell_signals, buy_prices, sell_prices, volumes)
+        )
+        next_open = self.execution.next_open
+        pending = self.pending_order
+        
+        # Sell rules (including stop loss / take profit) only apply when sell conditions exist
+        check_sells = not self.sell_program.empty
+        stop_loss = self.strategy.stop_loss
+        take_profit = self.strategy.take_profit
+        
+        values = [0.0] * n
+        cash_values = [0.0] * n
+        position_values = [0] * n
+        
+        for idx in range(n):
+            close = closes[idx]
             
-            # Track entry price for current position
-            entry_price = None
+            if pending is not None:
+                if pending == "SELL":
+                    self.execute_trade(index[idx], sell_prices[idx], "SELL", "Sell conditions met", volumes[idx])
+                else:
+                    self.execute_trade(index[idx], buy_prices[idx], "BUY", "Buy conditions met", volumes[idx])
+                pending = None
             
-            # Iterate through each day
-            for idx, (timestamp, row) in enumerate(df.iterrows()):
-                # Calculate current portfolio value
-                if self.position > 0:
-                    self.portfolio_value = self.cash + (self.position * row['close'])
+            if self.position > 0:
+                position_value = self.position * close
+                self.portfolio_value = self.cash + position_value
+            else:
+                position_value = 0
+                self.portfolio_value = self.cash
+            
+            values[idx] = self.portfolio_value
+            cash_values[idx] = self.cash
+            position_values[idx] = position_value
+            
+            if self.position > 0 and self.entry_price:
+                if not check_sells:
+                    continue
+                entry_price = self.entry_price
+                if stop_loss and close <= entry_price * (1 - stop_loss / 100):
+                    sell = True
+                elif take_profit and close >= entry_price * (1 + take_profit / 100):
+                    sell = True
                 else:
-                    self.portfolio_value = self.cash
+                    sell = sell_signals[idx]
                 
-                # Record equity curve
-                self.equity_curve.append({
-                    "timestamp": timestamp.isoformat(),
-                    "value": self.portfolio_value,
-                    "cash": self.cash,
-                    "position_value": self.position * row['close'] if self.position > 0 else 0
+                if sell:
+                    if next_open:
+                        pending = "SELL"
+                    else:
+                        self.execute_trade(index[idx], sell_prices[idx], "SELL", "Sell conditions met", volumes[idx])
+            
+            elif self.position == 0 and buy_signals[idx]:
+                if next_open:
+                    pending = "BUY"
+                else:
+                    self.execute_trade(index[idx], buy_prices[idx], "BUY", "Buy conditions met", volumes[idx])
+        
+        self.pending_order = pending
+        return values, cash_values, position_values
+    
+    def _walk_compiled(
+        self,
+        index: pd.DatetimeIndex,
+        closes: np.ndarray,
+        buy_signals: np.ndarray,
+        sell_signals: np.ndarray,
+        buy_prices: np.ndarray,
+        sell_prices: np.ndarray,
+        volumes: np.ndarray
+    ) -> Tuple[List[float], List[float], List[float]]:
+        """Walk the position state machine in the compiled kernel; trades match _walk exactly"""
+        state = {
+            "cash": self.cash,
+            "position": self.position,
+            "entry_price": self.entry_price,
+            "entry_cost": self.entry_cost,
+            "pending_order": self.pending_order,
+        }
+        rules = {
+            "position_size": self.strategy.position_size,
+            "stop_loss": self.strategy.stop_loss,
+            "take_profit": self.strategy.take_profit,
+            "check_sells": not self.sell_program.empty,
+        }
+        values, cash_values, position_values, trades, state = simulation_kernel.simulate(
+            closes, buy_prices, sell_prices, volumes, buy_signals, sell_signals, 0, state, rules, self.execution
+        )
+        
+        fractional = self.execution.fractional
+        timestamps = index[trades[:, 0].astype(np.int64)]
+        for timestamp, (_, action, price, shares, amount, commission, profit, profit_pct) in zip(timestamps, trades.tolist()):
+            trade = {
+                "timestamp": timestamp.isoformat(),
+                "action": "BUY" if action == simulation_kernel.BUY else "SELL",
+                "price": price,
+                "shares": shares if fractional else int(shares),
+            }
+            if action == simulation_kernel.BUY:
+                trade.update({"cost": amount, "commission": commission, "reason": "Buy conditions met"})
+            else:
+                trade.update({
+                    "proceeds": amount,
+                    "commission": commission,
+                    "profit": profit,
+                    "profit_pct": profit_pct,
+                    "reason": "Sell conditions met"
                 })
-                
-                # Check for sell signal (if we have a position)
-                if self.position > 0 and entry_price:
-                    if self.check_sell_conditions(row, df, idx, entry_price):
-                        self.execute_trade(timestamp, row['close'], "SELL", "Sell conditions met")
-                        entry_price = None
-                
-                # Check for buy signal (if we don't have a position)
-                elif self.position == 0:
-                    if self.check_buy_conditions(row, df, idx):
-                        self.execute_trade(timestamp, row['close'], "BUY", "Buy conditions met")
-                        entry_price = row['close']
+            self.trades.append(trade)
+        
+        self.cash = state["cash"]
+        # Flat positions are the integer 0, as execute_trade leaves them
+        self.position = state["position"] if fractional and state["position"] > 0 else int(state["position"])
+        self.entry_price = state["entry_price"]
+        self.entry_cost = state["entry_cost"]
+        self.pending_order = state["pending_order"]
+        if len(values):
+            # As after _walk: the last bar's value, or the cash once an exit on that bar left the portfolio flat
+            self.portfolio_value = self.cash if self.position == 0 else float(values[-1])
+        return values.tolist(), cash_values.tolist(), position_values.tolist()
+    
+    def simulate(self, df: pd.DataFrame, start: int = 0):
+        """Simulate the strategy over a frame with indicators using the configured mode"""
+        if self.vectorized:
+            self.simulate_vectorized(df, start)
+        else:
+            self.simulate_loop(df, start)
+    
+    def _save_portfolio_state(self):
+        # Taken before the end-of-period close, which an extended run must not inherit
+        self._portfolio_state = {
+            "cash": self.cash,
+            "position": self.position,
+            "entry_price": self.entry_price,
+            "entry_cost": self.entry_cost,
+            "pending_order": self.pending_order,
+            "portfolio_value": self.portfolio_value,
+            "trades": len(self.trades)
+        }
+    
+    def run(self) -> Dict[str, Any]:
+        """Run the backtest simulation"""
+        try:
+            # Fetch and prepare data
+            with self.profile.stage("fetch_market_data") as stage:
+                df = self.fetch_market_data()
+                stage["rows"] = len(df)
+            with self.profile.stage("calculate_indicators", rows=len(df)):
+                df = self.calculate_indicators(df)
             
-            # Close any open positions at the end
-            if self.position > 0:
-                last_price = df.iloc[-1]['close']
-                self.execute_trade(df.index[-1], last_price, "SELL", "End of backtest period")
+            with self.profile.stage("simulate", rows=len(df)):
+                self.simulate(df)
+            
+            if self.capture_state:
+                # Windowed indicators replay every close to carry their exact running sums
+                with self.profile.stage("capture_state", rows=len(df)):
+                    streaming = streaming_indicators(self.indicators, self.strategy.parameters or {})
+                    self.state = capture_state(self.strategy, self.interval, df, streaming, self._portfolio_state)
             
             # Calculate performance metrics
-            metrics = self.calculate_metrics()
+            with self.profile.stage("calculate_metrics", rows=len(self.equity_curve)):
+                metrics = self.calculate_metrics()
             
             return {
                 "trades": self.trades,
@@ -300,66 +596,99 @@ class BacktestingEngine:
         except Exception as e:
             raise Exception(f"Backtest execution failed: {str(e)}")
     
+    def extend(
+        self,
+        state: Dict[str, Any],
+        trades: List[Dict[str, Any]],
+        equity_curve: List[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """
+        Continue a completed run up to `end_date` from its saved state
+        
+        Only bars after the last simulated one are fetched, run through the
+        saved streaming indicators and simulated; they are appended to the
+        previous trades and equity curve, and metrics are recomputed over the
+        whole run. The saved indicators carry their exact running state, so
+        results are identical to a full rerun.
+        """
+        try:
+            # Resume from the portfolio before the previous end-of-period close
+            portfolio = state["portfolio"]
+            self.cash = portfolio["cash"]
+            self.position = portfolio["position"]
+            self.entry_price = portfolio["entry_price"]
+            self.entry_cost = portfolio["entry_cost"]
+            self.pending_order = portfolio["pending_order"]
+            self.portfolio_value = portfolio["portfolio_value"]
+            self.trades = trades[:portfolio["trades"]]
+            self.equity_curve = equity_curve
+            
+            last_timestamp = pd.Timestamp(state["last_timestamp"])
+            with self.profile.stage("fetch_market_data") as stage:
+                new_bars = self.market_data_service.fetch_frame(
+                    symbol=self.strategy.symbol,
+                    start_date=last_timestamp.to_pydatetime(),
+                    end_date=self.end_date,
+                    interval=self.interval,
+                    allow_empty=True
+                )
+                new_bars = new_bars[new_bars.index > last_timestamp]
+                stage["rows"] = len(new_bars)
+            
+            with self.profile.stage("calculate_indicators", rows=len(new_bars)):
+                df, streaming = extension_frame(state, new_bars)
+            
+            # The first row is the previous run's last bar, history for crossover conditions
+            with self.profile.stage("simulate", rows=len(new_bars)):
+                self.simulate(df, start=1)
+            
+            with self.profile.stage("capture_state"):
+                self.state = capture_state(self.strategy, self.interval, df, streaming, self._portfolio_state)
+            
+            with self.profile.stage("calculate_metrics", rows=len(self.equity_curve)):
+                metrics = self.calculate_metrics()
+            
+            return {
+                "trades": self.trades,
+                "equity_curve": self.equity_curve,
+                "metrics": metrics
+            }
+        
+        except Exception as e:
+            raise Exception(f"Backtest extension failed: {str(e)}")
+    
     def calculate_metrics(self) -> Dict[str, Any]:
         """Calculate performance metrics"""
-        # Basic metrics
-        final_value = self.portfolio_value
-        total_return = final_value - self.initial_capital
-        total_return_pct = (total_return / self.initial_capital) * 100
-        
-        # Trade statistics
-        buy_trades = [t for t in self.trades if t['action'] == 'BUY']
-        sell_trades = [t for t in self.trades if t['action'] == 'SELL']
-        total_trades = len(sell_trades)
-        
-        if total_trades > 0:
-            winning_trades = len([t for t in sell_trades if t.get('profit', 0) > 0])
-            losing_trades = len([t for t in sell_trades if t.get('profit', 0) <= 0])
-            win_rate = (winning_trades / total_trades) * 100
-            
-            avg_win = np.mean([t['profit'] for t in sell_trades if t.get('profit', 0) > 0]) if winning_trades > 0 else 0
-            avg_loss = np.mean([t['profit'] for t in sell_trades if t.get('profit', 0) <= 0]) if losing_trades > 0 else 0
-        else:
-            winning_trades = 0
-            losing_trades = 0
-            win_rate = 0
-            avg_win = 0
-            avg_loss = 0
-        
-        # Calculate returns for Sharpe ratio
-        equity_values = [e['value'] for e in self.equity_curve]
-        returns = pd.Series(equity_values).pct_change().dropna()
-        
-        if len(returns) > 0:
-            sharpe_ratio = (returns.mean() / returns.std()) * np.sqrt(252) if returns.std() > 0 else 0
-        else:
-            sharpe_ratio = 0
-        
-        # Maximum drawdown
-        equity_series = pd.Series(equity_values)
-        cummax = equity_series.cummax()
-        drawdown = (equity_series - cummax) / cummax
-        max_drawdown = drawdown.min() * 100
-        
-        return {
-            "final_value": final_value,
-            "total_return": total_return,
-            "total_return_pct": total_return_pct,
-            "sharpe_ratio": sharpe_ratio,
-            "max_drawdown": max_drawdown,
-            "total_trades": total_trades,
-            "winning_trades": winning_trades,
-            "losing_trades": losing_trades,
-            "win_rate": win_rate,
-            "avg_win": avg_win,
-            "avg_loss": avg_loss,
-            "profit_factor": abs(avg_win / avg_loss) if avg_loss != 0 else 0
-        }
+        curve = self.equity_curve
+        sells = [trade for trade in self.trades if trade['action'] == 'SELL']
+        traded_value = sum(trade.get('cost', 0) + trade.get('proceeds', 0) for trade in self.trades)
+        
+        return compute_metrics(
+            column(curve, 'value'),
+            self.initial_capital,
+            final_value=self.portfolio_value,
+            profits=column(sells, 'profit'),
+            position_values=column(curve, 'position_value'),
+            traded_value=traded_value,
+            periods_per_year=self.periods_per_year,
+            years=calendar_years(curve[0]['timestamp'], curve[-1]['timestamp']) if len(curve) > 1 else None
+        )
 
 
-def run_backtest(backtest_id: int):
-    """Background task to run a backtest"""
+def run_backtest(backtest_id: int, incremental: bool = False, market_data: Optional[pd.DataFrame] = None):
+    """
+    Background task to run a backtest
+    
+    With `incremental`, a backtest whose end_date was moved forward is
+    continued from its saved engine state when that state still matches the
+    strategy; otherwise it is rerun in full. `market_data` is a preloaded
+    frame of the strategy symbol over the backtest range, shared by jobs of
+    the same group. Out-of-core backtests stream their bars and results in
+    chunks through ChunkedBacktestingEngine.
+    """
     db = SessionLocal()
+    engine = None
+    profiler = None
     try:
         # Get backtest and strategy
         backtest = db.query(Backtest).filter(Backtest.id == backtest_id).first()
@@ -377,34 +706,99 @@ def run_backtest(backtest_id: int):
         backtest.status = "running"
         db.commit()
         
+        # Opt-in function-level profile of this run, stored as an artifact
+        if backtest.capture_profile:
+            profiler = cProfile.Profile()
+            profiler.enable()
+        
         # Run backtest
-        engine = BacktestingEngine(strategy, backtest.start_date, backtest.end_date)
-        results = engine.run()
-        
-        # Update backtest with results
-        backtest.status = "completed"
-        backtest.trades = results['trades']
-        backtest.equity_curve = results['equity_curve']
-        backtest.metrics = results['metrics']
-        
-        # Extract key metrics
-        metrics = results['metrics']
-        backtest.total_return = metrics['total_return']
-        backtest.total_return_pct = metrics['total_return_pct']
-        backtest.sharpe_ratio = metrics['sharpe_ratio']
-        backtest.max_drawdown = metrics['max_drawdown']
-        backtest.win_rate = metrics['win_rate']
-        backtest.total_trades = metrics['total_trades']
-        backtest.winning_trades = metrics['winning_trades']
-        backtest.losing_trades = metrics['losing_trades']
-        backtest.completed_at = datetime.utcnow()
+        if backtest.symbols:
+            from app.services.portfolio_engine import PortfolioBacktestingEngine
+            engine = PortfolioBacktestingEngine(
+                strategy,
+                backtest.symbols,
+                backtest.start_date,
+                backtest.end_date,
+                interval=backtest.interval or "1d"
+            )
+        elif backtest.out_of_core:
+            from app.services.chunked_engine import ChunkedBacktestingEngine
+            engine = ChunkedBacktestingEngine(
+                strategy,
+                backtest.start_date,
+                backtest.end_date,
+                interval=backtest.interval or "1d"
+            )
+        else:
+            engine = BacktestingEngine(
+                strategy,
+                backtest.start_date,
+                backtest.end_date,
+                vectorized=settings.VECTORIZED_BACKTESTING,
+                market_data=market_data,
+                interval=backtest.interval or "1d"
+            )
+            engine.capture_state = True
         
-        db.commit()
+        state = backtest.engine_state if incremental and not backtest.symbols else None
+        if can_extend(state, strategy, engine.interval):
+            with engine.profile.stage("load_results") as stage:
+                trades = load_results(db, backtest, "trades") or []
+                equity_curve = load_results(db, backtest, "equity_curve") or []
+                stage["rows"] = len(equity_curve)
+            results = engine.extend(state, trades, equity_curve)
+        else:
+            results = engine.run()
+        
+        with engine.profile.stage("store_results", rows=len(results['equity_curve'])):
+            # Update backtest with results
+            backtest.status = "completed"
+            backtest.metrics = results['metrics']
+            save_results(db, backtest, results)
+            backtest.engine_state = engine.state
+            
+            # Extract key metrics
+            metrics = results['metrics']
+            backtest.total_return = metrics['total_return']
+            backtest.total_return_pct = metrics['total_return_pct']
+            backtest.sharpe_ratio = metrics['sharpe_ratio']
+            backtest.max_drawdown = metrics['max_drawdown']
+            backtest.win_rate = metrics['win_rate']
+            backtest.total_trades = metrics['total_trades']
+            backtest.winning_trades = metrics['winning_trades']
+            backtest.losing_trades = metrics['losing_trades']
+            backtest.completed_at = datetime.utcnow()
+            
+            db.commit()
+        
+        _save_profile(db, backtest, engine, profiler)
     
     except Exception as e:
+        db.rollback()
         backtest.status = "failed"
         backtest.error_message = str(e)
         db.commit()
+        if engine is not None:
+            _save_profile(db, backtest, engine, profiler)
     
     finally:
+        if profiler is not None:
+            profiler.disable()
         db.close()
+
+
+def _save_profile(db: Session, backtest: Backtest, engine: BacktestingEngine, profiler: Optional[cProfile.Profile]):
+    """Persist the stage timings of a run and, when captured, its cProfile stats"""
+    backtest.profile = engine.profile.to_dict()
+    if profiler is not None:
+        profiler.disable()
+        data = profiler_data(profiler)
+        artifact = next((artifact for artifact in backtest.artifacts if artifact.kind == "cprofile"), None)
+        if artifact is None:
+            artifact = BacktestArtifact(kind="cprofile")
+            backtest.artifacts.append(artifact)
+        artifact.format = CPROFILE_FORMAT
+        artifact.rows = len(profiler.stats)  # Profiled functions
+        artifact.size_bytes = len(data)
+        artifact.data = data
+    db.commit()
@@ -0,0 +1,262 @@
+import numpy as np
+import pandas as pd
+from datetime import datetime
+from typing import Dict, Any, Iterator, Optional, Tuple
+from app.core.config import settings
+from app.models.models import Strategy
+from app.services.backtesting_engine import (
+    BacktestingEngine, compute_indicator_columns, indicator_column_names, simulation_chunk_bars
+)
+from app.services.incremental import lookback_bars
+from app.services.indicator_cache import IndicatorCalculator
+from app.services.performance import MetricsAccumulator, calendar_years, column
+from app.services.result_store import ResultSpool
+from app.services.streaming_indicators import StreamingEMA, StreamingIndicator
+from app.services.timeframes import as_of, completed_bars, higher_timeframes, timeframe_column
+
+
+def continue_ewm(values: np.ndarray, span: int, state: Optional[StreamingEMA]) -> Tuple[np.ndarray, StreamingEMA]:
+    """
+    `Series.ewm(span=span).mean()` of values following the series `state` has seen
+
+    The adjusted average at a bar is the average over the new values alone
+    blended with the carried average, each weighted by its total decayed
+    weight, so a chunk is continued vectorized. Chunks with missing values
+    are replayed through the streaming recurrence instead.
+
+    Returns:
+        The averages of the values and the state after the last of them
+    """
+    output = pd.Series(values).ewm(span=span).mean().to_numpy()
+    if state is None or not state.nobs:
+        return output, StreamingEMA.from_series(values.tolist(), float(output[-1]), span)
+
+    state = StreamingIndicator.restore(state.snapshot())
+    if np.isnan(values).any():
+        return np.array([state.update(value) for value in values.tolist()]), state
+
+    factor = state.factor
+    decay = factor ** np.arange(1, len(values) + 1)
+    chunk_weight = (1 - decay) / (1 - factor)
+    carried_weight = decay * state.weight
+    output = (carried_weight * state.weighted + chunk_weight * output) / (carried_weight + chunk_weight)
+    state.weighted = float(output[-1])
+    state.weight = float(carried_weight[-1] + chunk_weight[-1])
+    state.nobs += len(values)
+    return output, state
+
+
+class _ChunkCalculator(IndicatorCalculator):
+    """
+    IndicatorCalculator over one chunk of closes preceded by warm-up closes of earlier chunks
+
+    Windowed indicators see the warm-up closes as the bars before the chunk;
+    EWM-based indicators continue the averages carried from earlier chunks
+    and are NaN over the warm-up closes. Results are memoized for the chunk.
+    """
+
+    def __init__(self, closes: np.ndarray, warmup: int, averages: Dict[Tuple, StreamingEMA]):
+        super().__init__(pd.Series(closes), ("chunk",))
+        self.warmup = warmup
+        self.averages = averages
+        self.continued: Dict[Tuple, StreamingEMA] = {}  # Averages after this chunk
+        self._results: Dict[Tuple, np.ndarray] = {}
+
+    def _get(self, indicator: str, params: Tuple, compute) -> np.ndarray:
+        key = (indicator, params)
+        if key not in self._results:
+            self._results[key] = np.asarray(compute(), dtype=np.float64)
+        return self._results[key]
+
+    def _continue(self, key: Tuple, values: np.ndarray, span: int) -> np.ndarray:
+        output = np.full(len(values), np.nan)
+        output[self.warmup:], self.continued[key] = continue_ewm(values[self.warmup:], span, self.averages.get(key))
+        return output
+
+    def ema(self, span: int) -> np.ndarray:
+        return self._get('ema', (span,), lambda: self._continue(('ema', span), self.close.to_numpy(), span))
+
+    def macd_signal(self, fast: int, slow: int, signal: int) -> np.ndarray:
+        return self._get('macd_signal', (fast, slow, signal), lambda: self._continue(
+            ('macd_signal', fast, slow, signal), self.macd(fast, slow), signal
+        ))
+
+
+class IndicatorStream:
+    """
+    compute_indicator_columns over a close series fed in consecutive chunks
+
+    Carries the last lookback_bars closes as warm-up for windowed indicators
+    and the state of every exponential average, so each chunk's columns
+    match those of the whole series up to floating point rounding of the
+    rolling sums.
+    """
+
+    def __init__(self, params: Dict[str, Any]):
+        self.params = params
+        self.lookback = lookback_bars(params)
+        self.warmup = np.empty(0)
+        self.averages: Dict[Tuple, StreamingEMA] = {}
+
+    def advance(self, closes: np.ndarray) -> Dict[str, np.ndarray]:
+        """Indicator columns of the next closes"""
+        series = np.concatenate((self.warmup, closes))
+        indicators = _ChunkCalculator(series, len(self.warmup), self.averages)
+        columns = {
+            name: values[len(self.warmup):]
+            for name, values in compute_indicator_columns(indicators, self.params).items()
+        }
+        self.averages = indicators.continued
+        self.warmup = series[-self.lookback:]
+        return columns
+
+
+class TimeframeStream:
+    """
+    compute_timeframe_columns of one higher timeframe over bars fed in consecutive chunks
+
+    A higher-timeframe bar completing on a chunk's last bar is only known to
+    be complete once the next chunk's first bar starts another one, so each
+    chunk is advanced with that bar's timestamp; its indicators are carried
+    into the next chunk until another higher-timeframe bar completes.
+    """
+
+    def __init__(self, timeframe: str, params: Dict[str, Any]):
+        self.timeframe = timeframe
+        self.names = indicator_column_names(params)
+        self.indicators = IndicatorStream(params)
+        self.latest = {name: np.nan for name in self.names}  # Values of the last completed bar
+
+    def advance(self, index: pd.DatetimeIndex, closes: np.ndarray, following: Optional[pd.Timestamp]) -> Dict[str, np.ndarray]:
+        """
+        Higher-timeframe columns of the next bars, aligned as of the bars they complete on
+
+        `following` is the timestamp of the bar after them, None after the last bar.
+        """
+        if following is None:
+            ends = completed_bars(index, self.timeframe)
+        else:
+            ends = completed_bars(index.append(pd.DatetimeIndex([following])), self.timeframe)
+            ends = ends[ends < len(index)]
+
+        completed = self.indicators.advance(closes[ends]) if len(ends) else {}
+        # The last bar completed before this chunk is known from its first bar on
+        ends = np.concatenate(([-1], ends))
+        columns = {}
+        for name in self.names:
+            values = np.concatenate(([self.latest[name]], completed.get(name, [])))
+            columns[timeframe_column(name, self.timeframe)] = as_of(values, ends, len(index))
+            self.latest[name] = float(values[-1])
+        return columns
+
+
+class ChunkedBacktestingEngine(BacktestingEngine):
+    """
+    Out-of-core single-symbol backtest over histories too long for memory
+
+    Bars are streamed from the market data cache in chunks that fit
+    SIMULATION_CHUNK_BYTES. Indicators carry their warm-up closes and
+    exponential averages across chunk boundaries, each chunk's first bar
+    sees the previous chunk's last bar for crossover conditions, and the
+    portfolio (including a pending next-open order) carries on. Trades and
+    equity points of every chunk are spooled to temporary files and folded
+    into running metrics, so peak memory does not grow with the history.
+
+    Results match an in-memory vectorized run up to floating point rounding
+    of rolling indicators and running metric sums. No engine state is
+    captured, so these runs are never extended incrementally.
+    """
+
+    def __init__(
+        self,
+        strategy: Strategy,
+        start_date: datetime,
+        end_date: datetime,
+        market_data: Optional[pd.DataFrame] = None,
+        interval: str = "1d"
+    ):
+        super().__init__(strategy, start_date, end_date, vectorized=True, market_data=market_data, interval=interval)
+        self.chunk_rows = simulation_chunk_bars()
+
+    def iter_market_data(self) -> Iterator[pd.DataFrame]:
+        """Consecutive frames of at most `chunk_rows` bars of the strategy symbol"""
+        if self.market_data is not None:
+            df = self.market_data
+            return (df.iloc[lo:lo + self.chunk_rows] for lo in range(0, len(df), self.chunk_rows))
+
+        return self.market_data_service.iter_frames(
+            symbol=self.strategy.symbol,
+            start_date=self.start_date,
+            end_date=self.end_date,
+            interval=self.interval,
+            rows=self.chunk_rows
+        )
+
+    def run(self) -> Dict[str, Any]:
+        """Run the backtest simulation chunk by chunk"""
+        trades = ResultSpool(settings.RESULT_SPOOL_DIR)
+        equity_curve = ResultSpool(settings.RESULT_SPOOL_DIR)
+        try:
+            params = self.strategy.parameters or {}
+            indicators = IndicatorStream(params)
+            timeframes = [
+                TimeframeStream(timeframe, timeframe_params)
+                for timeframe, timeframe_params in higher_timeframes(params, self.interval).items()
+            ]
+            accumulator = MetricsAccumulator(self.initial_capital, self.periods_per_year)
+            traded_value = 0.0
+            first_timestamp = last_timestamp = None
+
+            with self.profile.stage("simulate_chunks", rows=0) as stage:
+                frames = self.iter_market_data()
+                frame = next(frames, None)
+                if frame is None:
+                    raise ValueError(f"No data found for symbol {self.strategy.symbol}")
+                previous = None  # Last bar of the previous chunk with its indicators
+                stage["chunks"] = 0
+                while frame is not None:
+                    following = next(frames, None)
+                    closes = frame['close'].to_numpy(dtype=np.float64)
+                    columns = indicators.advance(closes)
+                    for stream in timeframes:
+                        columns.update(stream.advance(frame.index, closes, None if following is None else following.index[0]))
+                    df = frame.assign(**columns)
+                    if previous is not None:
+                        df = pd.concat([previous, df])
+
+                    self.simulate_vectorized(df, start=0 if previous is None else 1, final=following is None)
+                    previous = df.iloc[-1:]
+
+                    # Fold the chunk's results into the metrics and spool them to disk
+                    curve = self.equity_curve
+                    accumulator.add_bars(column(curve, 'value'), column(curve, 'position_value'))
+                    accumulator.add_profits(column([trade for trade in self.trades if trade['action'] == 'SELL'], 'profit'))
+                    traded_value += sum(trade.get('cost', 0) + trade.get('proceeds', 0) for trade in self.trades)
+                    first_timestamp = first_timestamp or curve[0]['timestamp']
+                    last_timestamp = curve[-1]['timestamp']
+                    trades.append(self.trades)
+                    equity_curve.append(curve)
+                    self.trades = []
+                    self.equity_curve = []
+
+                    stage["rows"] += len(frame)
+                    stage["chunks"] += 1
+                    frame = following
+
+            with self.profile.stage("calculate_metrics", rows=len(equity_curve)):
+                metrics = accumulator.metrics(
+                    final_value=self.portfolio_value,
+                    traded_value=traded_value,
+                    years=calendar_years(first_timestamp, last_timestamp) if len(equity_curve) > 1 else None
+                )
+
+            return {
+                "trades": trades,
+                "equity_curve": equity_curve,
+                "metrics": metrics
+            }
+
+        except Exception as e:
+            trades.close()
+            equity_curve.close()
+            raise Exception(f"Backtest execution failed: {str(e)}")
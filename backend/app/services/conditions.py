@@ -0,0 +1,223 @@
+import operator
+import numpy as np
+from enum import Enum
+from typing import Dict, List, Any, Callable, Iterable, Mapping, NamedTuple, Optional, Tuple, Union
+
+# Keys of a condition that nests a list of conditions, and whether its items must all hold
+GROUP_KEYS = {"all": True, "any": False}
+
+
+class Operator(str, Enum):
+    GT = '>'
+    LT = '<'
+    GE = '>='
+    LE = '<='
+    EQ = '=='
+    CROSSES_ABOVE = 'crosses_above'
+    CROSSES_BELOW = 'crosses_below'
+
+
+# Comparison applied on the current bar
+COMPARISONS = {
+    Operator.GT: operator.gt,
+    Operator.LT: operator.lt,
+    Operator.GE: operator.ge,
+    Operator.LE: operator.le,
+    Operator.EQ: operator.eq,
+}
+
+# Comparisons applied on the previous and the current bar by crossovers
+CROSSINGS = {
+    Operator.CROSSES_ABOVE: (operator.le, operator.gt),
+    Operator.CROSSES_BELOW: (operator.ge, operator.lt),
+}
+
+
+class Comparison(NamedTuple):
+    operator: Operator
+    column: int  # Index into ConditionProgram.columns
+    operand: Optional[int]  # Column index compared to, None for a constant
+    value: float  # Constant compared to when operand is None
+
+
+class ConditionGroup(NamedTuple):
+    require_all: bool  # AND when set, OR otherwise
+    items: Tuple[Union[Comparison, "ConditionGroup"], ...]
+
+
+class ConditionError(ValueError):
+    """A strategy condition that cannot be compiled"""
+
+
+class ConditionProgram:
+    """
+    Compiled buy or sell conditions
+
+    Conditions reference columns by position in `columns`, so evaluating
+    them never looks up names or dispatches on operator strings per bar.
+    The same program runs vectorized over whole arrays (`evaluate`) or bar
+    by bar over plain lists (`bind`), with identical results: comparisons
+    against NaN are false, and crossovers are false on the first bar.
+    """
+
+    def __init__(self, columns: Tuple[str, ...], root: ConditionGroup):
+        self.columns = columns
+        self.root = root
+
+    @property
+    def empty(self) -> bool:
+        return not self.root.items
+
+    def evaluate(self, columns: Mapping[str, Any], shape: tuple) -> np.ndarray:
+        """
+        Evaluate the conditions over arrays of bars
+
+        `columns` maps names to arrays (or a DataFrame) indexed by bar along
+        the first axis; a second axis (e.g. one column per symbol) is
+        evaluated element-wise. No conditions never signal.
+
+        Returns:
+            Boolean array of the given shape
+        """
+        if self.empty:
+            return np.zeros(shape, dtype=bool)
+        arrays = [np.asarray(columns[name], dtype=np.float64) for name in self.columns]
+        previous: Dict[int, np.ndarray] = {}
+        with np.errstate(invalid='ignore'):
+            signals = self._evaluate(self.root, arrays, previous)
+        return np.broadcast_to(signals, shape)
+
+    def _evaluate(self, node: Union[Comparison, ConditionGroup], arrays: List[np.ndarray], previous: Dict[int, np.ndarray]) -> np.ndarray:
+        if isinstance(node, ConditionGroup):
+            masks = [self._evaluate(item, arrays, previous) for item in node.items]
+            return np.logical_and.reduce(masks) if node.require_all else np.logical_or.reduce(masks)
+
+        values = arrays[node.column]
+        compare_values = node.value if node.operand is None else arrays[node.operand]
+        if node.operator in COMPARISONS:
+            return COMPARISONS[node.operator](values, compare_values)
+
+        # Previous bar values are NaN on the first bar, so no cross is reported
+        before, now = CROSSINGS[node.operator]
+        prev_values = _previous(node.column, arrays, previous)
+        prev_compare = node.value if node.operand is None else _previous(node.operand, arrays, previous)
+        return before(prev_values, prev_compare) & now(values, compare_values)
+
+    def bind(self, columns: Mapping[str, Any]) -> Callable[[int], bool]:
+        """Test of the conditions at one bar index, over the given columns as plain float lists"""
+        if self.empty:
+            return lambda idx: False
+        rows = [np.asarray(columns[name], dtype=np.float64).tolist() for name in self.columns]
+        return _bind(self.root, rows)
+
+
+def _previous(column: int, arrays: List[np.ndarray], previous: Dict[int, np.ndarray]) -> np.ndarray:
+    if column not in previous:
+        values = arrays[column]
+        shifted = np.empty_like(values)
+        shifted[0] = np.nan
+        shifted[1:] = values[:-1]
+        previous[column] = shifted
+    return previous[column]
+
+
+def _bind(node: Union[Comparison, ConditionGroup], rows: List[List[float]]) -> Callable[[int], bool]:
+    if isinstance(node, ConditionGroup):
+        tests = [_bind(item, rows) for item in node.items]
+        if len(tests) == 1:
+            return tests[0]
+        if node.require_all:
+            return lambda idx: all(test(idx) for test in tests)
+        return lambda idx: any(test(idx) for test in tests)
+
+    values = rows[node.column]
+    constant = node.value
+    compare_values = None if node.operand is None else rows[node.operand]
+
+    if node.operator in COMPARISONS:
+        compare = COMPARISONS[node.operator]
+        if compare_values is None:
+            return lambda idx: compare(values[idx], constant)
+        return lambda idx: compare(values[idx], compare_values[idx])
+
+    before, now = CROSSINGS[node.operator]
+    if compare_values is None:
+        return lambda idx: idx > 0 and before(values[idx - 1], constant) and now(values[idx], constant)
+    return lambda idx: (
+        idx > 0 and before(values[idx - 1], compare_values[idx - 1]) and now(values[idx], compare_values[idx])
+    )
+
+
+def _column(name: Any, path: str, available: Tuple[str, ...], columns: List[str]) -> int:
+    if name not in available:
+        raise ConditionError(f"{path}: unknown column {name!r}; available: {', '.join(available)}")
+    if name not in columns:
+        columns.append(name)
+    return columns.index(name)
+
+
+def _compile(condition: Any, path: str, available: Tuple[str, ...], columns: List[str]) -> Union[Comparison, ConditionGroup]:
+    if not isinstance(condition, dict):
+        raise ConditionError(f"{path}: a condition must be an object")
+
+    groups = [key for key in GROUP_KEYS if key in condition]
+    if groups:
+        key = groups[0]
+        if len(condition) > 1:
+            raise ConditionError(f"{path}: a group holds only an 'all' or an 'any' list")
+        items = condition[key]
+        if not isinstance(items, list) or not items:
+            raise ConditionError(f"{path}.{key}: a group needs a non-empty list of conditions")
+        return ConditionGroup(GROUP_KEYS[key], tuple(
+            _compile(item, f"{path}.{key}[{position}]", available, columns) for position, item in enumerate(items)
+        ))
+
+    try:
+        op = Operator(condition.get('operator'))
+    except ValueError:
+        raise ConditionError(
+            f"{path}: unknown operator {condition.get('operator')!r}; expected one of {', '.join(member.value for member in Operator)}"
+        )
+    column = _column(condition.get('indicator'), f"{path}.indicator", available, columns)
+
+    # A column to compare to takes precedence over a constant
+    compare_to = condition.get('compare_to')
+    if compare_to:
+        return Comparison(op, column, _column(compare_to, f"{path}.compare_to", available, columns), np.nan)
+
+    value = condition.get('value')
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise ConditionError(f"{path}: needs a numeric 'value' or a 'compare_to' column")
+    return Comparison(op, column, None, float(value))
+
+
+def compile_conditions(
+    conditions: Optional[List[Dict[str, Any]]],
+    require_all: bool,
+    available: Iterable[str],
+    name: str = "conditions"
+) -> ConditionProgram:
+    """
+    Compile a strategy's condition list
+
+    Top-level conditions are combined with AND (`require_all`) or OR; an
+    item {"all": [...]} or {"any": [...]} nests a group of conditions
+    combined with AND or OR respectively.
+
+    Args:
+        conditions: Condition dicts with indicator, operator and value or compare_to
+        require_all: Combine the top-level conditions with AND (buy) or OR (sell)
+        available: Columns the strategy's data provides
+        name: Name of the list in error messages
+
+    Raises:
+        ConditionError: A condition references an unknown column or operator
+            or has no operand
+    """
+    available = tuple(available)
+    columns: List[str] = []
+    items = tuple(
+        _compile(condition, f"{name}[{position}]", available, columns)
+        for position, condition in enumerate(conditions or [])
+    )
+    return ConditionProgram(tuple(columns), ConditionGroup(require_all, items))
@@ -0,0 +1,103 @@
+import numpy as np
+
+# Supported downsampling methods
+DOWNSAMPLING_METHODS = ('lttb', 'minmax', 'none')
+
+
+def _bucket_edges(n: int, buckets: int) -> np.ndarray:
+    """Split the interior points 1..n-2 into equally sized buckets"""
+    return np.linspace(1, n - 1, buckets + 1).astype(np.int64)
+
+
+def lttb(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets downsampling
+
+    Keeps the first and last points and, from each bucket in between, the
+    point forming the largest triangle with the previously kept point and the
+    average of the next bucket. Preserves the visual shape of the series.
+
+    Returns:
+        Sorted indices of the kept points
+    """
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    edges = _bucket_edges(n, threshold - 2)
+
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    previous = 0
+
+    for i in range(threshold - 2):
+        start, stop = edges[i], edges[i + 1]
+        if i + 2 < len(edges):
+            next_start, next_stop = edges[i + 1], edges[i + 2]
+            next_x = x[next_start:next_stop].mean()
+            next_y = y[next_start:next_stop].mean()
+        else:
+            next_x, next_y = x[-1], y[-1]
+
+        # Twice the triangle area; the constant factor does not change the argmax
+        areas = np.abs(
+            (x[previous] - next_x) * (y[start:stop] - y[previous])
+            - (x[previous] - x[start:stop]) * (next_y - y[previous])
+        )
+        previous = start + int(np.nanargmax(areas)) if not np.isnan(areas).all() else start
+        selected[i + 1] = previous
+
+    return selected
+
+
+def minmax(y: np.ndarray, threshold: int) -> np.ndarray:
+    """
+    Min/max-per-bucket downsampling
+
+    Keeps the first and last points and the lowest and highest point of each
+    bucket in between, so peaks and drawdown troughs are never dropped.
+
+    Returns:
+        Sorted indices of the kept points
+    """
+    n = len(y)
+    if threshold >= n or threshold < 4:
+        return np.arange(n)
+
+    y = np.asarray(y, dtype=np.float64)
+    buckets = (threshold - 2) // 2
+    edges = _bucket_edges(n, buckets)
+    starts = edges[:-1]
+
+    # Per-bucket argmin/argmax with reduceat over the bucket start offsets
+    interior = y[1:n - 1]
+    offsets = starts - 1
+    lows = np.minimum.reduceat(interior, offsets)
+    highs = np.maximum.reduceat(interior, offsets)
+    bucket_of = np.repeat(np.arange(buckets), np.diff(edges))
+    is_low = interior == lows[bucket_of]
+    is_high = interior == highs[bucket_of]
+
+    # First occurrence of each bucket's extreme
+    positions = np.arange(1, n - 1)
+    low_index = np.full(buckets, n, dtype=np.int64)
+    high_index = np.full(buckets, n, dtype=np.int64)
+    np.minimum.at(low_index, bucket_of[is_low], positions[is_low])
+    np.minimum.at(high_index, bucket_of[is_high], positions[is_high])
+
+    kept = np.concatenate(([0], low_index, high_index, [n - 1]))
+    return np.unique(kept[kept < n])
+
+
+def downsample(x: np.ndarray, y: np.ndarray, threshold: int, method: str = 'lttb') -> np.ndarray:
+    """Indices of the points to keep when reducing a series to about `threshold` points"""
+    if method == 'lttb':
+        return lttb(x, y, threshold)
+    if method == 'minmax':
+        return minmax(y, threshold)
+    if method == 'none':
+        return np.arange(len(y))
+    raise ValueError(f"Unknown downsampling method: {method}")
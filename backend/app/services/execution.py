@@ -0,0 +1,127 @@
+import math
+import numpy as np
+from typing import Dict, Any, Optional, Tuple, Union
+from app.models.models import Strategy
+
+FILL_PRICES = ("close", "next_open")
+SLIPPAGE_MODELS = ("fixed", "volume")
+
+# Frictionless fills on the signal bar's close in whole shares, the engine's original behaviour
+DEFAULT_EXECUTION: Dict[str, Any] = {
+    "commission_fixed": 0.0,
+    "commission_pct": 0.0,
+    "spread_pct": 0.0,
+    "slippage_model": "fixed",
+    "slippage_pct": 0.0,
+    "fill_price": "close",
+    "max_volume_pct": None,
+    "fractional_shares": False,
+}
+
+Number = Union[float, np.ndarray]
+
+
+class ExecutionModel:
+    """
+    How a strategy's orders are filled and charged
+
+    Settings come from `Strategy.execution`; missing keys take the defaults
+    in DEFAULT_EXECUTION:
+
+        commission_fixed: Charge per order
+        commission_pct: Charge in percent of the traded value
+        spread_pct: Quoted bid/ask spread in percent; buys fill half of it
+            above the reference price and sells half below
+        slippage_model: "fixed" moves every fill `slippage_pct` percent
+            against the order; "volume" scales `slippage_pct` by the square
+            root of the order's share of the bar volume
+        slippage_pct: Slippage in percent of the reference price
+        fill_price: "close" fills on the signal bar's close, "next_open" on
+            the following bar's open
+        max_volume_pct: Entries buy at most this percent of the bar volume
+        fractional_shares: Size positions in fractions of a share
+
+    Price adjustments and sizing work on floats and NumPy arrays alike, so
+    vectorized simulations compute the fill prices of every bar up front.
+    """
+
+    def __init__(self, settings: Optional[Dict[str, Any]] = None):
+        unknown = set(settings or {}) - set(DEFAULT_EXECUTION)
+        if unknown:
+            raise ValueError(f"Unknown execution settings: {', '.join(sorted(unknown))}")
+        config = {**DEFAULT_EXECUTION, **{k: v for k, v in (settings or {}).items() if v is not None}}
+        if config["fill_price"] not in FILL_PRICES:
+            raise ValueError(f"fill_price must be one of {', '.join(FILL_PRICES)}")
+        if config["slippage_model"] not in SLIPPAGE_MODELS:
+            raise ValueError(f"slippage_model must be one of {', '.join(SLIPPAGE_MODELS)}")
+        for name in ("commission_fixed", "commission_pct", "spread_pct", "slippage_pct"):
+            if config[name] < 0:
+                raise ValueError(f"{name} cannot be negative")
+        if config["max_volume_pct"] is not None and not 0 < config["max_volume_pct"] <= 100:
+            raise ValueError("max_volume_pct must be in (0, 100]")
+
+        self.commission_fixed = float(config["commission_fixed"])
+        self.commission_rate = float(config["commission_pct"]) / 100
+        self.next_open = config["fill_price"] == "next_open"
+        self.fractional = bool(config["fractional_shares"])
+        self.max_volume_fraction = config["max_volume_pct"] / 100 if config["max_volume_pct"] is not None else None
+
+        slippage = float(config["slippage_pct"]) / 100
+        self.volume_slippage = slippage if config["slippage_model"] == "volume" and slippage > 0 else 0.0
+        self.markup = float(config["spread_pct"]) / 200 + (slippage if config["slippage_model"] == "fixed" else 0.0)
+
+    @classmethod
+    def from_strategy(cls, strategy: Strategy) -> "ExecutionModel":
+        return cls(getattr(strategy, 'execution', None))
+
+    @property
+    def uses_volume(self) -> bool:
+        """Whether fills depend on bar volume"""
+        return self.max_volume_fraction is not None or self.volume_slippage > 0
+
+    def fill_prices(self, reference: Number) -> Tuple[Number, Number]:
+        """Buy and sell fill prices at reference prices after spread and fixed slippage"""
+        if not self.markup:
+            return reference, reference
+        return reference * (1 + self.markup), reference * (1 - self.markup)
+
+    def impact(self, shares: Number, volume: Number) -> Number:
+        """Fractional volume slippage of orders for `shares` on bars trading `volume`"""
+        if not self.volume_slippage:
+            return 0.0
+        with np.errstate(divide='ignore', invalid='ignore'):
+            participation = np.where(volume > 0, shares / volume, 0.0)
+        return self.volume_slippage * np.sqrt(np.minimum(participation, 1.0))
+
+    def commission(self, value: Number) -> Number:
+        """Charge on orders of the given traded value"""
+        return self.commission_fixed + value * self.commission_rate
+
+    def _affordable(self, budget: Number, price: Number, volume: Number) -> Number:
+        shares = (budget - self.commission_fixed) / (price * (1 + self.commission_rate))
+        if self.max_volume_fraction is not None:
+            shares = np.minimum(shares, np.nan_to_num(volume * self.max_volume_fraction, nan=np.inf))
+        shares = np.maximum(shares, 0.0)
+        return shares if self.fractional else np.floor(shares)
+
+    def entry(self, budget: Number, price: Number, volume: Number = math.nan) -> Tuple[Number, Number]:
+        """
+        Size entries spending at most `budget` at fill `price`
+
+        Volume slippage depends on the order size, so orders are sized at the
+        quoted fill price, repriced with their impact and sized again.
+
+        Returns:
+            Shares bought and the fill price paid per share
+        """
+        shares = self._affordable(budget, price, volume)
+        if self.volume_slippage:
+            price = price * (1 + self.impact(shares, volume))
+            shares = self._affordable(budget, price, volume)
+        return shares, price
+
+    def exit_price(self, shares: Number, price: Number, volume: Number = math.nan) -> Number:
+        """Fill price of exits for `shares` quoted at fill `price`"""
+        if self.volume_slippage:
+            return price * (1 - self.impact(shares, volume))
+        return price
@@ -0,0 +1,137 @@
+import hashlib
+import json
+import numpy as np
+import pandas as pd
+from typing import Dict, Any, Optional, Tuple
+from app.models.models import Strategy
+from app.services.indicator_cache import IndicatorCalculator
+from app.services.streaming_indicators import StreamingEMA, StreamingIndicatorSet, StreamingMACD
+from app.services.timeframes import higher_timeframes
+
+# Bump when the layout of saved engine state changes; older states fall back to a full rerun
+STATE_VERSION = 5
+
+
+def strategy_fingerprint(strategy: Strategy) -> str:
+    """Hash of every strategy setting that affects a run, so edited strategies are never extended"""
+    config = {
+        "symbol": strategy.symbol,
+        "parameters": strategy.parameters or {},
+        "buy_conditions": strategy.buy_conditions or [],
+        "sell_conditions": strategy.sell_conditions or [],
+        "initial_capital": strategy.initial_capital,
+        "position_size": strategy.position_size,
+        "stop_loss": strategy.stop_loss,
+        "take_profit": strategy.take_profit,
+        "execution": strategy.execution or {},
+    }
+    return hashlib.blake2b(json.dumps(config, sort_keys=True, default=str).encode(), digest_size=16).hexdigest()
+
+
+def lookback_bars(params: Dict[str, Any]) -> int:
+    """Closes needed to warm up every windowed indicator"""
+    windows = [params[name] for name in ('sma_short', 'sma_long', 'bb_period') if name in params]
+    if 'rsi_period' in params:
+        windows.append(params['rsi_period'] + 1)  # RSI averages one-bar differences
+    return max(windows, default=1)
+
+
+def streaming_indicators(indicators: IndicatorCalculator, params: Dict[str, Any]) -> StreamingIndicatorSet:
+    """
+    Streaming indicators positioned after the series a batch calculator covers
+
+    EWM-based indicators take their exact state from the batch output.
+    The running sums of windowed indicators depend on every close before
+    them, so those replay the whole series; either way the streamed values
+    of later bars equal what pandas computes over the extended series.
+    """
+    streaming = StreamingIndicatorSet(params)
+    closes = indicators.close.to_numpy(dtype=np.float64).tolist()
+
+    for name, indicator in streaming.indicators.items():
+        if isinstance(indicator, StreamingEMA):
+            output = indicators.ema(indicator.span)
+            streaming.indicators[name] = StreamingEMA.from_series(closes, float(output[-1]), indicator.span)
+        elif isinstance(indicator, StreamingMACD):
+            fast, slow, signal = indicator.fast.span, indicator.slow.span, indicator.signal.span
+            macd = indicators.macd(fast, slow)
+            macd_signal = indicators.macd_signal(fast, slow, signal)
+            indicator.fast = StreamingEMA.from_series(closes, float(indicators.ema(fast)[-1]), fast)
+            indicator.slow = StreamingEMA.from_series(closes, float(indicators.ema(slow)[-1]), slow)
+            indicator.signal = StreamingEMA.from_series(macd.tolist(), float(macd_signal[-1]), signal)
+            indicator.macd, indicator.macd_signal = float(macd[-1]), float(macd_signal[-1])
+        else:
+            indicator.replay(closes)
+
+    return streaming
+
+
+def _json_floats(row: pd.Series) -> Dict[str, Optional[float]]:
+    # NaN is not valid JSON, so missing values are stored as null
+    return {name: None if value != value else value for name, value in row.astype(np.float64).items()}
+
+
+def capture_state(
+    strategy: Strategy,
+    interval: str,
+    df: pd.DataFrame,
+    streaming: StreamingIndicatorSet,
+    portfolio: Dict[str, Any]
+) -> Dict[str, Any]:
+    """
+    Terminal state of a single-symbol run, enough to simulate bars appended later
+
+    Holds the portfolio before the end-of-period close, the last bar with its
+    indicator values (crossover conditions compare against it), and the
+    streaming indicators that compute the following bars.
+    """
+    return {
+        "version": STATE_VERSION,
+        "strategy": strategy_fingerprint(strategy),
+        "interval": interval,
+        "last_timestamp": df.index[-1].isoformat(),
+        "last_bar": _json_floats(df.iloc[-1]),
+        "portfolio": portfolio,
+        "indicators": streaming.snapshot(),
+    }
+
+
+def can_extend(state: Optional[Dict[str, Any]], strategy: Strategy, interval: str) -> bool:
+    """
+    Whether a saved state can continue a run of this strategy
+
+    Higher-timeframe indicators have no streaming state, so strategies using
+    them are always rerun in full.
+    """
+    return (
+        state is not None
+        and state.get("version") == STATE_VERSION
+        and state.get("interval") == interval
+        and state.get("strategy") == strategy_fingerprint(strategy)
+        and not higher_timeframes(strategy.parameters or {})
+    )
+
+
+def extension_frame(state: Dict[str, Any], new_bars: pd.DataFrame) -> Tuple[pd.DataFrame, StreamingIndicatorSet]:
+    """
+    Frame of the saved last bar followed by new bars with streamed indicator values
+
+    The saved streaming indicators advance over the new closes, so nothing
+    before the last bar is recomputed. Returns the frame and the advanced
+    indicators.
+    """
+    streaming = StreamingIndicatorSet.restore(state["indicators"])
+    columns = streaming.run(new_bars['close'].to_numpy(dtype=np.float64).tolist())
+
+    last_timestamp = pd.Timestamp(state["last_timestamp"])
+    if last_timestamp.tzinfo is not None and new_bars.index.tz is not None:
+        last_timestamp = last_timestamp.tz_convert(new_bars.index.tz)
+    last_bar = pd.DataFrame(
+        {name: [np.nan if value is None else value] for name, value in state["last_bar"].items()},
+        index=pd.DatetimeIndex([last_timestamp], name=new_bars.index.name)
+    )
+    if new_bars.empty:
+        return last_bar, streaming
+
+    new_bars = new_bars.assign(**{name: np.array(values, dtype=np.float64) for name, values in columns.items()})
+    return pd.concat([last_bar, new_bars]), streaming
@@ -0,0 +1,178 @@
+import hashlib
+import threading
+import numpy as np
+import pandas as pd
+from collections import OrderedDict
+from typing import Callable, Dict, List, Any, Hashable, Optional, Tuple, Union
+from app.core.config import settings
+
+
+def _fingerprint(index: pd.Index, values: np.ndarray) -> str:
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(np.ascontiguousarray(index.asi8).tobytes())
+    digest.update(np.ascontiguousarray(values, dtype=np.float64).tobytes())
+    return digest.hexdigest()
+
+
+def data_version(df: pd.DataFrame) -> str:
+    """
+    Fingerprint a frame's timestamps and closes so cached series are never reused across different data
+
+    The fingerprint is kept in the frame's attrs, which pandas carries over to
+    copies and slices, so it is only reused by frames spanning the same bars.
+    """
+    timestamps = df.index.asi8
+    span = (len(timestamps), int(timestamps[0]), int(timestamps[-1])) if len(timestamps) else (0,)
+    cached = df.attrs.get('data_version')
+    if cached is not None and cached[0] == span:
+        return cached[1]
+    version = _fingerprint(df.index, df['close'].to_numpy(dtype=np.float64))
+    df.attrs['data_version'] = (span, version)
+    return version
+
+
+class IndicatorCache:
+    """
+    LRU cache of computed indicator series bounded by memory
+
+    Keys are (symbol, interval, data version, indicator, parameters); values are
+    read-only float64 arrays so callers can attach them to frames without copying.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Hashable, np.ndarray]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        # Counters
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], np.ndarray]) -> np.ndarray:
+        """Return the cached array for key, computing and storing it on a miss"""
+        with self._lock:
+            values = self._entries.get(key)
+            if values is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return values
+            self.misses += 1
+
+        values = np.array(compute(), dtype=np.float64)
+        values.setflags(write=False)
+
+        with self._lock:
+            if key not in self._entries and values.nbytes <= self.max_bytes:
+                self._entries[key] = values
+                self._bytes += values.nbytes
+                while self._bytes > self.max_bytes:
+                    _, evicted = self._entries.popitem(last=False)
+                    self._bytes -= evicted.nbytes
+                    self.evictions += 1
+        return values
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and memory usage"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes
+            }
+
+
+def combine_stats(stats: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Sum the stats() of several caches, one per process"""
+    totals = {name: sum(cache[name] for cache in stats) for name in ("hits", "misses", "evictions", "entries", "bytes", "max_bytes")}
+    lookups = totals["hits"] + totals["misses"]
+    totals["hit_rate"] = totals["hits"] / lookups if lookups else 0.0
+    totals["processes"] = len(stats)
+    return totals
+
+
+class IndicatorCalculator:
+    """
+    Indicator series for one dataset, memoized in an IndicatorCache
+
+    The dataset is a close series, or a close panel with one column per symbol
+    in which case every indicator is computed for all symbols at once.
+
+    Composite indicators are built from shared primitives, so e.g. MACD reuses
+    the EMA series of `ema_short`/`ema_long` with the same span and Bollinger
+    Bands reuse the SMA of the same window.
+    """
+
+    def __init__(self, close: Union[pd.Series, pd.DataFrame], key: Tuple, cache: Optional[IndicatorCache] = None):
+        self.close = close
+        self.cache = cache
+        self.prefix = key
+
+    @classmethod
+    def for_frame(
+        cls,
+        df: pd.DataFrame,
+        symbol: str,
+        interval: str,
+        cache: Optional[IndicatorCache] = None
+    ) -> "IndicatorCalculator":
+        """Calculator over a single symbol's OHLCV frame"""
+        return cls(df['close'], (symbol, interval, data_version(df)), cache)
+
+    @classmethod
+    def for_panel(
+        cls,
+        close: pd.DataFrame,
+        interval: str,
+        cache: Optional[IndicatorCache] = None
+    ) -> "IndicatorCalculator":
+        """Calculator over a (time x symbol) close panel; indicators are 2D arrays"""
+        key = (tuple(close.columns), interval, _fingerprint(close.index, close.to_numpy()))
+        return cls(close, key, cache)
+
+    def _get(self, indicator: str, params: Tuple, compute: Callable[[], Any]) -> np.ndarray:
+        if self.cache is None:
+            return np.asarray(compute(), dtype=np.float64)
+        return self.cache.get_or_compute(self.prefix + (indicator, params), compute)
+
+    def sma(self, window: int) -> np.ndarray:
+        return self._get('sma', (window,), lambda: self.close.rolling(window=window).mean().to_numpy())
+
+    def rolling_std(self, window: int) -> np.ndarray:
+        return self._get('rolling_std', (window,), lambda: self.close.rolling(window=window).std().to_numpy())
+
+    def ema(self, span: int) -> np.ndarray:
+        return self._get('ema', (span,), lambda: self.close.ewm(span=span).mean().to_numpy())
+
+    def rsi(self, period: int) -> np.ndarray:
+        def compute():
+            delta = self.close.diff()
+            gain = (delta.where(delta > 0, 0)).rolling(window=period).mean()
+            loss = (-delta.where(delta < 0, 0)).rolling(window=period).mean()
+            rs = gain / loss
+            return (100 - (100 / (1 + rs))).to_numpy()
+        return self._get('rsi', (period,), compute)
+
+    def macd(self, fast: int, slow: int) -> np.ndarray:
+        return self._get('macd', (fast, slow), lambda: self.ema(fast) - self.ema(slow))
+
+    def macd_signal(self, fast: int, slow: int, signal: int) -> np.ndarray:
+        def compute():
+            macd = self.macd(fast, slow)
+            macd = pd.DataFrame(macd) if macd.ndim == 2 else pd.Series(macd)
+            return macd.ewm(span=signal).mean().to_numpy()
+        return self._get('macd_signal', (fast, slow, signal), compute)
+
+
+indicator_cache = IndicatorCache(max_bytes=settings.INDICATOR_CACHE_MAX_BYTES)
@@ -0,0 +1,491 @@
+import json
+import numpy as np
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta
+from typing import Dict, List, Any, Optional, Callable, Iterable, Tuple
+from sqlalchemy import case, func, insert, select
+from sqlalchemy.orm import Session, aliased
+from sqlalchemy.sql import Select
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.models import AnalysisRun, Backtest, BacktestJob, User
+
+# How many queued candidates a worker considers per claim attempt
+CLAIM_BATCH = 20
+
+# Number of recently finished jobs used for latency statistics
+STATS_WINDOW = 500
+
+
+def market_data_key(symbol: str, start_date: datetime, end_date: datetime, interval: str = "1d") -> str:
+    """Group key of jobs that run over the same market data"""
+    return json.dumps([symbol.upper(), interval, start_date.isoformat(), end_date.isoformat()])
+
+
+def parse_market_data_key(key: str) -> Tuple[str, datetime, datetime, str]:
+    """Symbol, start date, end date and interval encoded in a group key"""
+    symbol, interval, start_date, end_date = json.loads(key)
+    return symbol, datetime.fromisoformat(start_date), datetime.fromisoformat(end_date), interval
+
+
+def user_claim_lock(user_id: int) -> Select:
+    """
+    Row lock on a user taken before claiming one of their jobs
+
+    Under READ COMMITTED, concurrent claims of different jobs each count the
+    user's running jobs from the same committed snapshot; holding the user's
+    row until the claim commits makes the next claim count after it. SQLite
+    has no row locks and serializes writers instead.
+    """
+    return select(User.id).where(User.id == user_id).with_for_update()
+
+
+def job_subject(job: BacktestJob) -> Optional[Any]:
+    """The backtest or analysis run a job executes, whose status follows the job's"""
+    return job.backtest if job.backtest_id is not None else job.analysis
+
+
+class JobQueue(ABC):
+    """Interface for job queues of backtests and analysis runs"""
+
+    @abstractmethod
+    def enqueue(
+        self,
+        db: Session,
+        backtest: Backtest,
+        priority: int = 0,
+        kind: str = "run",
+        group_key: Optional[str] = None
+    ) -> BacktestJob:
+        """Queue a job for a backtest"""
+
+    @abstractmethod
+    def enqueue_many(
+        self,
+        db: Session,
+        user_id: int,
+        backtests: Iterable[Tuple[int, Optional[str]]],
+        priority: int = 0,
+        kind: str = "run"
+    ) -> int:
+        """Queue jobs for many backtests of one user"""
+
+    @abstractmethod
+    def enqueue_analysis(self, db: Session, analysis: AnalysisRun, priority: int = 0) -> BacktestJob:
+        """Queue a job for an analysis run"""
+
+    @abstractmethod
+    def claim(self, worker_id: str, prefer_group: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Claim the next runnable job for a worker, None when there is none"""
+
+    @abstractmethod
+    def complete(self, job_id: int):
+        """Mark a running job as completed"""
+
+    @abstractmethod
+    def fail(self, job_id: int, error: str) -> bool:
+        """Record a failed attempt; True if the job was requeued"""
+
+    @abstractmethod
+    def cancel(self, db: Session, backtest_id: int) -> bool:
+        """Cancel the active job of a backtest; True if there was one"""
+
+    @abstractmethod
+    def cancel_analysis(self, db: Session, analysis_id: str) -> bool:
+        """Cancel the active job of an analysis run; True if there was one"""
+
+    @abstractmethod
+    def stats(self, db: Session) -> Dict[str, Any]:
+        """Queue depth and latency statistics"""
+
+
+class DatabaseJobQueue(JobQueue):
+    """
+    Job queue stored in the application database
+
+    Works with SQLite and PostgreSQL without outside services. Workers claim
+    jobs with a conditional UPDATE, so a job is only ever handed to one worker.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session] = SessionLocal,
+        max_per_user: Optional[int] = None,
+        max_attempts: Optional[int] = None,
+        retry_delay: Optional[float] = None
+    ):
+        self.session_factory = session_factory
+        self.max_per_user = max_per_user or settings.MAX_CONCURRENT_BACKTESTS_PER_USER
+        self.max_attempts = max_attempts or settings.BACKTEST_MAX_ATTEMPTS
+        self.retry_delay = retry_delay if retry_delay is not None else settings.BACKTEST_RETRY_DELAY_SECONDS
+
+    def enqueue(
+        self,
+        db: Session,
+        backtest: Backtest,
+        priority: int = 0,
+        kind: str = "run",
+        group_key: Optional[str] = None
+    ) -> BacktestJob:
+        """Queue a job for a backtest and mark the backtest pending"""
+        now = datetime.utcnow()
+        job = BacktestJob(
+            backtest_id=backtest.id,
+            user_id=backtest.user_id,
+            kind=kind,
+            group_key=group_key,
+            priority=priority,
+            status="queued",
+            max_attempts=self.max_attempts,
+            enqueued_at=now,
+            available_at=now
+        )
+        backtest.status = "pending"
+        db.add(job)
+        db.commit()
+        db.refresh(job)
+        return job
+
+    def enqueue_many(
+        self,
+        db: Session,
+        user_id: int,
+        backtests: Iterable[Tuple[int, Optional[str]]],
+        priority: int = 0,
+        kind: str = "run"
+    ) -> int:
+        """
+        Queue jobs for many pending backtests of one user with a single INSERT
+
+        Args:
+            backtests: (backtest id, group key) pairs, in the order they should run
+
+        Returns:
+            Number of jobs queued
+        """
+        now = datetime.utcnow()
+        rows = [
+            {
+                "backtest_id": backtest_id,
+                "user_id": user_id,
+                "kind": kind,
+                "group_key": group_key,
+                "priority": priority,
+                "status": "queued",
+                "attempts": 0,
+                "max_attempts": self.max_attempts,
+                "cancel_requested": False,
+                "enqueued_at": now,
+                "available_at": now
+            }
+            for backtest_id, group_key in backtests
+        ]
+        if rows:
+            db.execute(insert(BacktestJob), rows)
+        db.commit()
+        return len(rows)
+
+    def enqueue_analysis(self, db: Session, analysis: AnalysisRun, priority: int = 0) -> BacktestJob:
+        """
+        Queue a job running an analysis and mark the analysis pending
+
+        Analyses count against the same per-user limit as backtests; their
+        kind selects the worker's handler.
+        """
+        now = datetime.utcnow()
+        job = BacktestJob(
+            analysis_id=analysis.id,
+            user_id=analysis.user_id,
+            kind=analysis.kind,
+            priority=priority,
+            status="queued",
+            max_attempts=self.max_attempts,
+            enqueued_at=now,
+            available_at=now
+        )
+        analysis.status = "pending"
+        db.add(job)
+        db.commit()
+        db.refresh(job)
+        return job
+
+    def claim(self, worker_id: str, prefer_group: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Claim the highest priority queued job, respecting per-user concurrency limits
+
+        Among jobs of equal priority, those in `prefer_group` come first, so a
+        worker keeps running jobs over the market data it already holds. The
+        per-user limit is checked again by the claiming UPDATE itself while
+        the user's row is locked (see user_claim_lock), so workers claiming
+        at the same time cannot exceed it together.
+        """
+        db = self.session_factory()
+        try:
+            now = datetime.utcnow()
+
+            # Users already at their concurrency limit, skipped up front
+            saturated = [
+                user_id for user_id, running in db.query(BacktestJob.user_id, func.count(BacktestJob.id))
+                .filter(BacktestJob.status == "running")
+                .group_by(BacktestJob.user_id)
+                .all()
+                if running >= self.max_per_user
+            ]
+
+            query = db.query(BacktestJob).filter(
+                BacktestJob.status == "queued",
+                BacktestJob.available_at <= now
+            )
+            if saturated:
+                query = query.filter(BacktestJob.user_id.notin_(saturated))
+            order = [BacktestJob.priority.desc()]
+            if prefer_group:
+                order.append(case((BacktestJob.group_key == prefer_group, 0), else_=1))
+            candidates = query.order_by(*order, BacktestJob.enqueued_at, BacktestJob.id).limit(CLAIM_BATCH).all()
+
+            running = aliased(BacktestJob)
+            for job in candidates:
+                db.execute(user_claim_lock(job.user_id))
+                running_jobs = select(func.count(running.id)).where(
+                    running.user_id == job.user_id,
+                    running.status == "running"
+                ).scalar_subquery()
+                claimed = db.query(BacktestJob).filter(
+                    BacktestJob.id == job.id,
+                    BacktestJob.status == "queued",
+                    running_jobs < self.max_per_user
+                ).update({
+                    BacktestJob.status: "running",
+                    BacktestJob.worker_id: worker_id,
+                    BacktestJob.started_at: now,
+                    BacktestJob.attempts: BacktestJob.attempts + 1
+                }, synchronize_session=False)
+                db.commit()
+
+                if claimed:
+                    # The commit expired the job, so its fields are read back from the claimed row
+                    return {
+                        "id": job.id,
+                        "backtest_id": job.backtest_id,
+                        "analysis_id": job.analysis_id,
+                        "user_id": job.user_id,
+                        "kind": job.kind,
+                        "group_key": job.group_key,
+                        "attempts": job.attempts
+                    }
+
+            return None
+        finally:
+            db.close()
+
+    def complete(self, job_id: int):
+        """Mark a running job as completed"""
+        db = self.session_factory()
+        try:
+            db.query(BacktestJob).filter(BacktestJob.id == job_id, BacktestJob.status == "running").update({
+                BacktestJob.status: "completed",
+                BacktestJob.finished_at: datetime.utcnow()
+            }, synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+
+    def fail(self, job_id: int, error: str) -> bool:
+        """
+        Record a failed attempt
+
+        Returns:
+            True if the job was requeued for another attempt
+        """
+        db = self.session_factory()
+        try:
+            job = db.query(BacktestJob).filter(BacktestJob.id == job_id).first()
+            if not job or job.status != "running":
+                return False
+
+            now = datetime.utcnow()
+            job.error_message = error
+            retry = job.attempts < job.max_attempts and not job.cancel_requested
+            subject = job_subject(job)
+
+            if retry:
+                # Exponential backoff between attempts
+                job.status = "queued"
+                job.worker_id = None
+                job.available_at = now + timedelta(seconds=self.retry_delay * 2 ** (job.attempts - 1))
+                if subject:
+                    subject.status = "pending"
+            else:
+                job.status = "failed"
+                job.finished_at = now
+                if subject and subject.status in ("pending", "running"):
+                    subject.status = "failed"
+                    subject.error_message = error
+
+            db.commit()
+            return retry
+        finally:
+            db.close()
+
+    def cancel(self, db: Session, backtest_id: int) -> bool:
+        """
+        Cancel the active job of a backtest
+
+        Queued jobs are cancelled immediately; running jobs are flagged and
+        stopped by the worker pool that holds them.
+
+        Returns:
+            True if an active job was found
+        """
+        return self._cancel(db, BacktestJob.backtest_id == backtest_id)
+
+    def cancel_analysis(self, db: Session, analysis_id: str) -> bool:
+        """Cancel the active job of an analysis run, like cancel; True if there was one"""
+        return self._cancel(db, BacktestJob.analysis_id == analysis_id)
+
+    def _cancel(self, db: Session, condition) -> bool:
+        jobs = db.query(BacktestJob).filter(
+            condition,
+            BacktestJob.status.in_(["queued", "running"])
+        ).all()
+
+        for job in jobs:
+            if job.status == "queued":
+                job.status = "cancelled"
+                job.finished_at = datetime.utcnow()
+                job_subject(job).status = "cancelled"
+            else:
+                job.cancel_requested = True
+
+        db.commit()
+        return bool(jobs)
+
+    def cancel_requests(self, worker_ids: List[str]) -> List[Dict[str, Any]]:
+        """Running jobs held by the given workers that have been asked to stop"""
+        if not worker_ids:
+            return []
+        db = self.session_factory()
+        try:
+            jobs = db.query(BacktestJob).filter(
+                BacktestJob.status == "running",
+                BacktestJob.cancel_requested == True,
+                BacktestJob.worker_id.in_(worker_ids)
+            ).all()
+            return [{"id": job.id, "worker_id": job.worker_id} for job in jobs]
+        finally:
+            db.close()
+
+    def mark_cancelled(self, job_id: int):
+        """Finalize a running job whose worker has been stopped"""
+        db = self.session_factory()
+        try:
+            job = db.query(BacktestJob).filter(BacktestJob.id == job_id).first()
+            if job and job.status == "running":
+                job.status = "cancelled"
+                job.finished_at = datetime.utcnow()
+                subject = job_subject(job)
+                if subject:
+                    subject.status = "cancelled"
+                db.commit()
+        finally:
+            db.close()
+
+    def running_jobs(self, worker_id: str) -> List[int]:
+        """Ids of jobs currently held by a worker"""
+        db = self.session_factory()
+        try:
+            return [
+                job_id for (job_id,) in db.query(BacktestJob.id).filter(
+                    BacktestJob.status == "running",
+                    BacktestJob.worker_id == worker_id
+                ).all()
+            ]
+        finally:
+            db.close()
+
+    def running_on_host(self, hostname: str) -> List[Dict[str, Any]]:
+        """Running jobs held by any worker on a host"""
+        db = self.session_factory()
+        try:
+            jobs = db.query(BacktestJob.id, BacktestJob.worker_id).filter(
+                BacktestJob.status == "running",
+                BacktestJob.worker_id.like(f"{hostname}:%")
+            ).all()
+            return [{"id": job_id, "worker_id": worker_id} for job_id, worker_id in jobs]
+        finally:
+            db.close()
+
+    def requeue(self, job_id: int):
+        """Return a running job to the queue without counting the interrupted attempt"""
+        db = self.session_factory()
+        try:
+            job = db.query(BacktestJob).filter(BacktestJob.id == job_id).first()
+            if job and job.status == "running":
+                job.status = "queued"
+                job.worker_id = None
+                job.attempts = max(job.attempts - 1, 0)
+                job.available_at = datetime.utcnow()
+                subject = job_subject(job)
+                if subject:
+                    subject.status = "pending"
+                db.commit()
+        finally:
+            db.close()
+
+    def stats(self, db: Session) -> Dict[str, Any]:
+        """Queue depth and latency statistics"""
+        depth = dict(
+            db.query(BacktestJob.status, func.count(BacktestJob.id))
+            .filter(BacktestJob.status.in_(["queued", "running"]))
+            .group_by(BacktestJob.status)
+            .all()
+        )
+        by_priority = dict(
+            db.query(BacktestJob.priority, func.count(BacktestJob.id))
+            .filter(BacktestJob.status == "queued")
+            .group_by(BacktestJob.priority)
+            .all()
+        )
+
+        recent = db.query(
+            BacktestJob.status,
+            BacktestJob.enqueued_at,
+            BacktestJob.started_at,
+            BacktestJob.finished_at
+        ).filter(
+            BacktestJob.finished_at.isnot(None)
+        ).order_by(BacktestJob.finished_at.desc()).limit(STATS_WINDOW).all()
+
+        outcomes: Dict[str, int] = {}
+        wait_times = []
+        run_times = []
+        for job_status, enqueued_at, started_at, finished_at in recent:
+            outcomes[job_status] = outcomes.get(job_status, 0) + 1
+            if started_at:
+                wait_times.append((started_at - enqueued_at).total_seconds())
+                run_times.append((finished_at - started_at).total_seconds())
+
+        return {
+            "queued": depth.get("queued", 0),
+            "running": depth.get("running", 0),
+            "queued_by_priority": by_priority,
+            "recent_outcomes": outcomes,
+            "wait_seconds": _summarize(wait_times),
+            "run_seconds": _summarize(run_times)
+        }
+
+
+def _summarize(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {"count": 0, "avg": 0.0, "p50": 0.0, "p95": 0.0, "max": 0.0}
+    array = np.asarray(values)
+    return {
+        "count": len(values),
+        "avg": float(array.mean()),
+        "p50": float(np.percentile(array, 50)),
+        "p95": float(np.percentile(array, 95)),
+        "max": float(array.max())
+    }
+
+
+job_queue = DatabaseJobQueue()
@@ -0,0 +1,496 @@
+import json
+import os
+import re
+import threading
+import numpy as np
+import pandas as pd
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Tuple, Any
+from app.core.config import settings
+
+OHLCV_COLUMNS = ['open', 'high', 'low', 'close', 'volume']
+
+# Fetcher signature: (symbol, start_date, end_date, interval) -> OHLCV frame (may be empty)
+Fetcher = Callable[[str, datetime, datetime, str], pd.DataFrame]
+
+# Per-process counters; entries and bytes are read from the shared cache directory
+COUNTERS = ('hits', 'partial_hits', 'misses', 'evictions')
+
+
+class MarketDataCache:
+    """
+    Persistent on-disk OHLCV cache keyed by symbol and interval
+
+    Each entry is stored as a memory-mappable columnar layout:
+        <key>.ts.npy     int64 UTC nanosecond timestamps (sorted)
+        <key>.ohlcv.npy  float64 array of shape (5, rows), one row per column
+        <key>.json       metadata (timezone and the covered [start, end) range)
+
+    Requests are served from local storage and only the missing head/tail
+    ranges are fetched from the provider and merged into the entry. Each
+    entry has its own lock, so different symbols fetch concurrently while
+    concurrent requests for one symbol wait for the first fetch and are then
+    served from disk.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int, offline: bool = False):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.offline = offline
+        self._lock = threading.Lock()  # Guards the lock table and counters
+        self._key_locks: Dict[str, threading.RLock] = {}
+        self._evict_lock = threading.Lock()
+
+        # Counters
+        self.hits = 0  # Served entirely from disk
+        self.partial_hits = 0  # Served from disk after fetching missing gaps
+        self.misses = 0  # No cached entry, fetched from the provider
+        self.evictions = 0
+
+    def _key(self, symbol: str, interval: str) -> str:
+        return re.sub(r'[^A-Za-z0-9_.=-]', '_', f"{symbol.upper()}__{interval}")
+
+    def _lock_for(self, key: str) -> threading.RLock:
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.RLock())
+
+    def _count(self, counter: str):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def _paths(self, key: str) -> Tuple[Path, Path, Path]:
+        return (
+            self.cache_dir / f"{key}.ts.npy",
+            self.cache_dir / f"{key}.ohlcv.npy",
+            self.cache_dir / f"{key}.json"
+        )
+
+    @staticmethod
+    def _to_ns(value: Any, tz: Optional[str]) -> int:
+        """Convert a datetime bound to nanoseconds in the entry's time base"""
+        ts = pd.Timestamp(value)
+        if tz:
+            ts = ts.tz_localize(tz) if ts.tzinfo is None else ts.tz_convert(tz)
+        elif ts.tzinfo is not None:
+            ts = ts.tz_convert('UTC').tz_localize(None)
+        return ts.value
+
+    def _load_meta(self, key: str) -> Optional[Dict[str, Any]]:
+        meta_path = self._paths(key)[2]
+        try:
+            with open(meta_path) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def _load_arrays(self, key: str, meta: Dict[str, Any]) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """Memory-map an entry's columns, returning None if the files are missing or inconsistent"""
+        ts_path, ohlcv_path, _ = self._paths(key)
+        try:
+            timestamps = np.load(ts_path, mmap_mode='r')
+            ohlcv = np.load(ohlcv_path, mmap_mode='r')
+        except (FileNotFoundError, ValueError):
+            return None
+        if len(timestamps) != meta['rows'] or ohlcv.shape != (len(OHLCV_COLUMNS), meta['rows']):
+            return None
+        return timestamps, ohlcv
+
+    def _frame(self, timestamps: np.ndarray, ohlcv: np.ndarray, tz: Optional[str]) -> pd.DataFrame:
+        index = pd.DatetimeIndex(np.array(timestamps, dtype='datetime64[ns]'), name='timestamp')
+        if tz:
+            index = index.tz_localize('UTC').tz_convert(tz)
+        # One contiguous copy of the (5, rows) block; pandas keeps it as a single float64 block
+        # so every column is a contiguous view
+        block = np.array(ohlcv, dtype=np.float64, order='C')
+        return pd.DataFrame(block.T, index=index, columns=OHLCV_COLUMNS, copy=False)
+
+    @staticmethod
+    def _frame_tz(df: pd.DataFrame) -> Optional[str]:
+        tz = getattr(df.index, 'tz', None)
+        return str(tz) if tz is not None else None
+
+    def _frame_arrays(self, df: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray]:
+        index = df.index
+        if getattr(index, 'tz', None) is not None:
+            index = index.tz_convert('UTC').tz_localize(None)
+        timestamps = index.as_unit('ns').asi8.astype(np.int64)
+        ohlcv = np.vstack([df[column].to_numpy(dtype=np.float64) for column in OHLCV_COLUMNS])
+        return timestamps, ohlcv
+
+    def _write(self, key: str, meta: Dict[str, Any], timestamps: np.ndarray, ohlcv: np.ndarray):
+        """Write an entry, replacing files atomically so concurrent readers never see partial arrays"""
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        suffix = f".tmp-{os.getpid()}-{threading.get_ident()}"
+
+        for path, array in zip(self._paths(key)[:2], (timestamps, ohlcv)):
+            tmp_path = path.with_name(path.name + suffix)
+            with open(tmp_path, 'wb') as f:
+                np.save(f, np.ascontiguousarray(array))
+            os.replace(tmp_path, path)
+
+        meta_path = self._paths(key)[2]
+        tmp_path = meta_path.with_name(meta_path.name + suffix)
+        with open(tmp_path, 'w') as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, meta_path)
+
+    def missing_ranges(self, meta: Optional[Dict[str, Any]], start_ns: int, end_ns: int) -> List[Tuple[int, int]]:
+        """Return the [start, end) nanosecond ranges not covered by an entry"""
+        if meta is None:
+            return [(start_ns, end_ns)]
+
+        ranges = []
+        if start_ns < meta['start']:
+            ranges.append((start_ns, meta['start']))
+        if end_ns > meta['end']:
+            ranges.append((meta['end'], end_ns))
+        return ranges
+
+    def get(
+        self,
+        symbol: str,
+        interval: str,
+        start_date: datetime,
+        end_date: datetime,
+        fetcher: Fetcher,
+        offline: Optional[bool] = None
+    ) -> pd.DataFrame:
+        """
+        Return OHLCV bars in [start_date, end_date) for a symbol/interval
+
+        Missing head/tail ranges are fetched with `fetcher` and merged into the
+        cached entry, unless the cache is in offline mode. `offline` overrides
+        the cache's mode, e.g. for fetchers that never touch the network.
+        """
+        with self._lock_for(self._key(symbol, interval)):
+            timestamps, ohlcv, tz = self._serve(symbol, interval, start_date, end_date, fetcher, offline)
+            return self._frame(timestamps, ohlcv, tz)
+
+    def iter_frames(
+        self,
+        symbol: str,
+        interval: str,
+        start_date: datetime,
+        end_date: datetime,
+        fetcher: Fetcher,
+        rows: int,
+        offline: Optional[bool] = None
+    ) -> Iterator[pd.DataFrame]:
+        """
+        Yield the bars `get` would return as consecutive frames of at most `rows` bars
+
+        The entry is filled like for `get` right away, then read lazily through
+        its memory-mapped files, so only one frame of bars is in memory at a
+        time. The mapping stays readable if the entry is replaced or evicted
+        meanwhile.
+        """
+        timestamps, ohlcv, tz = self._serve(symbol, interval, start_date, end_date, fetcher, offline, mapped=True)
+        return (
+            self._frame(timestamps[lo:lo + rows], ohlcv[:, lo:lo + rows], tz)
+            for lo in range(0, len(timestamps), rows)
+        )
+
+    def _serve(
+        self,
+        symbol: str,
+        interval: str,
+        start_date: datetime,
+        end_date: datetime,
+        fetcher: Fetcher,
+        offline: Optional[bool],
+        mapped: bool = False
+    ) -> Tuple[np.ndarray, np.ndarray, Optional[str]]:
+        """Timestamps, OHLCV columns and timezone of the requested bars, filling the entry as needed"""
+        offline = self.offline if offline is None else offline
+        key = self._key(symbol, interval)
+
+        with self._lock_for(key):
+            meta = self._load_meta(key)
+            arrays = self._load_arrays(key, meta) if meta else None
+            if arrays is None:
+                meta = None
+
+            tz = meta['tz'] if meta else None
+            start_ns = self._to_ns(start_date, tz)
+            end_ns = self._to_ns(end_date, tz)
+            missing = self.missing_ranges(meta, start_ns, end_ns)
+
+            if missing and offline:
+                if meta is None:
+                    self._count("misses")
+                    raise ValueError(f"No cached data for {symbol} ({interval}) available in offline mode")
+                missing = []
+
+            if not missing:
+                self._count("hits")
+                os.utime(self._paths(key)[2])
+            else:
+                if meta is None:
+                    self._count("misses")
+                else:
+                    self._count("partial_hits")
+                meta, arrays = self._fill(key, symbol, interval, meta, arrays, missing, fetcher, start_date, end_date)
+                tz = meta['tz']
+                start_ns = self._to_ns(start_date, tz)
+                end_ns = self._to_ns(end_date, tz)
+                self._evict(keep=key)
+                if mapped:
+                    # Trade the merged arrays for a mapping of the files just written
+                    arrays = self._load_arrays(key, meta) or arrays
+
+            timestamps, ohlcv = arrays
+            lo = int(np.searchsorted(timestamps, start_ns, side='left'))
+            hi = int(np.searchsorted(timestamps, end_ns, side='left'))
+            return timestamps[lo:hi], ohlcv[:, lo:hi], tz
+
+    def _fill(
+        self,
+        key: str,
+        symbol: str,
+        interval: str,
+        meta: Optional[Dict[str, Any]],
+        arrays: Optional[Tuple[np.ndarray, np.ndarray]],
+        missing: List[Tuple[int, int]],
+        fetcher: Fetcher,
+        start_date: datetime,
+        end_date: datetime
+    ) -> Tuple[Dict[str, Any], Tuple[np.ndarray, np.ndarray]]:
+        """Fetch missing ranges, merge them into the entry and persist it"""
+        tz = meta['tz'] if meta else None
+        frames = []
+
+        for range_start, range_end in missing:
+            if meta is None:
+                # Fresh entry: fetch with the caller's bounds, the timezone is not known yet
+                fetch_start, fetch_end = start_date, end_date
+            else:
+                fetch_start = self._from_ns(range_start, tz)
+                fetch_end = self._from_ns(range_end, tz)
+            df = fetcher(symbol, fetch_start, fetch_end, interval)
+            if not df.empty:
+                tz = tz or self._frame_tz(df)
+                frames.append(df)
+
+        if meta is None:
+            start_ns = self._to_ns(start_date, tz)
+            end_ns = self._to_ns(end_date, tz)
+        else:
+            start_ns = min(meta['start'], self._to_ns(start_date, tz))
+            end_ns = max(meta['end'], self._to_ns(end_date, tz))
+
+        timestamps, ohlcv = self._merge(arrays, frames)
+
+        # Never mark the future as covered; the latest bar may still be forming
+        now_ns = self._to_ns(pd.Timestamp.now(tz='UTC'), tz)
+        if end_ns > now_ns:
+            end_ns = int(timestamps[-1]) if len(timestamps) else start_ns
+            end_ns = max(end_ns, start_ns)
+
+        meta = {
+            "symbol": symbol,
+            "interval": interval,
+            "tz": tz,
+            "start": int(start_ns),
+            "end": int(end_ns),
+            "rows": int(len(timestamps)),
+            "pinned": bool(meta and meta.get("pinned"))
+        }
+        self._write(key, meta, timestamps, ohlcv)
+        return meta, (timestamps, ohlcv)
+
+    def _merge(
+        self,
+        arrays: Optional[Tuple[np.ndarray, np.ndarray]],
+        frames: List[pd.DataFrame]
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Merge frames into an entry's arrays, later bars replacing earlier ones with the same timestamp"""
+        parts_ts = [arrays[0]] if arrays is not None else []
+        parts_ohlcv = [arrays[1]] if arrays is not None else []
+        for df in frames:
+            timestamps, ohlcv = self._frame_arrays(df)
+            parts_ts.append(timestamps)
+            parts_ohlcv.append(ohlcv)
+
+        if not parts_ts:
+            return np.empty(0, dtype=np.int64), np.empty((len(OHLCV_COLUMNS), 0), dtype=np.float64)
+
+        timestamps = np.concatenate(parts_ts)
+        ohlcv = np.concatenate(parts_ohlcv, axis=1)
+        # Stable sort, keeping the most recently fetched bar for duplicate timestamps
+        order = np.argsort(timestamps, kind='stable')
+        timestamps = timestamps[order]
+        ohlcv = ohlcv[:, order]
+        keep = np.ones(len(timestamps), dtype=bool)
+        keep[:-1] = timestamps[1:] != timestamps[:-1]
+        return timestamps[keep], ohlcv[:, keep]
+
+    def put(
+        self,
+        symbol: str,
+        interval: str,
+        frames: List[pd.DataFrame],
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        pinned: bool = True
+    ) -> Dict[str, Any]:
+        """
+        Merge imported bars into a symbol's entry
+
+        The entry is marked covered from `start_date` (default: the first bar)
+        to `end_date` (default: just after the last bar), merged with what it
+        already covered. Pinned entries are never evicted.
+
+        Returns:
+            The entry's metadata
+        """
+        key = self._key(symbol, interval)
+        frames = [df for df in frames if not df.empty]
+        with self._lock_for(key):
+            meta = self._load_meta(key)
+            arrays = self._load_arrays(key, meta) if meta else None
+            if arrays is None:
+                meta = None
+
+            tz = meta['tz'] if meta else next((self._frame_tz(df) for df in frames), None)
+            if any((self._frame_tz(df) is None) != (tz is None) for df in frames):
+                raise ValueError(f"Cannot mix timezone-aware and naive bars for {symbol} ({interval})")
+
+            timestamps, ohlcv = self._merge(arrays, frames)
+            if not len(timestamps):
+                raise ValueError(f"No bars to import for {symbol} ({interval})")
+
+            start_ns = self._to_ns(start_date, tz) if start_date is not None else int(timestamps[0])
+            end_ns = self._to_ns(end_date, tz) if end_date is not None else int(timestamps[-1]) + 1
+            if meta is not None:
+                start_ns, end_ns = min(start_ns, meta['start']), max(end_ns, meta['end'])
+
+            meta = {
+                "symbol": symbol,
+                "interval": interval,
+                "tz": tz,
+                "start": int(start_ns),
+                "end": int(end_ns),
+                "rows": int(len(timestamps)),
+                "pinned": pinned or bool(meta and meta.get("pinned"))
+            }
+            self._write(key, meta, timestamps, ohlcv)
+            return meta
+
+    @staticmethod
+    def _from_ns(value: int, tz: Optional[str]) -> pd.Timestamp:
+        ts = pd.Timestamp(value)
+        return ts.tz_localize('UTC').tz_convert(tz) if tz else ts
+
+    def _entries(self) -> List[Dict[str, Any]]:
+        """List cached entries with their size, last access time and whether they are pinned"""
+        entries = []
+        if not self.cache_dir.exists():
+            return entries
+        for meta_path in self.cache_dir.glob('*.json'):
+            key = meta_path.name[:-len('.json')]
+            paths = self._paths(key)
+            try:
+                size = sum(path.stat().st_size for path in paths)
+                last_access = meta_path.stat().st_mtime
+            except FileNotFoundError:
+                continue
+            meta = self._load_meta(key) or {}
+            entries.append({"key": key, "bytes": size, "last_access": last_access, "pinned": bool(meta.get("pinned"))})
+        return entries
+
+    def _evict(self, keep: Optional[str] = None):
+        """Remove least recently used entries until the cache fits in max_bytes"""
+        # One eviction pass at a time; a concurrent caller leaves it to the running pass
+        if not self._evict_lock.acquire(blocking=False):
+            return
+        try:
+            # Imported entries have no provider to refetch them from, so they are kept and not counted
+            entries = [entry for entry in self._entries() if not entry['pinned']]
+            total = sum(entry['bytes'] for entry in entries)
+            if total <= self.max_bytes:
+                return
+
+            for entry in sorted(entries, key=lambda e: e['last_access']):
+                if total <= self.max_bytes:
+                    break
+                if entry['key'] == keep:
+                    continue
+                # Entries being read or filled are skipped rather than waited for
+                lock = self._lock_for(entry['key'])
+                if not lock.acquire(blocking=False):
+                    continue
+                try:
+                    self._remove(entry['key'])
+                finally:
+                    lock.release()
+                total -= entry['bytes']
+                self._count("evictions")
+        finally:
+            self._evict_lock.release()
+
+    def _remove(self, key: str):
+        # Metadata first, so a half-removed entry is never treated as valid
+        for path in reversed(self._paths(key)):
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+
+    def invalidate(self, symbol: str, interval: str):
+        """Drop the cached entry for a symbol/interval"""
+        key = self._key(symbol, interval)
+        with self._lock_for(key):
+            self._remove(key)
+
+    def clear(self):
+        """Drop every cached entry"""
+        for entry in self._entries():
+            with self._lock_for(entry['key']):
+                self._remove(entry['key'])
+
+    def covers(self, symbol: str, interval: str, start_date: datetime, end_date: datetime) -> bool:
+        """Whether [start_date, end_date) would be served without fetching"""
+        key = self._key(symbol, interval)
+        with self._lock_for(key):
+            meta = self._load_meta(key)
+            if meta is None:
+                return False
+            start_ns = self._to_ns(start_date, meta['tz'])
+            end_ns = self._to_ns(end_date, meta['tz'])
+            return not self.missing_ranges(meta, start_ns, end_ns)
+
+    def counters(self) -> Dict[str, int]:
+        """Return this process's hit/miss and eviction counters"""
+        with self._lock:
+            return {name: getattr(self, name) for name in COUNTERS}
+
+    def stats(self) -> Dict[str, Any]:
+        """Return this process's counters and the storage usage of the cache directory"""
+        entries = self._entries()
+        return {
+            **self.counters(),
+            "entries": len(entries),
+            "bytes": sum(entry['bytes'] for entry in entries),
+            "pinned_entries": sum(entry['pinned'] for entry in entries),
+            "max_bytes": self.max_bytes,
+            "offline": self.offline
+        }
+
+
+def combine_stats(stats: Dict[str, Any], counters: List[Dict[str, int]]) -> Dict[str, Any]:
+    """
+    Replace the counters in stats() by the sum of several processes' counters()
+
+    Processes share the cache directory, so its storage usage is the same
+    for all of them and is not summed.
+    """
+    totals = {name: sum(process[name] for process in counters) for name in COUNTERS}
+    return {**stats, **totals, "processes": len(counters)}
+
+
+market_data_cache = MarketDataCache(
+    cache_dir=settings.MARKET_DATA_CACHE_DIR,
+    max_bytes=settings.MARKET_DATA_CACHE_MAX_BYTES,
+    offline=settings.MARKET_DATA_OFFLINE
+)
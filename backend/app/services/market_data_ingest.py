@@ -0,0 +1,58 @@
+import logging
+import pandas as pd
+from datetime import datetime
+from typing import Dict, List, Optional
+from app.services.market_data_cache import MarketDataCache, market_data_cache
+from app.services.market_data_providers import LocalFileProvider
+
+logger = logging.getLogger(__name__)
+
+# Bars buffered in memory before they are merged into the store
+DEFAULT_FLUSH_BYTES = 256 * 1024 ** 2
+
+
+def ingest_dump(
+    source: str,
+    interval: str = "1d",
+    symbols: Optional[List[str]] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    tz: Optional[str] = None,
+    flush_bytes: int = DEFAULT_FLUSH_BYTES,
+    cache: Optional[MarketDataCache] = None
+) -> Dict[str, int]:
+    """
+    Convert a bulk vendor dump into pinned market data cache entries
+
+    The dump is scanned in chunks (see LocalFileProvider for the layouts).
+    Bars are buffered per symbol and merged into the store whenever the
+    buffer reaches `flush_bytes`, so dumps larger than memory can be
+    imported. `start_date`/`end_date` declare the range the dump covers;
+    by default each symbol covers its first to last bar.
+
+    Returns:
+        Symbol -> bars stored for it
+    """
+    cache = cache or market_data_cache
+    provider = LocalFileProvider(source, tz=tz)
+    pending: Dict[str, List[pd.DataFrame]] = {}
+    pending_bytes = 0
+    stored: Dict[str, int] = {}
+
+    def flush():
+        nonlocal pending_bytes
+        for symbol, frames in pending.items():
+            meta = cache.put(symbol, interval, frames, start_date, end_date)
+            stored[symbol] = meta['rows']
+        logger.info("Stored %d symbols (%d total)", len(pending), len(stored))
+        pending.clear()
+        pending_bytes = 0
+
+    for symbol, piece in provider.scan(interval, symbols):
+        pending.setdefault(symbol, []).append(piece)
+        pending_bytes += int(piece.memory_usage(index=True).sum())
+        if pending_bytes >= flush_bytes:
+            flush()
+    if pending:
+        flush()
+    return stored
@@ -0,0 +1,497 @@
+import re
+import threading
+from abc import ABC, abstractmethod
+import numpy as np
+import pandas as pd
+import requests
+import yfinance as yf
+from datetime import datetime
+from pathlib import Path
+from requests.adapters import HTTPAdapter
+from typing import Callable, Dict, FrozenSet, Iterator, List, Optional, Tuple
+from app.core.config import settings
+from app.services.market_data_cache import OHLCV_COLUMNS
+
+try:
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet dumps need pyarrow
+    pq = None
+
+# Rows per chunk when scanning CSV and Parquet dumps
+DUMP_CHUNK_ROWS = 1_000_000
+
+DUMP_SUFFIXES = ('.csv', '.csv.gz', '.parquet')
+
+# Vendor column names, compared lowercase with spaces, dashes and underscores removed
+COLUMN_ALIASES = {
+    'timestamp': ('timestamp', 'datetime', 'date', 'time', 'ts', 't'),
+    'symbol': ('symbol', 'ticker', 'sym'),
+    'open': ('open', 'o'),
+    'high': ('high', 'h'),
+    'low': ('low', 'l'),
+    'close': ('close', 'c'),
+    'volume': ('volume', 'vol', 'v'),
+}
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+
+def http_session() -> requests.Session:
+    """HTTP session shared by every provider request, pooling connections per host"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=settings.MARKET_DATA_MAX_CONCURRENCY)
+            _session = requests.Session()
+            _session.mount("https://", adapter)
+            _session.mount("http://", adapter)
+        return _session
+
+
+def empty_frame() -> pd.DataFrame:
+    return pd.DataFrame(
+        {column: pd.Series(dtype='float64') for column in OHLCV_COLUMNS},
+        index=pd.DatetimeIndex([], name='timestamp')
+    )
+
+
+def _normalize(df: pd.DataFrame) -> pd.DataFrame:
+    """Provider frame as lowercase float64 OHLCV columns indexed by timestamp"""
+    df = df.rename(columns=str.lower)[OHLCV_COLUMNS].astype('float64')
+    df.index.name = 'timestamp'
+    return df
+
+
+def slice_frame(df: pd.DataFrame, start_date: datetime, end_date: datetime) -> pd.DataFrame:
+    """Bars of a frame in [start_date, end_date), with naive bounds taken in the frame's timezone"""
+    tz = getattr(df.index, 'tz', None)
+    bounds = []
+    for value in (start_date, end_date):
+        ts = pd.Timestamp(value)
+        if tz is not None:
+            ts = ts.tz_localize(tz) if ts.tzinfo is None else ts.tz_convert(tz)
+        elif ts.tzinfo is not None:
+            ts = ts.tz_convert('UTC').tz_localize(None)
+        bounds.append(ts)
+    return df[(df.index >= bounds[0]) & (df.index < bounds[1])]
+
+
+class MarketDataProvider(ABC):
+    """Source of historical OHLCV bars"""
+
+    name = "provider"
+    remote = True  # Needs the network, so unavailable in offline mode
+    supports_batch = False  # download_many is cheaper than one download per symbol
+
+    @abstractmethod
+    def download(self, symbol: str, start_date: datetime, end_date: datetime, interval: str = "1d") -> pd.DataFrame:
+        """Bars in [start_date, end_date) as lowercase float64 OHLCV columns indexed by timestamp"""
+
+    def download_many(
+        self,
+        symbols: List[str],
+        start_date: datetime,
+        end_date: datetime,
+        interval: str = "1d"
+    ) -> Dict[str, pd.DataFrame]:
+        """Bars of several symbols; symbols without data may be left out"""
+        return {symbol: self.download(symbol, start_date, end_date, interval) for symbol in symbols}
+
+    def latest_price(self, symbol: str) -> float:
+        """Close of the most recent bar"""
+        end_date = datetime.utcnow()
+        df = self.download(symbol, end_date - pd.Timedelta(days=7), end_date, "1d")
+        if df.empty:
+            raise ValueError(f"No data found for symbol {symbol}")
+        return float(df['close'].iloc[-1])
+
+
+class YFinanceProvider(MarketDataProvider):
+    """Yahoo Finance through yfinance"""
+
+    name = "yfinance"
+    supports_batch = True
+
+    def download(self, symbol: str, start_date: datetime, end_date: datetime, interval: str = "1d") -> pd.DataFrame:
+        df = yf.Ticker(symbol, session=http_session()).history(start=start_date, end=end_date, interval=interval)
+        return empty_frame() if df.empty else _normalize(df)
+
+    def download_many(
+        self,
+        symbols: List[str],
+        start_date: datetime,
+        end_date: datetime,
+        interval: str = "1d"
+    ) -> Dict[str, pd.DataFrame]:
+        # Same bars as Ticker.history: adjusted prices in exchange time
+        df = yf.download(
+            symbols,
+            start=start_date,
+            end=end_date,
+            interval=interval,
+            group_by='ticker',
+            auto_adjust=True,
+            ignore_tz=False,
+            threads=settings.MARKET_DATA_MAX_CONCURRENCY,
+            progress=False,
+            session=http_session()
+        )
+        if df is None or df.empty:
+            return {}
+        if not isinstance(df.columns, pd.MultiIndex):
+            return {symbols[0]: _normalize(df)}
+        # Rows are the union of every symbol's dates; a symbol's missing dates are all NaN
+        available = set(df.columns.get_level_values(0))
+        return {symbol: _normalize(df[symbol].dropna(how='all')) for symbol in symbols if symbol in available}
+
+    def latest_price(self, symbol: str) -> float:
+        data = yf.Ticker(symbol, session=http_session()).history(period="1d")
+        if data.empty:
+            raise ValueError(f"No data found for symbol {symbol}")
+        return float(data['Close'].iloc[-1])
+
+
+class AlphaVantageProvider(MarketDataProvider):
+    """Alpha Vantage time series; intraday history is limited to what the API serves"""
+
+    name = "alpha_vantage"
+    INTRADAY = {"1m": "1min", "5m": "5min", "15m": "15min", "30m": "30min", "1h": "60min", "60m": "60min"}
+
+    def __init__(self, api_key: Optional[str] = None):
+        self.api_key = api_key or settings.ALPHA_VANTAGE_API_KEY
+        if not self.api_key:
+            raise ValueError("ALPHA_VANTAGE_API_KEY is not configured")
+
+    def download(self, symbol: str, start_date: datetime, end_date: datetime, interval: str = "1d") -> pd.DataFrame:
+        from alpha_vantage.timeseries import TimeSeries
+
+        series = TimeSeries(key=self.api_key, output_format='pandas')
+        if interval in self.INTRADAY:
+            df, _ = series.get_intraday(symbol, interval=self.INTRADAY[interval], outputsize='full')
+        elif interval == "1d":
+            df, _ = series.get_daily(symbol, outputsize='full')
+        elif interval == "1wk":
+            df, _ = series.get_weekly(symbol)
+        elif interval == "1mo":
+            df, _ = series.get_monthly(symbol)
+        else:
+            raise ValueError(f"Interval {interval} is not supported by Alpha Vantage")
+
+        if df.empty:
+            return empty_frame()
+        # Columns come as "1. open", "2. high", ...; timestamps are US/Eastern
+        df = df.rename(columns=lambda name: name.split('. ', 1)[-1]).sort_index()
+        df.index = pd.DatetimeIndex(df.index).tz_localize('America/New_York')
+        return slice_frame(_normalize(df), start_date, end_date)
+
+
+class PolygonProvider(MarketDataProvider):
+    """Polygon.io aggregate bars"""
+
+    name = "polygon"
+    BASE_URL = "https://api.polygon.io"
+    TIMESPANS = {
+        "1m": (1, "minute"), "5m": (5, "minute"), "15m": (15, "minute"), "30m": (30, "minute"),
+        "1h": (1, "hour"), "60m": (1, "hour"), "1d": (1, "day"), "1wk": (1, "week"), "1mo": (1, "month"),
+    }
+
+    def __init__(self, api_key: Optional[str] = None):
+        self.api_key = api_key or settings.POLYGON_API_KEY
+        if not self.api_key:
+            raise ValueError("POLYGON_API_KEY is not configured")
+
+    def download(self, symbol: str, start_date: datetime, end_date: datetime, interval: str = "1d") -> pd.DataFrame:
+        if interval not in self.TIMESPANS:
+            raise ValueError(f"Interval {interval} is not supported by Polygon")
+        multiplier, timespan = self.TIMESPANS[interval]
+
+        # Millisecond bounds, inclusive on both ends; naive dates are taken as UTC
+        start_ms, end_ms = (
+            (ts if ts.tzinfo else ts.tz_localize('UTC')).value // 10 ** 6
+            for ts in (pd.Timestamp(start_date), pd.Timestamp(end_date))
+        )
+        url = f"{self.BASE_URL}/v2/aggs/ticker/{symbol.upper()}/range/{multiplier}/{timespan}/{start_ms}/{end_ms - 1}"
+        params = {"adjusted": "true", "sort": "asc", "limit": 50000, "apiKey": self.api_key}
+
+        results = []
+        while url:
+            response = http_session().get(url, params=params, timeout=30)
+            response.raise_for_status()
+            payload = response.json()
+            results.extend(payload.get("results") or [])
+            # Further pages carry their own query except for the key
+            url = payload.get("next_url")
+            params = {"apiKey": self.api_key}
+
+        if not results:
+            return empty_frame()
+        df = pd.DataFrame(results)
+        df.index = pd.to_datetime(df['t'], unit='ms', utc=True)
+        df = df.rename(columns={'o': 'open', 'h': 'high', 'l': 'low', 'c': 'close', 'v': 'volume'})
+        return _normalize(df)
+
+
+def _canonical(name: str) -> str:
+    return re.sub(r'[\s_\-]', '', str(name).lower())
+
+
+def _column_map(columns: List[str]) -> Dict[str, str]:
+    """Map vendor column names to timestamp/symbol/OHLCV names"""
+    by_canonical = {_canonical(column): column for column in columns}
+    mapping = {}
+    for target, aliases in COLUMN_ALIASES.items():
+        for alias in aliases:
+            if alias in by_canonical:
+                mapping[by_canonical[alias]] = target
+                break
+    missing = [name for name in ('timestamp', 'open', 'high', 'low', 'close') if name not in mapping.values()]
+    if missing:
+        raise ValueError(f"Dump has no {', '.join(missing)} column (columns: {', '.join(map(str, columns))})")
+    return mapping
+
+
+def _parse_timestamps(values: pd.Series, tz: Optional[str]) -> pd.DatetimeIndex:
+    if pd.api.types.is_numeric_dtype(values):
+        # Epoch timestamps; the unit follows from the magnitude
+        magnitude = float(np.nanmax(np.abs(values.to_numpy(dtype=np.float64)))) if len(values) else 0.0
+        unit = 'ns' if magnitude > 1e17 else 'us' if magnitude > 1e14 else 'ms' if magnitude > 1e11 else 's'
+        index = pd.DatetimeIndex(pd.to_datetime(values, unit=unit, utc=True))
+    else:
+        try:
+            index = pd.DatetimeIndex(pd.to_datetime(values, format='ISO8601'))
+        except (ValueError, TypeError):
+            # Mixed UTC offsets
+            index = pd.DatetimeIndex(pd.to_datetime(values, format='ISO8601', utc=True))
+    if tz:
+        index = index.tz_localize(tz) if index.tz is None else index.tz_convert(tz)
+    return index
+
+
+def _dump_frame(chunk: pd.DataFrame, mapping: Dict[str, str], tz: Optional[str]) -> pd.DataFrame:
+    chunk = chunk.rename(columns=mapping)
+    index = _parse_timestamps(chunk['timestamp'], tz)
+    data = {
+        column: chunk[column].to_numpy(dtype=np.float64) if column in chunk else np.zeros(len(chunk))
+        for column in OHLCV_COLUMNS
+    }
+    if 'symbol' in chunk:
+        data['symbol'] = chunk['symbol'].astype(str).str.upper().to_numpy()
+    return pd.DataFrame(data, index=index.rename('timestamp'))
+
+
+def dump_columns(path: Path) -> List[str]:
+    """Column names of a CSV or Parquet dump, from its header or schema"""
+    if path.name.lower().endswith('.parquet'):
+        if pq is None:
+            raise ValueError(f"Reading {path.name} requires pyarrow")
+        return pq.read_schema(path, memory_map=True).names
+    return list(pd.read_csv(path, nrows=0).columns)
+
+
+def dump_symbols(path: Path) -> FrozenSet[str]:
+    """Uppercase symbols of a multi-symbol dump, reading only its symbol column; empty without one"""
+    column = next((name for name, target in _column_map(dump_columns(path)).items() if target == 'symbol'), None)
+    if column is None:
+        return frozenset()
+
+    if path.name.lower().endswith('.parquet'):
+        batches = pq.ParquetFile(path, memory_map=True).iter_batches(batch_size=DUMP_CHUNK_ROWS, columns=[column])
+        values = (batch.column(0).to_pandas() for batch in batches)
+    else:
+        chunks = pd.read_csv(
+            path, usecols=[column], chunksize=DUMP_CHUNK_ROWS, memory_map=not path.name.lower().endswith('.gz')
+        )
+        values = (chunk[column] for chunk in chunks)
+    symbols = set()
+    for series in values:
+        symbols.update(series.astype(str).str.upper().unique())
+    return frozenset(symbols)
+
+
+def read_dump(path: Path, symbol: Optional[str] = None, tz: Optional[str] = None) -> Iterator[pd.DataFrame]:
+    """
+    Read a CSV or Parquet dump file in chunks
+
+    Files are read DUMP_CHUNK_ROWS rows at a time (Parquet files in record
+    batches of the memory-mapped file), so files larger than memory can be
+    scanned. Chunks have OHLCV columns (volume 0 when the dump has none)
+    and, for multi-symbol files, an uppercase symbol column. With `symbol`,
+    only its rows are kept.
+    """
+    name = path.name.lower()
+    mapping = _column_map(dump_columns(path))
+    if name.endswith('.parquet'):
+        batches = pq.ParquetFile(path, memory_map=True).iter_batches(batch_size=DUMP_CHUNK_ROWS, columns=list(mapping))
+        chunks = (batch.to_pandas() for batch in batches)
+    else:
+        # memory_map only applies to uncompressed files
+        chunks = pd.read_csv(
+            path, usecols=list(mapping), chunksize=DUMP_CHUNK_ROWS, memory_map=not name.endswith('.gz')
+        )
+
+    for chunk in chunks:
+        frame = _dump_frame(chunk, mapping, tz)
+        if symbol and 'symbol' in frame:
+            frame = frame[frame['symbol'] == symbol.upper()]
+        if not frame.empty:
+            yield frame
+
+
+def _finalize(frames: List[pd.DataFrame]) -> pd.DataFrame:
+    """Concatenate dump chunks into one sorted frame, keeping the last row for duplicate timestamps"""
+    if not frames:
+        return empty_frame()
+    df = pd.concat(frames)[OHLCV_COLUMNS]
+    df = df[~df.index.duplicated(keep='last')].sort_index(kind='stable')
+    df.index.name = 'timestamp'
+    return df
+
+
+# Dates in partition paths: 2020-01-02, 20200102, date=2020-01-02 or year=2020/month=01/day=02
+_PARTITION_DATE = re.compile(r'(?<!\d)(\d{4})-?(\d{2})-?(\d{2})(?!\d)')
+_HIVE_DATE = re.compile(r'year=(\d{4}).*month=(\d{1,2}).*day=(\d{1,2})')
+
+
+def partition_date(relative_path: str) -> Optional[pd.Timestamp]:
+    """Date a date-partitioned dump file holds, if its path names one"""
+    match = _HIVE_DATE.search(relative_path) or _PARTITION_DATE.search(relative_path)
+    if not match:
+        return None
+    try:
+        return pd.Timestamp(int(match.group(1)), int(match.group(2)), int(match.group(3)))
+    except ValueError:
+        return None
+
+
+class LocalFileProvider(MarketDataProvider):
+    """
+    Bars read from bulk vendor dumps under a directory, without network access
+
+    Two layouts are recognised, each either directly under the root or in a
+    per-interval subdirectory (`<root>/1d/...`), which takes precedence:
+
+        one file per symbol    <root>/AAPL.csv, <root>/AAPL.parquet
+        partitioned by date    <root>/2020-01-02.csv, <root>/date=2020-01-02/part-0.parquet, ...
+                               with a symbol column in each file
+
+    Date partitions outside the requested range are skipped by path, and
+    files that do not hold the symbol by their symbol column (see
+    `file_symbols`).
+    """
+
+    name = "local"
+    remote = False
+
+    def __init__(self, root: Optional[str] = None, tz: Optional[str] = None):
+        self.root = Path(root or settings.MARKET_DATA_LOCAL_DIR)
+        self.tz = tz if tz is not None else (settings.MARKET_DATA_LOCAL_TIMEZONE or None)  # For naive timestamps
+        self._file_symbols: Dict[Path, Tuple[Tuple[int, int], FrozenSet[str]]] = {}  # Path -> (mtime and size, symbols)
+        self._lock = threading.Lock()
+
+    def directory(self, interval: str) -> Path:
+        interval_dir = self.root / interval
+        return interval_dir if interval_dir.is_dir() else self.root
+
+    def _files(self, directory: Path) -> List[Path]:
+        return sorted(
+            path for path in directory.rglob('*')
+            if path.is_file() and path.name.lower().endswith(DUMP_SUFFIXES)
+        )
+
+    def symbol_file(self, symbol: str, interval: str) -> Optional[Path]:
+        directory = self.directory(interval)
+        for name in dict.fromkeys((symbol, symbol.upper())):
+            for suffix in DUMP_SUFFIXES:
+                path = directory / f"{name}{suffix}"
+                if path.is_file():
+                    return path
+        return None
+
+    def partition_files(
+        self,
+        interval: str,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None
+    ) -> List[Path]:
+        """Files of a date-partitioned dump, pruned to the partitions that can hold the range"""
+        directory = self.directory(interval)
+        start_day = pd.Timestamp(start_date).tz_localize(None).normalize() if start_date is not None else None
+        end_day = pd.Timestamp(end_date).tz_localize(None) if end_date is not None else None
+        files = []
+        for path in self._files(directory):
+            day = partition_date(str(path.relative_to(directory)))
+            if day is not None and ((start_day is not None and day < start_day) or (end_day is not None and day >= end_day)):
+                continue
+            files.append(path)
+        return files
+
+    def file_symbols(self, path: Path) -> FrozenSet[str]:
+        """
+        Symbols a dump file holds, empty for files without a symbol column
+
+        Files without one belong to other symbols of a one-file-per-symbol
+        dump. The symbols are remembered until the file changes, so later
+        downloads skip files of other symbols without opening them.
+        """
+        stat = path.stat()
+        version = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            cached = self._file_symbols.get(path)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        symbols = dump_symbols(path)
+        with self._lock:
+            self._file_symbols[path] = (version, symbols)
+        return symbols
+
+    def download(self, symbol: str, start_date: datetime, end_date: datetime, interval: str = "1d") -> pd.DataFrame:
+        path = self.symbol_file(symbol, interval)
+        if path is not None:
+            chunks = read_dump(path, tz=self.tz)
+        else:
+            chunks = (
+                chunk
+                for file in self.partition_files(interval, start_date, end_date)
+                if symbol.upper() in self.file_symbols(file)
+                for chunk in read_dump(file, symbol=symbol, tz=self.tz)
+            )
+        return _finalize([slice_frame(chunk, start_date, end_date) for chunk in chunks])
+
+    def scan(self, interval: str, symbols: Optional[List[str]] = None) -> Iterator[Tuple[str, pd.DataFrame]]:
+        """
+        Every (symbol, bars) piece of the dump, for bulk ingestion
+
+        A symbol may be yielded several times when its bars are spread over
+        partitions; pieces are not sorted against each other.
+        """
+        wanted = {symbol.upper() for symbol in symbols} if symbols else None
+        for path in self._files(self.directory(interval)):
+            for chunk in read_dump(path, tz=self.tz):
+                if 'symbol' not in chunk:
+                    # One file per symbol, named after it
+                    symbol = path.name.split('.', 1)[0].upper()
+                    if wanted is None or symbol in wanted:
+                        yield symbol, chunk[OHLCV_COLUMNS]
+                    continue
+                for symbol, piece in chunk.groupby('symbol', sort=False):
+                    if wanted is None or symbol in wanted:
+                        yield symbol, piece[OHLCV_COLUMNS]
+
+
+# Provider name -> factory
+PROVIDERS: Dict[str, Callable[[], MarketDataProvider]] = {
+    "yfinance": YFinanceProvider,
+    "alpha_vantage": AlphaVantageProvider,
+    "polygon": PolygonProvider,
+    "local": LocalFileProvider,
+}
+
+
+def get_provider(name: Optional[str] = None) -> MarketDataProvider:
+    """Build the named provider, by default the configured MARKET_DATA_PROVIDER"""
+    name = name or settings.MARKET_DATA_PROVIDER
+    factory = PROVIDERS.get(name)
+    if factory is None:
+        raise ValueError(f"Unknown market data provider: {name} (available: {', '.join(PROVIDERS)})")
+    return factory()
@@ -1,79 +1,370 @@
-import yfinance as yf
+import asyncio
+import functools
+import logging
+import weakref
 import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import List, Dict
+from typing import Callable, Iterator, List, Dict, Optional, Tuple
+from app.core.config import settings
 from app.schemas.schemas import OHLCVData
+from app.services.market_data_cache import market_data_cache, OHLCV_COLUMNS, Fetcher
+from app.services.market_data_providers import MarketDataProvider, get_provider, slice_frame
+
+logger = logging.getLogger(__name__)
+
 
 class MarketDataService:
     """Service to fetch historical market data from various sources"""
     
-    def __init__(self):
-        self.source = "yfinance"  # Default to Yahoo Finance
+    def __init__(self, provider: Optional[MarketDataProvider] = None):
+        self.provider = provider or get_provider()  # MARKET_DATA_PROVIDER by default
+        self.source = self.provider.name
+        self.cache = market_data_cache if settings.MARKET_DATA_CACHE_ENABLED else None
     
-    def fetch_data(
-        self, 
-        symbol: str, 
-        start_date: datetime, 
-        end_date: datetime, 
+    def _download(
+        self,
+        symbol: str,
+        start_date: datetime,
+        end_date: datetime,
         interval: str = "1d"
-    ) -> List[Dict]:
+    ) -> pd.DataFrame:
+        """Download OHLCV bars from the provider as a frame with lowercase float64 columns"""
+        if settings.MARKET_DATA_OFFLINE and self.provider.remote:
+            raise ValueError(f"Market data for {symbol} is not cached and offline mode is enabled")
+        return self.provider.download(symbol, start_date, end_date, interval)
+    
+    def _prefetched_download(self, prefetched: pd.DataFrame) -> Fetcher:
+        # Ranges the cache asks for lie within the batch request, so they are cut from its frame
+        return lambda symbol, start_date, end_date, interval: slice_frame(prefetched, start_date, end_date)
+    
+    def _load(
+        self,
+        symbol: str,
+        start_date: datetime,
+        end_date: datetime,
+        interval: str,
+        allow_empty: bool,
+        prefetched: Optional[pd.DataFrame] = None
+    ) -> pd.DataFrame:
+        try:
+            download = self._download if prefetched is None else self._prefetched_download(prefetched)
+            # Serve from the local cache, fetching only missing ranges from the provider
+            if self.cache is not None:
+                offline = self.cache.offline and self.provider.remote
+                df = self.cache.get(symbol, interval, start_date, end_date, download, offline=offline)
+            else:
+                df = download(symbol, start_date, end_date, interval)
+            
+            if df.empty and not allow_empty:
+                raise ValueError(f"No data found for symbol {symbol}")
+            
+            return df
+        
+        except Exception as e:
+            raise Exception(f"Error fetching market data: {str(e)}")
+    
+    def fetch_frame(
+        self,
+        symbol: str,
+        start_date: datetime,
+        end_date: datetime,
+        interval: str = "1d",
+        allow_empty: bool = False
+    ) -> pd.DataFrame:
         """
-        Fetch historical OHLCV data for a given symbol
+        Fetch historical OHLCV data for a given symbol as a DataFrame
         
         Args:
             symbol: Trading symbol (e.g., AAPL, BTC-USD)
             start_date: Start date for historical data
             end_date: End date for historical data
             interval: Data interval (1d, 1h, 5m, etc.)
+            allow_empty: Return an empty frame instead of raising when there are no bars
         
         Returns:
-            List of OHLCV data points
+            DataFrame indexed by timestamp with contiguous float64
+            open/high/low/close/volume columns
+        """
+        return self._load(symbol, start_date, end_date, interval, allow_empty)
+    
+    def iter_frames(
+        self,
+        symbol: str,
+        start_date: datetime,
+        end_date: datetime,
+        interval: str = "1d",
+        rows: int = 100_000
+    ) -> Iterator[pd.DataFrame]:
+        """
+        Fetch historical OHLCV data as consecutive frames of at most `rows` bars
+        
+        Bars are read from the memory-mapped cache entry one frame at a time,
+        so long histories are never loaded whole; without the cache they are
+        downloaded at once and sliced.
         """
         try:
-            # Fetch data using yfinance
-            ticker = yf.Ticker(symbol)
-            df = ticker.history(
-                start=start_date,
-                end=end_date,
-                interval=interval
-            )
-            
-            if df.empty:
+            if self.cache is not None:
+                offline = self.cache.offline and self.provider.remote
+                frames = self.cache.iter_frames(symbol, interval, start_date, end_date, self._download, rows, offline=offline)
+            else:
+                df = self._download(symbol, start_date, end_date, interval)
+                frames = (df.iloc[lo:lo + rows] for lo in range(0, len(df), rows))
+            first = next(frames, None)
+            if first is None:
                 raise ValueError(f"No data found for symbol {symbol}")
-            
-            # Convert to list of dictionaries
-            data = []
-            for index, row in df.iterrows():
-                data.append({
-                    "timestamp": index.to_pydatetime(),
-                    "open": float(row['Open']),
-                    "high": float(row['High']),
-                    "low": float(row['Low']),
-                    "close": float(row['Close']),
-                    "volume": float(row['Volume'])
-                })
-            
-            return data
-        
         except Exception as e:
             raise Exception(f"Error fetching market data: {str(e)}")
+        
+        yield first
+        yield from frames
+    
+    def fetch_frames(
+        self,
+        symbols: List[str],
+        start_date: datetime,
+        end_date: datetime,
+        interval: str = "1d"
+    ) -> Tuple[Dict[str, pd.DataFrame], Dict[str, str]]:
+        """
+        Fetch OHLCV frames for several symbols
+        
+        Symbols the cache cannot serve are downloaded in one batched provider
+        request; if that request fails they are downloaded one at a time.
+        
+        Returns:
+            Frames of the symbols with data, and the error of each symbol without
+        """
+        symbols = list(dict.fromkeys(symbols))
+        prefetched: Dict[str, pd.DataFrame] = {}
+        if self.provider.supports_batch and not (settings.MARKET_DATA_OFFLINE and self.provider.remote):
+            pending = [
+                symbol for symbol in symbols
+                if self.cache is None or not self.cache.covers(symbol, interval, start_date, end_date)
+            ]
+            if len(pending) > 1:
+                try:
+                    prefetched = self.provider.download_many(pending, start_date, end_date, interval)
+                except Exception:
+                    logger.warning("Batched download of %d symbols failed", len(pending), exc_info=True)
+        
+        frames: Dict[str, pd.DataFrame] = {}
+        errors: Dict[str, str] = {}
+        for symbol in symbols:
+            try:
+                frames[symbol] = self._load(symbol, start_date, end_date, interval, False, prefetched.get(symbol))
+            except Exception as e:
+                errors[symbol] = str(e)
+        return frames, errors
+    
+    @staticmethod
+    def frame_to_records(df: pd.DataFrame) -> List[Dict]:
+        """Convert an OHLCV frame into the list-of-dicts shape served by the /market-data endpoint"""
+        columns = [df[column].tolist() for column in OHLCV_COLUMNS]
+        return [
+            {
+                "timestamp": timestamp,
+                "open": open_,
+                "high": high,
+                "low": low,
+                "close": close,
+                "volume": volume
+            }
+            for timestamp, open_, high, low, close, volume in zip(df.index.to_pydatetime(), *columns)
+        ]
+    
+    def fetch_data(
+        self,
+        symbol: str,
+        start_date: datetime,
+        end_date: datetime,
+        interval: str = "1d"
+    ) -> List[Dict]:
+        """
+        Fetch historical OHLCV data for a given symbol
+        
+        Args:
+            symbol: Trading symbol (e.g., AAPL, BTC-USD)
+            start_date: Start date for historical data
+            end_date: End date for historical data
+            interval: Data interval (1d, 1h, 5m, etc.)
+        
+        Returns:
+            List of OHLCV data points
+        """
+        df = self.fetch_frame(symbol, start_date, end_date, interval)
+        return self.frame_to_records(df)
     
     def fetch_latest_price(self, symbol: str) -> float:
         """Fetch the latest price for a symbol"""
         try:
-            ticker = yf.Ticker(symbol)
-            data = ticker.history(period="1d")
-            if data.empty:
-                raise ValueError(f"No data found for symbol {symbol}")
-            return float(data['Close'].iloc[-1])
+            return self.provider.latest_price(symbol)
         except Exception as e:
             raise Exception(f"Error fetching latest price: {str(e)}")
     
     def validate_symbol(self, symbol: str) -> bool:
         """Validate if a symbol exists"""
         try:
-            ticker = yf.Ticker(symbol)
-            data = ticker.history(period="1d")
-            return not data.empty
+            self.provider.latest_price(symbol)
+            return True
         except:
             return False
+
+
+class AsyncMarketDataService:
+    """
+    asyncio front end of MarketDataService for request handlers
+    
+    Provider and cache I/O is blocking, so it runs on a thread pool of
+    MARKET_DATA_MAX_CONCURRENCY threads sharing one pooled HTTP session,
+    which also bounds concurrent upstream requests. Concurrent requests for
+    the same symbol, interval and range share a single fetch.
+    """
+    
+    def __init__(self, service: Optional[MarketDataService] = None, max_concurrency: Optional[int] = None):
+        self.service = service or MarketDataService()
+        self.max_concurrency = max_concurrency or settings.MARKET_DATA_MAX_CONCURRENCY
+        self._executor = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="market-data")
+        # In-flight fetches per event loop: key -> task resolving to (frame or None, error or None)
+        self._inflight: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[Tuple, asyncio.Task]]" = (
+            weakref.WeakKeyDictionary()
+        )
+        self.coalesced = 0  # Requests served by a fetch another request started
+    
+    @staticmethod
+    def _key(symbol: str, start_date: datetime, end_date: datetime, interval: str) -> Tuple:
+        return (symbol.upper(), interval, start_date.isoformat(), end_date.isoformat())
+    
+    def _run(self, func: Callable, *args):
+        return asyncio.get_running_loop().run_in_executor(self._executor, functools.partial(func, *args))
+    
+    def _register(self, key: Tuple, coroutine) -> asyncio.Task:
+        inflight = self._inflight.setdefault(asyncio.get_running_loop(), {})
+        task = asyncio.ensure_future(coroutine)
+        inflight[key] = task
+        
+        def done(finished: asyncio.Task):
+            if inflight.get(key) is finished:
+                del inflight[key]
+            if not finished.cancelled():
+                finished.exception()  # Retrieved here in case every waiter went away
+        
+        task.add_done_callback(done)
+        return task
+    
+    def _joinable(self, key: Tuple) -> Optional[asyncio.Task]:
+        task = self._inflight.get(asyncio.get_running_loop(), {}).get(key)
+        if task is not None:
+            self.coalesced += 1
+        return task
+    
+    async def _fetch_one(self, symbol: str, start_date: datetime, end_date: datetime, interval: str):
+        try:
+            return await self._run(self.service.fetch_frame, symbol, start_date, end_date, interval, True), None
+        except Exception as e:
+            return None, str(e)
+    
+    def _load_records(self, symbol: str, start_date: datetime, end_date: datetime, interval: str) -> List[Dict]:
+        return MarketDataService.frame_to_records(self.service.fetch_frame(symbol, start_date, end_date, interval))
+    
+    async def _fetch_records(self, symbol: str, start_date: datetime, end_date: datetime, interval: str):
+        try:
+            return await self._run(self._load_records, symbol, start_date, end_date, interval), None
+        except Exception as e:
+            return None, str(e)
+    
+    @staticmethod
+    def _frames_to_records(frames: Dict[str, pd.DataFrame]) -> Dict[str, List[Dict]]:
+        return {symbol: MarketDataService.frame_to_records(df) for symbol, df in frames.items()}
+    
+    @staticmethod
+    async def _pick(batch: asyncio.Future, symbol: str):
+        frames, errors = await batch
+        if symbol in frames:
+            return frames[symbol], None
+        return None, errors.get(symbol, f"Error fetching market data: No data found for symbol {symbol}")
+    
+    async def fetch_frame(
+        self,
+        symbol: str,
+        start_date: datetime,
+        end_date: datetime,
+        interval: str = "1d",
+        allow_empty: bool = False
+    ) -> pd.DataFrame:
+        """Async MarketDataService.fetch_frame; the returned frame may be shared, so copy before mutating"""
+        key = self._key(symbol, start_date, end_date, interval)
+        task = self._joinable(key) or self._register(key, self._fetch_one(symbol, start_date, end_date, interval))
+        # Shielded so a disconnecting client never cancels a fetch other requests wait on
+        df, error = await asyncio.shield(task)
+        if error is not None:
+            raise Exception(error)
+        if df.empty and not allow_empty:
+            raise Exception(f"Error fetching market data: No data found for symbol {symbol}")
+        return df
+    
+    async def fetch_frames(
+        self,
+        symbols: List[str],
+        start_date: datetime,
+        end_date: datetime,
+        interval: str = "1d"
+    ) -> Tuple[Dict[str, pd.DataFrame], Dict[str, str]]:
+        """Async MarketDataService.fetch_frames, joining fetches already in flight"""
+        symbols = list(dict.fromkeys(symbols))
+        tasks: Dict[str, asyncio.Task] = {}
+        pending = []
+        for symbol in symbols:
+            task = self._joinable(self._key(symbol, start_date, end_date, interval))
+            if task is not None:
+                tasks[symbol] = task
+            else:
+                pending.append(symbol)
+        
+        if pending:
+            batch = asyncio.ensure_future(self._run(self.service.fetch_frames, pending, start_date, end_date, interval))
+            for symbol in pending:
+                tasks[symbol] = self._register(self._key(symbol, start_date, end_date, interval), self._pick(batch, symbol))
+        
+        frames: Dict[str, pd.DataFrame] = {}
+        errors: Dict[str, str] = {}
+        for symbol, (df, error) in zip(tasks, await asyncio.shield(asyncio.gather(*tasks.values()))):
+            if error is None and not df.empty:
+                frames[symbol] = df
+            else:
+                errors[symbol] = error or f"Error fetching market data: No data found for symbol {symbol}"
+        return frames, errors
+    
+    async def fetch_data(
+        self,
+        symbol: str,
+        start_date: datetime,
+        end_date: datetime,
+        interval: str = "1d"
+    ) -> List[Dict]:
+        """
+        Async MarketDataService.fetch_data; the returned records may be shared
+        
+        Records are converted in the same thread pool call that fetches the
+        bars, so large ranges never block the event loop.
+        """
+        key = ("records",) + self._key(symbol, start_date, end_date, interval)
+        task = self._joinable(key) or self._register(key, self._fetch_records(symbol, start_date, end_date, interval))
+        records, error = await asyncio.shield(task)
+        if error is not None:
+            raise Exception(error)
+        return records
+    
+    async def fetch_data_batch(
+        self,
+        symbols: List[str],
+        start_date: datetime,
+        end_date: datetime,
+        interval: str = "1d"
+    ) -> Tuple[Dict[str, List[Dict]], Dict[str, str]]:
+        """Async fetch_frames with every frame converted to records on the thread pool"""
+        frames, errors = await self.fetch_frames(symbols, start_date, end_date, interval)
+        return await self._run(self._frames_to_records, frames), errors
+
+
+async_market_data_service = AsyncMarketDataService()
@@ -0,0 +1,116 @@
+import math
+from typing import Dict, List, Any, Optional, Sequence, Tuple
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from app.models.models import Backtest, BacktestJob
+
+# Number of recent runs the histograms are built from
+METRICS_WINDOW = 1000
+
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+WAIT_BUCKETS = (0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 300, 900, 3600)
+THROUGHPUT_BUCKETS = (1e3, 1e4, 5e4, 1e5, 5e5, 1e6, 5e6, 1e7)
+MEMORY_BUCKETS = tuple(2 ** power * 1024 ** 2 for power in range(5, 14))  # 32 MiB to 8 GiB
+
+
+def _labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for value in labels.values())
+    return "{" + ",".join(f'{name}="{value}"' for name, value in zip(labels, escaped)) + "}"
+
+
+class Histogram:
+    """Prometheus histogram with optional labels, rendered in the text exposition format"""
+
+    def __init__(self, name: str, documentation: str, buckets: Sequence[float]):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(buckets)
+        self._series: Dict[Tuple[Tuple[str, str], ...], Dict[str, Any]] = {}
+
+    def observe(self, value: float, **labels: str):
+        key = tuple(labels.items())
+        series = self._series.setdefault(key, {"counts": [0] * len(self.buckets), "count": 0, "sum": 0.0})
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                series["counts"][i] += 1
+        series["count"] += 1
+        series["sum"] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for key, series in self._series.items():
+            labels = dict(key)
+            for bound, count in zip(self.buckets, series["counts"]):
+                lines.append(f"{self.name}_bucket{_labels({**labels, 'le': _number(bound)})} {count}")
+            lines.append(f"{self.name}_bucket{_labels({**labels, 'le': '+Inf'})} {series['count']}")
+            lines.append(f"{self.name}_sum{_labels(labels)} {_number(series['sum'])}")
+            lines.append(f"{self.name}_count{_labels(labels)} {series['count']}")
+        return lines
+
+
+def _number(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+def _gauge(name: str, documentation: str, values: List[Tuple[Dict[str, str], float]]) -> List[str]:
+    lines = [f"# HELP {name} {documentation}", f"# TYPE {name} gauge"]
+    lines.extend(f"{name}{_labels(labels)} {_number(value)}" for labels, value in values)
+    return lines
+
+
+def render_metrics(db: Session, window: Optional[int] = None) -> str:
+    """
+    Render backtest instrumentation in the Prometheus text format
+
+    Workers run in separate processes, so histograms are rebuilt from the
+    stage timings persisted on the most recent `window` backtests and jobs
+    rather than kept in memory.
+    """
+    window = window or METRICS_WINDOW
+
+    stage_seconds = Histogram("backtest_stage_seconds", "Wall time of each backtest stage", STAGE_BUCKETS)
+    rows_per_second = Histogram("backtest_stage_rows_per_second", "Bars processed per second by each backtest stage", THROUGHPUT_BUCKETS)
+    run_seconds = Histogram("backtest_run_seconds", "Total wall time of a backtest run", STAGE_BUCKETS)
+    peak_memory = Histogram("backtest_peak_rss_bytes", "Worker memory high-water mark at the end of a run", MEMORY_BUCKETS)
+    queue_wait = Histogram("backtest_queue_wait_seconds", "Time jobs spent queued before a worker claimed them", WAIT_BUCKETS)
+
+    profiles = db.query(Backtest.status, Backtest.profile).filter(
+        Backtest.profile.isnot(None)
+    ).order_by(Backtest.id.desc()).limit(window).all()
+
+    for status, profile in profiles:
+        for stage in profile.get("stages", []):
+            stage_seconds.observe(stage["seconds"], stage=stage["name"])
+            if stage.get("rows") and stage["seconds"] > 0:
+                rows_per_second.observe(stage["rows"] / stage["seconds"], stage=stage["name"])
+        if profile.get("total_seconds") is not None:
+            run_seconds.observe(profile["total_seconds"], status=status)
+        if profile.get("peak_rss_bytes") is not None:
+            peak_memory.observe(profile["peak_rss_bytes"])
+
+    started = db.query(BacktestJob.enqueued_at, BacktestJob.started_at).filter(
+        BacktestJob.started_at.isnot(None)
+    ).order_by(BacktestJob.started_at.desc()).limit(window).all()
+    for enqueued_at, started_at in started:
+        queue_wait.observe(max((started_at - enqueued_at).total_seconds(), 0.0))
+
+    depth = dict(
+        db.query(BacktestJob.status, func.count(BacktestJob.id))
+        .filter(BacktestJob.status.in_(["queued", "running"]))
+        .group_by(BacktestJob.status)
+        .all()
+    )
+
+    lines: List[str] = []
+    for histogram in (stage_seconds, rows_per_second, run_seconds, peak_memory, queue_wait):
+        lines.extend(histogram.render())
+    lines.extend(_gauge(
+        "backtest_jobs",
+        "Backtest jobs currently queued or running",
+        [({"status": status}, depth.get(status, 0)) for status in ("queued", "running")]
+    ))
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,245 @@
+import itertools
+import math
+import threading
+import uuid
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from datetime import datetime
+from typing import Callable, Dict, List, Any, Optional, Tuple
+from app.core.config import settings
+from app.models.models import Strategy
+from app.services.backtesting_engine import BacktestingEngine
+from app.services.market_data_service import MarketDataService
+from app.services.process_pool import SharedMarketData, init_worker, pool_context, pool_size, worker_state
+from app.services.timeframes import higher_timeframes
+
+# Strategy columns that can be swept directly; every other key goes into `parameters`
+STRATEGY_FIELDS = ('initial_capital', 'position_size', 'stop_loss', 'take_profit')
+SNAPSHOT_FIELDS = (
+    'id', 'name', 'symbol', 'strategy_type', 'parameters', 'buy_conditions', 'sell_conditions', 'execution'
+) + STRATEGY_FIELDS
+
+# Upper bound on combinations evaluated per pool task
+MAX_CHUNK_SIZE = 16
+
+
+def expand_parameter_ranges(parameter_ranges: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Expand parameter ranges into the full grid of combinations
+
+    Each range is either an explicit list of values or a dict with
+    `start`, `stop` and `step` (stop inclusive).
+    """
+    names = []
+    values = []
+
+    for name, spec in parameter_ranges.items():
+        if isinstance(spec, dict):
+            try:
+                start, stop, step = spec['start'], spec['stop'], spec['step']
+            except KeyError:
+                raise ValueError(f"Range for '{name}' needs start, stop and step")
+            if step <= 0:
+                raise ValueError(f"Step for '{name}' must be positive")
+            count = int(math.floor((stop - start) / step + 1e-9)) + 1
+            if all(isinstance(v, int) for v in (start, stop, step)):
+                options = [start + i * step for i in range(count)]
+            else:
+                options = [round(start + i * step, 10) for i in range(count)]
+        elif isinstance(spec, list):
+            options = spec
+        else:
+            raise ValueError(f"Range for '{name}' must be a list or a start/stop/step object")
+
+        if not options:
+            raise ValueError(f"Range for '{name}' is empty")
+        names.append(name)
+        values.append(options)
+
+    return [dict(zip(names, combination)) for combination in itertools.product(*values)]
+
+
+def strategy_snapshot(strategy: Strategy) -> Dict[str, Any]:
+    """Copy the fields needed to rebuild a strategy outside its DB session"""
+    return {field: getattr(strategy, field) for field in SNAPSHOT_FIELDS}
+
+
+def build_strategy(snapshot: Dict[str, Any], overrides: Dict[str, Any]) -> Strategy:
+    """Build a transient Strategy from a snapshot with parameter overrides applied"""
+    fields = dict(snapshot)
+    parameters = dict(fields.get('parameters') or {})
+    for name, value in overrides.items():
+        if name in STRATEGY_FIELDS:
+            fields[name] = value
+        else:
+            parameters[name] = value
+    fields['parameters'] = parameters
+    return Strategy(**fields)
+
+
+def evaluate_parameters(
+    df: pd.DataFrame,
+    snapshot: Dict[str, Any],
+    overrides: Dict[str, Any],
+    interval: str = "1d"
+) -> Dict[str, Any]:
+    """Run one vectorized backtest over a preloaded frame of `interval` bars and return its metrics"""
+    strategy = build_strategy(snapshot, overrides)
+    engine = BacktestingEngine(strategy, None, None, vectorized=True, market_data=df, interval=interval)
+    return engine.run()['metrics']
+
+
+def _evaluate_chunk(chunk: List[Tuple[int, Dict[str, Any]]]) -> List[Tuple[int, Optional[Dict[str, Any]], Optional[str]]]:
+    df = worker_state['df']
+    snapshot = worker_state['snapshot']
+    cancel_event = worker_state['cancel_event']
+    interval = worker_state['interval']
+    results = []
+    for index, overrides in chunk:
+        if cancel_event.is_set():
+            break
+        try:
+            results.append((index, evaluate_parameters(df, snapshot, overrides, interval), None))
+        except Exception as e:
+            results.append((index, None, str(e)))
+    return results
+
+
+class ParameterOptimizer:
+    """Grid-search a strategy's parameters over one shared dataset using a process pool"""
+
+    def __init__(
+        self,
+        strategy: Strategy,
+        start_date: datetime,
+        end_date: datetime,
+        parameter_ranges: Dict[str, Any],
+        metric: str = "sharpe_ratio",
+        maximize: bool = True,
+        max_workers: Optional[int] = None,
+        user_id: Optional[int] = None,
+        interval: str = "1d"
+    ):
+        self.id = uuid.uuid4().hex
+        self.user_id = user_id
+        self.strategy_id = strategy.id
+        self.snapshot = strategy_snapshot(strategy)
+        self.start_date = start_date
+        self.end_date = end_date
+        self.interval = interval
+        higher_timeframes(self.snapshot['parameters'] or {}, interval)
+        self.metric = metric
+        self.maximize = maximize
+        self.max_workers = pool_size(max_workers)
+
+        self.combinations = expand_parameter_ranges(parameter_ranges)
+        if len(self.combinations) > settings.OPTIMIZER_MAX_COMBINATIONS:
+            raise ValueError(
+                f"Parameter grid has {len(self.combinations)} combinations, "
+                f"the limit is {settings.OPTIMIZER_MAX_COMBINATIONS}"
+            )
+
+        # Progress
+        self.status = "pending"  # pending, running, completed, cancelled, failed
+        self.completed = 0
+        self.failed = 0
+        self.error_message = None
+        self.created_at = datetime.utcnow()
+        self.completed_at = None
+        self._results: List[Dict[str, Any]] = []
+        self.on_progress: Optional[Callable[[], None]] = None  # Called as results arrive
+        self._mp_context = pool_context()
+        self._cancel_event = self._mp_context.Event()  # Shared with workers so running chunks stop early
+        self._lock = threading.Lock()
+
+    @property
+    def total_combinations(self) -> int:
+        return len(self.combinations)
+
+    def cancel(self):
+        """Request early cancellation; pending combinations are dropped"""
+        self._cancel_event.set()
+
+    def progress(self) -> Dict[str, Any]:
+        """Counters of the run so far"""
+        return {"total_combinations": self.total_combinations, "completed": self.completed, "failed": self.failed}
+
+    def result(self) -> List[Dict[str, Any]]:
+        """Results so far, ranked"""
+        return self.ranked_results()
+
+    def _report(self):
+        if self.on_progress is not None:
+            self.on_progress()
+
+    def _chunks(self) -> List[List[Tuple[int, Dict[str, Any]]]]:
+        # Several small chunks per worker keeps the pool balanced
+        items = list(enumerate(self.combinations))
+        size = max(1, min(math.ceil(len(items) / (self.max_workers * 4)), MAX_CHUNK_SIZE))
+        return [items[i:i + size] for i in range(0, len(items), size)]
+
+    def _record(self, chunk_results: List[Tuple[int, Optional[Dict[str, Any]], Optional[str]]]):
+        with self._lock:
+            for index, metrics, error in chunk_results:
+                if metrics is None:
+                    self.failed += 1
+                    continue
+                self.completed += 1
+                self._results.append({"parameters": self.combinations[index], "metrics": metrics})
+
+    def ranked_results(self, top_n: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Return results ordered by the target metric, best first"""
+        def sort_key(result):
+            value = result['metrics'].get(self.metric)
+            if value is None or (isinstance(value, float) and math.isnan(value)):
+                return (1, 0.0)
+            return (0, -value if self.maximize else value)
+
+        with self._lock:
+            ranked = sorted(self._results, key=sort_key)
+        if top_n is not None:
+            ranked = ranked[:top_n]
+        return [{"rank": i + 1, **result} for i, result in enumerate(ranked)]
+
+    def run(self) -> List[Dict[str, Any]]:
+        """Load the market data once and evaluate every combination in parallel"""
+        self.status = "running"
+        shared = None
+        try:
+            df = MarketDataService().fetch_frame(
+                symbol=self.snapshot['symbol'],
+                start_date=self.start_date,
+                end_date=self.end_date,
+                interval=self.interval
+            )
+            shared = SharedMarketData(df)
+
+            executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=self._mp_context,
+                initializer=init_worker,
+                initargs=(shared.descriptor(), self.snapshot, self._cancel_event, self.interval)
+            )
+            try:
+                pending = {executor.submit(_evaluate_chunk, chunk) for chunk in self._chunks()}
+                while pending and not self._cancel_event.is_set():
+                    done, pending = wait(pending, timeout=0.5, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        self._record(future.result())
+                    self._report()
+            finally:
+                executor.shutdown(wait=True, cancel_futures=True)
+
+            self.status = "cancelled" if self._cancel_event.is_set() else "completed"
+
+        except Exception as e:
+            self.status = "failed"
+            self.error_message = str(e)
+
+        finally:
+            if shared is not None:
+                shared.close()
+            self.completed_at = datetime.utcnow()
+
+        return self.ranked_results()
+
@@ -0,0 +1,298 @@
+import math
+import numpy as np
+from operator import itemgetter
+from typing import Dict, List, Any, Iterable, Optional, Sequence
+
+PERIODS_PER_YEAR = 252
+SECONDS_PER_YEAR = 365.25 * 86400
+
+# Length of the "YYYY-MM-DDTHH:MM:SS" prefix of an ISO timestamp
+_ISO_SECONDS = 19
+
+# Period name -> datetime64 unit the timestamps are truncated to
+PERIOD_UNITS = {"monthly": "M", "yearly": "Y"}
+
+
+def column(records: Sequence[Dict[str, Any]], key: str) -> np.ndarray:
+    """One float64 field of a list of result records (equity points or trades)"""
+    return np.fromiter(map(itemgetter(key), records), dtype=np.float64, count=len(records))
+
+
+def local_times(timestamps: Iterable[str]) -> np.ndarray:
+    """ISO timestamps as naive local datetime64[s], dropping fractional seconds and UTC offsets"""
+    return np.array([timestamp[:_ISO_SECONDS] for timestamp in timestamps], dtype='datetime64[s]')
+
+
+def calendar_years(start: str, end: str) -> float:
+    """Years between two ISO timestamps"""
+    first, last = local_times((start, end))
+    return float((last - first) / np.timedelta64(1, 's')) / SECONDS_PER_YEAR
+
+
+def simple_returns(values: np.ndarray) -> np.ndarray:
+    """Bar-to-bar returns of an equity series"""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return values[1:] / values[:-1] - 1
+
+
+def drawdowns(values: np.ndarray, peaks: Optional[np.ndarray] = None) -> np.ndarray:
+    """Fractional distance of every point below the running peak (0 at a peak, negative below)"""
+    if peaks is None:
+        peaks = np.maximum.accumulate(values)
+    return (values - peaks) / peaks
+
+
+def drawdown_duration(values: np.ndarray, peaks: Optional[np.ndarray] = None) -> int:
+    """Longest run of bars spent below a previous peak"""
+    if len(values) == 0:
+        return 0
+    if peaks is None:
+        peaks = np.maximum.accumulate(values)
+    positions = np.arange(len(values))
+    last_peak = np.maximum.accumulate(np.where(values >= peaks, positions, 0))
+    return int((positions - last_peak).max())
+
+
+def _ratio(numerator: float, denominator: float) -> float:
+    return numerator / denominator if denominator > 0 else 0
+
+
+class MetricsAccumulator:
+    """
+    compute_metrics over a run fed in consecutive chunks of bars and trades
+
+    Only running sums, extremes and the last bar's value are kept, so the
+    metrics of arbitrarily long runs take constant memory. Return moments of
+    the chunks are merged with Chan's parallel update: fed in one chunk the
+    metrics are exactly those of compute_metrics, fed in several they differ
+    by floating point rounding only.
+    """
+
+    def __init__(self, initial_capital: float, periods_per_year: int = PERIODS_PER_YEAR):
+        self.initial_capital = initial_capital
+        self.periods_per_year = periods_per_year
+
+        # Equity
+        self.bars = 0
+        self.last_value = math.nan  # Base of the next chunk's first return
+        self.value_sum = 0.0
+        self.position_bars = 0  # Bars with a position value, for exposure
+        self.exposed_bars = 0
+        self.peak = -math.inf
+        self.last_peak = 0  # Position of the latest bar at its running peak
+        self.min_drawdown = math.inf
+        self.max_drawdown_duration = 0
+
+        # Non-NaN bar returns
+        self.returns = 0
+        self.mean = 0.0
+        self.m2 = 0.0  # Sum of squared deviations from the mean
+        self.downside_m2 = 0.0  # Sum of squared negative returns
+
+        # Closed trades
+        self.trades = 0
+        self.wins = 0
+        self.win_sum = 0.0
+        self.loss_sum = 0.0
+
+    def add_bars(self, values: np.ndarray, position_values: Optional[np.ndarray] = None):
+        """Feed the portfolio value (and value held in positions) of the next bars"""
+        values = np.asarray(values, dtype=np.float64)
+        if position_values is not None:
+            self.position_bars += len(position_values)
+            self.exposed_bars += int(np.count_nonzero(np.asarray(position_values) > 0))
+        if len(values) == 0:
+            return
+
+        # NaN returns (zero equity) are skipped like pct_change().dropna()
+        returns = simple_returns(values if self.bars == 0 else np.concatenate(([self.last_value], values)))
+        returns = returns[~np.isnan(returns)]
+        if len(returns):
+            mean = float(returns.mean())
+            m2 = float(((returns - mean) ** 2).sum())
+            count = self.returns + len(returns)
+            if self.returns == 0:
+                self.mean, self.m2 = mean, m2
+            else:
+                delta = mean - self.mean
+                self.m2 += m2 + delta * delta * self.returns * len(returns) / count
+                self.mean += delta * len(returns) / count
+            self.returns = count
+            self.downside_m2 += float((np.minimum(returns, 0) ** 2).sum())
+
+        peaks = np.maximum(np.maximum.accumulate(values), self.peak)
+        self.min_drawdown = min(self.min_drawdown, float(drawdowns(values, peaks).min()))
+        positions = np.arange(self.bars, self.bars + len(values))
+        last_peak = np.maximum.accumulate(np.where(values >= peaks, positions, self.last_peak))
+        self.max_drawdown_duration = max(self.max_drawdown_duration, int((positions - last_peak).max()))
+        self.peak = float(peaks[-1])
+        self.last_peak = int(last_peak[-1])
+
+        self.value_sum += float(values.sum())
+        self.last_value = float(values[-1])
+        self.bars += len(values)
+
+    def add_profits(self, profits: np.ndarray):
+        """Feed the profit of the next closed trades"""
+        profits = np.asarray(profits, dtype=np.float64)
+        wins = profits[profits > 0]
+        self.trades += len(profits)
+        self.wins += len(wins)
+        self.win_sum += float(wins.sum())
+        self.loss_sum += float(profits[profits <= 0].sum())
+
+    def metrics(
+        self,
+        final_value: Optional[float] = None,
+        traded_value: float = 0.0,
+        years: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """Metrics of everything fed so far; arguments as for compute_metrics"""
+        initial_capital = self.initial_capital
+        if final_value is None:
+            final_value = self.last_value if self.bars else initial_capital
+        total_return = final_value - initial_capital
+        annualization = math.sqrt(self.periods_per_year)
+
+        # Trade statistics
+        losses = self.trades - self.wins
+        avg_win = self.win_sum / self.wins if self.wins else 0
+        avg_loss = self.loss_sum / losses if losses else 0
+
+        # Risk-adjusted returns
+        if self.returns > 1:
+            mean = self.mean
+            std = math.sqrt(self.m2 / (self.returns - 1))
+            downside = math.sqrt(self.downside_m2 / self.returns)
+        else:
+            mean = std = downside = 0.0
+        sharpe_ratio = _ratio(mean, std) * annualization
+        sortino_ratio = _ratio(mean, downside) * annualization
+
+        max_drawdown = self.min_drawdown * 100 if self.bars else math.nan
+        if years is None:
+            years = self.bars / self.periods_per_year
+        growth = final_value / initial_capital
+        cagr = (growth ** (1 / years) - 1) * 100 if years > 0 and growth > 0 else 0.0
+
+        exposure = self.exposed_bars / self.position_bars * 100 if self.position_bars else 0.0
+        average_equity = self.value_sum / self.bars if self.bars else initial_capital
+
+        return {
+            "final_value": final_value,
+            "total_return": total_return,
+            "total_return_pct": total_return / initial_capital * 100,
+            "sharpe_ratio": sharpe_ratio,
+            "max_drawdown": max_drawdown,
+            "total_trades": self.trades,
+            "winning_trades": self.wins,
+            "losing_trades": losses,
+            "win_rate": self.wins / self.trades * 100 if self.trades else 0,
+            "avg_win": avg_win,
+            "avg_loss": avg_loss,
+            "profit_factor": abs(avg_win / avg_loss) if avg_loss != 0 else 0,
+            "gross_profit_factor": _ratio(self.win_sum, -self.loss_sum),
+            "sortino_ratio": sortino_ratio,
+            "volatility": std * annualization * 100,
+            "cagr": cagr,
+            "calmar_ratio": _ratio(cagr, -max_drawdown) if self.bars else 0,
+            "max_drawdown_duration": self.max_drawdown_duration,
+            "exposure_pct": exposure,
+            "turnover": _ratio(traded_value, average_equity),
+        }
+
+
+def compute_metrics(
+    values: np.ndarray,
+    initial_capital: float,
+    final_value: Optional[float] = None,
+    profits: Optional[np.ndarray] = None,
+    position_values: Optional[np.ndarray] = None,
+    traded_value: float = 0.0,
+    years: Optional[float] = None,
+    periods_per_year: int = PERIODS_PER_YEAR
+) -> Dict[str, Any]:
+    """
+    Performance metrics of one run from its equity and trade arrays
+
+    Args:
+        values: Portfolio value at every bar
+        initial_capital: Starting capital
+        final_value: Value after the end-of-period close, the last bar's value by default
+        profits: Profit of every closed trade
+        position_values: Value held in positions at every bar, for exposure
+        traded_value: Total value bought and sold, for turnover
+        years: Calendar length of the run, for CAGR; bars / periods_per_year by default
+        periods_per_year: Bars per year, for annualization
+
+    Returns:
+        Dict of float metrics; the first twelve keep the definitions
+        BacktestingEngine has always stored
+    """
+    accumulator = MetricsAccumulator(initial_capital, periods_per_year)
+    accumulator.add_bars(values, position_values)
+    if profits is not None:
+        accumulator.add_profits(profits)
+    return accumulator.metrics(final_value, traded_value, years)
+
+
+def rolling_metrics(
+    values: np.ndarray,
+    window: int,
+    periods_per_year: int = PERIODS_PER_YEAR
+) -> Dict[str, np.ndarray]:
+    """
+    Trailing-window return, volatility, Sharpe ratio and max drawdown at every bar
+
+    Each metric at bar i covers the `window` returns ending at i; the first
+    `window` bars are NaN. Windows are strided views of the series, so every
+    metric is computed for all bars at once without copying the windows;
+    variances are taken per window rather than from running sums, which
+    cancel catastrophically over flat stretches of the curve.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    n = len(values)
+    result = {name: np.full(n, np.nan) for name in ("return_pct", "volatility", "sharpe_ratio", "max_drawdown")}
+    if window < 2 or n <= window:
+        return result
+
+    returns = np.lib.stride_tricks.sliding_window_view(simple_returns(values), window)
+    mean = returns.mean(axis=1)
+    std = returns.std(axis=1, ddof=1)
+    annualization = math.sqrt(periods_per_year)
+
+    result["return_pct"][window:] = (values[window:] / values[:-window] - 1) * 100
+    result["volatility"][window:] = std * annualization * 100
+    result["sharpe_ratio"][window:] = np.divide(mean, std, out=np.zeros_like(mean), where=std > 0) * annualization
+
+    windows = np.lib.stride_tricks.sliding_window_view(values, window + 1)
+    peaks = np.maximum.accumulate(windows, axis=1)
+    result["max_drawdown"][window:] = ((windows - peaks) / peaks).min(axis=1) * 100
+    return result
+
+
+def period_returns(values: np.ndarray, times: np.ndarray, period: str = "monthly") -> List[Dict[str, Any]]:
+    """
+    Return of every calendar month or year
+
+    Each period runs from the last value of the previous period (the first
+    value for the first period) to its own last value.
+
+    Args:
+        values: Portfolio value at every bar
+        times: Local bar times as datetime64, see local_times
+        period: monthly or yearly
+    """
+    if period not in PERIOD_UNITS:
+        raise ValueError(f"Unknown period: {period}")
+    values = np.asarray(values, dtype=np.float64)
+    if len(values) == 0:
+        return []
+    buckets = times.astype(f'datetime64[{PERIOD_UNITS[period]}]')
+    ends = np.append(np.flatnonzero(buckets[1:] != buckets[:-1]), len(values) - 1)
+    closes = values[ends]
+    opens = np.concatenate(([values[0]], closes[:-1]))
+    return [
+        {"period": str(bucket), "return_pct": value}
+        for bucket, value in zip(buckets[ends], ((closes / opens - 1) * 100).tolist())
+    ]
@@ -0,0 +1,321 @@
+import numpy as np
+import pandas as pd
+from datetime import datetime
+from typing import Dict, List, Any, Optional, Tuple
+from app.models.models import Strategy
+from app.services.backtesting_engine import BacktestingEngine, compute_indicator_columns
+from app.services.indicator_cache import IndicatorCalculator, indicator_cache
+from app.services.market_data_cache import OHLCV_COLUMNS
+from app.services.timeframes import higher_timeframes
+
+
+def build_panel(frames: Dict[str, pd.DataFrame]) -> Tuple[pd.DatetimeIndex, Dict[str, np.ndarray]]:
+    """
+    Align per-symbol OHLCV frames into (time x symbol) arrays
+
+    The time axis is the union of all bar timestamps; bars a symbol does not
+    have are NaN.
+
+    Returns:
+        Union index and a dict of OHLCV column name -> 2D float64 array
+    """
+    symbols = list(frames)
+    tz = None
+    stamps = []
+    for df in frames.values():
+        index = df.index
+        if getattr(index, 'tz', None) is not None:
+            tz = tz or index.tz
+            index = index.tz_convert('UTC').tz_localize(None)
+        stamps.append(index.as_unit('ns').asi8)
+
+    union = np.unique(np.concatenate(stamps))
+    panel = {column: np.full((len(union), len(symbols)), np.nan) for column in OHLCV_COLUMNS}
+    for j, (symbol, timestamps) in enumerate(zip(symbols, stamps)):
+        rows = np.searchsorted(union, timestamps)
+        df = frames[symbol]
+        for column in OHLCV_COLUMNS:
+            panel[column][rows, j] = df[column].to_numpy(dtype=np.float64)
+
+    index = pd.DatetimeIndex(union.view('datetime64[ns]'), name='timestamp')
+    if tz is not None:
+        index = index.tz_localize('UTC').tz_convert(tz)
+    return index, panel
+
+
+def forward_fill(values: np.ndarray) -> np.ndarray:
+    """Forward-fill NaNs down each column of a 2D array"""
+    rows = np.where(np.isnan(values), 0, np.arange(len(values))[:, None])
+    np.maximum.accumulate(rows, axis=0, out=rows)
+    return values[rows, np.arange(values.shape[1])]
+
+
+class PortfolioBacktestingEngine(BacktestingEngine):
+    """
+    Backtesting engine running one strategy over a universe of symbols with shared capital
+
+    Indicators and buy/sell conditions are evaluated for every symbol at once
+    on (time x symbol) arrays; the bar loop only moves cash between positions.
+    Each new position is sized at `position_size` percent of current equity,
+    limited by available cash and the optional `max_positions` parameter.
+    """
+
+    def __init__(
+        self,
+        strategy: Strategy,
+        symbols: List[str],
+        start_date: datetime,
+        end_date: datetime,
+        market_data: Optional[Dict[str, pd.DataFrame]] = None,
+        interval: str = "1d"
+    ):
+        super().__init__(strategy, start_date, end_date, vectorized=True, interval=interval)
+        if higher_timeframes(strategy.parameters or {}):
+            raise ValueError("Higher-timeframe indicators are not supported in portfolio backtests")
+        self.symbols = list(dict.fromkeys(symbols))
+        self.panel_data = market_data  # Preloaded symbol -> OHLCV frame, skips fetching when set
+        self.skipped_symbols: Dict[str, str] = {}
+
+    def fetch_panel_data(self) -> Dict[str, pd.DataFrame]:
+        """Fetch OHLCV frames for every symbol in the universe, skipping symbols without data"""
+        if self.panel_data is not None:
+            return {symbol: self.panel_data[symbol] for symbol in self.symbols if symbol in self.panel_data}
+
+        frames, errors = self.market_data_service.fetch_frames(
+            self.symbols, self.start_date, self.end_date, self.interval
+        )
+        self.skipped_symbols.update(errors)
+        return frames
+
+    def calculate_panel_indicators(
+        self,
+        index: pd.DatetimeIndex,
+        symbols: List[str],
+        panel: Dict[str, np.ndarray]
+    ) -> Dict[str, np.ndarray]:
+        """Compute indicator columns for all symbols at once"""
+        params = self.strategy.parameters or {}
+        close = pd.DataFrame(panel['close'], index=index, columns=symbols)
+        indicators = IndicatorCalculator.for_panel(close, self.interval, cache=indicator_cache)
+
+        columns = dict(panel)
+        columns.update(compute_indicator_columns(indicators, params))
+        return columns
+
+    def simulate_panel(self, index: pd.DatetimeIndex, symbols: List[str], columns: Dict[str, np.ndarray]):
+        """Simulate the strategy over aligned (time x symbol) arrays"""
+        closes = columns['close']
+        n_bars, n_symbols = closes.shape
+        shape = (n_bars, n_symbols)
+
+        buy_signals = self.buy_program.evaluate(columns, shape)
+        sell_signals = self.sell_program.evaluate(columns, shape)
+
+        # Last known price for valuation; NaN until a symbol's first bar
+        marks = forward_fill(closes)
+        tradable = ~np.isnan(closes)
+
+        # Fill prices of every bar and symbol, at the signal bar's close or the next bar's open
+        execution = self.execution
+        next_open = execution.next_open
+        buy_prices, sell_prices = execution.fill_prices(columns['open'] if next_open else closes)
+        volumes = columns['volume']
+
+        check_sells = not self.sell_program.empty
+        stop_loss = self.strategy.stop_loss
+        take_profit = self.strategy.take_profit
+        position_fraction = self.strategy.position_size / 100
+        max_positions = (self.strategy.parameters or {}).get('max_positions')
+
+        shares = np.zeros(n_symbols, dtype=np.float64 if execution.fractional else np.int64)
+        entry_price = np.zeros(n_symbols)
+        entry_cost = np.zeros(n_symbols)
+        positions = (shares, entry_price, entry_cost)
+
+        # Orders signalled for the next bar's open
+        pending_exits = np.zeros(n_symbols, dtype=bool)
+        pending_entries = np.empty(0, dtype=np.int64)
+
+        values = np.empty(n_bars)
+        cash_values = np.empty(n_bars)
+        position_values = np.empty(n_bars)
+
+        for t in range(n_bars):
+            can_trade = tradable[t]
+
+            if next_open:
+                # Orders wait for the symbol's next traded bar
+                fills = pending_exits & (shares > 0) & can_trade
+                for j in np.flatnonzero(fills):
+                    self._close_position(index[t], symbols[j], j, float(sell_prices[t, j]), shares, entry_cost, "Sell conditions met", volumes[t, j])
+                pending_exits &= ~fills & (shares > 0)
+                if len(pending_entries):
+                    candidates = pending_entries[can_trade[pending_entries] & (shares[pending_entries] == 0)]
+                    self._open_positions(index[t], symbols, candidates, buy_prices[t], volumes[t], self.portfolio_value * position_fraction, positions)
+                    pending_entries = pending_entries[:0]
+
+            held = shares > 0
+            position_value = float(np.dot(shares[held], marks[t, held])) if held.any() else 0.0
+            self.portfolio_value = self.cash + position_value
+
+            values[t] = self.portfolio_value
+            cash_values[t] = self.cash
+            position_values[t] = position_value
+
+            price = closes[t]
+
+            # Exits
+            if check_sells and held.any():
+                with np.errstate(invalid='ignore'):
+                    exits = sell_signals[t].copy()
+                    if stop_loss:
+                        exits |= price <= entry_price * (1 - stop_loss / 100)
+                    if take_profit:
+                        exits |= price >= entry_price * (1 + take_profit / 100)
+                exits &= held & can_trade
+                if next_open:
+                    pending_exits |= exits
+                else:
+                    for j in np.flatnonzero(exits):
+                        self._close_position(index[t], symbols[j], j, float(sell_prices[t, j]), shares, entry_cost, "Sell conditions met", volumes[t, j])
+
+            # Entries (symbols held at the start of the bar are not re-entered on the same bar)
+            entries = buy_signals[t] & can_trade & ~held
+            if entries.any():
+                candidates = np.flatnonzero(entries)
+                if max_positions is not None:
+                    slots = max(int(max_positions) - int((shares > 0).sum()), 0)
+                    candidates = candidates[:slots]
+
+                if next_open:
+                    pending_entries = candidates
+                else:
+                    self._open_positions(index[t], symbols, candidates, buy_prices[t], volumes[t], self.portfolio_value * position_fraction, positions)
+
+        # Close any open positions at the end at their last known price
+        last_prices = execution.fill_prices(marks[-1])[1]
+        for j in np.flatnonzero(shares > 0):
+            self._close_position(index[-1], symbols[j], j, float(last_prices[j]), shares, entry_cost, "End of backtest period", volumes[-1, j])
+        # Every position is closed, so the final value is the cash after the exits' costs
+        self.portfolio_value = self.cash
+
+        timestamps = [timestamp.isoformat() for timestamp in index]
+        self.equity_curve.extend(
+            {"timestamp": timestamp, "value": value, "cash": cash, "position_value": position_value}
+            for timestamp, value, cash, position_value in zip(
+                timestamps, values.tolist(), cash_values.tolist(), position_values.tolist()
+            )
+        )
+
+    def _open_positions(
+        self,
+        timestamp: pd.Timestamp,
+        symbols: List[str],
+        candidates: np.ndarray,
+        prices: np.ndarray,
+        volumes: np.ndarray,
+        budget: float,
+        positions: Tuple[np.ndarray, np.ndarray, np.ndarray]
+    ):
+        """Enter candidate symbols in order while cash lasts, each spending at most `budget`"""
+        if not len(candidates):
+            return
+        shares, entry_price, entry_cost = positions
+        execution = self.execution
+        sizes, fills = execution.entry(budget, prices[candidates], volumes[candidates])
+        commissions = execution.commission(sizes * fills)
+        costs = np.where(sizes > 0, sizes * fills + commissions, 0.0)
+        affordable = (sizes > 0) & (np.cumsum(costs) <= self.cash)
+
+        for j, size, fill, commission, cost in zip(
+            candidates[affordable], sizes[affordable], fills[affordable], commissions[affordable], costs[affordable]
+        ):
+            self.cash -= float(cost)
+            shares[j] = size
+            entry_price[j] = fill
+            entry_cost[j] = cost
+            self.trades.append({
+                "timestamp": timestamp.isoformat(),
+                "symbol": symbols[j],
+                "action": "BUY",
+                "price": float(fill),
+                "shares": float(size) if execution.fractional else int(size),
+                "cost": float(cost),
+                "commission": float(commission),
+                "reason": "Buy conditions met"
+            })
+
+    def _close_position(
+        self,
+        timestamp: pd.Timestamp,
+        symbol: str,
+        j: int,
+        price: float,
+        shares: np.ndarray,
+        entry_cost: np.ndarray,
+        reason: str,
+        volume: float = np.nan
+    ):
+        quantity = float(shares[j]) if self.execution.fractional else int(shares[j])
+        price = float(self.execution.exit_price(quantity, price, volume))
+        commission = float(self.execution.commission(quantity * price))
+        proceeds = quantity * price - commission
+        profit = proceeds - entry_cost[j]
+        self.cash += proceeds
+        self.trades.append({
+            "timestamp": timestamp.isoformat(),
+            "symbol": symbol,
+            "action": "SELL",
+            "price": price,
+            "shares": quantity,
+            "proceeds": proceeds,
+            "commission": commission,
+            "profit": float(profit),
+            "profit_pct": float(profit / entry_cost[j] * 100),
+            "reason": reason
+        })
+        shares[j] = 0
+
+    def symbol_breakdown(self) -> Dict[str, Dict[str, Any]]:
+        """Per-symbol trade statistics"""
+        breakdown = {}
+        for trade in self.trades:
+            if trade['action'] != 'SELL':
+                continue
+            stats = breakdown.setdefault(trade['symbol'], {"total_trades": 0, "winning_trades": 0, "total_profit": 0.0})
+            stats['total_trades'] += 1
+            stats['winning_trades'] += trade['profit'] > 0
+            stats['total_profit'] += trade['profit']
+        return breakdown
+
+    def run(self) -> Dict[str, Any]:
+        """Run the portfolio backtest simulation"""
+        try:
+            with self.profile.stage("fetch_market_data") as stage:
+                frames = self.fetch_panel_data()
+                stage["rows"] = sum(len(df) for df in frames.values())
+            if not frames:
+                raise ValueError("No market data found for any symbol in the universe")
+
+            symbols = list(frames)
+            with self.profile.stage("calculate_indicators") as stage:
+                index, panel = build_panel(frames)
+                stage["rows"] = len(index) * len(symbols)
+                columns = self.calculate_panel_indicators(index, symbols, panel)
+
+            with self.profile.stage("simulate", rows=len(index) * len(symbols)):
+                self.simulate_panel(index, symbols, columns)
+
+            with self.profile.stage("calculate_metrics", rows=len(self.equity_curve)):
+                metrics = self.calculate_metrics()
+            metrics['symbols'] = self.symbol_breakdown()
+            metrics['skipped_symbols'] = self.skipped_symbols
+
+            return {
+                "trades": self.trades,
+                "equity_curve": self.equity_curve,
+                "metrics": metrics
+            }
+
+        except Exception as e:
+            raise Exception(f"Backtest execution failed: {str(e)}")
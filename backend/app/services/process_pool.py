@@ -0,0 +1,110 @@
+import multiprocessing
+import os
+import threading
+import time
+import numpy as np
+import pandas as pd
+from multiprocessing import shared_memory
+from typing import Dict, Any, Optional, Tuple
+from app.core.config import settings
+from app.services.market_data_cache import OHLCV_COLUMNS
+
+
+def pool_context():
+    """
+    Start method of worker pools
+
+    Spawned (not forked): runs execute in job worker processes, and a forked
+    child could inherit their DB connections or a lock another thread held.
+    """
+    return multiprocessing.get_context("spawn")
+
+
+def watch_parent(interval: float = 1.0):
+    """
+    Exit this pool process once the process that started the pool is gone
+
+    Analyses run inside job workers, which the worker pool terminates to
+    cancel a job; pool processes would otherwise wait for tasks forever.
+    """
+    parent = os.getppid()
+
+    def watch():
+        while os.getppid() == parent:
+            time.sleep(interval)
+        os._exit(1)
+
+    threading.Thread(target=watch, name="parent-watch", daemon=True).start()
+
+
+def pool_size(requested: Optional[int], default: Optional[int] = None) -> int:
+    """Worker processes of a pool: the requested count, by default OPTIMIZER_MAX_WORKERS or every core, at most the cores"""
+    cores = os.cpu_count() or 1
+    return max(1, min(requested or default or settings.OPTIMIZER_MAX_WORKERS or cores, cores))
+
+
+class SharedMarketData:
+    """OHLCV frame published once in shared memory and attached zero-copy by workers"""
+
+    def __init__(self, df: pd.DataFrame):
+        rows = len(df)
+        index = df.index
+        self.tz = str(index.tz) if getattr(index, 'tz', None) is not None else None
+        if self.tz:
+            index = index.tz_convert('UTC').tz_localize(None)
+
+        # Layout: int64 timestamps followed by a (5, rows) float64 block
+        self.rows = rows
+        self.shm = shared_memory.SharedMemory(create=True, size=max(rows * 8 * (1 + len(OHLCV_COLUMNS)), 1))
+        timestamps, block = self._views(self.shm, rows)
+        timestamps[:] = index.as_unit('ns').asi8
+        for i, column in enumerate(OHLCV_COLUMNS):
+            block[i] = df[column].to_numpy(dtype=np.float64)
+
+    @staticmethod
+    def _views(shm: shared_memory.SharedMemory, rows: int) -> Tuple[np.ndarray, np.ndarray]:
+        timestamps = np.ndarray((rows,), dtype=np.int64, buffer=shm.buf)
+        block = np.ndarray((len(OHLCV_COLUMNS), rows), dtype=np.float64, buffer=shm.buf, offset=rows * 8)
+        return timestamps, block
+
+    def descriptor(self) -> Dict[str, Any]:
+        return {"name": self.shm.name, "rows": self.rows, "tz": self.tz}
+
+    @classmethod
+    def attach(cls, descriptor: Dict[str, Any]) -> Tuple[shared_memory.SharedMemory, pd.DataFrame]:
+        """Attach to a published frame; the returned segment must outlive the frame"""
+        shm = shared_memory.SharedMemory(name=descriptor['name'])
+        timestamps, block = cls._views(shm, descriptor['rows'])
+        index = pd.DatetimeIndex(timestamps.view('datetime64[ns]'), name='timestamp')
+        if descriptor['tz']:
+            index = index.tz_localize('UTC').tz_convert(descriptor['tz'])
+        df = pd.DataFrame(block.T, index=index, columns=OHLCV_COLUMNS, copy=False)
+        return shm, df
+
+    def close(self):
+        self.shm.close()
+        try:
+            self.shm.unlink()
+        except FileNotFoundError:
+            pass
+
+
+# Per-process state of a pool process, set by init_worker: the attached frame ("df")
+# and its segment ("shm"), the strategy "snapshot", the run's "cancel_event" and the bar "interval"
+worker_state: Dict[str, Any] = {}
+
+
+def init_worker(descriptor: Dict[str, Any], snapshot: Dict[str, Any], cancel_event, interval: str = "1d"):
+    """
+    Initializer of pools evaluating a strategy over shared market data
+
+    Attaches the frame published by a SharedMarketData (its descriptor) and
+    keeps it in worker_state with the run's settings for the pool's tasks.
+    """
+    watch_parent()
+    shm, df = SharedMarketData.attach(descriptor)
+    worker_state['shm'] = shm
+    worker_state['df'] = df
+    worker_state['snapshot'] = snapshot
+    worker_state['cancel_event'] = cancel_event
+    worker_state['interval'] = interval
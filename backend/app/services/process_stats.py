@@ -0,0 +1,58 @@
+from datetime import datetime
+from typing import Callable, Dict, List, Any
+from sqlalchemy.orm import Session
+from app.core.database import SessionLocal
+from app.models.models import ProcessStats
+from app.services.indicator_cache import indicator_cache
+from app.services.market_data_cache import market_data_cache
+
+
+def local_stats() -> Dict[str, Dict[str, Any]]:
+    """Counters of this process's in-memory caches, by component"""
+    return {"indicator_cache": indicator_cache.stats(), "market_data_cache": market_data_cache.counters()}
+
+
+def publish_stats(process_id: str, session_factory: Callable[[], Session] = SessionLocal):
+    """Save this process's counters under its id, replacing those it published before"""
+    db = session_factory()
+    try:
+        db.merge(ProcessStats(process_id=process_id, stats=local_stats(), updated_at=datetime.utcnow()))
+        db.commit()
+    finally:
+        db.close()
+
+
+def forget_stats(process_ids: List[str], session_factory: Callable[[], Session] = SessionLocal):
+    """Drop the counters of processes that have exited, whose caches are gone"""
+    if not process_ids:
+        return
+    db = session_factory()
+    try:
+        db.query(ProcessStats).filter(ProcessStats.process_id.in_(process_ids)).delete(synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+
+def published_on_host(hostname: str, session_factory: Callable[[], Session] = SessionLocal) -> List[str]:
+    """Ids of the processes on a host that have published counters"""
+    db = session_factory()
+    try:
+        return [
+            process_id for (process_id,) in db.query(ProcessStats.process_id).filter(
+                ProcessStats.process_id.like(f"{hostname}:%")
+            ).all()
+        ]
+    finally:
+        db.close()
+
+
+def collect_stats(db: Session, component: str) -> List[Dict[str, Any]]:
+    """
+    Counters of one component in every live worker, followed by this process's own
+
+    Workers publish when they start and after every job, so the counters
+    of a job still running are not included yet.
+    """
+    published = [stats[component] for (stats,) in db.query(ProcessStats.stats).all() if component in stats]
+    return published + [local_stats()[component]]
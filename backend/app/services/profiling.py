@@ -0,0 +1,89 @@
+import cProfile
+import io
+import marshal
+import pstats
+import sys
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Any, Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Format of stored cProfile artifacts: marshalled pstats, as written by Profile.dump_stats
+CPROFILE_FORMAT = "pstats-marshal"
+
+
+def peak_rss_bytes() -> Optional[int]:
+    """High-water mark of the process resident set size, or None where unavailable"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Reported in bytes on macOS and kilobytes elsewhere
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class RunProfile:
+    """
+    Wall time, bar counts and memory high-water marks of each stage of a run
+
+    Stages are recorded in the order they finish. Memory is the process peak
+    RSS, so a stage only shows growth when it pushes the peak higher.
+    """
+
+    def __init__(self):
+        self.stages: List[Dict[str, Any]] = []
+        self._started = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name: str, rows: Optional[int] = None):
+        """Time the enclosed block; `rows` may also be set later through the yielded dict"""
+        entry: Dict[str, Any] = {"name": name, "rows": rows}
+        peak_before = peak_rss_bytes()
+        start = time.perf_counter()
+        try:
+            yield entry
+        except BaseException:
+            entry["failed"] = True
+            raise
+        finally:
+            entry["seconds"] = time.perf_counter() - start
+            peak_after = peak_rss_bytes()
+            entry["peak_rss_bytes"] = peak_after
+            entry["peak_rss_growth_bytes"] = (
+                peak_after - peak_before if peak_after is not None and peak_before is not None else None
+            )
+            self.stages.append(entry)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "stages": self.stages,
+            "total_seconds": time.perf_counter() - self._started,
+            "peak_rss_bytes": peak_rss_bytes(),
+        }
+
+
+def profiler_data(profiler: cProfile.Profile) -> bytes:
+    """Serialize a finished profiler in the pstats file format"""
+    profiler.create_stats()
+    return marshal.dumps(profiler.stats)
+
+
+class _StoredStats:
+    """Adapter letting pstats.Stats load already-collected stats"""
+
+    def __init__(self, stats: Dict):
+        self.stats = stats
+
+    def create_stats(self):
+        pass
+
+
+def format_profiler_data(data: bytes, sort: str = "cumulative", limit: int = 50) -> str:
+    """Render stored profiler data as the pstats text report of the top `limit` functions"""
+    output = io.StringIO()
+    stats = pstats.Stats(_StoredStats(marshal.loads(data)), stream=output)
+    stats.strip_dirs().sort_stats(sort).print_stats(limit)
+    return output.getvalue()
@@ -0,0 +1,303 @@
+import io
+import json
+import tempfile
+import numpy as np
+from typing import Dict, List, Any, Optional, Tuple, Union
+from sqlalchemy.orm import Session
+from app.models.models import Backtest, BacktestArtifact
+
+# Result series stored as artifacts rather than JSON columns
+ARTIFACT_KINDS = ('trades', 'equity_curve')
+
+ARTIFACT_FORMAT = "npz-columns-v1"
+
+# Consecutive ARTIFACT_FORMAT parts, each prefixed with its length, written by ResultSpool
+PARTS_FORMAT = "npz-parts-v1"
+
+# Length of the "YYYY-MM-DDTHH:MM:SS" prefix of an ISO timestamp
+_ISO_SECONDS = 19
+
+_MISSING = object()
+
+
+def _encode_timestamps(values: List[str]) -> Optional[Dict[str, np.ndarray]]:
+    """
+    Split ISO timestamps into naive local seconds and a categorical suffix
+
+    The suffix holds fractional seconds and the UTC offset, so decoding
+    reproduces the original strings exactly. Returns None if a value is not
+    an ISO timestamp with seconds.
+    """
+    if any(len(value) < _ISO_SECONDS or value[10] != 'T' for value in values):
+        return None
+    try:
+        local = np.array([value[:_ISO_SECONDS] for value in values], dtype='datetime64[s]')
+    except ValueError:
+        return None
+    suffixes, codes = np.unique(np.array([value[_ISO_SECONDS:] for value in values], dtype=object), return_inverse=True)
+    return {"seconds": local.astype(np.int64), "codes": codes.astype(np.int32), "categories": suffixes.tolist()}
+
+
+def _column_kind(values: List[Any]) -> str:
+    if all(isinstance(value, (bool, np.bool_)) for value in values):
+        return "bool"
+    numbers = [isinstance(value, (int, float, np.integer, np.floating)) for value in values]
+    if all(numbers) and not any(isinstance(value, (bool, np.bool_)) for value in values):
+        if all(isinstance(value, (int, np.integer)) for value in values):
+            return "int"
+        return "float"
+    if all(isinstance(value, str) for value in values):
+        return "str"
+    return "json"
+
+
+def encode_records(records: List[Dict[str, Any]]) -> bytes:
+    """
+    Encode a list of flat dicts as compressed columnar arrays
+
+    Each key becomes a typed NumPy array (float64, int64, bool, categorical
+    string or ISO timestamp); keys missing from some records are tracked with
+    a presence mask. Values of any other type fall back to JSON.
+    """
+    keys: Dict[str, None] = {}
+    for record in records:
+        keys.update(dict.fromkeys(record))
+
+    arrays: Dict[str, np.ndarray] = {}
+    columns = []
+    for i, key in enumerate(keys):
+        values = [record.get(key, _MISSING) for record in records]
+        present = np.array([value is not _MISSING for value in values], dtype=bool)
+        if not present.all():
+            values = [value for value in values if value is not _MISSING]
+            arrays[f"{i}.present"] = present
+
+        kind = _column_kind(values)
+        column = {"name": key, "kind": kind, "masked": not present.all()}
+
+        if kind == "str":
+            timestamps = _encode_timestamps(values)
+            if timestamps is not None:
+                column["kind"] = "timestamp"
+                column["categories"] = timestamps["categories"]
+                arrays[f"{i}.seconds"] = timestamps["seconds"]
+                arrays[f"{i}.codes"] = timestamps["codes"]
+            else:
+                categories, codes = np.unique(np.array(values, dtype=object), return_inverse=True)
+                column["categories"] = categories.tolist()
+                arrays[f"{i}.codes"] = codes.astype(np.int32)
+        elif kind == "bool":
+            arrays[f"{i}.values"] = np.array(values, dtype=bool)
+        elif kind == "int":
+            arrays[f"{i}.values"] = np.array(values, dtype=np.int64)
+        elif kind == "float":
+            arrays[f"{i}.values"] = np.array(values, dtype=np.float64)
+        else:
+            column["values"] = values
+
+        columns.append(column)
+
+    meta = {"format": ARTIFACT_FORMAT, "rows": len(records), "columns": columns}
+    arrays["meta"] = np.frombuffer(json.dumps(meta).encode(), dtype=np.uint8)
+
+    buffer = io.BytesIO()
+    np.savez_compressed(buffer, **arrays)
+    return buffer.getvalue()
+
+
+def _decode_arrays(data: bytes) -> Tuple[int, List[Tuple[str, np.ndarray, Optional[np.ndarray]]]]:
+    """Decode stored columns into (name, values of present rows, presence mask or None)"""
+    with np.load(io.BytesIO(data), allow_pickle=False) as arrays:
+        meta = json.loads(arrays["meta"].tobytes())
+
+        columns = []
+        for i, column in enumerate(meta["columns"]):
+            kind = column["kind"]
+            if kind == "timestamp":
+                local = arrays[f"{i}.seconds"].astype('datetime64[s]')
+                suffixes = np.array(column["categories"], dtype=object)[arrays[f"{i}.codes"]]
+                values = np.datetime_as_string(local, unit='s').astype(object) + suffixes
+            elif kind == "str":
+                values = np.array(column["categories"], dtype=object)[arrays[f"{i}.codes"]]
+            elif kind == "json":
+                values = np.empty(len(column["values"]), dtype=object)
+                for j, value in enumerate(column["values"]):
+                    values[j] = value
+            else:
+                values = arrays[f"{i}.values"]
+
+            mask = arrays[f"{i}.present"] if column["masked"] else None
+            columns.append((column["name"], values, mask))
+
+    return meta["rows"], columns
+
+
+def decode_records(data: bytes) -> List[Dict[str, Any]]:
+    """Rebuild the list of dicts encoded by encode_records"""
+    rows, decoded = _decode_arrays(data)
+    names = [name for name, _, _ in decoded]
+    masks = [mask for _, _, mask in decoded]
+
+    if all(mask is None for mask in masks):
+        columns = [values.tolist() for _, values, _ in decoded]
+        return [dict(zip(names, row)) for row in zip(*columns)] if names else [{} for _ in range(rows)]
+
+    columns = [values.tolist() if mask is None else iter(values.tolist()) for _, values, mask in decoded]
+    records = []
+    for row in range(rows):
+        record = {}
+        for name, values, mask in zip(names, columns, masks):
+            if mask is None:
+                record[name] = values[row]
+            elif mask[row]:
+                record[name] = next(values)
+        records.append(record)
+    return records
+
+
+def decode_columns(data: bytes) -> Dict[str, np.ndarray]:
+    """
+    Decode stored records as one array per key
+
+    Timestamps and strings are object arrays; rows missing a key hold None.
+    """
+    rows, decoded = _decode_arrays(data)
+    columns = {}
+    for name, values, mask in decoded:
+        if mask is not None:
+            full = np.full(rows, None, dtype=object)
+            full[mask] = values
+            values = full
+        columns[name] = values
+    return columns
+
+
+class ResultSpool:
+    """
+    Result records written to a temporary file in encoded parts as a run produces them
+
+    Out-of-core runs append the trades or equity points of every chunk and
+    drop them from memory; the file is stored as a PARTS_FORMAT artifact.
+    """
+
+    def __init__(self, directory: Optional[str] = None):
+        self.file = tempfile.TemporaryFile(prefix="backtest-results-", dir=directory)
+        self.rows = 0
+
+    def __len__(self) -> int:
+        return self.rows
+
+    def append(self, records: List[Dict[str, Any]]):
+        if not records:
+            return
+        data = encode_records(records)
+        self.file.write(len(data).to_bytes(8, 'little'))
+        self.file.write(data)
+        self.rows += len(records)
+
+    def read(self) -> bytes:
+        """Every part written so far, in PARTS_FORMAT"""
+        self.file.seek(0)
+        data = self.file.read()
+        self.file.seek(0, io.SEEK_END)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+def _parts(data: bytes) -> List[bytes]:
+    parts = []
+    offset = 0
+    while offset < len(data):
+        size = int.from_bytes(data[offset:offset + 8], 'little')
+        parts.append(data[offset + 8:offset + 8 + size])
+        offset += 8 + size
+    return parts
+
+
+def _concat_columns(parts: List[Dict[str, np.ndarray]]) -> Dict[str, np.ndarray]:
+    # Keys missing from a whole part are None in its rows, as for records missing a key
+    names = dict.fromkeys(name for columns in parts for name in columns)
+    columns = {}
+    for name in names:
+        columns[name] = np.concatenate([
+            part[name] if name in part else np.full(len(next(iter(part.values()))), None, dtype=object)
+            for part in parts
+        ])
+    return columns
+
+
+def _artifact_records(artifact: BacktestArtifact) -> List[Dict[str, Any]]:
+    if artifact.format == PARTS_FORMAT:
+        return [record for part in _parts(artifact.data) for record in decode_records(part)]
+    return decode_records(artifact.data)
+
+
+def _artifact_columns(artifact: BacktestArtifact) -> Dict[str, np.ndarray]:
+    if artifact.format == PARTS_FORMAT:
+        parts = [decode_columns(part) for part in _parts(artifact.data)]
+        return _concat_columns(parts) if parts else {}
+    return decode_columns(artifact.data)
+
+
+def save_results(db: Session, backtest: Backtest, results: Dict[str, Any]):
+    """
+    Store a run's trades and equity curve as artifacts of the backtest (committed by the caller)
+
+    Each series is a list of records, or a ResultSpool of an out-of-core run
+    which is closed once stored.
+    """
+    existing = {artifact.kind: artifact for artifact in backtest.artifacts}
+    for kind in ARTIFACT_KINDS:
+        records: Union[List[Dict[str, Any]], ResultSpool] = results.get(kind) or []
+        if isinstance(records, ResultSpool):
+            data, data_format = records.read(), PARTS_FORMAT
+            records.close()
+        else:
+            data, data_format = encode_records(records), ARTIFACT_FORMAT
+        artifact = existing.get(kind)
+        if artifact is None:
+            artifact = BacktestArtifact(kind=kind)
+            backtest.artifacts.append(artifact)
+        artifact.format = data_format
+        artifact.rows = len(records)
+        artifact.size_bytes = len(data)
+        artifact.data = data
+
+    # Results stored before artifacts existed are superseded
+    backtest.trades_json = None
+    backtest.equity_curve_json = None
+
+
+def load_results(db: Session, backtest: Backtest, kind: str) -> Optional[List[Dict[str, Any]]]:
+    """Load one result series of a backtest, falling back to the legacy JSON column"""
+    artifact = db.query(BacktestArtifact).filter(
+        BacktestArtifact.backtest_id == backtest.id,
+        BacktestArtifact.kind == kind
+    ).first()
+    if artifact is not None:
+        return _artifact_records(artifact)
+    return getattr(backtest, f"{kind}_json")
+
+
+def load_columns(db: Session, backtest: Backtest, kind: str) -> Optional[Dict[str, np.ndarray]]:
+    """Load one result series of a backtest as arrays, see decode_columns"""
+    artifact = db.query(BacktestArtifact).filter(
+        BacktestArtifact.backtest_id == backtest.id,
+        BacktestArtifact.kind == kind
+    ).first()
+    if artifact is not None:
+        return _artifact_columns(artifact)
+
+    records = getattr(backtest, f"{kind}_json")
+    if records is None:
+        return None
+    keys: Dict[str, None] = {}
+    for record in records:
+        keys.update(dict.fromkeys(record))
+    columns = {}
+    for key in keys:
+        values = [record.get(key) for record in records]
+        columns[key] = np.array(values, dtype=np.float64 if _column_kind(values) in ("int", "float") else object)
+    return columns
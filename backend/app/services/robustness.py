@@ -0,0 +1,278 @@
+import math
+import threading
+import uuid
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from datetime import datetime
+from typing import Callable, Dict, List, Any, Optional, Tuple
+from app.core.config import settings
+from app.services.process_pool import pool_context, pool_size, watch_parent
+
+# Resampling methods: closed trades drawn in a new order, and blocks of the per-bar returns
+METHODS = ("trades", "returns")
+
+# Float64 matrices of one chunk's shape alive at once while computing path statistics
+_MATRICES_PER_CHUNK = 5
+
+PERIODS_PER_YEAR = 252
+
+
+def trade_returns(actions: np.ndarray, profits: np.ndarray, initial_capital: float) -> np.ndarray:
+    """Return of each closed trade on the capital the portfolio held before it"""
+    profits = profits[actions == "SELL"].astype(np.float64)
+    capital = initial_capital + np.concatenate(([0.0], np.cumsum(profits)[:-1]))
+    return profits / capital
+
+
+def equity_returns(values: np.ndarray) -> np.ndarray:
+    """Bar-to-bar returns of an equity curve"""
+    values = values.astype(np.float64)
+    return values[1:] / values[:-1] - 1
+
+
+def resample_indices(
+    rng: np.random.Generator,
+    simulations: int,
+    length: int,
+    block_size: int = 1,
+    replace: bool = True
+) -> np.ndarray:
+    """
+    Index matrix of `simulations` resampled sequences of `length` observations
+
+    With `block_size` > 1 runs of consecutive observations are drawn
+    (circular block bootstrap), which keeps short-range autocorrelation;
+    without `replace` every row is a permutation.
+    """
+    if not replace:
+        return rng.permuted(np.broadcast_to(np.arange(length), (simulations, length)), axis=1)
+    if block_size <= 1:
+        return rng.integers(0, length, size=(simulations, length))
+    blocks = -(-length // block_size)
+    starts = rng.integers(0, length, size=(simulations, blocks, 1))
+    return ((starts + np.arange(block_size)) % length).reshape(simulations, blocks * block_size)[:, :length]
+
+
+def path_statistics(
+    returns: np.ndarray,
+    initial_capital: float,
+    sharpe: bool = True,
+    periods_per_year: int = PERIODS_PER_YEAR
+) -> Dict[str, np.ndarray]:
+    """
+    Final value, max drawdown (percent) and annualized Sharpe ratio of each row of a return matrix
+
+    Matches the definitions of BacktestingEngine.calculate_metrics, with the
+    initial capital as the first point of every path; `periods_per_year` is
+    the number of bars of the backtest's interval in a year.
+    """
+    values = initial_capital * np.cumprod(1 + returns, axis=1)
+    peaks = np.maximum(np.maximum.accumulate(values, axis=1), initial_capital)
+    stats = {
+        "final_value": values[:, -1].copy(),
+        "max_drawdown": np.minimum(((values - peaks) / peaks).min(axis=1), 0.0) * 100,
+    }
+    if sharpe:
+        if returns.shape[1] > 1:
+            std = returns.std(axis=1, ddof=1)
+            ratio = np.divide(returns.mean(axis=1), std, out=np.zeros(len(returns)), where=std > 0)
+            stats["sharpe_ratio"] = ratio * math.sqrt(periods_per_year)
+        else:
+            stats["sharpe_ratio"] = np.zeros(len(returns))
+    return stats
+
+
+def simulate_chunk(
+    method: str,
+    returns: np.ndarray,
+    initial_capital: float,
+    simulations: int,
+    seed: np.random.SeedSequence,
+    block_size: int = 1,
+    replace: bool = True,
+    periods_per_year: int = PERIODS_PER_YEAR
+) -> Dict[str, np.ndarray]:
+    """Statistics of one chunk of resampled paths, all simulated as one matrix"""
+    rng = np.random.default_rng(seed)
+    index = resample_indices(rng, simulations, len(returns), block_size, replace)
+    return path_statistics(returns[index], initial_capital, sharpe=method == "returns", periods_per_year=periods_per_year)
+
+
+def summarize(samples: np.ndarray, observed: Optional[float], confidence: float) -> Dict[str, Any]:
+    """Distribution summary with a two-sided percentile confidence interval"""
+    lower, median, upper = np.percentile(samples, [(1 - confidence) / 2 * 100, 50, (1 + confidence) / 2 * 100])
+    return {
+        "observed": observed,
+        "mean": float(samples.mean()),
+        "std": float(samples.std()),
+        "median": float(median),
+        "lower": float(lower),
+        "upper": float(upper),
+    }
+
+
+class RobustnessAnalysis:
+    """
+    Monte Carlo robustness analysis of a completed backtest
+
+    Closed trades are resampled into new sequences and the per-bar returns of
+    the equity curve are block-bootstrapped into new paths; the spread of the
+    resulting final value, max drawdown and Sharpe ratio gives confidence
+    intervals for the observed run. Simulations run as NumPy matrices in
+    chunks bounded by ROBUSTNESS_CHUNK_BYTES, optionally across processes.
+    Chunks draw from child seeds of one seed, so results depend only on the
+    seed and not on the number of workers.
+    """
+
+    def __init__(
+        self,
+        backtest_id: int,
+        initial_capital: float,
+        trades: Dict[str, np.ndarray],
+        equity_curve: Dict[str, np.ndarray],
+        observed: Dict[str, Any],
+        simulations: int = 1000,
+        block_size: Optional[int] = None,
+        trade_sampling: str = "bootstrap",
+        confidence: float = 0.95,
+        seed: Optional[int] = None,
+        periods_per_year: int = PERIODS_PER_YEAR,
+        max_workers: Optional[int] = None,
+        user_id: Optional[int] = None
+    ):
+        self.id = uuid.uuid4().hex
+        self.user_id = user_id
+        self.backtest_id = backtest_id
+        self.initial_capital = initial_capital
+        self.observed = observed
+        self.simulations = simulations
+        self.trade_sampling = trade_sampling
+        self.confidence = confidence
+        self.seed = seed if seed is not None else int(np.random.SeedSequence().entropy % 2 ** 63)
+        self.periods_per_year = periods_per_year  # Annualizes the Sharpe ratio of the backtest's bars
+        self.max_workers = pool_size(max_workers, default=1)  # 1 simulates in the job's worker process
+
+        if simulations > settings.ROBUSTNESS_MAX_SIMULATIONS:
+            raise ValueError(f"{simulations} simulations requested, the limit is {settings.ROBUSTNESS_MAX_SIMULATIONS}")
+        if trade_sampling not in ("bootstrap", "shuffle"):
+            raise ValueError("Trade sampling must be 'bootstrap' or 'shuffle'")
+
+        self.returns = {
+            "trades": trade_returns(trades.get("action", np.array([])), trades.get("profit", np.array([])), initial_capital),
+            "returns": equity_returns(equity_curve.get("value", np.array([]))),
+        }
+        if len(self.returns["trades"]) == 0 and len(self.returns["returns"]) == 0:
+            raise ValueError("Backtest has no closed trades or equity curve to resample")
+        length = len(self.returns["returns"])
+        self.block_size = block_size or max(1, round(length ** (1 / 3)))
+
+        # Progress
+        self.status = "pending"  # pending, running, completed, cancelled, failed
+        self.completed = 0
+        self.results: Dict[str, Any] = {}
+        self.error_message = None
+        self.created_at = datetime.utcnow()
+        self.completed_at = None
+        self.on_progress: Optional[Callable[[], None]] = None  # Called as chunks complete
+        self._cancel_event = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def total_simulations(self) -> int:
+        return self.simulations * sum(1 for method in METHODS if len(self.returns[method]))
+
+    def cancel(self):
+        """Request early cancellation; chunks not yet started are dropped"""
+        self._cancel_event.set()
+
+    def progress(self) -> Dict[str, Any]:
+        """Counters of the run so far"""
+        return {"total_simulations": self.total_simulations, "completed": self.completed}
+
+    def result(self) -> Dict[str, Any]:
+        """Distribution summaries of the methods simulated so far"""
+        return self.results
+
+    def _report(self):
+        if self.on_progress is not None:
+            self.on_progress()
+
+    def _tasks(self, method: str, seed: np.random.SeedSequence) -> List[Tuple]:
+        returns = self.returns[method]
+        size = max(1, min(self.simulations, settings.ROBUSTNESS_CHUNK_BYTES // (len(returns) * 8 * _MATRICES_PER_CHUNK)))
+        sizes = [min(size, self.simulations - start) for start in range(0, self.simulations, size)]
+        block_size, replace = (1, self.trade_sampling == "bootstrap") if method == "trades" else (self.block_size, True)
+        return [
+            (method, returns, self.initial_capital, count, child, block_size, replace, self.periods_per_year)
+            for count, child in zip(sizes, seed.spawn(len(sizes)))
+        ]
+
+    def _record(self, stats: Dict[str, np.ndarray], samples: Dict[str, List[np.ndarray]]):
+        for name, values in stats.items():
+            samples.setdefault(name, []).append(values)
+        with self._lock:
+            self.completed += len(stats["final_value"])
+
+    def _simulate(self, tasks: List[Tuple], executor: Optional[ProcessPoolExecutor]) -> Dict[str, np.ndarray]:
+        # Chunk results are kept in task order so a seed always yields the same samples
+        chunks: Dict[int, Dict[str, np.ndarray]] = {}
+        samples: Dict[str, List[np.ndarray]] = {}
+        if executor is None:
+            for position, task in enumerate(tasks):
+                if self._cancel_event.is_set():
+                    break
+                chunks[position] = simulate_chunk(*task)
+                self._record(chunks[position], samples)
+                self._report()
+        else:
+            futures = {executor.submit(simulate_chunk, *task): position for position, task in enumerate(tasks)}
+            pending = set(futures)
+            while pending and not self._cancel_event.is_set():
+                done, pending = wait(pending, timeout=0.5, return_when=FIRST_COMPLETED)
+                for future in done:
+                    chunks[futures[future]] = future.result()
+                    self._record(chunks[futures[future]], samples)
+                self._report()
+        return {name: np.concatenate([chunks[position][name] for position in sorted(chunks)]) for name in samples}
+
+    def _summary(self, method: str, samples: Dict[str, np.ndarray]) -> Dict[str, Any]:
+        summary: Dict[str, Any] = {"simulations": len(samples["final_value"])}
+        for name, values in samples.items():
+            summary[name] = summarize(values, self.observed.get(name), self.confidence)
+        summary["probability_of_loss"] = float((samples["final_value"] < self.initial_capital).mean() * 100)
+        if method == "trades":
+            summary["trades"] = len(self.returns[method])
+            summary["sampling"] = self.trade_sampling
+        else:
+            summary["bars"] = len(self.returns[method])
+            summary["block_size"] = self.block_size
+        return summary
+
+    def run(self) -> Dict[str, Any]:
+        """Simulate every resampling method and summarize the distributions"""
+        self.status = "running"
+        executor = None
+        try:
+            if self.max_workers > 1:
+                executor = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=pool_context(), initializer=watch_parent)
+            for method, seed in zip(METHODS, np.random.SeedSequence(self.seed).spawn(len(METHODS))):
+                if not len(self.returns[method]):
+                    continue
+                samples = self._simulate(self._tasks(method, seed), executor)
+                if self._cancel_event.is_set():
+                    break
+                self.results[method] = self._summary(method, samples)
+
+            self.status = "cancelled" if self._cancel_event.is_set() else "completed"
+
+        except Exception as e:
+            self.status = "failed"
+            self.error_message = str(e)
+
+        finally:
+            if executor is not None:
+                executor.shutdown(wait=True, cancel_futures=True)
+            self.completed_at = datetime.utcnow()
+
+        return self.results
+
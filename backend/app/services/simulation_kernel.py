@@ -0,0 +1,216 @@
+import math
+import numpy as np
+from typing import Dict, Any, Tuple
+
+try:
+    import numba
+except ImportError:  # Vectorized simulations walk the bars in Python instead
+    numba = None
+
+# Trade actions and pending orders as kernel codes
+NONE, BUY, SELL = 0, 1, -1
+
+# Columns of the kernel's trade matrix
+TRADE_FIELDS = ("bar", "action", "price", "shares", "amount", "commission", "profit", "profit_pct")
+_TRADE_COLUMNS = len(TRADE_FIELDS)
+
+
+def available() -> bool:
+    """Whether the compiled kernel can run"""
+    return numba is not None
+
+
+def _impact(shares, volume, volume_slippage):
+    # ExecutionModel.impact for one order
+    participation = shares / volume if volume > 0 else 0.0
+    if participation > 1.0:
+        participation = 1.0
+    return volume_slippage * math.sqrt(participation)
+
+
+def _affordable(budget, price, volume, commission_fixed, commission_rate, max_volume_fraction, fractional):
+    # ExecutionModel._affordable for one order; a NaN volume fraction means no cap
+    shares = (budget - commission_fixed) / (price * (1 + commission_rate))
+    if not math.isnan(max_volume_fraction):
+        cap = volume * max_volume_fraction
+        if math.isnan(cap):
+            cap = math.inf
+        if cap < shares:
+            shares = cap
+    if shares < 0.0:
+        shares = 0.0
+    return shares if fractional else np.floor(shares)
+
+
+def _order(
+    trades, count, idx, action, price, volume, cash, position, entry_price, entry_cost,
+    position_size, commission_fixed, commission_rate, max_volume_fraction, volume_slippage, fractional
+):
+    # BacktestingEngine.execute_trade step for step, so fills match it bit for bit
+    if action == BUY and position == 0:
+        budget = cash * (position_size / 100)
+        shares = _affordable(budget, price, volume, commission_fixed, commission_rate, max_volume_fraction, fractional)
+        if volume_slippage > 0.0:
+            price = price * (1 + _impact(shares, volume, volume_slippage))
+            shares = _affordable(budget, price, volume, commission_fixed, commission_rate, max_volume_fraction, fractional)
+        if shares > 0:
+            commission = commission_fixed + shares * price * commission_rate
+            cost = shares * price + commission
+            cash -= cost
+            position = shares
+            entry_price = price
+            entry_cost = cost
+            trades[count, 0] = idx
+            trades[count, 1] = BUY
+            trades[count, 2] = price
+            trades[count, 3] = shares
+            trades[count, 4] = cost
+            trades[count, 5] = commission
+            trades[count, 6] = 0.0
+            trades[count, 7] = 0.0
+            count += 1
+
+    elif action == SELL and position > 0:
+        if volume_slippage > 0.0:
+            price = price * (1 - _impact(position, volume, volume_slippage))
+        commission = commission_fixed + position * price * commission_rate
+        proceeds = position * price - commission
+        cash += proceeds
+        profit = proceeds - entry_cost
+        trades[count, 0] = idx
+        trades[count, 1] = SELL
+        trades[count, 2] = price
+        trades[count, 3] = position
+        trades[count, 4] = proceeds
+        trades[count, 5] = commission
+        trades[count, 6] = profit
+        trades[count, 7] = (profit / entry_cost) * 100
+        count += 1
+        position = 0.0
+        entry_price = math.nan
+        entry_cost = 0.0
+
+    return count, cash, position, entry_price, entry_cost
+
+
+def _simulate(
+    closes, buy_prices, sell_prices, volumes, buy_signals, sell_signals, start,
+    cash, position, entry_price, entry_cost, pending,
+    position_size, stop_loss, take_profit, check_sells, next_open,
+    commission_fixed, commission_rate, max_volume_fraction, volume_slippage, fractional
+):
+    n = len(closes)
+    values = np.empty(n - start)
+    cash_values = np.empty(n - start)
+    position_values = np.empty(n - start)
+    # A pending fill at the open and a fill at the close can happen on the same bar
+    trades = np.empty((2 * (n - start), _TRADE_COLUMNS))
+    count = 0
+
+    for idx in range(start, n):
+        close = closes[idx]
+
+        if pending != NONE:
+            price = sell_prices[idx] if pending == SELL else buy_prices[idx]
+            count, cash, position, entry_price, entry_cost = _order(
+                trades, count, idx, pending, price, volumes[idx], cash, position, entry_price, entry_cost,
+                position_size, commission_fixed, commission_rate, max_volume_fraction, volume_slippage, fractional
+            )
+            pending = NONE
+
+        position_value = position * close if position > 0 else 0.0
+        values[idx - start] = cash + position_value
+        cash_values[idx - start] = cash
+        position_values[idx - start] = position_value
+
+        action = NONE
+        if position > 0 and entry_price != 0.0:
+            if check_sells:
+                if stop_loss != 0.0 and close <= entry_price * (1 - stop_loss / 100):
+                    action = SELL
+                elif take_profit != 0.0 and close >= entry_price * (1 + take_profit / 100):
+                    action = SELL
+                elif sell_signals[idx]:
+                    action = SELL
+        elif position == 0 and buy_signals[idx]:
+            action = BUY
+
+        if action != NONE:
+            if next_open:
+                pending = action
+            else:
+                price = sell_prices[idx] if action == SELL else buy_prices[idx]
+                count, cash, position, entry_price, entry_cost = _order(
+                    trades, count, idx, action, price, volumes[idx], cash, position, entry_price, entry_cost,
+                    position_size, commission_fixed, commission_rate, max_volume_fraction, volume_slippage, fractional
+                )
+
+    return values, cash_values, position_values, trades[:count], cash, position, entry_price, entry_cost, pending
+
+
+if numba is not None:
+    # Cached on disk, so workers load the compiled kernel instead of compiling it again
+    _impact = numba.njit(cache=True)(_impact)
+    _affordable = numba.njit(cache=True)(_affordable)
+    _order = numba.njit(cache=True)(_order)
+    _simulate = numba.njit(cache=True)(_simulate)
+
+
+def simulate(
+    closes: np.ndarray,
+    buy_prices: np.ndarray,
+    sell_prices: np.ndarray,
+    volumes: np.ndarray,
+    buy_signals: np.ndarray,
+    sell_signals: np.ndarray,
+    start: int,
+    state: Dict[str, Any],
+    rules: Dict[str, Any],
+    execution
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, Dict[str, Any]]:
+    """
+    Walk the position state machine over float64 arrays of every bar
+
+    Mirrors BacktestingEngine.simulate_vectorized step for step, including
+    the order of floating point operations, so trades and equity match the
+    Python loop bit for bit.
+
+    Args:
+        closes, buy_prices, sell_prices, volumes: Per-bar float64 arrays;
+            volumes are NaN when fills ignore volume
+        buy_signals, sell_signals: Per-bar boolean arrays
+        start: First simulated bar; earlier bars are history only
+        state: cash, position, entry_price, entry_cost and pending_order
+        rules: position_size, stop_loss, take_profit and check_sells
+        execution: The strategy's ExecutionModel
+
+    Returns:
+        Value, cash and position value per simulated bar, the trade matrix
+        (columns in TRADE_FIELDS, amount being a buy's cost or a sell's
+        proceeds) and the state after the last bar
+    """
+    max_volume_fraction = execution.max_volume_fraction
+    pending = {"BUY": BUY, "SELL": SELL}.get(state["pending_order"], NONE)
+    entry_price = state["entry_price"]
+    # Fixed dtypes and layouts, so every call reuses the one compiled signature
+    prices = (np.ascontiguousarray(values, dtype=np.float64) for values in (closes, buy_prices, sell_prices, volumes))
+    signals = (np.ascontiguousarray(values, dtype=np.bool_) for values in (buy_signals, sell_signals))
+    result = _simulate(
+        *prices, *signals, int(start),
+        float(state["cash"]), float(state["position"]), math.nan if entry_price is None else float(entry_price),
+        float(state["entry_cost"]), pending,
+        float(rules["position_size"]), float(rules["stop_loss"] or 0.0), float(rules["take_profit"] or 0.0),
+        bool(rules["check_sells"]), bool(execution.next_open),
+        execution.commission_fixed, execution.commission_rate,
+        math.nan if max_volume_fraction is None else float(max_volume_fraction),
+        execution.volume_slippage, bool(execution.fractional)
+    )
+    values, cash_values, position_values, trades, cash, position, entry_price, entry_cost, pending = result
+    state = {
+        "cash": cash,
+        "position": position,
+        "entry_price": None if position == 0 else entry_price,
+        "entry_cost": entry_cost,
+        "pending_order": {BUY: "BUY", SELL: "SELL"}.get(pending),
+    }
+    return values, cash_values, position_values, trades, state
@@ -0,0 +1,595 @@
+import math
+import sys
+import pandas as pd
+from typing import Dict, List, Any, Optional
+
+NAN = float('nan')
+
+# pandas 3 dropped the repeated-value shortcut of rolling variance and instead
+# recomputes a window whose running sums became ill-conditioned
+_RECOMPUTE_UNSTABLE_VARIANCE = int(pd.__version__.split('.')[0]) >= 3
+_INV_COND_TOL = sys.float_info.epsilon * 1e3
+
+
+def _signbit(value: float) -> bool:
+    return math.copysign(1.0, value) < 0
+
+
+def _json_float(value: float) -> Optional[float]:
+    # NaN is not valid JSON, so snapshots store it as null
+    return None if value != value else value
+
+
+def _float(value: Optional[float]) -> float:
+    return NAN if value is None else value
+
+
+class StreamingIndicator:
+    """
+    Indicator updated one bar at a time in constant time
+
+    Subclasses replay the arithmetic of the pandas formulas used by
+    IndicatorCalculator operation for operation, so feeding a series bar by
+    bar yields exactly the values pandas computes over the whole series.
+    State lives in fixed-size slots and ring buffers; `snapshot()` returns it
+    as JSON-safe data and `restore()` rebuilds an identical indicator.
+    """
+
+    __slots__ = ()
+
+    kind = ""
+
+    def update(self, value: float) -> float:
+        raise NotImplementedError
+
+    def replay(self, values: List[float]) -> float:
+        """Advance over several values as `update` would, returning the last output"""
+        output = NAN
+        for value in values:
+            output = self.update(value)
+        return output
+
+    def snapshot(self) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    @staticmethod
+    def restore(snapshot: Dict[str, Any]) -> "StreamingIndicator":
+        return INDICATOR_TYPES[snapshot["kind"]]._from_snapshot(snapshot)
+
+    @classmethod
+    def _from_snapshot(cls, snapshot: Dict[str, Any]) -> "StreamingIndicator":
+        raise NotImplementedError
+
+
+class _Window:
+    """Ring buffer of the last `size` values, preallocated"""
+
+    __slots__ = ("values", "size", "position", "count")
+
+    def __init__(self, size: int):
+        self.values = [NAN] * size
+        self.size = size
+        self.position = 0
+        self.count = 0
+
+    def push(self, value: float) -> float:
+        """Store a value, returning the one leaving the window (NaN while filling)"""
+        evicted = self.values[self.position] if self.count >= self.size else NAN
+        self.values[self.position] = value
+        self.position = (self.position + 1) % self.size
+        self.count += 1
+        return evicted
+
+    def ordered(self) -> List[float]:
+        """Values in the window, oldest first"""
+        if self.count < self.size:
+            return self.values[:self.count]
+        return self.values[self.position:] + self.values[:self.position]
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"values": [_json_float(value) for value in self.values], "position": self.position, "count": self.count}
+
+    @classmethod
+    def from_snapshot(cls, size: int, snapshot: Dict[str, Any]) -> "_Window":
+        window = cls(size)
+        window.values = [_float(value) for value in snapshot["values"]]
+        window.position = snapshot["position"]
+        window.count = snapshot["count"]
+        return window
+
+
+class StreamingSMA(StreamingIndicator):
+    """`Series.rolling(window).mean()`: Kahan-compensated running sum"""
+
+    __slots__ = ("window", "buffer", "nobs", "sum", "neg_count", "add_compensation", "remove_compensation",
+                 "same_count", "previous")
+
+    kind = "sma"
+
+    def __init__(self, window: int):
+        self.window = window
+        self.buffer = _Window(window)
+        self.nobs = 0
+        self.sum = 0.0
+        self.neg_count = 0
+        self.add_compensation = 0.0
+        self.remove_compensation = 0.0
+        self.same_count = 0  # Run length of the latest value, which pandas returns exactly
+        self.previous = NAN
+
+    def update(self, value: float) -> float:
+        first = self.buffer.count == 0
+        evicted = self.buffer.push(value)
+
+        if evicted == evicted:
+            self.nobs -= 1
+            y = -evicted - self.remove_compensation
+            t = self.sum + y
+            self.remove_compensation = t - self.sum - y
+            self.sum = t
+            if _signbit(evicted):
+                self.neg_count -= 1
+
+        if first:
+            self.previous = value
+        if value == value:
+            self.nobs += 1
+            y = value - self.add_compensation
+            t = self.sum + y
+            self.add_compensation = t - self.sum - y
+            self.sum = t
+            if _signbit(value):
+                self.neg_count += 1
+            self.same_count = self.same_count + 1 if value == self.previous else 1
+            self.previous = value
+
+        return self._output()
+
+    def replay(self, values: List[float]) -> float:
+        # The arithmetic of update with the state in locals, for warming up on long histories
+        window, ring = self.window, self.buffer.values
+        position, count = self.buffer.position, self.buffer.count
+        nobs, total, neg_count = self.nobs, self.sum, self.neg_count
+        add_compensation, remove_compensation = self.add_compensation, self.remove_compensation
+        same_count, previous = self.same_count, self.previous
+        copysign = math.copysign
+
+        for value in values:
+            if count == 0:
+                previous = value
+            evicted = ring[position] if count >= window else NAN
+            ring[position] = value
+            position = position + 1 if position + 1 < window else 0
+            count += 1
+
+            if evicted == evicted:
+                nobs -= 1
+                y = -evicted - remove_compensation
+                t = total + y
+                remove_compensation = t - total - y
+                total = t
+                if copysign(1.0, evicted) < 0:
+                    neg_count -= 1
+
+            if value == value:
+                nobs += 1
+                y = value - add_compensation
+                t = total + y
+                add_compensation = t - total - y
+                total = t
+                if copysign(1.0, value) < 0:
+                    neg_count += 1
+                same_count = same_count + 1 if value == previous else 1
+                previous = value
+
+        self.buffer.position, self.buffer.count = position, count
+        self.nobs, self.sum, self.neg_count = nobs, total, neg_count
+        self.add_compensation, self.remove_compensation = add_compensation, remove_compensation
+        self.same_count, self.previous = same_count, previous
+        return self._output() if values else NAN
+
+    def _output(self) -> float:
+        if self.nobs >= self.window:
+            result = self.sum / self.nobs
+            if self.same_count >= self.nobs:
+                return self.previous
+            if self.neg_count == 0 and result < 0:
+                return 0.0
+            if self.neg_count == self.nobs and result > 0:
+                return 0.0
+            return result
+        return NAN
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "kind": self.kind,
+            "window": self.window,
+            "buffer": self.buffer.snapshot(),
+            "state": [self.nobs, self.sum, self.neg_count, self.add_compensation, self.remove_compensation,
+                      self.same_count, _json_float(self.previous)],
+        }
+
+    @classmethod
+    def _from_snapshot(cls, snapshot: Dict[str, Any]) -> "StreamingSMA":
+        indicator = cls(snapshot["window"])
+        indicator.buffer = _Window.from_snapshot(indicator.window, snapshot["buffer"])
+        (indicator.nobs, indicator.sum, indicator.neg_count, indicator.add_compensation,
+         indicator.remove_compensation, indicator.same_count, previous) = snapshot["state"]
+        indicator.previous = _float(previous)
+        return indicator
+
+
+class StreamingStd(StreamingIndicator):
+    """`Series.rolling(window).std()`: Welford running variance with Kahan compensation"""
+
+    __slots__ = ("window", "buffer", "nobs", "mean", "ssqdm", "add_compensation", "remove_compensation",
+                 "same_count", "previous", "unstable")
+
+    kind = "std"
+
+    def __init__(self, window: int):
+        self.window = window
+        self.buffer = _Window(window)
+        self.nobs = 0.0
+        self.mean = 0.0
+        self.ssqdm = 0.0  # Sum of squared differences from the mean
+        self.add_compensation = 0.0
+        self.remove_compensation = 0.0
+        self.same_count = 0
+        self.previous = NAN
+        self.unstable = False  # Set when an update lost most significant digits
+
+    def _add(self, value: float):
+        if value != value:
+            return
+        self.nobs += 1
+        self.same_count = self.same_count + 1 if value == self.previous else 1
+        self.previous = value
+        previous_ssqdm = self.ssqdm
+        previous_mean = self.mean - self.add_compensation
+        y = value - self.add_compensation
+        t = y - self.mean
+        self.add_compensation = t + self.mean - y
+        self.mean = self.mean + t / self.nobs
+        self.ssqdm = self.ssqdm + (value - previous_mean) * (value - self.mean)
+        if previous_ssqdm * _INV_COND_TOL > self.ssqdm:
+            self.unstable = True
+
+    def _remove(self, value: float):
+        if value != value:
+            return
+        self.nobs -= 1
+        if self.nobs:
+            previous_ssqdm = self.ssqdm
+            previous_mean = self.mean - self.remove_compensation
+            y = value - self.remove_compensation
+            t = y - self.mean
+            self.remove_compensation = t + self.mean - y
+            self.mean = self.mean - t / self.nobs
+            self.ssqdm = self.ssqdm - (value - previous_mean) * (value - self.mean)
+            if previous_ssqdm * _INV_COND_TOL > self.ssqdm:
+                self.unstable = True
+        else:
+            self.mean = 0.0
+            self.ssqdm = 0.0
+            self.unstable = False
+
+    def update(self, value: float) -> float:
+        if self.buffer.count == 0:
+            self.previous = value
+        self._remove(self.buffer.push(value))
+        self._add(value)
+
+        if _RECOMPUTE_UNSTABLE_VARIANCE and self.unstable:
+            # pandas >= 3 restarts the window's sums after catastrophic cancellation
+            self.nobs = self.mean = self.ssqdm = self.add_compensation = self.remove_compensation = 0.0
+            for held in self.buffer.ordered():
+                self._add(held)
+        self.unstable = False
+
+        if self.nobs >= self.window and self.nobs > 1:
+            if not _RECOMPUTE_UNSTABLE_VARIANCE and self.same_count >= self.nobs:
+                return 0.0
+            variance = self.ssqdm / (self.nobs - 1.0)
+            return math.sqrt(variance) if variance >= 0 else 0.0
+        return NAN
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "kind": self.kind,
+            "window": self.window,
+            "buffer": self.buffer.snapshot(),
+            "state": [self.nobs, self.mean, self.ssqdm, self.add_compensation, self.remove_compensation,
+                      self.same_count, _json_float(self.previous)],
+        }
+
+    @classmethod
+    def _from_snapshot(cls, snapshot: Dict[str, Any]) -> "StreamingStd":
+        indicator = cls(snapshot["window"])
+        indicator.buffer = _Window.from_snapshot(indicator.window, snapshot["buffer"])
+        (indicator.nobs, indicator.mean, indicator.ssqdm, indicator.add_compensation,
+         indicator.remove_compensation, indicator.same_count, previous) = snapshot["state"]
+        indicator.previous = _float(previous)
+        return indicator
+
+
+class StreamingEMA(StreamingIndicator):
+    """`Series.ewm(span=span).mean()`: pandas' adjusted EWM recurrence"""
+
+    __slots__ = ("span", "factor", "weighted", "weight", "nobs")
+
+    kind = "ema"
+
+    def __init__(self, span: int):
+        self.span = span
+        self.factor = 1.0 - 2.0 / (span + 1.0)
+        self.weighted = NAN
+        self.weight = 1.0
+        self.nobs = 0
+
+    def update(self, value: float) -> float:
+        observed = value == value
+        self.nobs += observed
+        if self.weighted == self.weighted:
+            self.weight *= self.factor
+            if observed:
+                if self.weighted != value:
+                    self.weighted = (self.weight * self.weighted + value) / (self.weight + 1.0)
+                self.weight += 1.0
+        elif observed:
+            self.weighted = value
+        return self.weighted if self.nobs else NAN
+
+    @classmethod
+    def from_series(cls, values: List[float], output: float, span: int) -> "StreamingEMA":
+        """
+        EMA positioned after a whole series, given the series and its last EWM value
+
+        Avoids replaying the average: the carried weight only depends on which
+        bars were observed after the first observation.
+        """
+        indicator = cls(span)
+        observed = [value == value for value in values]
+        if True not in observed:
+            return indicator
+        for bar_observed in observed[observed.index(True) + 1:]:
+            indicator.weight *= indicator.factor
+            if bar_observed:
+                indicator.weight += 1.0
+        indicator.weighted = output
+        indicator.nobs = sum(observed)
+        return indicator
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"kind": self.kind, "span": self.span, "state": [_json_float(self.weighted), self.weight, self.nobs]}
+
+    @classmethod
+    def _from_snapshot(cls, snapshot: Dict[str, Any]) -> "StreamingEMA":
+        indicator = cls(snapshot["span"])
+        weighted, indicator.weight, indicator.nobs = snapshot["state"]
+        indicator.weighted = _float(weighted)
+        return indicator
+
+
+class StreamingRSI(StreamingIndicator):
+    """RSI from rolling means of gains and losses, as IndicatorCalculator.rsi"""
+
+    __slots__ = ("period", "gain", "loss", "last_close")
+
+    kind = "rsi"
+
+    def __init__(self, period: int):
+        self.period = period
+        self.gain = StreamingSMA(period)
+        self.loss = StreamingSMA(period)
+        self.last_close = NAN
+
+    def update(self, value: float) -> float:
+        # The first difference is NaN, which pandas' where() turns into a zero gain and loss
+        delta = value - self.last_close
+        self.last_close = value
+        gain = self.gain.update(delta if delta > 0 else 0.0)
+        loss = self.loss.update(-(delta if delta < 0 else 0.0))
+        return self._rsi(gain, loss)
+
+    def replay(self, values: List[float]) -> float:
+        if not values:
+            return NAN
+        deltas = [value - previous for previous, value in zip([self.last_close] + values[:-1], values)]
+        self.last_close = values[-1]
+        gain = self.gain.replay([delta if delta > 0 else 0.0 for delta in deltas])
+        loss = self.loss.replay([-(delta if delta < 0 else 0.0) for delta in deltas])
+        return self._rsi(gain, loss)
+
+    @staticmethod
+    def _rsi(gain: float, loss: float) -> float:
+        # NumPy division semantics: x/0 is +-inf, 0/0 and NaN propagate
+        if loss == 0:
+            rs = NAN if gain == 0 or gain != gain else math.copysign(math.inf, gain) * math.copysign(1.0, loss)
+        else:
+            rs = gain / loss
+        return 100 - (100 / (1 + rs))
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "kind": self.kind,
+            "period": self.period,
+            "gain": self.gain.snapshot(),
+            "loss": self.loss.snapshot(),
+            "last_close": _json_float(self.last_close),
+        }
+
+    @classmethod
+    def _from_snapshot(cls, snapshot: Dict[str, Any]) -> "StreamingRSI":
+        indicator = cls(snapshot["period"])
+        indicator.gain = StreamingSMA._from_snapshot(snapshot["gain"])
+        indicator.loss = StreamingSMA._from_snapshot(snapshot["loss"])
+        indicator.last_close = _float(snapshot["last_close"])
+        return indicator
+
+
+class StreamingMACD(StreamingIndicator):
+    """MACD line, signal line and histogram; `update` returns the MACD line"""
+
+    __slots__ = ("fast", "slow", "signal", "macd", "macd_signal")
+
+    kind = "macd"
+
+    def __init__(self, fast: int, slow: int, signal: int = 9):
+        self.fast = StreamingEMA(fast)
+        self.slow = StreamingEMA(slow)
+        self.signal = StreamingEMA(signal)
+        self.macd = NAN
+        self.macd_signal = NAN
+
+    def update(self, value: float) -> float:
+        self.macd = self.fast.update(value) - self.slow.update(value)
+        self.macd_signal = self.signal.update(self.macd)
+        return self.macd
+
+    @property
+    def histogram(self) -> float:
+        return self.macd - self.macd_signal
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "kind": self.kind,
+            "fast": self.fast.snapshot(),
+            "slow": self.slow.snapshot(),
+            "signal": self.signal.snapshot(),
+            "values": [_json_float(self.macd), _json_float(self.macd_signal)],
+        }
+
+    @classmethod
+    def _from_snapshot(cls, snapshot: Dict[str, Any]) -> "StreamingMACD":
+        indicator = cls(snapshot["fast"]["span"], snapshot["slow"]["span"], snapshot["signal"]["span"])
+        indicator.fast = StreamingEMA._from_snapshot(snapshot["fast"])
+        indicator.slow = StreamingEMA._from_snapshot(snapshot["slow"])
+        indicator.signal = StreamingEMA._from_snapshot(snapshot["signal"])
+        indicator.macd, indicator.macd_signal = (_float(value) for value in snapshot["values"])
+        return indicator
+
+
+class StreamingBollinger(StreamingIndicator):
+    """Bollinger Bands from a rolling mean and running variance; `update` returns the middle band"""
+
+    __slots__ = ("std_dev", "middle_band", "deviation", "middle", "std")
+
+    kind = "bollinger"
+
+    def __init__(self, period: int, std_dev: float = 2):
+        self.std_dev = std_dev
+        self.middle_band = StreamingSMA(period)
+        self.deviation = StreamingStd(period)
+        self.middle = NAN
+        self.std = NAN
+
+    def update(self, value: float) -> float:
+        self.middle = self.middle_band.update(value)
+        self.std = self.deviation.update(value)
+        return self.middle
+
+    def replay(self, values: List[float]) -> float:
+        if values:
+            self.middle = self.middle_band.replay(values)
+            self.std = self.deviation.replay(values)
+        return self.middle
+
+    @property
+    def upper(self) -> float:
+        return self.middle + (self.std * self.std_dev)
+
+    @property
+    def lower(self) -> float:
+        return self.middle - (self.std * self.std_dev)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "kind": self.kind,
+            "std_dev": self.std_dev,
+            "middle": self.middle_band.snapshot(),
+            "std": self.deviation.snapshot(),
+            "values": [_json_float(self.middle), _json_float(self.std)],
+        }
+
+    @classmethod
+    def _from_snapshot(cls, snapshot: Dict[str, Any]) -> "StreamingBollinger":
+        indicator = cls(snapshot["middle"]["window"], snapshot["std_dev"])
+        indicator.middle_band = StreamingSMA._from_snapshot(snapshot["middle"])
+        indicator.deviation = StreamingStd._from_snapshot(snapshot["std"])
+        indicator.middle, indicator.std = (_float(value) for value in snapshot["values"])
+        return indicator
+
+
+INDICATOR_TYPES = {
+    indicator.kind: indicator
+    for indicator in (StreamingSMA, StreamingStd, StreamingEMA, StreamingRSI, StreamingMACD, StreamingBollinger)
+}
+
+
+class StreamingIndicatorSet:
+    """
+    Streaming counterpart of compute_indicator_columns
+
+    Builds the indicators requested by strategy parameters and updates them
+    together, producing one value per indicator column for each new close.
+    """
+
+    __slots__ = ("indicators",)
+
+    def __init__(self, params: Optional[Dict[str, Any]] = None):
+        params = params or {}
+        self.indicators: Dict[str, StreamingIndicator] = {}
+
+        if 'sma_short' in params:
+            self.indicators['SMA_SHORT'] = StreamingSMA(params['sma_short'])
+        if 'sma_long' in params:
+            self.indicators['SMA_LONG'] = StreamingSMA(params['sma_long'])
+        if 'ema_short' in params:
+            self.indicators['EMA_SHORT'] = StreamingEMA(params['ema_short'])
+        if 'ema_long' in params:
+            self.indicators['EMA_LONG'] = StreamingEMA(params['ema_long'])
+        if 'rsi_period' in params:
+            self.indicators['RSI'] = StreamingRSI(params['rsi_period'])
+        if 'macd_fast' in params and 'macd_slow' in params:
+            self.indicators['MACD'] = StreamingMACD(params['macd_fast'], params['macd_slow'], params.get('macd_signal', 9))
+        if 'bb_period' in params:
+            self.indicators['BB'] = StreamingBollinger(params['bb_period'], params.get('bb_std', 2))
+
+    def update(self, close: float) -> Dict[str, float]:
+        """Advance every indicator by one bar and return the new column values"""
+        values = {}
+        for name, indicator in self.indicators.items():
+            value = indicator.update(close)
+            if name == 'MACD':
+                values['MACD'] = value
+                values['MACD_SIGNAL'] = indicator.macd_signal
+                values['MACD_HIST'] = indicator.histogram
+            elif name == 'BB':
+                values['BB_MIDDLE'] = value
+                values['BB_STD'] = indicator.std
+                values['BB_UPPER'] = indicator.upper
+                values['BB_LOWER'] = indicator.lower
+            else:
+                values[name] = value
+        return values
+
+    def run(self, closes: List[float]) -> Dict[str, List[float]]:
+        """Advance over several bars, returning one list of values per column"""
+        columns: Dict[str, List[float]] = {}
+        for i, close in enumerate(closes):
+            for name, value in self.update(close).items():
+                column = columns.get(name)
+                if column is None:
+                    column = columns[name] = [NAN] * len(closes)
+                column[i] = value
+        return columns
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {name: indicator.snapshot() for name, indicator in self.indicators.items()}
+
+    @classmethod
+    def restore(cls, snapshot: Dict[str, Any]) -> "StreamingIndicatorSet":
+        indicator_set = cls()
+        indicator_set.indicators = {name: StreamingIndicator.restore(state) for name, state in snapshot.items()}
+        return indicator_set
@@ -0,0 +1,108 @@
+import math
+import numpy as np
+import pandas as pd
+from typing import Dict, Any, Optional
+
+TRADING_DAYS_PER_YEAR = 252
+SESSION_MINUTES = 390  # Regular US equity session, 09:30-16:00
+
+# Nominal minutes per bar of every supported interval
+INTERVAL_MINUTES = {
+    "1m": 1,
+    "5m": 5,
+    "15m": 15,
+    "30m": 30,
+    "1h": 60,
+    "60m": 60,
+    "1d": 1440,
+    "1wk": 7 * 1440,
+    "1mo": 30 * 1440,
+}
+
+# pandas resampling rule of every interval; weeks end on Friday like trading weeks
+RESAMPLE_RULES = {
+    "1m": "1min",
+    "5m": "5min",
+    "15m": "15min",
+    "30m": "30min",
+    "1h": "1h",
+    "60m": "1h",
+    "1d": "1D",
+    "1wk": "W-FRI",
+    "1mo": "MS",
+}
+
+
+def validate_interval(interval: str) -> str:
+    if interval not in INTERVAL_MINUTES:
+        raise ValueError(f"Unknown interval {interval!r}; expected one of {', '.join(INTERVAL_MINUTES)}")
+    return interval
+
+
+def periods_per_year(interval: str) -> int:
+    """
+    Bars per year of an interval, for annualizing Sharpe ratios and volatility
+
+    Intraday bars count the bars of one regular session (a partial last bar
+    counts, as providers return it) over 252 trading days.
+    """
+    minutes = INTERVAL_MINUTES[validate_interval(interval)]
+    if interval == "1wk":
+        return 52
+    if interval == "1mo":
+        return 12
+    if minutes >= 1440:
+        return TRADING_DAYS_PER_YEAR
+    return TRADING_DAYS_PER_YEAR * math.ceil(SESSION_MINUTES / minutes)
+
+
+def higher_timeframes(params: Dict[str, Any], interval: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    Indicator parameters of each higher timeframe in strategy parameters
+
+    Strategy parameters may hold {"timeframes": {"1d": {"sma_long": 50}}};
+    each timeframe must be coarser than the bar interval it is used on, which
+    is only checked when `interval` is given.
+    """
+    timeframes = params.get("timeframes") or {}
+    if not isinstance(timeframes, dict):
+        raise ValueError("timeframes must map intervals to indicator parameters")
+    for timeframe, timeframe_params in timeframes.items():
+        validate_interval(timeframe)
+        if interval is not None and INTERVAL_MINUTES[timeframe] <= INTERVAL_MINUTES[validate_interval(interval)]:
+            raise ValueError(f"Timeframe {timeframe} is not coarser than the {interval} bars it is used on")
+        if not isinstance(timeframe_params, dict):
+            raise ValueError(f"Parameters of timeframe {timeframe} must be an object")
+    return timeframes
+
+
+def timeframe_column(name: str, timeframe: str) -> str:
+    """Name of an indicator column computed on a higher timeframe, e.g. SMA_LONG_1D"""
+    return f"{name}_{timeframe.upper()}"
+
+
+def completed_bars(index: pd.DatetimeIndex, timeframe: str) -> np.ndarray:
+    """
+    Position of the last bar of every higher-timeframe bar in a bar index
+
+    Higher-timeframe bars are the buckets the timestamps resample into (in
+    the index's own timezone, so days are trading days); a bucket's close is
+    the close of its last bar, known once that bar has closed.
+    """
+    positions = pd.Series(np.arange(len(index)), index=index).resample(RESAMPLE_RULES[timeframe]).max()
+    return positions.dropna().to_numpy(dtype=np.int64)
+
+
+def as_of(values: np.ndarray, ends: np.ndarray, length: int) -> np.ndarray:
+    """
+    Align higher-timeframe values to the bars they were known on
+
+    Bar i sees the latest higher-timeframe bar whose last bar is at or before
+    i, so no value is used before the bar that completes it (no look-ahead);
+    bars before the first completed bucket are NaN. `ends` is sorted, so the
+    join is one binary search per bar.
+    """
+    latest = np.searchsorted(ends, np.arange(length), side='right') - 1
+    aligned = np.asarray(values, dtype=np.float64)[np.maximum(latest, 0)]
+    aligned[latest < 0] = np.nan
+    return aligned
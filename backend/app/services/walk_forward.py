@@ -0,0 +1,373 @@
+import math
+import threading
+import uuid
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from datetime import datetime
+from typing import Callable, Dict, List, Any, Optional, Tuple
+from app.core.config import settings
+from app.models.models import Strategy
+from app.services.backtesting_engine import BacktestingEngine
+from app.services.market_data_service import MarketDataService
+from app.services.optimizer import MAX_CHUNK_SIZE, build_strategy, expand_parameter_ranges, strategy_snapshot
+from app.services.process_pool import SharedMarketData, init_worker, pool_context, pool_size, worker_state
+from app.services.timeframes import higher_timeframes
+
+
+def walk_forward_windows(
+    index: pd.DatetimeIndex,
+    train_days: int,
+    test_days: int,
+    anchored: bool = False
+) -> List[Dict[str, int]]:
+    """
+    Split a bar index into consecutive train/test windows
+
+    Each test window covers the `test_days` after its train window and the
+    next window starts one test window later, so test windows tile the range
+    without overlapping. Rolling train windows span `train_days`; anchored
+    ones all start at the first bar. The last test window may be shorter.
+
+    Returns:
+        Positional [start, end) bounds of each window's train and test bars
+    """
+    if train_days <= 0 or test_days <= 0:
+        raise ValueError("Train and test windows must be at least one day")
+    if len(index) == 0:
+        return []
+
+    first = index[0]
+    train_span = pd.Timedelta(days=train_days)
+    test_span = pd.Timedelta(days=test_days)
+    windows = []
+    step = 0
+    while True:
+        train_start = first if anchored else first + step * test_span
+        train_end = first + train_span + step * test_span
+        if train_end > index[-1]:
+            break
+        bounds = index.searchsorted([train_start, train_end, train_end + test_span])
+        train_lo, test_lo, test_hi = (int(bound) for bound in bounds)
+        if test_lo > train_lo and test_hi > test_lo:
+            windows.append({"train_start": train_lo, "train_end": test_lo, "test_start": test_lo, "test_end": test_hi})
+        step += 1
+    return windows
+
+
+def simulate_window(frame: pd.DataFrame, strategy: Strategy, start: int, end: int, interval: str = "1d") -> BacktestingEngine:
+    """
+    Simulate bars [start, end) of a frame with indicators on a fresh engine
+
+    Indicators are causal, so they are computed once over the whole frame;
+    the bar before `start` is kept as history for crossover conditions and
+    any position open at `end` is closed on the window's last bar.
+    """
+    engine = BacktestingEngine(strategy, None, None, vectorized=True, interval=interval)
+    history = 1 if start > 0 else 0
+    engine.simulate(frame.iloc[start - history:end], start=history)
+    return engine
+
+
+def _indicator_frame(df: pd.DataFrame, strategy: Strategy, interval: str) -> pd.DataFrame:
+    engine = BacktestingEngine(strategy, None, None, vectorized=True, market_data=df, interval=interval)
+    return engine.calculate_indicators(engine.fetch_market_data())
+
+
+def _train_chunk(
+    chunk: List[Tuple[int, Dict[str, Any]]],
+    windows: List[Dict[str, int]]
+) -> List[Tuple[int, Optional[List[Dict[str, Any]]], Optional[str]]]:
+    df = worker_state['df']
+    snapshot = worker_state['snapshot']
+    cancel_event = worker_state['cancel_event']
+    interval = worker_state['interval']
+    results = []
+    for index, overrides in chunk:
+        if cancel_event.is_set():
+            break
+        try:
+            strategy = build_strategy(snapshot, overrides)
+            frame = _indicator_frame(df, strategy, interval)
+            metrics = [
+                simulate_window(frame, strategy, window['train_start'], window['train_end'], interval).calculate_metrics()
+                for window in windows
+            ]
+            results.append((index, metrics, None))
+        except Exception as e:
+            results.append((index, None, str(e)))
+    return results
+
+
+def _test_window(position: int, window: Dict[str, int], overrides: Dict[str, Any]) -> Dict[str, Any]:
+    interval = worker_state['interval']
+    strategy = build_strategy(worker_state['snapshot'], overrides)
+    frame = _indicator_frame(worker_state['df'], strategy, interval)
+    engine = simulate_window(frame, strategy, window['test_start'], window['test_end'], interval)
+    return {
+        "position": position,
+        "trades": engine.trades,
+        "equity_curve": engine.equity_curve,
+        "metrics": engine.calculate_metrics()
+    }
+
+
+def stitch_windows(
+    strategy: Strategy,
+    tests: List[Dict[str, Any]],
+    interval: str = "1d"
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]], Dict[str, Any]]:
+    """
+    Join the out-of-sample runs of consecutive test windows into one result
+
+    Every window starts from the strategy's initial capital, so each equity
+    curve is scaled by the capital the previous windows compounded to. Trades
+    keep the amounts of their own window and are tagged with its position.
+
+    Returns:
+        Stitched trades, equity curve and metrics over the whole curve
+    """
+    engine = BacktestingEngine(strategy, None, None, interval=interval)
+    scale = 1.0
+    for position, test in enumerate(tests):
+        for point in test["equity_curve"]:
+            engine.equity_curve.append({
+                "timestamp": point["timestamp"],
+                "value": point["value"] * scale,
+                "cash": point["cash"] * scale,
+                "position_value": point["position_value"] * scale
+            })
+        engine.trades.extend({**trade, "window": position} for trade in test["trades"])
+        scale *= test["metrics"]["final_value"] / engine.initial_capital
+    engine.portfolio_value = engine.initial_capital * scale
+    return engine.trades, engine.equity_curve, engine.calculate_metrics()
+
+
+class WalkForwardAnalysis:
+    """
+    Walk-forward optimization of a strategy over one shared dataset
+
+    Each train window is grid-searched for the best parameters, which are
+    then run on the following test window; the out-of-sample runs are
+    stitched into one equity curve. Both phases run on a process pool that
+    attaches the market data once per worker.
+    """
+
+    def __init__(
+        self,
+        strategy: Strategy,
+        start_date: datetime,
+        end_date: datetime,
+        parameter_ranges: Dict[str, Any],
+        train_days: int,
+        test_days: int,
+        anchored: bool = False,
+        metric: str = "sharpe_ratio",
+        maximize: bool = True,
+        max_workers: Optional[int] = None,
+        user_id: Optional[int] = None,
+        interval: str = "1d"
+    ):
+        self.id = uuid.uuid4().hex
+        self.user_id = user_id
+        self.strategy_id = strategy.id
+        self.snapshot = strategy_snapshot(strategy)
+        self.start_date = start_date
+        self.end_date = end_date
+        self.interval = interval
+        higher_timeframes(self.snapshot['parameters'] or {}, interval)
+        self.train_days = train_days
+        self.test_days = test_days
+        self.anchored = anchored
+        self.metric = metric
+        self.maximize = maximize
+        self.max_workers = pool_size(max_workers)
+
+        if train_days <= 0 or test_days <= 0:
+            raise ValueError("Train and test windows must be at least one day")
+        self.combinations = expand_parameter_ranges(parameter_ranges)
+        if len(self.combinations) > settings.OPTIMIZER_MAX_COMBINATIONS:
+            raise ValueError(
+                f"Parameter grid has {len(self.combinations)} combinations, "
+                f"the limit is {settings.OPTIMIZER_MAX_COMBINATIONS}"
+            )
+
+        # Progress
+        self.status = "pending"  # pending, running, completed, cancelled, failed
+        self.phase = None  # training, testing
+        self.windows: List[Dict[str, Any]] = []
+        self.completed = 0  # Combinations evaluated over every train window
+        self.failed = 0
+        self.tested = 0
+        self.trades: List[Dict[str, Any]] = []
+        self.equity_curve: List[Dict[str, Any]] = []
+        self.metrics: Optional[Dict[str, Any]] = None
+        self.error_message = None
+        self.created_at = datetime.utcnow()
+        self.completed_at = None
+        self._train_metrics: Dict[int, List[Dict[str, Any]]] = {}
+        self.on_progress: Optional[Callable[[], None]] = None  # Called as windows train and test
+        self._mp_context = pool_context()
+        self._cancel_event = self._mp_context.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def total_combinations(self) -> int:
+        return len(self.combinations)
+
+    def cancel(self):
+        """Request early cancellation; pending work is dropped"""
+        self._cancel_event.set()
+
+    def progress(self) -> Dict[str, Any]:
+        """Counters, windows and stitched metrics of the run so far"""
+        return {
+            "phase": self.phase,
+            "total_combinations": self.total_combinations,
+            "completed": self.completed,
+            "failed": self.failed,
+            "tested": self.tested,
+            "windows": self.windows,
+            "metrics": self.metrics,
+        }
+
+    def result(self) -> Dict[str, Any]:
+        """Stitched out-of-sample trades and equity curve"""
+        return {"trades": self.trades, "equity_curve": self.equity_curve}
+
+    def _report(self):
+        if self.on_progress is not None:
+            self.on_progress()
+
+    def _chunks(self) -> List[List[Tuple[int, Dict[str, Any]]]]:
+        items = list(enumerate(self.combinations))
+        size = max(1, min(math.ceil(len(items) / (self.max_workers * 4)), MAX_CHUNK_SIZE))
+        return [items[i:i + size] for i in range(0, len(items), size)]
+
+    def _record_training(self, chunk_results: List[Tuple[int, Optional[List[Dict[str, Any]]], Optional[str]]]):
+        with self._lock:
+            for index, metrics, error in chunk_results:
+                if metrics is None:
+                    self.failed += 1
+                    continue
+                self.completed += 1
+                self._train_metrics[index] = metrics
+
+    def _best(self, position: int) -> Optional[int]:
+        """Combination scoring best on the target metric over one train window"""
+        best, best_key = None, None
+        for index, metrics in self._train_metrics.items():
+            value = metrics[position].get(self.metric)
+            if value is None or (isinstance(value, float) and math.isnan(value)):
+                continue
+            key = (value if self.maximize else -value, -index)  # Ties go to the earliest combination
+            if best_key is None or key > best_key:
+                best, best_key = index, key
+        return best
+
+    def _drain(self, pending, record):
+        while pending and not self._cancel_event.is_set():
+            done, pending = wait(pending, timeout=0.5, return_when=FIRST_COMPLETED)
+            for future in done:
+                record(future.result())
+            self._report()
+
+    def efficiency(self) -> Optional[float]:
+        """
+        Walk-forward efficiency: out-of-sample return per bar over in-sample return per bar
+
+        Averaged across the tested windows; None while no window is tested or
+        when the in-sample return is not positive.
+        """
+        tested = [window for window in self.windows if window.get("test_metrics")]
+        if not tested:
+            return None
+        train_rate = np.mean([w["train_metrics"]["total_return_pct"] / w["train_bars"] for w in tested])
+        test_rate = np.mean([w["test_metrics"]["total_return_pct"] / w["test_bars"] for w in tested])
+        return float(test_rate / train_rate) if train_rate > 0 else None
+
+    def run(self) -> Dict[str, Any]:
+        """Load the market data once, optimize every train window and evaluate every test window"""
+        self.status = "running"
+        shared = None
+        try:
+            df = MarketDataService().fetch_frame(
+                symbol=self.snapshot['symbol'],
+                start_date=self.start_date,
+                end_date=self.end_date,
+                interval=self.interval
+            )
+            bounds = walk_forward_windows(df.index, self.train_days, self.test_days, self.anchored)
+            if not bounds:
+                raise ValueError("The date range is too short for one train and test window")
+            if len(bounds) > settings.WALK_FORWARD_MAX_WINDOWS:
+                raise ValueError(f"Range splits into {len(bounds)} windows, the limit is {settings.WALK_FORWARD_MAX_WINDOWS}")
+            timestamps = [timestamp.isoformat() for timestamp in df.index]
+            self.windows = [
+                {
+                    "train_start": timestamps[window['train_start']],
+                    "train_end": timestamps[window['train_end'] - 1],
+                    "test_start": timestamps[window['test_start']],
+                    "test_end": timestamps[window['test_end'] - 1],
+                    "train_bars": window['train_end'] - window['train_start'],
+                    "test_bars": window['test_end'] - window['test_start'],
+                }
+                for window in bounds
+            ]
+            self._report()
+            shared = SharedMarketData(df)
+
+            executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=self._mp_context,
+                initializer=init_worker,
+                initargs=(shared.descriptor(), self.snapshot, self._cancel_event, self.interval)
+            )
+            try:
+                self.phase = "training"
+                pending = {executor.submit(_train_chunk, chunk, bounds) for chunk in self._chunks()}
+                self._drain(pending, self._record_training)
+
+                self.phase = "testing"
+                tests: Dict[int, Dict[str, Any]] = {}
+                pending = set()
+                for position, window in enumerate(bounds):
+                    best = self._best(position)
+                    if best is None:
+                        raise ValueError(f"No parameters produced a {self.metric} for train window {position + 1}")
+                    self.windows[position]["parameters"] = self.combinations[best]
+                    self.windows[position]["train_metrics"] = self._train_metrics[best][position]
+                    pending.add(executor.submit(_test_window, position, window, self.combinations[best]))
+
+                def record_test(test: Dict[str, Any]):
+                    tests[test["position"]] = test
+                    self.windows[test["position"]]["test_metrics"] = test["metrics"]
+                    self.tested += 1
+
+                if not self._cancel_event.is_set():
+                    self._drain(pending, record_test)
+            finally:
+                executor.shutdown(wait=True, cancel_futures=True)
+
+            if self._cancel_event.is_set():
+                self.status = "cancelled"
+            else:
+                strategy = build_strategy(self.snapshot, {})
+                self.trades, self.equity_curve, self.metrics = stitch_windows(
+                    strategy, [tests[position] for position in range(len(bounds))], self.interval
+                )
+                self.metrics["walk_forward_efficiency"] = self.efficiency()
+                self.status = "completed"
+
+        except Exception as e:
+            self.status = "failed"
+            self.error_message = str(e)
+
+        finally:
+            if shared is not None:
+                shared.close()
+            self.phase = None
+            self.completed_at = datetime.utcnow()
+
+        return {"windows": self.windows, "trades": self.trades, "equity_curve": self.equity_curve, "metrics": self.metrics}
+
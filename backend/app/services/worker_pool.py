@@ -0,0 +1,243 @@
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+import time
+import pandas as pd
+from typing import Callable, Dict, Any, Optional
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.models import AnalysisRun, Backtest
+from app.services.analysis_runs import ANALYSIS_KINDS, run_analysis
+from app.services.backtesting_engine import run_backtest
+from app.services.job_queue import JobQueue, DatabaseJobQueue, parse_market_data_key
+from app.services.market_data_service import MarketDataService
+from app.services.process_stats import forget_stats, publish_stats, published_on_host
+
+logger = logging.getLogger(__name__)
+
+# Job kind -> handler taking the claimed job
+JOB_HANDLERS: Dict[str, Callable[[Dict[str, Any]], None]] = {
+    "run": lambda job: run_backtest(job['backtest_id'], market_data=job.get('market_data')),
+    "extend": lambda job: run_backtest(job['backtest_id'], incremental=True),
+    **{kind: lambda job: run_analysis(job['analysis_id']) for kind in ANALYSIS_KINDS},
+}
+
+
+def _job_error(job: Dict[str, Any]) -> Optional[str]:
+    """Return the error recorded on the backtest or analysis run of a job if it failed"""
+    db = SessionLocal()
+    try:
+        if job.get('analysis_id') is not None:
+            subject = db.query(AnalysisRun).filter(AnalysisRun.id == job['analysis_id']).first()
+        else:
+            subject = db.query(Backtest).filter(Backtest.id == job['backtest_id']).first()
+        if subject and subject.status == "failed":
+            return subject.error_message or "Job failed"
+        return None
+    finally:
+        db.close()
+
+
+class GroupMarketData:
+    """
+    Market data of the job group a worker ran last
+
+    Jobs with the same group key run over the same symbol and date range,
+    so the frame is fetched once and reused until the worker moves on to
+    another group.
+    """
+
+    def __init__(self):
+        self.key: Optional[str] = None
+        self.frame: Optional[pd.DataFrame] = None
+
+    def frame_for(self, group_key: Optional[str]) -> Optional[pd.DataFrame]:
+        if group_key is None:
+            return None
+        if group_key != self.key:
+            self.key, self.frame = group_key, None
+            symbol, start_date, end_date, interval = parse_market_data_key(group_key)
+            try:
+                self.frame = MarketDataService().fetch_frame(symbol, start_date, end_date, interval)
+            except Exception:
+                logger.warning("Could not preload market data for group %s", group_key, exc_info=True)
+                # Each job fetches on its own and records the error
+        return self.frame
+
+
+def process_next_job(queue: JobQueue, worker_id: str, group_data: Optional[GroupMarketData] = None) -> bool:
+    """
+    Claim and execute a single job
+
+    With `group_data`, jobs over the market data the worker already holds
+    are preferred and run on that frame.
+
+    Returns:
+        True if a job was processed, False if the queue had nothing claimable
+    """
+    job = queue.claim(worker_id, prefer_group=group_data.key if group_data else None)
+    if job is None:
+        return False
+
+    try:
+        if group_data is not None and job['kind'] == "run":
+            job['market_data'] = group_data.frame_for(job.get('group_key'))
+        handler = JOB_HANDLERS.get(job['kind'])
+        if handler is None:
+            raise ValueError(f"Unknown job kind: {job['kind']}")
+        handler(job)
+        error = _job_error(job)
+    except Exception as e:
+        error = str(e)
+
+    if error:
+        queue.fail(job['id'], error)
+    else:
+        queue.complete(job['id'])
+    return True
+
+
+def worker_main(worker_id: str, poll_interval: float):
+    """Entry point of a worker process: claim and run jobs until terminated"""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # Shutdown is driven by the supervisor
+    queue = DatabaseJobQueue()
+    group_data = GroupMarketData()
+    published = False
+    while True:
+        try:
+            processed = process_next_job(queue, worker_id, group_data)
+            # Cache counters only change while jobs run
+            if processed or not published:
+                publish_stats(worker_id)
+                published = True
+            if not processed:
+                time.sleep(poll_interval)
+        except Exception:
+            logger.exception("Worker %s failed to process a job", worker_id)
+            time.sleep(poll_interval)
+
+
+class BacktestWorkerPool:
+    """
+    Pool of worker processes executing queued backtests and analysis runs
+
+    A supervisor thread restarts workers that die, requeues the jobs they
+    held, and stops workers whose running job has been cancelled.
+    """
+
+    def __init__(
+        self,
+        num_workers: Optional[int] = None,
+        poll_interval: Optional[float] = None,
+        queue: Optional[DatabaseJobQueue] = None
+    ):
+        self.num_workers = num_workers or settings.BACKTEST_WORKERS
+        self.poll_interval = poll_interval or settings.WORKER_POLL_INTERVAL
+        self.queue = queue or DatabaseJobQueue()
+        self.hostname = socket.gethostname()
+        # Spawned (not forked) so workers never inherit the API server's threads or DB connections
+        self._context = multiprocessing.get_context("spawn")
+        self._workers: Dict[int, multiprocessing.Process] = {}  # slot -> process
+        self._stop_event = threading.Event()
+        self._supervisor: Optional[threading.Thread] = None
+
+    def _worker_id(self, process: multiprocessing.Process) -> str:
+        return f"{self.hostname}:{process.pid}"
+
+    def _spawn(self, slot: int):
+        # The worker id needs the pid, so the process derives it from its own pid.
+        # Not daemonic: analyses start process pools, which daemonic processes
+        # cannot; stop() terminates the workers instead.
+        process = self._context.Process(
+            target=_spawned_worker_main,
+            args=(self.hostname, self.poll_interval),
+            name=f"backtest-worker-{slot}",
+            daemon=False
+        )
+        process.start()
+        self._workers[slot] = process
+
+    def _recover_orphans(self):
+        """Requeue jobs left running by workers on this host that no longer exist, and drop their counters"""
+        for job in self.queue.running_on_host(self.hostname):
+            if not _process_exists(job['worker_id']):
+                self.queue.requeue(job['id'])
+        forget_stats([
+            process_id for process_id in published_on_host(self.hostname)
+            if not _process_exists(process_id)
+        ])
+
+    def start(self):
+        """Start the worker processes and the supervisor thread"""
+        self._recover_orphans()
+        for slot in range(self.num_workers):
+            self._spawn(slot)
+        self._supervisor = threading.Thread(target=self._supervise, name="backtest-pool-supervisor", daemon=True)
+        self._supervisor.start()
+        logger.info("Started %d backtest workers", self.num_workers)
+
+    def _supervise(self):
+        while not self._stop_event.wait(self.poll_interval):
+            try:
+                self._reap_dead_workers()
+                self._stop_cancelled_jobs()
+            except Exception:
+                logger.exception("Backtest pool supervisor iteration failed")
+
+    def _reap_dead_workers(self):
+        for slot, process in list(self._workers.items()):
+            if process.is_alive():
+                continue
+            worker_id = self._worker_id(process)
+            for job_id in self.queue.running_jobs(worker_id):
+                self.queue.fail(job_id, f"Worker process exited with code {process.exitcode}")
+            forget_stats([worker_id])
+            logger.warning("Backtest worker %s exited, restarting", worker_id)
+            self._spawn(slot)
+
+    def _stop_cancelled_jobs(self):
+        slots = {self._worker_id(process): slot for slot, process in self._workers.items()}
+        for request in self.queue.cancel_requests(list(slots)):
+            slot = slots[request['worker_id']]
+            process = self._workers[slot]
+            process.terminate()
+            process.join(timeout=10)
+            self.queue.mark_cancelled(request['id'])
+            forget_stats([request['worker_id']])
+            # The worker may have moved on to another job before it was stopped
+            for job_id in self.queue.running_jobs(request['worker_id']):
+                self.queue.fail(job_id, "Worker stopped while cancelling another job")
+            self._spawn(slot)
+
+    def stop(self, timeout: float = 10):
+        """Stop the supervisor and terminate the workers"""
+        self._stop_event.set()
+        if self._supervisor is not None:
+            self._supervisor.join(timeout=timeout)
+        for process in self._workers.values():
+            process.terminate()
+        for process in self._workers.values():
+            process.join(timeout=timeout)
+            # Interrupted jobs go back to the queue for the next pool
+            for job_id in self.queue.running_jobs(self._worker_id(process)):
+                self.queue.requeue(job_id)
+        forget_stats([self._worker_id(process) for process in self._workers.values()])
+        self._workers.clear()
+
+
+def _process_exists(process_id: str) -> bool:
+    """Whether the process of a host:pid id on this host is alive"""
+    try:
+        os.kill(int(process_id.rsplit(':', 1)[1]), 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass  # Alive, owned by another user
+    return True
+
+
+def _spawned_worker_main(hostname: str, poll_interval: float):
+    worker_main(f"{hostname}:{os.getpid()}", poll_interval)
@@ -0,0 +1,25 @@
+import logging
+import signal
+import threading
+from app.core.migrations import upgrade_database
+from app.services.worker_pool import BacktestWorkerPool
+
+logging.basicConfig(level=logging.INFO)
+
+
+def main():
+    """Run a standalone backtest worker pool until interrupted"""
+    upgrade_database()
+    
+    pool = BacktestWorkerPool()
+    pool.start()
+    
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    signal.signal(signal.SIGINT, lambda *_: stop.set())
+    stop.wait()
+    pool.stop()
+
+
+if __name__ == "__main__":
+    main()
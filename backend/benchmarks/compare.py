@@ -0,0 +1,86 @@
+"""
+Compare two benchmark result files and flag regressions
+
+Usage (from backend/):
+    python -m benchmarks.compare baseline.json results.json --threshold 0.10
+
+Exits with status 1 if any benchmark's median time grew by more than the
+threshold (a fraction; 0.10 is 10%).
+"""
+import argparse
+import json
+import sys
+from typing import Dict, List, Any, Optional, Tuple
+
+
+def _key(result: Dict[str, Any]) -> Tuple[str, str]:
+    return result["name"], json.dumps(result["params"], sort_keys=True)
+
+
+def compare(
+    baseline: Dict[str, Any],
+    current: Dict[str, Any],
+    threshold: float,
+    metric: str = "median_s"
+) -> List[Dict[str, Any]]:
+    """
+    Pair up benchmarks present in both runs
+
+    Returns:
+        One row per benchmark with the relative change of `metric` and of the
+        memory peak, and whether the time change exceeds the threshold
+    """
+    base = {_key(result): result for result in baseline["results"]}
+    rows = []
+    for result in current["results"]:
+        before = base.get(_key(result))
+        if before is None:
+            continue
+        change = result[metric] / before[metric] - 1 if before[metric] else 0.0
+        memory_before = before.get("peak_memory_bytes") or 0
+        memory_change = result.get("peak_memory_bytes", 0) / memory_before - 1 if memory_before else 0.0
+        rows.append({
+            "name": result["name"],
+            "params": result["params"],
+            "before": before[metric],
+            "after": result[metric],
+            "change": change,
+            "memory_change": memory_change,
+            "regression": change > threshold,
+        })
+    return rows
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files")
+    parser.add_argument("baseline")
+    parser.add_argument("current")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Allowed slowdown as a fraction")
+    parser.add_argument("--metric", default="median_s", choices=["median_s", "min_s"])
+    args = parser.parse_args(argv)
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+
+    rows = compare(baseline, current, args.threshold, args.metric)
+    for row in rows:
+        flag = "REGRESSION" if row["regression"] else ""
+        print(
+            f"{row['name']:<28} {json.dumps(row['params']):<40} "
+            f"{row['before'] * 1000:10.2f} ms -> {row['after'] * 1000:10.2f} ms "
+            f"{row['change'] * 100:+7.1f}%  mem {row['memory_change'] * 100:+7.1f}%  {flag}"
+        )
+
+    regressions = [row for row in rows if row["regression"]]
+    print(
+        f"{len(rows)} benchmarks compared "
+        f"({baseline['metadata'].get('commit')} -> {current['metadata'].get('commit')}), "
+        f"{len(regressions)} regressed by more than {args.threshold * 100:.0f}%"
+    )
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
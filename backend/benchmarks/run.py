@@ -0,0 +1,381 @@
+"""
+Offline benchmark suite for the backtesting and market data hot paths
+
+Runs entirely on synthetic data against a throwaway SQLite database and
+market data cache, and writes machine-readable results that can be compared
+between commits with `python -m benchmarks.compare`.
+
+Usage (from backend/):
+    python -m benchmarks.run --suite quick --output results.json
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Callable, Dict, List, Any, Optional
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import bars_for, generate_ohlcv, generate_universe
+
+SUITES: Dict[str, Dict[str, Any]] = {
+    "quick": {
+        "repeats": 3,
+        "engine": [("1d", 5), ("1h", 1), ("1m", 0.1)],
+        "loop": [("1d", 5)],
+        "portfolio": [(1, 5), (50, 5)],
+        "market_data": [("1d", 20), ("1m", 0.25)],
+        "api_backtests": 50,
+    },
+    "full": {
+        "repeats": 5,
+        "engine": [("1d", 1), ("1d", 5), ("1d", 20), ("1h", 1), ("1h", 5), ("1m", 1)],
+        "loop": [("1d", 1), ("1d", 20), ("1h", 1)],
+        "portfolio": [(1, 10), (50, 10), (500, 10)],
+        "market_data": [("1d", 20), ("1h", 5), ("1m", 1)],
+        "api_backtests": 1000,
+    },
+}
+
+STRATEGY = {
+    "name": "benchmark",
+    "symbol": "SYM000",
+    "strategy_type": "SMA_CROSSOVER",
+    "parameters": {"sma_short": 10, "sma_long": 30, "rsi_period": 14},
+    "buy_conditions": [
+        {"indicator": "SMA_SHORT", "operator": "crosses_above", "compare_to": "SMA_LONG"},
+        {"indicator": "RSI", "operator": "<", "value": 70},
+    ],
+    "sell_conditions": [
+        {"indicator": "SMA_SHORT", "operator": "crosses_below", "compare_to": "SMA_LONG"},
+    ],
+    "initial_capital": 10000.0,
+    "position_size": 10.0,
+    "stop_loss": 5.0,
+    "take_profit": 15.0,
+}
+
+
+def configure_environment(workdir: str):
+    """Point the application at a scratch database and cache; must run before importing `app`"""
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'benchmark.db')}"
+    os.environ["MARKET_DATA_CACHE_DIR"] = os.path.join(workdir, "market_data_cache")
+    os.environ["MARKET_DATA_OFFLINE"] = "True"
+    os.environ["EMBEDDED_WORKER_POOL"] = "False"
+
+
+def measure(
+    run: Callable[[Any], Any],
+    setup: Optional[Callable[[], Any]] = None,
+    repeats: int = 3
+) -> Dict[str, Any]:
+    """
+    Time `run(setup())` over several repeats, then record its memory peak in one extra traced run
+
+    Setup time is excluded. Memory is measured separately because tracing
+    allocations slows the code down.
+    """
+    timings = []
+    for _ in range(repeats):
+        state = setup() if setup else None
+        gc.collect()
+        start = time.perf_counter()
+        run(state)
+        timings.append(time.perf_counter() - start)
+
+    state = setup() if setup else None
+    gc.collect()
+    tracemalloc.start()
+    try:
+        run(state)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "repeats": repeats,
+        "min_s": min(timings),
+        "median_s": float(np.median(timings)),
+        "max_s": max(timings),
+        "peak_memory_bytes": peak,
+    }
+
+
+class BenchmarkRunner:
+    """Collects benchmark results for one suite"""
+
+    def __init__(self, suite: str, only: Optional[List[str]] = None):
+        self.suite = suite
+        self.config = SUITES[suite]
+        self.only = only
+        self.results: List[Dict[str, Any]] = []
+
+    def bench(
+        self,
+        name: str,
+        params: Dict[str, Any],
+        run: Callable[[Any], Any],
+        setup: Optional[Callable[[], Any]] = None,
+        items: Optional[int] = None
+    ):
+        """Measure one case; `items` (e.g. bars processed) adds a throughput figure"""
+        if self.only and not any(name.startswith(prefix) for prefix in self.only):
+            return
+        result = {"name": name, "params": params, **measure(run, setup, self.config["repeats"])}
+        if items:
+            result["items"] = items
+            result["items_per_s"] = items / result["median_s"] if result["median_s"] else None
+        self.results.append(result)
+        print(
+            f"{name:<28} {json.dumps(params):<40} "
+            f"median {result['median_s'] * 1000:10.2f} ms  peak {result['peak_memory_bytes'] / 1024 ** 2:8.1f} MiB",
+            flush=True
+        )
+
+    # Engine stages
+
+    def engine_stages(self, interval: str, years: float, loop: bool):
+        from app.models.models import Strategy
+        from app.services.backtesting_engine import BacktestingEngine
+        from app.services.chunked_engine import ChunkedBacktestingEngine
+        from app.services.indicator_cache import indicator_cache
+
+        df = generate_ohlcv(bars_for(years, interval), interval)
+        bars = len(df)
+        params = {"interval": interval, "years": years, "bars": bars}
+
+        def new_engine(vectorized: bool = True) -> BacktestingEngine:
+            return BacktestingEngine(Strategy(**STRATEGY), None, None, vectorized=vectorized, market_data=df, interval=interval)
+
+        def cold_indicators():
+            indicator_cache.clear()
+            engine = new_engine()
+            return engine, engine.fetch_market_data()
+
+        self.bench("engine.calculate_indicators", params, lambda s: s[0].calculate_indicators(s[1]), cold_indicators, bars)
+
+        def prepared(vectorized: bool):
+            def setup():
+                engine = new_engine(vectorized)
+                return engine, engine.calculate_indicators(engine.fetch_market_data())
+            return setup
+
+        self.bench("engine.simulate_vectorized", params, lambda s: s[0].simulate_vectorized(s[1]), prepared(True), bars)
+        if new_engine().jit:
+            def uncompiled():
+                engine, frame = prepared(True)()
+                engine.jit = False
+                return engine, frame
+            # The vectorized run walking the bars in Python, the fallback without Numba
+            self.bench("engine.simulate_uncompiled", params, lambda s: s[0].simulate_vectorized(s[1]), uncompiled, bars)
+        if loop:
+            self.bench("engine.simulate_loop", params, lambda s: s[0].simulate_loop(s[1]), prepared(False), bars)
+
+        def simulated():
+            engine, frame = prepared(True)()
+            engine.simulate_vectorized(frame)
+            return engine
+
+        self.bench("engine.calculate_metrics", params, lambda engine: engine.calculate_metrics(), simulated, bars)
+        self.bench("engine.run", params, lambda _: new_engine().run(), None, bars)
+
+        def run_out_of_core(_):
+            results = ChunkedBacktestingEngine(Strategy(**STRATEGY), None, None, market_data=df, interval=interval).run()
+            results["trades"].close()
+            results["equity_curve"].close()
+
+        self.bench("engine.run_out_of_core", params, run_out_of_core, None, bars)
+        self.result_serialization(params, new_engine().run(), bars)
+
+    def result_serialization(self, params: Dict[str, Any], results: Dict[str, Any], bars: int):
+        """Time storing a run's results the way run_backtest does"""
+        from app.core.database import SessionLocal
+        from app.models.models import Backtest
+        from app.services.result_store import save_results
+
+        def setup():
+            db = SessionLocal()
+            backtest = Backtest(
+                strategy_id=self.strategy_id,
+                user_id=self.user_id,
+                start_date=datetime(2000, 1, 1),
+                end_date=datetime(2020, 1, 1),
+                status="completed",
+                metrics=results["metrics"]
+            )
+            db.add(backtest)
+            db.commit()
+            return db, backtest
+
+        def run(state):
+            db, backtest = state
+            save_results(db, backtest, results)
+            db.commit()
+            db.close()
+
+        self.bench("run_backtest.save_results", params, run, setup, bars)
+
+    # Portfolio engine
+
+    def portfolio(self, symbols: int, years: float):
+        from app.models.models import Strategy
+        from app.services.portfolio_engine import PortfolioBacktestingEngine
+
+        frames = generate_universe(symbols, years)
+        bars = sum(len(df) for df in frames.values())
+        strategy = Strategy(**{**STRATEGY, "position_size": 5.0})
+
+        def run(_):
+            PortfolioBacktestingEngine(strategy, list(frames), None, None, market_data=frames).run()
+
+        self.bench("portfolio.run", {"symbols": symbols, "years": years, "bars": bars}, run, None, bars)
+
+    # Market data
+
+    def market_data(self, interval: str, years: float, workdir: str):
+        from app.services.market_data_cache import MarketDataCache
+
+        df = generate_ohlcv(bars_for(years, interval), interval)
+        start = df.index[0].to_pydatetime()
+        end = (df.index[-1] + pd.Timedelta(days=1)).to_pydatetime()
+        params = {"interval": interval, "years": years, "bars": len(df)}
+
+        def fetcher(symbol, start_date, end_date, fetch_interval):
+            return df
+
+        def cold():
+            cache = MarketDataCache(os.path.join(workdir, f"cache-{interval}-{time.perf_counter_ns()}"), 2 * 1024 ** 3)
+            return cache
+
+        self.bench("market_data_cache.miss", params, lambda cache: cache.get("SYM", interval, start, end, fetcher), cold, len(df))
+
+        warm_cache = cold()
+        warm_cache.get("SYM", interval, start, end, fetcher)
+        self.bench("market_data_cache.hit", params, lambda _: warm_cache.get("SYM", interval, start, end, fetcher), None, len(df))
+
+    # API
+
+    def seed_database(self):
+        """Create the benchmark user and strategy"""
+        from app.core.database import SessionLocal
+        from app.core.migrations import upgrade_database
+        from app.core.security import get_password_hash, create_access_token
+        from app.models.models import User, Strategy
+
+        upgrade_database()
+        db = SessionLocal()
+        try:
+            user = User(email="bench@example.com", username="bench", hashed_password=get_password_hash("bench"))
+            db.add(user)
+            db.commit()
+            strategy = Strategy(**STRATEGY, user_id=user.id)
+            db.add(strategy)
+            db.commit()
+            self.user_id = user.id
+            self.strategy_id = strategy.id
+            self.token = create_access_token(data={"sub": user.email})
+        finally:
+            db.close()
+
+    def api(self, backtests: int):
+        from fastapi.testclient import TestClient
+        from app.core.database import SessionLocal
+        from app.main import app
+        from app.models.models import Backtest, Strategy
+        from app.services.backtesting_engine import BacktestingEngine
+        from app.services.result_store import save_results
+
+        # Every backtest stores the results of a 10-year daily run
+        df = generate_ohlcv(bars_for(10, "1d"), "1d")
+        results = BacktestingEngine(Strategy(**STRATEGY), None, None, vectorized=True, market_data=df).run()
+        db = SessionLocal()
+        try:
+            for _ in range(backtests):
+                backtest = Backtest(
+                    strategy_id=self.strategy_id,
+                    user_id=self.user_id,
+                    start_date=datetime(2000, 1, 1),
+                    end_date=datetime(2010, 1, 1),
+                    status="completed",
+                    metrics=results["metrics"]
+                )
+                db.add(backtest)
+                save_results(db, backtest, results)
+            db.commit()
+            backtest_id = backtest.id
+        finally:
+            db.close()
+
+        client = TestClient(app)
+        headers = {"Authorization": f"Bearer {self.token}"}
+        params = {"backtests": backtests, "bars": len(df)}
+
+        def get(url: str, **query):
+            def run(_):
+                response = client.get(url, params=query, headers=headers)
+                response.raise_for_status()
+            return run
+
+        self.bench("api.list_backtests", params, get("/api/v1/backtests/", limit=50))
+        self.bench("api.get_backtest", params, get(f"/api/v1/backtests/{backtest_id}"))
+        self.bench("api.equity_curve", params, get(f"/api/v1/backtests/{backtest_id}/equity-curve", points=500))
+        self.bench("api.list_strategies", params, get("/api/v1/strategies/", limit=50))
+
+    def run(self, workdir: str) -> Dict[str, Any]:
+        self.seed_database()
+        for interval, years in self.config["engine"]:
+            self.engine_stages(interval, years, loop=(interval, years) in self.config["loop"])
+        for symbols, years in self.config["portfolio"]:
+            self.portfolio(symbols, years)
+        for interval, years in self.config["market_data"]:
+            self.market_data(interval, years, workdir)
+        self.api(self.config["api_backtests"])
+        return {"metadata": environment_metadata(self.suite), "results": self.results}
+
+
+def environment_metadata(suite: str) -> Dict[str, Any]:
+    """Describe the code and machine the results were produced on"""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "suite": suite,
+        "commit": commit,
+        "created_at": datetime.utcnow().isoformat(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Run the offline benchmark suite")
+    parser.add_argument("--suite", choices=sorted(SUITES), default="quick")
+    parser.add_argument("--output", default="benchmark-results.json", help="Where to write the JSON results")
+    parser.add_argument("--only", nargs="*", help="Only run benchmarks whose name starts with one of these prefixes")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix="benchmarks-") as workdir:
+        configure_environment(workdir)
+        results = BenchmarkRunner(args.suite, args.only).run(workdir)
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Wrote {len(results['results'])} results to {args.output}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,64 @@
+import numpy as np
+import pandas as pd
+from typing import Dict
+
+# Bars per trading day and minutes per bar for each supported interval
+INTERVALS = {
+    "1d": (1, None),
+    "1h": (7, 60),
+    "1m": (390, 1),
+}
+
+TRADING_DAYS_PER_YEAR = 252
+
+
+def bars_for(years: float, interval: str) -> int:
+    """Number of bars covering `years` of trading at an interval"""
+    per_day, _ = INTERVALS[interval]
+    return max(int(years * TRADING_DAYS_PER_YEAR * per_day), 2)
+
+
+def trading_index(bars: int, interval: str, start: str = "2000-01-03") -> pd.DatetimeIndex:
+    """Exchange-hours timestamps (New York, 09:30-16:00 on business days)"""
+    per_day, minutes = INTERVALS[interval]
+    days = pd.bdate_range(start, periods=-(-bars // per_day))
+    if per_day == 1:
+        index = days
+    else:
+        offsets = pd.to_timedelta(9 * 60 + 30 + minutes * np.arange(per_day), unit="min")
+        index = pd.DatetimeIndex((days.values[:, None] + offsets.values[None, :]).ravel())
+    return pd.DatetimeIndex(index[:bars].tz_localize("America/New_York"), name="timestamp")
+
+
+def generate_ohlcv(bars: int, interval: str = "1d", seed: int = 0, start: str = "2000-01-03") -> pd.DataFrame:
+    """
+    Random-walk OHLCV bars
+
+    Prices follow a geometric random walk with volatility scaled to the
+    interval, so indicator crossovers and trades occur at realistic rates.
+    The same seed always produces the same frame.
+    """
+    per_day, _ = INTERVALS[interval]
+    rng = np.random.default_rng(seed)
+    volatility = 0.02 / np.sqrt(per_day)
+
+    close = 100 * np.exp(np.cumsum(rng.normal(0.0002 / per_day, volatility, bars)))
+    open_ = close * (1 + rng.normal(0, volatility / 4, bars))
+    spread = np.abs(rng.normal(0, volatility / 2, bars))
+    high = np.maximum(open_, close) * (1 + spread)
+    low = np.minimum(open_, close) * (1 - spread)
+    volume = rng.integers(100_000, 1_000_000, bars).astype(np.float64) / per_day
+
+    return pd.DataFrame(
+        {"open": open_, "high": high, "low": low, "close": close, "volume": volume},
+        index=trading_index(bars, interval, start)
+    )
+
+
+def generate_universe(symbols: int, years: float, interval: str = "1d", seed: int = 0) -> Dict[str, pd.DataFrame]:
+    """Independent OHLCV frames for `symbols` symbols named SYM000, SYM001, ..."""
+    bars = bars_for(years, interval)
+    return {
+        f"SYM{i:03d}": generate_ohlcv(bars, interval, seed=seed + i)
+        for i in range(symbols)
+    }
@@ -0,0 +1,79 @@
+import tempfile
+from datetime import datetime
+
+import pytest
+
+from benchmarks.run import configure_environment
+
+# Scratch database and market data cache, set before anything imports `app`
+configure_environment(tempfile.mkdtemp(prefix="backtesting-tests-"))
+
+from app.core.database import Base, SessionLocal, engine  # noqa: E402
+from app.models.models import Backtest, Strategy, User  # noqa: E402
+from app.services.backtesting_engine import BacktestingEngine  # noqa: E402
+
+
+@pytest.fixture
+def db():
+    """Session on freshly created tables of the scratch database"""
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def make_backtest(db):
+    """Factory of saved pending backtests; the owner named by `user` and their strategy are created on first use"""
+    strategies = {}
+
+    def make(user: str = "alice", **fields) -> Backtest:
+        if user not in strategies:
+            owner = User(email=f"{user}@example.com", username=user, hashed_password="-")
+            db.add(owner)
+            db.flush()
+            strategies[user] = Strategy(name=user, symbol="TEST", strategy_type="CUSTOM", user_id=owner.id)
+            db.add(strategies[user])
+            db.flush()
+        strategy = strategies[user]
+        config = {
+            "start_date": datetime(2020, 1, 1),
+            "end_date": datetime(2021, 1, 1),
+            "status": "pending",
+            **fields,
+        }
+        backtest = Backtest(strategy_id=strategy.id, user_id=strategy.user_id, **config)
+        db.add(backtest)
+        db.commit()
+        return backtest
+    return make
+
+
+@pytest.fixture
+def make_strategy():
+    """Factory of unsaved strategies; keyword arguments override the defaults"""
+    def make(**fields) -> Strategy:
+        config = {
+            "id": 1,
+            "name": "test",
+            "symbol": "TEST",
+            "strategy_type": "CUSTOM",
+            "initial_capital": 100000.0,
+            "position_size": 50.0,
+            **fields,
+        }
+        return Strategy(**config)
+    return make
+
+
+@pytest.fixture
+def run_engine():
+    """Run a single-symbol backtest over a frame bar by bar ("loop"), vectorized ("vectorized") or compiled ("compiled")"""
+    def run(strategy: Strategy, df, mode: str, interval: str = "1d"):
+        engine = BacktestingEngine(strategy, None, None, vectorized=mode != "loop", market_data=df, interval=interval)
+        engine.jit = mode == "compiled"
+        return engine.run()
+    return run
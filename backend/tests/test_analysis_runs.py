@@ -0,0 +1,179 @@
+from datetime import datetime
+
+import pytest
+
+from app.models.models import AnalysisRun, BacktestJob
+from app.services.analysis_runs import submit_analysis
+from app.services.job_queue import DatabaseJobQueue
+from app.services.market_data_cache import market_data_cache
+from app.services.optimizer import strategy_snapshot
+from app.services.worker_pool import process_next_job
+from benchmarks.synthetic import generate_ohlcv
+
+START, END = datetime(2000, 1, 1), datetime(2002, 1, 1)
+
+
+@pytest.fixture
+def strategy(make_backtest, db):
+    """Crossover strategy of alice over synthetic bars in the market data cache"""
+    market_data_cache.put("TEST", "1d", [generate_ohlcv(400, "1d")])
+    strategy = make_backtest("alice").strategy
+    strategy.parameters = {"sma_short": 10, "sma_long": 30}
+    strategy.buy_conditions = [{"indicator": "SMA_SHORT", "operator": "crosses_above", "compare_to": "SMA_LONG"}]
+    strategy.sell_conditions = [{"indicator": "SMA_SHORT", "operator": "crosses_below", "compare_to": "SMA_LONG"}]
+    strategy.initial_capital = 10000.0
+    strategy.position_size = 50.0
+    db.commit()
+    return strategy
+
+
+def optimization(strategy, **fields):
+    return {
+        "snapshot": strategy_snapshot(strategy),
+        "start_date": START.isoformat(),
+        "end_date": END.isoformat(),
+        "interval": "1d",
+        "parameter_ranges": {"sma_short": [5, 10], "sma_long": [20, 30]},
+        "metric": "total_return",
+        "maximize": True,
+        "max_workers": 1,
+        **fields,
+    }
+
+
+def walk_forward(strategy, **fields):
+    return {**optimization(strategy), "train_days": 200, "test_days": 100, "anchored": False, **fields}
+
+
+def reload(db, run):
+    db.expire_all()
+    return db.get(AnalysisRun, run.id)
+
+
+def test_analyses_run_on_workers_and_report_through_the_database(db, strategy):
+    queue = DatabaseJobQueue()
+    run = submit_analysis(db, "optimization", optimization(strategy), strategy.user_id, queue=queue)
+
+    job = db.query(BacktestJob).one()
+    assert (job.kind, job.analysis_id, job.backtest_id, job.status) == ("optimization", run.id, None, "queued")
+    assert run.status == "pending"
+    assert run.progress == {"total_combinations": 4, "completed": 0, "failed": 0}
+
+    assert process_next_job(queue, "worker:1")
+
+    run = reload(db, run)
+    assert run.status == "completed"
+    assert run.progress == {"total_combinations": 4, "completed": 4, "failed": 0}
+    assert [row["rank"] for row in run.results] == [1, 2, 3, 4]
+    returns = [row["metrics"]["total_return"] for row in run.results]
+    assert returns == sorted(returns, reverse=True)
+    assert run.completed_at is not None
+    assert db.get(BacktestJob, job.id).status == "completed"
+
+
+def test_walk_forward_windows_train_and_test_on_the_pool(db, strategy):
+    queue = DatabaseJobQueue()
+    run = submit_analysis(db, "walk_forward", walk_forward(strategy), strategy.user_id, queue=queue)
+
+    assert process_next_job(queue, "worker:1")
+
+    run = reload(db, run)
+    assert run.status == "completed", run.error_message
+    windows = run.progress["windows"]
+    assert len(windows) > 1
+    assert run.progress["tested"] == len(windows)
+    assert all(window["parameters"]["sma_short"] in (5, 10) and window["test_metrics"] for window in windows)
+    assert {trade["window"] for trade in run.results["trades"]} <= set(range(len(windows)))
+    assert len(run.results["equity_curve"]) == sum(window["test_bars"] for window in windows)
+    assert run.progress["metrics"]["final_value"] == pytest.approx(run.results["equity_curve"][-1]["value"])
+
+
+def test_invalid_analyses_are_rejected_before_anything_is_saved(db, strategy):
+    with pytest.raises(ValueError, match="empty"):
+        submit_analysis(db, "optimization", optimization(strategy, parameter_ranges={"sma_short": []}), strategy.user_id)
+
+    assert db.query(AnalysisRun).count() == 0
+    assert db.query(BacktestJob).count() == 0
+
+
+def test_analyses_failing_on_the_worker_fail_their_job(db, strategy):
+    queue = DatabaseJobQueue(max_attempts=1)
+    # Validated only once the bars are loaded: 400 bars leave no room for one train and test window
+    run = submit_analysis(db, "walk_forward", walk_forward(strategy, train_days=600), strategy.user_id, queue=queue)
+
+    assert process_next_job(queue, "worker:1")
+
+    run = reload(db, run)
+    assert run.status == "failed"
+    assert "too short" in run.error_message
+    assert run.jobs[0].status == "failed"
+
+
+def test_analyses_share_the_per_user_limit_with_backtests(db, strategy, make_backtest):
+    queue = DatabaseJobQueue(max_per_user=1)
+    backtest_job = queue.enqueue(db, make_backtest("alice"))
+    assert queue.claim("worker:1")["id"] == backtest_job.id
+
+    run = submit_analysis(db, "optimization", optimization(strategy), strategy.user_id, queue=queue)
+    assert queue.claim("worker:2") is None
+
+    queue.complete(backtest_job.id)
+    claimed = queue.claim("worker:2")
+    assert (claimed["kind"], claimed["analysis_id"], claimed["backtest_id"]) == ("optimization", run.id, None)
+    assert reload(db, run).status == "pending"  # Running once the worker starts it
+
+
+def test_cancelling_and_failing_analysis_jobs_update_their_runs(db, strategy):
+    queue = DatabaseJobQueue(max_attempts=1)
+    queued = submit_analysis(db, "optimization", optimization(strategy), strategy.user_id, queue=queue)
+    assert queue.cancel_analysis(db, queued.id)
+    assert reload(db, queued).status == "cancelled"
+
+    cancelled = submit_analysis(db, "optimization", optimization(strategy), strategy.user_id, queue=queue)
+    job = queue.claim("worker:1")
+    assert queue.cancel_analysis(db, cancelled.id)
+    assert queue.cancel_requests(["worker:1"]) == [{"id": job["id"], "worker_id": "worker:1"}]
+    queue.mark_cancelled(job["id"])
+    assert reload(db, cancelled).status == "cancelled"
+
+    failed = submit_analysis(db, "optimization", optimization(strategy), strategy.user_id, queue=queue)
+    job = queue.claim("worker:1")
+    assert not queue.fail(job["id"], "Worker process exited with code -9")
+    failed = reload(db, failed)
+    assert (failed.status, failed.error_message) == ("failed", "Worker process exited with code -9")
+
+
+def test_robustness_seeds_are_drawn_once_per_run(db, make_backtest):
+    queue = DatabaseJobQueue()
+    values = [10000.0, 10100.0, 9950.0, 10200.0, 10300.0, 10150.0, 10400.0]
+    backtest = make_backtest(
+        "alice",
+        status="completed",
+        trades_json=[
+            {"action": "BUY", "profit": None},
+            {"action": "SELL", "profit": 150.0},
+            {"action": "BUY", "profit": None},
+            {"action": "SELL", "profit": -50.0},
+        ],
+        equity_curve_json=[{"timestamp": f"2020-01-0{i + 1}", "value": value} for i, value in enumerate(values)],
+        metrics={"final_value": values[-1]},
+    )
+    request = {
+        "backtest_id": backtest.id,
+        "simulations": 200,
+        "block_size": None,
+        "trade_sampling": "bootstrap",
+        "confidence": 0.9,
+        "seed": None,
+        "max_workers": None,
+    }
+    run = submit_analysis(db, "robustness", request, backtest.user_id, queue=queue)
+    assert isinstance(run.request["seed"], int)
+
+    assert process_next_job(queue, "worker:1")
+
+    run = reload(db, run)
+    assert run.status == "completed"
+    assert run.progress == {"total_simulations": 400, "completed": 400}
+    assert set(run.results) == {"trades", "returns"}
+    assert run.results["returns"]["final_value"]["observed"] == values[-1]
@@ -0,0 +1,120 @@
+import math
+
+import numpy as np
+import pytest
+
+from app.core.config import settings
+from app.services import simulation_kernel
+from app.services.chunked_engine import ChunkedBacktestingEngine
+from app.services.result_store import _parts, decode_records
+from benchmarks.synthetic import generate_ohlcv
+
+PARAMETERS = {
+    "sma_short": 10, "sma_long": 30, "ema_short": 12, "ema_long": 26, "rsi_period": 14,
+    "macd_fast": 12, "macd_slow": 26, "macd_signal": 9, "bb_period": 20, "bb_std": 2,
+}
+
+# Strategies whose indicators, crossovers and pending orders straddle chunk boundaries
+CASES = {
+    "indicators": (
+        "1d",
+        PARAMETERS,
+        [{"indicator": "SMA_SHORT", "operator": "crosses_above", "compare_to": "SMA_LONG"}],
+        [
+            {"indicator": "MACD", "operator": "crosses_below", "compare_to": "MACD_SIGNAL"},
+            {"indicator": "RSI", "operator": ">", "value": 70},
+        ],
+        None,
+    ),
+    "execution": (
+        "1d",
+        PARAMETERS,
+        [{"indicator": "EMA_SHORT", "operator": "crosses_above", "compare_to": "EMA_LONG"}],
+        [{"indicator": "close", "operator": "<", "compare_to": "BB_LOWER"}],
+        {"fill_price": "next_open", "commission_pct": 0.1, "slippage_model": "volume", "slippage_pct": 0.2, "max_volume_pct": 5},
+    ),
+    "timeframes": (
+        "1h",
+        {"sma_short": 10, "timeframes": {"1d": {"sma_long": 5, "ema_short": 3}}},
+        [{"indicator": "SMA_SHORT", "operator": ">", "compare_to": "SMA_LONG_1D"}],
+        [{"indicator": "close", "operator": "crosses_below", "compare_to": "EMA_SHORT_1D"}],
+        None,
+    ),
+}
+
+# Bars per chunk, down to a single bar
+CHUNK_BARS = [1, 7, 333, 1000]
+
+MODES = [
+    "vectorized",
+    pytest.param("compiled", marks=pytest.mark.skipif(not simulation_kernel.available(), reason="numba is not installed")),
+]
+
+
+def spooled(spool):
+    return [record for part in _parts(spool.read()) for record in decode_records(part)]
+
+
+@pytest.fixture(scope="module")
+def frames():
+    return {"1d": generate_ohlcv(800, "1d", seed=5), "1h": generate_ohlcv(800, "1h", seed=5)}
+
+
+@pytest.mark.parametrize("mode", MODES)
+@pytest.mark.parametrize("chunk_bars", CHUNK_BARS)
+@pytest.mark.parametrize("case", CASES)
+def test_chunked_matches_in_memory(make_strategy, run_engine, frames, monkeypatch, case, chunk_bars, mode):
+    interval, parameters, buy_conditions, sell_conditions, execution = CASES[case]
+    df = frames[interval]
+    strategy = make_strategy(
+        parameters=parameters,
+        buy_conditions=buy_conditions,
+        sell_conditions=sell_conditions,
+        stop_loss=5.0,
+        take_profit=15.0,
+        execution=execution,
+    )
+    expected = run_engine(strategy, df, mode, interval=interval)
+
+    monkeypatch.setattr(settings, "SIMULATION_CHUNK_BYTES", chunk_bars * 512)
+    engine = ChunkedBacktestingEngine(strategy, None, None, market_data=df, interval=interval)
+    engine.jit = mode == "compiled"
+    result = engine.run()
+    trades = spooled(result["trades"])
+    equity_curve = spooled(result["equity_curve"])
+
+    assert engine.profile.stages[0]["chunks"] == math.ceil(len(df) / chunk_bars)
+    assert len(expected["trades"]) > 2
+    # Rolling sums restarted at chunk boundaries differ from the whole series' by rounding only
+    assert [(t["action"], t["timestamp"]) for t in trades] == [(t["action"], t["timestamp"]) for t in expected["trades"]]
+    assert np.allclose([t["price"] for t in trades], [t["price"] for t in expected["trades"]], rtol=1e-9, atol=0)
+    assert [p["timestamp"] for p in equity_curve] == [p["timestamp"] for p in expected["equity_curve"]]
+    assert np.allclose([p["value"] for p in equity_curve], [p["value"] for p in expected["equity_curve"]], rtol=1e-9, atol=0)
+    assert result["metrics"].keys() == expected["metrics"].keys()
+    for name, value in expected["metrics"].items():
+        if isinstance(value, float):
+            assert result["metrics"][name] == pytest.approx(value, rel=1e-8, nan_ok=True), name
+        else:
+            assert result["metrics"][name] == value, name
+
+
+@pytest.mark.parametrize("chunk_bars", [1, 7, 333])
+def test_chunked_walk_matches_loop(make_strategy, run_engine, frames, monkeypatch, chunk_bars):
+    # In-memory vectorized runs walk the bars in chunks too, carrying the engine state exactly
+    _, parameters, buy_conditions, sell_conditions, execution = CASES["execution"]
+    strategy = make_strategy(
+        parameters=parameters,
+        buy_conditions=buy_conditions,
+        sell_conditions=sell_conditions,
+        stop_loss=5.0,
+        take_profit=15.0,
+        execution=execution,
+    )
+    expected = run_engine(strategy, frames["1d"], "loop")
+
+    monkeypatch.setattr(settings, "SIMULATION_CHUNK_BYTES", chunk_bars * 512)
+    result = run_engine(strategy, frames["1d"], "vectorized")
+
+    assert result["trades"] == expected["trades"]
+    assert result["equity_curve"] == expected["equity_curve"]
+    assert result["metrics"] == expected["metrics"]
@@ -0,0 +1,96 @@
+import operator
+import re
+
+import numpy as np
+import pytest
+
+from app.services.conditions import ConditionError, compile_conditions
+
+OPERATORS = {">": operator.gt, "<": operator.lt, ">=": operator.ge, "<=": operator.le, "==": operator.eq}
+
+CONDITIONS = [
+    {"indicator": "A", "operator": "crosses_above", "compare_to": "B"},
+    {"any": [
+        {"indicator": "A", "operator": "crosses_below", "value": 0.5},
+        {"all": [
+            {"indicator": "B", "operator": ">=", "compare_to": "C"},
+            {"indicator": "C", "operator": "<", "value": 0.8},
+        ]},
+    ]},
+    {"indicator": "C", "operator": "==", "compare_to": "A"},
+    {"indicator": "B", "operator": "<=", "value": 0.3},
+    {"indicator": "A", "operator": ">", "value": 0.1},
+]
+
+
+def interpret(condition, columns, idx):
+    """Reference evaluation of one condition dict at a bar, straight from its fields"""
+    for key, combine in (("all", all), ("any", any)):
+        if key in condition:
+            return combine(interpret(item, columns, idx) for item in condition[key])
+
+    def operand(at):
+        return columns[condition["compare_to"]][at] if condition.get("compare_to") else condition["value"]
+
+    value = columns[condition["indicator"]][idx]
+    if condition["operator"] in OPERATORS:
+        return OPERATORS[condition["operator"]](value, operand(idx))
+    if idx == 0:
+        return False
+    previous = columns[condition["indicator"]][idx - 1]
+    if condition["operator"] == "crosses_above":
+        return previous <= operand(idx - 1) and value > operand(idx)
+    return previous >= operand(idx - 1) and value < operand(idx)
+
+
+@pytest.fixture
+def columns():
+    # Coarse values so ties and crossings from equality occur, with NaN gaps
+    rng = np.random.default_rng(7)
+    columns = {name: np.round(rng.random(2000), 1) for name in "ABC"}
+    for name, values in columns.items():
+        values[rng.integers(0, len(values), 100)] = np.nan
+    return columns
+
+
+@pytest.mark.parametrize("require_all", [True, False])
+def test_compiled_conditions_match_the_reference_interpretation(columns, require_all):
+    combine = all if require_all else any
+    for conditions in [CONDITIONS, CONDITIONS[:1], CONDITIONS[1:2], CONDITIONS[3:]]:
+        program = compile_conditions(conditions, require_all, "ABC")
+        rows = {name: values.tolist() for name, values in columns.items()}
+        expected = [combine(interpret(condition, rows, idx) for condition in conditions) for idx in range(2000)]
+
+        vectorized = program.evaluate(columns, (2000,))
+        test = program.bind(columns)
+        assert vectorized.tolist() == expected
+        assert [test(idx) for idx in range(2000)] == expected
+
+
+def test_panels_are_evaluated_per_symbol(columns):
+    program = compile_conditions(CONDITIONS, False, "ABC")
+    panel = {name: np.column_stack([values, values[::-1]]) for name, values in columns.items()}
+
+    signals = program.evaluate(panel, (2000, 2))
+    assert signals[:, 0].tolist() == program.evaluate(columns, (2000,)).tolist()
+    reversed_columns = {name: values[::-1].copy() for name, values in columns.items()}
+    assert signals[:, 1].tolist() == program.evaluate(reversed_columns, (2000,)).tolist()
+
+
+def test_no_conditions_never_signal(columns):
+    program = compile_conditions([], True, "ABC")
+    assert not program.evaluate(columns, (2000,)).any()
+    assert not program.bind(columns)(5)
+
+
+@pytest.mark.parametrize("condition, message", [
+    ({"indicator": "D", "operator": ">", "value": 1}, "buy_conditions[0].indicator: unknown column 'D'"),
+    ({"indicator": "A", "operator": "above", "value": 1}, "unknown operator 'above'"),
+    ({"indicator": "A", "operator": ">"}, "needs a numeric 'value'"),
+    ({"indicator": "A", "operator": ">", "value": True}, "needs a numeric 'value'"),
+    ({"all": []}, "buy_conditions[0].all: a group needs a non-empty list"),
+    ({"any": [{"indicator": "A", "operator": ">", "compare_to": "E"}]}, "buy_conditions[0].any[0].compare_to"),
+])
+def test_invalid_conditions_are_rejected_with_their_path(condition, message):
+    with pytest.raises(ConditionError, match=re.escape(message)):
+        compile_conditions([condition], True, "ABC", "buy_conditions")
@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+
+from app.services.downsampling import downsample, lttb, minmax
+
+
+@pytest.fixture
+def series():
+    rng = np.random.default_rng(11)
+    y = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, 10_000)))
+    x = np.cumsum(rng.integers(1, 4, len(y))).astype(np.float64)  # Uneven spacing, as across weekends
+    return x, y
+
+
+def reference_lttb(x, y, threshold):
+    """LTTB as published, one bucket at a time in plain Python"""
+    n = len(y)
+    every = (n - 2) / (threshold - 2)
+    kept = [0]
+    for i in range(threshold - 2):
+        start, stop = int(i * every) + 1, int((i + 1) * every) + 1
+        next_stop = min(int((i + 2) * every) + 1, n)
+        if i == threshold - 3:
+            next_x, next_y = x[n - 1], y[n - 1]
+        else:
+            next_x, next_y = np.mean(x[stop:next_stop]), np.mean(y[stop:next_stop])
+        a = kept[-1]
+        areas = [abs((x[a] - next_x) * (y[j] - y[a]) - (x[a] - x[j]) * (next_y - y[a])) for j in range(start, stop)]
+        kept.append(start + int(np.argmax(areas)))
+    return kept + [n - 1]
+
+
+@pytest.mark.parametrize("threshold", [3, 10, 2000])
+def test_lttb_keeps_the_largest_triangle_of_each_bucket(series, threshold):
+    x, y = series
+    kept = lttb(x, y, threshold)
+
+    assert len(kept) == threshold
+    assert kept.tolist() == reference_lttb(x, y, threshold)
+
+
+def test_minmax_keeps_the_extremes_of_every_bucket(series):
+    x, y = series
+    kept = minmax(y, 200)
+
+    assert len(kept) <= 200 and kept[0] == 0 and kept[-1] == len(y) - 1
+    assert np.all(np.diff(kept) > 0)
+    edges = np.linspace(1, len(y) - 1, 100).astype(np.int64)
+    for start, stop in zip(edges[:-1], edges[1:]):
+        assert start + np.argmin(y[start:stop]) in kept
+        assert start + np.argmax(y[start:stop]) in kept
+    assert np.argmin(y) in kept and np.argmax(y) in kept
+
+
+def test_short_series_and_method_none_keep_every_point(series):
+    x, y = series
+    assert lttb(x[:50], y[:50], 100).tolist() == list(range(50))
+    assert minmax(y[:50], 100).tolist() == list(range(50))
+    assert downsample(x, y, 10, "none").tolist() == list(range(len(y)))
+    assert downsample(x, y, 10, "lttb").tolist() == lttb(x, y, 10).tolist()
+    with pytest.raises(ValueError, match="Unknown downsampling method"):
+        downsample(x, y, 10, "average")
@@ -0,0 +1,131 @@
+import numpy as np
+import pytest
+
+from app.services import simulation_kernel
+from app.services.backtesting_engine import BacktestingEngine
+from app.services.incremental import can_extend, extension_frame
+from app.services.market_data_cache import OHLCV_COLUMNS
+from app.services.streaming_indicators import StreamingBollinger, StreamingRSI, StreamingSMA
+from benchmarks.synthetic import generate_ohlcv
+
+PARAMETERS = {
+    "sma_short": 10, "sma_long": 30, "ema_short": 12, "ema_long": 26, "rsi_period": 14,
+    "macd_fast": 12, "macd_slow": 26, "macd_signal": 9, "bb_period": 20, "bb_std": 2,
+}
+
+# Strategies using every streaming indicator, with fills at the close and at the next bar's open
+CASES = {
+    "close_fills": (
+        [{"indicator": "SMA_SHORT", "operator": "crosses_above", "compare_to": "SMA_LONG"}],
+        [
+            {"indicator": "MACD", "operator": "crosses_below", "compare_to": "MACD_SIGNAL"},
+            {"indicator": "RSI", "operator": ">", "value": 70},
+        ],
+        None,
+    ),
+    "next_open_fills": (
+        [{"indicator": "EMA_SHORT", "operator": "crosses_above", "compare_to": "EMA_LONG"}],
+        [{"indicator": "close", "operator": "<", "compare_to": "BB_LOWER"}],
+        {"fill_price": "next_open", "commission_pct": 0.1, "spread_pct": 0.05},
+    ),
+}
+
+MODES = [
+    "loop",
+    "vectorized",
+    pytest.param("compiled", marks=pytest.mark.skipif(not simulation_kernel.available(), reason="numba is not installed")),
+]
+
+# Bars of the first run and of every extension after it
+CUTS = [1200, 1201, 1500, 2000]
+
+
+@pytest.fixture(scope="module")
+def bars():
+    return generate_ohlcv(2000, "1d", seed=13)
+
+
+def make_engine(strategy, mode, bars, end):
+    engine = BacktestingEngine(strategy, None, bars.index[end - 1].to_pydatetime(), vectorized=mode != "loop")
+    engine.jit = mode == "compiled"
+    engine.capture_state = True
+    return engine
+
+
+@pytest.mark.parametrize("mode", MODES)
+@pytest.mark.parametrize("case", CASES)
+def test_extend_matches_full_rerun(make_strategy, run_engine, bars, monkeypatch, case, mode):
+    buy_conditions, sell_conditions, execution = CASES[case]
+    strategy = make_strategy(
+        parameters=PARAMETERS,
+        buy_conditions=buy_conditions,
+        sell_conditions=sell_conditions,
+        stop_loss=5.0,
+        take_profit=15.0,
+        execution=execution,
+    )
+    expected = run_engine(strategy, bars, mode)
+
+    def fetch_frame(symbol, start_date, end_date, interval, allow_empty=False):
+        return bars[(bars.index >= start_date) & (bars.index <= end_date)]
+
+    engine = make_engine(strategy, mode, bars, CUTS[0])
+    engine.market_data = bars.iloc[:CUTS[0]]
+    result = engine.run()
+    for end in CUTS[1:]:
+        assert can_extend(engine.state, strategy, "1d")
+        state = engine.state
+        engine = make_engine(strategy, mode, bars, end)
+        monkeypatch.setattr(engine.market_data_service, "fetch_frame", fetch_frame)
+        result = engine.extend(state, list(result["trades"]), list(result["equity_curve"]))
+
+    assert len(expected["trades"]) > 2
+    assert result["trades"] == expected["trades"]
+    assert result["equity_curve"] == expected["equity_curve"]
+    assert result["metrics"].keys() == expected["metrics"].keys()
+    for name, value in expected["metrics"].items():
+        assert result["metrics"][name] == value or (value != value and result["metrics"][name] != result["metrics"][name]), name
+
+
+def test_extended_indicators_equal_those_of_the_whole_series(make_strategy, bars):
+    strategy = make_strategy(parameters=PARAMETERS)
+    engine = make_engine(strategy, "vectorized", bars, CUTS[0])
+    engine.market_data = bars.iloc[:CUTS[0]]
+    engine.run()
+
+    df, _ = extension_frame(engine.state, bars.iloc[CUTS[0]:])
+    full = BacktestingEngine(strategy, None, None, market_data=bars).calculate_indicators(bars.copy())
+
+    columns = [name for name in df.columns if name not in OHLCV_COLUMNS]
+    assert "SMA_LONG" in columns and "BB_UPPER" in columns
+    for name in columns:
+        assert np.array_equal(df[name].to_numpy()[1:], full[name].to_numpy()[CUTS[0]:], equal_nan=True), name
+
+
+@pytest.mark.parametrize("indicator", ["sma", "rsi", "bollinger"])
+def test_replaying_a_history_matches_streaming_it(bars, indicator):
+    closes = bars["close"].tolist()
+    closes[100:103] = [float("nan")] * 3
+    closes[200:230] = [closes[199]] * 30
+
+    def make():
+        return {"sma": StreamingSMA(20), "rsi": StreamingRSI(14), "bollinger": StreamingBollinger(20, 2)}[indicator]
+
+    streamed, replayed = make(), make()
+    outputs = [streamed.update(close) for close in closes]
+    assert replayed.replay(closes) == outputs[-1]
+    assert replayed.snapshot() == streamed.snapshot()
+
+
+def test_higher_timeframes_are_not_extended(make_strategy, bars):
+    strategy = make_strategy(
+        parameters={"sma_short": 10, "timeframes": {"1wk": {"sma_long": 5}}},
+        buy_conditions=[{"indicator": "SMA_SHORT", "operator": ">", "compare_to": "SMA_LONG_1WK"}],
+        sell_conditions=[{"indicator": "SMA_SHORT", "operator": "<", "compare_to": "SMA_LONG_1WK"}],
+    )
+    engine = make_engine(strategy, "vectorized", bars, CUTS[0])
+    engine.market_data = bars.iloc[:CUTS[0]]
+    engine.run()
+
+    assert engine.state is not None
+    assert not can_extend(engine.state, strategy, "1d")
@@ -0,0 +1,76 @@
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.models.models import ProcessStats
+from app.services.indicator_cache import IndicatorCache, combine_stats, data_version, indicator_cache
+from app.services.process_stats import collect_stats, forget_stats, publish_stats, published_on_host
+from benchmarks.synthetic import generate_ohlcv
+
+
+def test_data_version_follows_the_bars():
+    df = generate_ohlcv(500, "1d", seed=1)
+    version = data_version(df)
+
+    assert data_version(df.copy(deep=False)) == version
+    assert data_version(df.iloc[:300]) == data_version(pd.DataFrame(df.iloc[:300]))
+    assert data_version(df.iloc[:300]) != version
+    assert data_version(df.iloc[1:]) != version
+
+
+def test_slices_of_a_fingerprinted_frame_get_their_own_indicators(make_strategy, run_engine):
+    df = generate_ohlcv(1000, "1d", seed=2)
+    strategy = make_strategy(
+        parameters={"sma_short": 10, "sma_long": 30},
+        buy_conditions=[{"indicator": "SMA_SHORT", "operator": "crosses_above", "compare_to": "SMA_LONG"}],
+        sell_conditions=[{"indicator": "SMA_SHORT", "operator": "crosses_below", "compare_to": "SMA_LONG"}],
+    )
+    run_engine(strategy, df, "vectorized")
+
+    fresh = df.iloc[200:700].copy()
+    fresh.attrs = {}
+    assert run_engine(strategy, df.iloc[200:700], "vectorized") == run_engine(strategy, fresh, "vectorized")
+
+
+def test_least_recently_used_series_are_evicted_beyond_max_bytes():
+    cache = IndicatorCache(max_bytes=3 * 800)
+    series = {name: np.full(100, float(i)) for i, name in enumerate("abcde")}
+    for name in "abc":
+        cache.get_or_compute(name, lambda: series[name])
+    assert cache.get_or_compute("a", pytest.fail)[0] == 0.0
+
+    cache.get_or_compute("d", lambda: series["d"])
+
+    assert cache.get_or_compute("d", pytest.fail)[0] == 3.0
+    assert cache.get_or_compute("b", lambda: series["e"])[0] == 4.0  # Evicted, so computed again
+    assert cache.stats() == {
+        "hits": 2, "misses": 5, "hit_rate": 2 / 7, "evictions": 2, "entries": 3, "bytes": 2400, "max_bytes": 2400
+    }
+    with pytest.raises(ValueError):
+        cache.get_or_compute("d", pytest.fail)[0] = 1.0  # Shared, so read-only
+
+    cache.get_or_compute("large", lambda: np.zeros(1000))
+    assert cache.stats()["entries"] == 3  # Larger than the whole cache, never stored
+
+
+def test_stats_are_summed_over_the_workers_that_published_them(db):
+    publish_stats("worker-host:101")
+    assert db.get(ProcessStats, "worker-host:101").stats["indicator_cache"] == indicator_cache.stats()
+
+    worker = {"hits": 30, "misses": 10, "hit_rate": 0.75, "evictions": 2, "entries": 5, "bytes": 4000, "max_bytes": 8000}
+    db.merge(ProcessStats(process_id="worker-host:101", stats={"indicator_cache": worker}, updated_at=datetime.utcnow()))
+    db.add(ProcessStats(process_id="other-host:7", stats={"indicator_cache": {**worker, "hits": 10}}, updated_at=datetime.utcnow()))
+    db.commit()
+
+    local = indicator_cache.stats()
+    totals = combine_stats(collect_stats(db, "indicator_cache"))
+    assert totals["processes"] == 3
+    assert (totals["hits"], totals["misses"]) == (40 + local["hits"], 20 + local["misses"])
+    assert totals["hit_rate"] == totals["hits"] / (totals["hits"] + totals["misses"])
+    assert totals["max_bytes"] == 16000 + local["max_bytes"]
+
+    assert published_on_host("worker-host") == ["worker-host:101"]
+    forget_stats(["worker-host:101"])
+    assert combine_stats(collect_stats(db, "indicator_cache"))["processes"] == 2
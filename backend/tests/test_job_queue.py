@@ -0,0 +1,128 @@
+import threading
+from datetime import datetime
+
+from sqlalchemy import event
+from sqlalchemy.dialects import postgresql
+
+from app.core.database import engine
+from app.models.models import BacktestJob
+from app.services.job_queue import DatabaseJobQueue, user_claim_lock
+
+
+def enqueue(db, queue, backtests, **options):
+    return [queue.enqueue(db, backtest, **options) for backtest in backtests]
+
+
+def statuses(db):
+    db.expire_all()
+    return {job.id: job.status for job in db.query(BacktestJob)}
+
+
+def test_claims_respect_the_per_user_limit(db, make_backtest):
+    queue = DatabaseJobQueue(max_per_user=2)
+    alice = enqueue(db, queue, [make_backtest("alice") for _ in range(3)])
+    bob = enqueue(db, queue, [make_backtest("bob")])
+
+    claimed = [queue.claim("worker:1") for _ in range(4)]
+
+    assert [job["id"] for job in claimed[:3]] == [alice[0].id, alice[1].id, bob[0].id]
+    assert claimed[3] is None
+    queue.complete(alice[0].id)
+    assert queue.claim("worker:1")["id"] == alice[2].id
+
+
+def test_concurrent_claims_respect_the_per_user_limit(db, make_backtest):
+    queue = DatabaseJobQueue(max_per_user=2)
+    enqueue(db, queue, [make_backtest() for _ in range(8)])
+    barrier = threading.Barrier(8)
+    claimed = []
+
+    def claim(worker):
+        barrier.wait()
+        claimed.append(queue.claim(f"worker:{worker}"))
+
+    threads = [threading.Thread(target=claim, args=(worker,)) for worker in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sum(job is not None for job in claimed) == 2
+    assert list(statuses(db).values()).count("running") == 2
+
+
+def test_claims_lock_the_user_before_counting(db, make_backtest):
+    queue = DatabaseJobQueue(max_per_user=1)
+    enqueue(db, queue, [make_backtest()])
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        assert queue.claim("worker:1") is not None
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+    lock = next(i for i, statement in enumerate(statements) if statement.startswith("SELECT users.id"))
+    update = next(i for i, statement in enumerate(statements) if statement.startswith("UPDATE backtest_jobs"))
+    assert lock < update
+    assert str(user_claim_lock(1).compile(dialect=postgresql.dialect())).endswith("FOR UPDATE")
+
+
+def test_claim_order(db, make_backtest):
+    queue = DatabaseJobQueue(max_per_user=10)
+    low = enqueue(db, queue, [make_backtest()], group_key="a")[0]
+    other_group = enqueue(db, queue, [make_backtest()], priority=1, group_key="a")[0]
+    preferred = enqueue(db, queue, [make_backtest()], priority=1, group_key="b")[0]
+    high = enqueue(db, queue, [make_backtest()], priority=2, group_key="a")[0]
+
+    order = [queue.claim("worker:1", prefer_group="b")["id"] for _ in range(4)]
+
+    assert order == [high.id, preferred.id, other_group.id, low.id]
+
+
+def test_failed_jobs_are_retried_with_backoff(db, make_backtest):
+    queue = DatabaseJobQueue(max_attempts=2, retry_delay=3600)
+    backtest = make_backtest()
+    job = enqueue(db, queue, [backtest])[0]
+
+    assert queue.fail(queue.claim("worker:1")["id"], "boom")
+    db.expire_all()
+    assert job.status == "queued" and job.available_at > datetime.utcnow()
+    assert backtest.status == "pending"
+    assert queue.claim("worker:1") is None
+
+    job.available_at = datetime.utcnow()
+    db.commit()
+    claimed = queue.claim("worker:1")
+    assert claimed["attempts"] == 2
+    assert not queue.fail(claimed["id"], "boom again")
+    db.expire_all()
+    assert job.status == "failed"
+    assert backtest.status == "failed" and backtest.error_message == "boom again"
+
+
+def test_cancel_queued_and_running_jobs(db, make_backtest):
+    queue = DatabaseJobQueue(max_per_user=10)
+    running, queued = [make_backtest(), make_backtest()]
+    running_job, queued_job = enqueue(db, queue, [running, queued])
+    assert queue.claim("worker:1")["id"] == running_job.id
+
+    assert queue.cancel(db, queued.id)
+    assert queue.cancel(db, running.id)
+    assert not queue.cancel(db, queued.id)
+
+    assert statuses(db) == {running_job.id: "running", queued_job.id: "cancelled"}
+    assert queued.status == "cancelled"
+    assert queue.claim("worker:1") is None
+    assert queue.cancel_requests(["worker:1"]) == [{"id": running_job.id, "worker_id": "worker:1"}]
+    assert queue.cancel_requests(["worker:2"]) == []
+
+    queue.mark_cancelled(running_job.id)
+    assert statuses(db)[running_job.id] == "cancelled"
+    db.expire_all()
+    assert running.status == "cancelled"
+    # A cancelled job is not failed or retried by a worker finishing late
+    assert not queue.fail(running_job.id, "stopped")
@@ -0,0 +1,89 @@
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+from app.models.models import ProcessStats
+from app.services.market_data_cache import MarketDataCache, combine_stats, market_data_cache
+from app.services.process_stats import collect_stats, publish_stats
+from benchmarks.synthetic import generate_ohlcv
+
+BARS = generate_ohlcv(500, "1d", seed=3)
+
+
+def provider(calls):
+    """Fetcher serving BARS, recording the ranges it is asked for"""
+    def fetch(symbol, start, end, interval):
+        calls.append((symbol, pd.Timestamp(start).date(), pd.Timestamp(end).date()))
+        start, end = (pd.Timestamp(bound) for bound in (start, end))
+        start = start.tz_localize(BARS.index.tz) if start.tzinfo is None else start
+        end = end.tz_localize(BARS.index.tz) if end.tzinfo is None else end
+        return BARS[(BARS.index >= start) & (BARS.index < end)]
+    return fetch
+
+
+def test_only_the_missing_head_and_tail_are_fetched(tmp_path):
+    cache = MarketDataCache(str(tmp_path), max_bytes=10**8)
+    calls = []
+
+    df = cache.get("SYM", "1d", datetime(2000, 6, 1), datetime(2001, 1, 1), provider(calls))
+    assert calls == [("SYM", datetime(2000, 6, 1).date(), datetime(2001, 1, 1).date())]
+    assert cache.covers("SYM", "1d", datetime(2000, 7, 1), datetime(2000, 12, 1))
+    assert not cache.covers("SYM", "1d", datetime(2000, 1, 1), datetime(2000, 12, 1))
+
+    calls.clear()
+    df = cache.get("SYM", "1d", datetime(2000, 1, 1), datetime(2001, 6, 1), provider(calls))
+    assert [call[1:] for call in calls] == [
+        (datetime(2000, 1, 1).date(), datetime(2000, 6, 1).date()),
+        (datetime(2001, 1, 1).date(), datetime(2001, 6, 1).date()),
+    ]
+    expected = BARS[(BARS.index >= "2000-01-01") & (BARS.index < "2001-06-01")]
+    pd.testing.assert_frame_equal(df, expected, check_freq=False, check_names=False, check_index_type=False)
+
+    cache.get("SYM", "1d", datetime(2000, 3, 1), datetime(2000, 4, 1), pytest.fail)
+    assert cache.counters() == {"hits": 1, "partial_hits": 1, "misses": 1, "evictions": 0}
+
+
+def test_offline_mode_serves_what_is_cached(tmp_path):
+    cache = MarketDataCache(str(tmp_path), max_bytes=10**8, offline=True)
+    with pytest.raises(ValueError):
+        cache.get("SYM", "1d", datetime(2000, 1, 1), datetime(2001, 1, 1), pytest.fail)
+
+    cache.put("SYM", "1d", [BARS.iloc[:100]])
+    df = cache.get("SYM", "1d", datetime(2000, 1, 1), datetime(2001, 1, 1), pytest.fail)
+    assert len(df) == 100
+
+
+def test_least_recently_used_entries_are_evicted_and_imports_kept(tmp_path):
+    cache = MarketDataCache(str(tmp_path), max_bytes=10**8)
+    start, end = datetime(2000, 1, 1), datetime(2001, 1, 1)
+    cache.put("PIN", "1d", [BARS])
+    cache.get("A", "1d", start, end, provider([]))
+    entry_bytes = cache.stats()["bytes"] - next(e["bytes"] for e in cache._entries() if e["pinned"])
+
+    cache.max_bytes = int(2.5 * entry_bytes)
+    cache.get("B", "1d", start, end, provider([]))
+    cache.get("A", "1d", start, end, pytest.fail)
+    cache.get("C", "1d", start, end, provider([]))
+
+    assert cache.covers("A", "1d", start, end)
+    assert not cache.covers("B", "1d", start, end)
+    assert cache.covers("C", "1d", start, end)
+    assert cache.covers("PIN", "1d", BARS.index[0], BARS.index[-1])
+    stats = cache.stats()
+    assert (stats["entries"], stats["pinned_entries"], stats["evictions"]) == (3, 1, 1)
+
+
+def test_counters_are_summed_over_the_workers_that_published_them(db):
+    publish_stats("worker-host:101")
+    assert db.get(ProcessStats, "worker-host:101").stats["market_data_cache"] == market_data_cache.counters()
+
+    worker = {"hits": 30, "partial_hits": 5, "misses": 10, "evictions": 2}
+    db.merge(ProcessStats(process_id="worker-host:101", stats={"market_data_cache": worker}, updated_at=datetime.utcnow()))
+    db.commit()
+
+    local = market_data_cache.stats()
+    totals = combine_stats(local, collect_stats(db, "market_data_cache"))
+    assert totals["processes"] == 2
+    assert (totals["hits"], totals["misses"]) == (30 + local["hits"], 10 + local["misses"])
+    assert (totals["entries"], totals["bytes"]) == (local["entries"], local["bytes"])  # Shared directory, not summed
@@ -0,0 +1,102 @@
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+from app.services import market_data_providers
+from app.services.market_data_cache import MarketDataCache
+from app.services.market_data_providers import LocalFileProvider, MarketDataProvider, empty_frame, slice_frame
+from app.services.market_data_service import MarketDataService
+from benchmarks.synthetic import generate_ohlcv
+
+BARS = generate_ohlcv(300, "1d", seed=4)
+START, END = datetime(2000, 1, 1), datetime(2001, 1, 1)
+
+
+def partition(day, symbols):
+    return pd.DataFrame([
+        {"Date": day, "Ticker": symbol, "Open": 1.0, "High": 2.0, "Low": 0.5, "Close": 1.5, "Volume": 100.0}
+        for symbol in symbols
+    ])
+
+
+@pytest.fixture
+def dump(tmp_path):
+    """Daily dump with a per-symbol file for AAPL and date partitions holding MSFT and IBM"""
+    daily = tmp_path / "1d"
+    daily.mkdir()
+    BARS.rename_axis("date").to_csv(daily / "AAPL.csv")
+    partition("2000-01-03", ["MSFT", "IBM"]).to_csv(daily / "2000-01-03.csv", index=False)
+    partition("2000-01-04", ["msft", "IBM"]).to_parquet(daily / "2000-01-04.parquet")
+    partition("2000-01-05", ["IBM"]).to_csv(daily / "2000-01-05.csv", index=False)
+    return tmp_path
+
+
+def test_local_files_of_other_symbols_are_skipped_without_reading_them(dump, monkeypatch):
+    provider = LocalFileProvider(str(dump))
+    reads, scans = [], []
+    read_dump, dump_symbols = market_data_providers.read_dump, market_data_providers.dump_symbols
+    monkeypatch.setattr(market_data_providers, "read_dump", lambda path, **kw: reads.append(path.name) or read_dump(path, **kw))
+    monkeypatch.setattr(market_data_providers, "dump_symbols", lambda path: scans.append(path.name) or dump_symbols(path))
+
+    df = provider.download("MSFT", START, END)
+    assert list(df.index) == [pd.Timestamp("2000-01-03"), pd.Timestamp("2000-01-04")]
+    assert reads == ["2000-01-03.csv", "2000-01-04.parquet"]
+    assert sorted(scans) == ["2000-01-03.csv", "2000-01-04.parquet", "2000-01-05.csv", "AAPL.csv"]
+    assert provider.file_symbols(dump / "1d" / "AAPL.csv") == frozenset()
+
+    scans.clear()
+    assert len(provider.download("IBM", START, END)) == 3
+    assert scans == []  # Symbols are remembered per file
+
+    partition("2000-01-05", ["IBM", "MSFT"]).to_csv(dump / "1d" / "2000-01-05.csv", index=False)
+    assert len(provider.download("MSFT", START, END)) == 3
+    assert scans == ["2000-01-05.csv"]
+
+    reads.clear()
+    expected = slice_frame(BARS, START, END)
+    pd.testing.assert_frame_equal(
+        provider.download("aapl", START, END), expected, check_freq=False, check_names=False, check_index_type=False
+    )
+    assert reads == ["AAPL.csv"]
+
+
+class BatchFailingProvider(MarketDataProvider):
+    name = "batch-failing"
+    remote = False
+    supports_batch = True
+
+    def __init__(self):
+        self.downloads = []
+
+    def download(self, symbol, start_date, end_date, interval="1d"):
+        self.downloads.append(symbol)
+        return empty_frame() if symbol == "NONE" else slice_frame(BARS, start_date, end_date)
+
+    def download_many(self, symbols, start_date, end_date, interval="1d"):
+        raise ConnectionError("batch endpoint unavailable")
+
+
+def test_failed_batch_downloads_fall_back_to_one_symbol_at_a_time(tmp_path):
+    service = MarketDataService(BatchFailingProvider())
+    service.cache = MarketDataCache(str(tmp_path), max_bytes=10**8, offline=True)
+
+    frames, errors = service.fetch_frames(["A", "B", "NONE"], START, END)
+
+    assert service.provider.downloads == ["A", "B", "NONE"]
+    assert sorted(frames) == ["A", "B"] and len(frames["A"]) == len(slice_frame(BARS, START, END))
+    assert "No data found" in errors["NONE"]
+
+
+def test_remote_providers_are_not_called_in_offline_mode(tmp_path):
+    class Remote(BatchFailingProvider):
+        remote = True
+
+    service = MarketDataService(Remote())
+    service.cache = MarketDataCache(str(tmp_path), max_bytes=10**8, offline=True)
+
+    with pytest.raises(Exception, match="offline"):
+        service.fetch_frame("A", START, END)
+    assert service.provider.downloads == []
+    with pytest.raises(TypeError):
+        MarketDataProvider()
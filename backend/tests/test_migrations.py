@@ -0,0 +1,71 @@
+from datetime import datetime
+
+import pytest
+from alembic.autogenerate import compare_metadata
+from alembic.migration import MigrationContext
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+
+from app.core.database import Base
+from app.core.migrations import INITIAL_REVISION, upgrade_database
+from app.models.models import Backtest, BacktestJob
+
+
+@pytest.fixture
+def scratch_engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'migrations.db'}")
+    yield engine
+    engine.dispose()
+
+
+def schema_differences(engine):
+    with engine.connect() as connection:
+        return compare_metadata(MigrationContext.configure(connection), Base.metadata)
+
+
+def test_migrations_build_the_model_schema(scratch_engine):
+    upgrade_database(scratch_engine)
+    assert schema_differences(scratch_engine) == []
+
+    # Already at the latest revision
+    upgrade_database(scratch_engine)
+    assert schema_differences(scratch_engine) == []
+
+
+def test_databases_from_before_migrations_are_upgraded_in_place(scratch_engine):
+    # The tables create_all built before migrations existed, with no alembic_version
+    upgrade_database(scratch_engine, INITIAL_REVISION)
+    with scratch_engine.begin() as connection:
+        connection.execute(text("DROP TABLE alembic_version"))
+        connection.execute(text("INSERT INTO users (id, email, username, hashed_password) VALUES (1, 'a@example.com', 'a', '-')"))
+        connection.execute(text(
+            "INSERT INTO strategies (id, name, user_id, symbol, strategy_type) VALUES (1, 'old', 1, 'AAPL', 'CUSTOM')"
+        ))
+        connection.execute(text(
+            "INSERT INTO backtests (id, strategy_id, user_id, start_date, end_date, status, trades) "
+            "VALUES (1, 1, 1, '2020-01-01', '2021-01-01', 'completed', '[{\"action\": \"BUY\"}]')"
+        ))
+
+    upgrade_database(scratch_engine)
+
+    assert schema_differences(scratch_engine) == []
+    with Session(scratch_engine) as db:
+        backtest = db.get(Backtest, 1)
+        assert backtest.trades_json == [{"action": "BUY"}]
+        assert (backtest.interval, backtest.out_of_core, backtest.capture_profile) == ("1d", False, False)
+        assert backtest.strategy.execution is None
+
+        db.add(BacktestJob(backtest_id=1, user_id=1, enqueued_at=datetime.utcnow()))
+        db.commit()
+        assert backtest.jobs[0].status == "queued"
+
+
+def test_databases_built_with_the_job_queue_tables_are_stamped_past_them(scratch_engine):
+    # create_all also built the job queue tables before migrations existed
+    upgrade_database(scratch_engine, "0002")
+    with scratch_engine.begin() as connection:
+        connection.execute(text("DROP TABLE alembic_version"))
+
+    upgrade_database(scratch_engine)
+
+    assert schema_differences(scratch_engine) == []
@@ -0,0 +1,61 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.core.pagination import encode_cursor, paginate
+from app.models.models import Backtest
+
+NOW = datetime(2024, 1, 1, 12, 0, 0)
+
+
+@pytest.fixture
+def backtests(make_backtest):
+    """Eight backtests of alice, four of them created at the same instant, and one of bob"""
+    created = [NOW - timedelta(minutes=minutes) for minutes in (0, 5, 5, 5, 5, 10, 20, 30)]
+    rows = [make_backtest(created_at=created_at) for created_at in created]
+    make_backtest(user="bob", created_at=NOW)
+    return sorted(rows, key=lambda row: (row.created_at, row.id), reverse=True)
+
+
+def pages(db, user_id, limit, cursor=None):
+    """Walk every page, returning the ids of each"""
+    result = []
+    while True:
+        query = db.query(Backtest).filter(Backtest.user_id == user_id)
+        rows, cursor = paginate(query, Backtest, cursor, limit)
+        result.append([row.id for row in rows])
+        if cursor is None:
+            return result
+
+
+@pytest.mark.parametrize("limit", [1, 2, 3, 4, 8, 9])
+def test_pages_cover_every_row_once_newest_first(db, backtests, limit):
+    result = pages(db, backtests[0].user_id, limit)
+
+    assert [id for page in result for id in page] == [row.id for row in backtests]
+    assert all(len(page) == limit for page in result[:-1])
+    # A next cursor is only returned when a row is left for it, so no page is empty
+    assert all(result)
+
+
+def test_ties_on_created_at_continue_by_id_across_pages(db, backtests):
+    tied = [row.id for row in backtests if row.created_at == NOW - timedelta(minutes=5)]
+    assert len(tied) == 4
+
+    first, second = pages(db, backtests[0].user_id, 3)[:2]
+    assert first[1:] == tied[:2]
+    assert second[:2] == tied[2:]
+
+
+def test_a_deleted_boundary_row_still_positions_the_cursor(db, backtests):
+    boundary = backtests[2]
+    cursor = encode_cursor(boundary.created_at, boundary.id)
+    db.delete(boundary)
+    db.commit()
+
+    assert pages(db, backtests[0].user_id, 10, cursor) == [[row.id for row in backtests[3:]]]
+
+
+def test_malformed_cursors_are_rejected(db):
+    with pytest.raises(ValueError, match="Invalid cursor"):
+        paginate(db.query(Backtest), Backtest, "not-a-cursor", 10)
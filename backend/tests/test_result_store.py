@@ -0,0 +1,71 @@
+import numpy as np
+
+from app.models.models import BacktestArtifact
+from app.services.result_store import (
+    ARTIFACT_FORMAT, PARTS_FORMAT, ResultSpool, decode_columns, decode_records, encode_records, load_columns,
+    load_results, save_results,
+)
+
+RECORDS = [
+    {"timestamp": "2020-01-02T09:30:00-05:00", "action": "BUY", "price": 101.25, "quantity": 3, "filled": True},
+    {"timestamp": "2020-03-09T09:30:00.250000-04:00", "action": "SELL", "price": 99.5, "quantity": 3, "filled": False,
+     "profit": -5.25, "tags": ["stop_loss"]},
+    {"timestamp": "2020-03-10T16:00:00", "action": "BUY", "price": float("nan"), "quantity": 0, "filled": True,
+     "note": None},
+]
+
+
+def test_records_round_trip_with_types_and_missing_keys():
+    decoded = decode_records(encode_records(RECORDS))
+
+    assert [sorted(record) for record in decoded] == [sorted(record) for record in RECORDS]
+    for record, original in zip(decoded, RECORDS):
+        for key, value in original.items():
+            if value != value:
+                assert record[key] != record[key]
+            else:
+                assert record[key] == value and type(record[key]) is type(value), key
+    assert decode_records(encode_records([])) == []
+    assert decode_records(encode_records([{}, {}])) == [{}, {}]
+
+
+def test_columns_decode_to_arrays_with_none_for_missing_keys():
+    columns = decode_columns(encode_records(RECORDS))
+
+    assert columns["price"].dtype == np.float64
+    assert columns["quantity"].tolist() == [3, 3, 0]
+    assert columns["timestamp"].tolist() == [record["timestamp"] for record in RECORDS]
+    assert columns["profit"].tolist() == [None, -5.25, None]
+
+
+def test_spooled_parts_are_stored_and_loaded_like_one_series(db, make_backtest):
+    backtest = make_backtest()
+    spool = ResultSpool()
+    spool.append(RECORDS[:2])
+    spool.append([])
+    spool.append([{"timestamp": "2020-03-11T16:00:00", "value": 1.0}])
+
+    save_results(db, backtest, {"trades": spool, "equity_curve": RECORDS})
+    db.commit()
+
+    formats = {artifact.kind: (artifact.format, artifact.rows) for artifact in db.query(BacktestArtifact)}
+    assert formats == {"trades": (PARTS_FORMAT, 3), "equity_curve": (ARTIFACT_FORMAT, 3)}
+    trades = load_results(db, backtest, "trades")
+    assert trades[:2] == RECORDS[:2] and trades[2] == {"timestamp": "2020-03-11T16:00:00", "value": 1.0}
+    columns = load_columns(db, backtest, "trades")
+    assert columns["value"].tolist() == [None, None, 1.0]
+    assert columns["action"].tolist() == ["BUY", "SELL", None]
+
+
+def test_results_stored_as_json_are_still_loaded(db, make_backtest):
+    backtest = make_backtest(equity_curve_json=[{"timestamp": "2020-01-02T00:00:00", "value": 10.0}, {"value": 11}])
+
+    assert load_results(db, backtest, "equity_curve") == backtest.equity_curve_json
+    assert load_columns(db, backtest, "equity_curve")["value"].tolist() == [10.0, 11.0]
+    assert load_results(db, backtest, "trades") is None
+
+    save_results(db, backtest, {"trades": [], "equity_curve": [{"value": 12.0}]})
+    db.commit()
+    assert backtest.equity_curve_json is None
+    assert load_results(db, backtest, "equity_curve") == [{"value": 12.0}]
+    assert load_results(db, backtest, "trades") == []
@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.services.backtesting_engine import compute_timeframe_columns
+from app.services.timeframes import completed_bars
+from benchmarks.synthetic import generate_ohlcv
+
+PARAMS = {"timeframes": {"1d": {"sma_long": 5, "rsi_period": 14}, "1wk": {"ema_long": 4, "macd_fast": 3, "macd_slow": 6, "macd_signal": 2}}}
+
+
+@pytest.fixture(scope="module")
+def hourly_bars():
+    return generate_ohlcv(1500, "1h", seed=3)
+
+
+def test_completed_bars_end_each_session(hourly_bars):
+    ends = completed_bars(hourly_bars.index, "1d")
+    dates = hourly_bars.index.date
+
+    assert len(ends) == len(np.unique(dates))
+    assert ends[-1] == len(hourly_bars) - 1
+    # Every end is the last bar of its day
+    assert all(dates[end] != dates[end + 1] for end in ends[:-1])
+
+
+@pytest.mark.parametrize("cut", [100, 503, 504, 777, 1200])
+def test_timeframe_columns_ignore_later_bars(hourly_bars, cut):
+    # Changing every close after a bar must leave the columns up to that bar unchanged
+    closes = hourly_bars['close'].to_numpy().copy()
+    closes[cut + 1:] *= 1.5
+    changed = pd.DataFrame({'close': closes}, index=hourly_bars.index)
+
+    expected = compute_timeframe_columns(hourly_bars, PARAMS, "1h", "TEST")
+    result = compute_timeframe_columns(changed, PARAMS, "1h", "TEST")
+
+    assert expected.keys() == result.keys()
+    for name, values in expected.items():
+        assert np.array_equal(result[name][:cut + 1], values[:cut + 1], equal_nan=True), name
+        assert not np.array_equal(result[name], values, equal_nan=True), name
+
+
+def test_timeframe_columns_change_only_on_completed_bars(hourly_bars):
+    columns = compute_timeframe_columns(hourly_bars, PARAMS, "1h", "TEST")
+    ends = set(completed_bars(hourly_bars.index, "1d").tolist())
+
+    values = columns["SMA_LONG_1D"]
+    changes = np.flatnonzero(np.diff(values) != 0) + 1
+    changes = changes[~np.isnan(values[changes - 1])]
+    assert len(changes) > 0
+    assert set(changes.tolist()) <= ends
@@ -0,0 +1,276 @@
+import pytest
+
+from app.services import simulation_kernel
+from app.services.backtesting_engine import BacktestingEngine
+from app.services.portfolio_engine import PortfolioBacktestingEngine
+from app.services.walk_forward import stitch_windows
+from benchmarks.synthetic import generate_ohlcv
+
+# Indicator parameters and conditions exercising every indicator and both crossover directions
+CASES = {
+    "sma_crossover": (
+        {"sma_short": 10, "sma_long": 30},
+        [{"indicator": "SMA_SHORT", "operator": "crosses_above", "compare_to": "SMA_LONG"}],
+        [{"indicator": "SMA_SHORT", "operator": "crosses_below", "compare_to": "SMA_LONG"}],
+    ),
+    "ema_rsi": (
+        {"ema_short": 12, "ema_long": 26, "rsi_period": 14},
+        [
+            {"indicator": "EMA_SHORT", "operator": ">", "compare_to": "EMA_LONG"},
+            {"indicator": "RSI", "operator": "<", "value": 60},
+        ],
+        [{"indicator": "RSI", "operator": ">", "value": 70}],
+    ),
+    "macd": (
+        {"macd_fast": 12, "macd_slow": 26, "macd_signal": 9},
+        [{"indicator": "MACD", "operator": "crosses_above", "compare_to": "MACD_SIGNAL"}],
+        [{"indicator": "MACD_HIST", "operator": "crosses_below", "value": 0}],
+    ),
+    "bollinger": (
+        {"bb_period": 20, "bb_std": 2},
+        [{"indicator": "close", "operator": "crosses_below", "compare_to": "BB_LOWER"}],
+        [{"indicator": "close", "operator": "crosses_above", "compare_to": "BB_UPPER"}],
+    ),
+}
+
+# Exits by sell conditions only, and with stop loss and take profit
+EXITS = {"signals": (None, None), "stops": (3.0, 6.0)}
+
+MODES = [
+    "vectorized",
+    pytest.param("compiled", marks=pytest.mark.skipif(not simulation_kernel.available(), reason="numba is not installed")),
+]
+
+# Execution settings exercising every friction and fill option
+EXECUTIONS = {
+    "commissions": {"commission_fixed": 5.0, "commission_pct": 0.1},
+    "spread_fixed_slippage": {"spread_pct": 0.2, "slippage_model": "fixed", "slippage_pct": 0.05},
+    "volume_slippage": {"slippage_model": "volume", "slippage_pct": 2.0},
+    "next_open": {"fill_price": "next_open", "commission_pct": 0.05},
+    "volume_cap": {"max_volume_pct": 0.5},
+    "fractional": {"fractional_shares": True, "commission_fixed": 1.0, "spread_pct": 0.1},
+}
+
+# Intraday strategies, filtered by indicators of higher timeframes
+INTRADAY_CASES = {
+    "intraday": (
+        {"sma_short": 7, "sma_long": 21},
+        [{"indicator": "SMA_SHORT", "operator": "crosses_above", "compare_to": "SMA_LONG"}],
+        [{"indicator": "SMA_SHORT", "operator": "crosses_below", "compare_to": "SMA_LONG"}],
+    ),
+    "daily_trend": (
+        {"sma_short": 7, "sma_long": 21, "timeframes": {"1d": {"sma_long": 5}}},
+        [
+            {"indicator": "SMA_SHORT", "operator": "crosses_above", "compare_to": "SMA_LONG"},
+            {"indicator": "close", "operator": ">", "compare_to": "SMA_LONG_1D"},
+        ],
+        [{"indicator": "SMA_SHORT", "operator": "crosses_below", "compare_to": "SMA_LONG"}],
+    ),
+    "daily_and_weekly": (
+        {"ema_short": 7, "ema_long": 21, "timeframes": {"1d": {"rsi_period": 14}, "1wk": {"ema_long": 4}}},
+        [
+            {"indicator": "EMA_SHORT", "operator": "crosses_above", "compare_to": "EMA_LONG"},
+            {"indicator": "RSI_1D", "operator": "<", "value": 60},
+        ],
+        [
+            {"indicator": "EMA_SHORT", "operator": "crosses_below", "compare_to": "EMA_LONG"},
+            {"indicator": "close", "operator": "crosses_below", "compare_to": "EMA_LONG_1WK"},
+        ],
+    ),
+}
+
+
+@pytest.fixture(scope="module")
+def bars():
+    return generate_ohlcv(2000, "1d", seed=7)
+
+
+@pytest.fixture(scope="module")
+def hourly_bars():
+    return generate_ohlcv(3000, "1h", seed=11)
+
+
+@pytest.mark.parametrize("mode", MODES)
+@pytest.mark.parametrize("exits", EXITS)
+@pytest.mark.parametrize("case", CASES)
+def test_vectorized_matches_loop(make_strategy, run_engine, bars, case, exits, mode):
+    parameters, buy_conditions, sell_conditions = CASES[case]
+    stop_loss, take_profit = EXITS[exits]
+    strategy = make_strategy(
+        parameters=parameters,
+        buy_conditions=buy_conditions,
+        sell_conditions=sell_conditions,
+        stop_loss=stop_loss,
+        take_profit=take_profit,
+    )
+
+    expected = run_engine(strategy, bars, "loop")
+    result = run_engine(strategy, bars, mode)
+
+    assert len(expected["trades"]) > 2
+    assert result["trades"] == expected["trades"]
+    assert result["equity_curve"] == expected["equity_curve"]
+    assert result["metrics"] == expected["metrics"]
+
+
+@pytest.mark.parametrize("case", CASES)
+def test_stops_change_exits(make_strategy, run_engine, bars, case):
+    # Guards the parity cases above against stop loss and take profit never triggering
+    parameters, buy_conditions, sell_conditions = CASES[case]
+    runs = [
+        run_engine(make_strategy(
+            parameters=parameters,
+            buy_conditions=buy_conditions,
+            sell_conditions=sell_conditions,
+            stop_loss=stop_loss,
+            take_profit=take_profit,
+        ), bars, "loop")
+        for stop_loss, take_profit in EXITS.values()
+    ]
+    assert runs[0]["trades"] != runs[1]["trades"]
+
+
+@pytest.mark.parametrize("mode", MODES)
+@pytest.mark.parametrize("execution", EXECUTIONS)
+@pytest.mark.parametrize("case", ["sma_crossover", "bollinger"])
+def test_execution_model_matches_loop(make_strategy, run_engine, bars, case, execution, mode):
+    parameters, buy_conditions, sell_conditions = CASES[case]
+    strategy = make_strategy(
+        parameters=parameters,
+        buy_conditions=buy_conditions,
+        sell_conditions=sell_conditions,
+        stop_loss=3.0,
+        take_profit=6.0,
+        execution=EXECUTIONS[execution],
+    )
+
+    expected = run_engine(strategy, bars, "loop")
+    result = run_engine(strategy, bars, mode)
+
+    assert len(expected["trades"]) > 2
+    assert result["trades"] == expected["trades"]
+    assert result["equity_curve"] == expected["equity_curve"]
+    assert result["metrics"] == expected["metrics"]
+
+
+@pytest.mark.parametrize("execution", EXECUTIONS)
+def test_execution_model_changes_fills(make_strategy, run_engine, bars, execution):
+    # Guards the parity cases above against execution settings being ignored
+    parameters, buy_conditions, sell_conditions = CASES["sma_crossover"]
+    runs = [
+        run_engine(make_strategy(
+            parameters=parameters,
+            buy_conditions=buy_conditions,
+            sell_conditions=sell_conditions,
+            execution=settings,
+        ), bars, "loop")
+        for settings in (None, EXECUTIONS[execution])
+    ]
+    assert runs[0]["trades"] != runs[1]["trades"]
+
+
+@pytest.mark.parametrize("mode", MODES)
+@pytest.mark.parametrize("exits", EXITS)
+@pytest.mark.parametrize("case", INTRADAY_CASES)
+def test_intraday_matches_loop(make_strategy, run_engine, hourly_bars, case, exits, mode):
+    parameters, buy_conditions, sell_conditions = INTRADAY_CASES[case]
+    stop_loss, take_profit = EXITS[exits]
+    strategy = make_strategy(
+        parameters=parameters,
+        buy_conditions=buy_conditions,
+        sell_conditions=sell_conditions,
+        stop_loss=stop_loss,
+        take_profit=take_profit,
+    )
+
+    expected = run_engine(strategy, hourly_bars, "loop", interval="1h")
+    result = run_engine(strategy, hourly_bars, mode, interval="1h")
+
+    assert len(expected["trades"]) > 2
+    assert result["trades"] == expected["trades"]
+    assert result["equity_curve"] == expected["equity_curve"]
+    assert result["metrics"] == expected["metrics"]
+
+
+def test_timeframe_filter_changes_entries(make_strategy, run_engine, hourly_bars):
+    # Guards the intraday parity cases above against higher-timeframe conditions never binding
+    runs = [
+        run_engine(make_strategy(
+            parameters=INTRADAY_CASES[case][0],
+            buy_conditions=INTRADAY_CASES[case][1],
+            sell_conditions=INTRADAY_CASES[case][2],
+        ), hourly_bars, "loop", interval="1h")
+        for case in ("intraday", "daily_trend")
+    ]
+    assert len(runs[1]["trades"]) < len(runs[0]["trades"])
+
+
+# Entries held to the end of the period, and round trips ending in a position closed there
+COSTLY_EXITS = {
+    "held_to_end": (
+        [{"indicator": "close", "operator": ">", "value": 0}],
+        [{"indicator": "close", "operator": "<", "value": 0}],
+    ),
+    "round_trips": CASES["sma_crossover"][1:],
+}
+COSTS = {"commission_fixed": 50.0, "spread_pct": 1.0}
+
+
+@pytest.mark.parametrize("mode", ["loop", *MODES])
+@pytest.mark.parametrize("case", COSTLY_EXITS)
+def test_final_value_is_cash_after_closing_costs(make_strategy, bars, case, mode):
+    buy_conditions, sell_conditions = COSTLY_EXITS[case]
+    strategy = make_strategy(
+        parameters=CASES["sma_crossover"][0],
+        buy_conditions=buy_conditions,
+        sell_conditions=sell_conditions,
+        execution=COSTS,
+    )
+    engine = BacktestingEngine(strategy, None, None, vectorized=mode != "loop", market_data=bars.iloc[:1500])
+    engine.jit = mode == "compiled"
+    result = engine.run()
+    profits = sum(trade["profit"] for trade in result["trades"] if trade["action"] == "SELL")
+
+    assert result["trades"][-1]["reason"] == "End of backtest period"
+    assert engine.position == 0
+    assert result["metrics"]["final_value"] == engine.cash
+    assert result["metrics"]["final_value"] == pytest.approx(strategy.initial_capital + profits, rel=1e-12)
+    assert result["metrics"]["total_return"] == pytest.approx(profits, rel=1e-9)
+    # The last bar is valued before the exit's costs
+    assert result["equity_curve"][-1]["value"] > engine.cash
+
+
+def test_portfolio_final_value_is_cash_after_closing_costs(make_strategy):
+    frames = {symbol: generate_ohlcv(500, "1d", seed=seed) for seed, symbol in enumerate(["AAA", "BBB", "CCC"])}
+    strategy = make_strategy(
+        parameters={"sma_short": 10, "sma_long": 30},
+        buy_conditions=COSTLY_EXITS["held_to_end"][0],
+        sell_conditions=COSTLY_EXITS["held_to_end"][1],
+        position_size=30.0,
+        execution=COSTS,
+    )
+    engine = PortfolioBacktestingEngine(strategy, list(frames), None, None, market_data=frames)
+    result = engine.run()
+    profits = sum(trade["profit"] for trade in result["trades"] if trade["action"] == "SELL")
+
+    assert sum(trade["reason"] == "End of backtest period" for trade in result["trades"]) == len(frames)
+    assert result["metrics"]["final_value"] == engine.cash
+    assert result["metrics"]["final_value"] == pytest.approx(strategy.initial_capital + profits, rel=1e-12)
+
+
+def test_stitched_windows_compound_final_values(make_strategy, run_engine, bars):
+    strategy = make_strategy(
+        parameters=CASES["sma_crossover"][0],
+        buy_conditions=COSTLY_EXITS["held_to_end"][0],
+        sell_conditions=COSTLY_EXITS["held_to_end"][1],
+        execution=COSTS,
+    )
+    tests = [run_engine(strategy, bars.iloc[lo:lo + 400], "vectorized") for lo in (0, 400, 800)]
+    _, equity_curve, metrics = stitch_windows(strategy, tests)
+
+    growth = 1.0
+    for test in tests:
+        profits = sum(trade["profit"] for trade in test["trades"] if trade["action"] == "SELL")
+        growth *= 1 + profits / strategy.initial_capital
+    assert metrics["final_value"] == pytest.approx(strategy.initial_capital * growth, rel=1e-12)
+    assert len(equity_curve) == 1200